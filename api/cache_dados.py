@@ -0,0 +1,76 @@
+"""
+Cache em memoria dos dados do banco
+Reconstroi estruturas derivadas apenas quando a versao dos dados muda
+"""
+import threading
+import time
+from datetime import date
+
+# Tabelas cuja carga define a "versao" dos dados servidos pela API
+TABELAS_VERSIONADAS = [
+    "titulos.debentures",
+    "titulos.cricra",
+    "titulos.titulospublicos",
+    "tsb.empresastsb",
+    "fundos.todosfundos",
+    "fundos.gestorassimilares",
+]
+
+
+def obter_versao_dados(cursor, tabelas=None):
+    """Retorna uma tupla (tabela, qtd, ultima carga) que muda a cada nova carga."""
+    tabelas = tabelas or TABELAS_VERSIONADAS
+    sql = " UNION ALL ".join(
+        f"SELECT '{t}', COUNT(*), MAX(datacriacao) FROM {t}" for t in tabelas
+    )
+    cursor.execute(sql)
+    return tuple((row[0], row[1], str(row[2])) for row in cursor.fetchall())
+
+
+class CacheVersionado:
+    """
+    Guarda um valor construido a partir do banco e so o reconstroi
+    quando obter_versao_dados() muda. A versao e consultada no maximo
+    uma vez a cada `ttl_verificacao` segundos. Com diario=True a data de
+    hoje faz parte da versao (valores calculados a partir da data corrente).
+    """
+
+    def __init__(self, construir, ttl_verificacao: float = 30.0, tabelas=None, diario: bool = False):
+        self.construir = construir
+        self.diario = diario
+        self.ttl_verificacao = ttl_verificacao
+        self.tabelas = tabelas
+        self.valor = None
+        self.versao = None
+        self.ultima_verificacao = 0.0
+        self._lock = threading.Lock()
+
+    def obter(self, get_connection):
+        """Retorna o valor em cache, reconstruindo se os dados mudaram."""
+        agora = time.monotonic()
+        if self.valor is not None and agora - self.ultima_verificacao < self.ttl_verificacao:
+            return self.valor
+
+        with self._lock:
+            if self.valor is not None and time.monotonic() - self.ultima_verificacao < self.ttl_verificacao:
+                return self.valor
+
+            conn = get_connection()
+            try:
+                versao = obter_versao_dados(conn.cursor(), self.tabelas)
+                if self.diario:
+                    versao = (date.today().isoformat(),) + versao
+                if self.valor is None or versao != self.versao:
+                    self.valor = self.construir(conn)
+                    self.versao = versao
+            finally:
+                conn.close()
+            self.ultima_verificacao = time.monotonic()
+            return self.valor
+
+    def invalidar(self):
+        """Forca a reconstrucao na proxima chamada."""
+        with self._lock:
+            self.valor = None
+            self.versao = None
+            self.ultima_verificacao = 0.0
@@ -0,0 +1,253 @@
+"""
+Curvas de juros dos titulos publicos e spreads de credito
+Constroi a curva zero prefixada (LTN + NTN-F) e a curva zero real (NTN-B
+Principal + NTN-B) por bootstrapping com interpolacao flat-forward (log-linear
+nos fatores de desconto, base 252 dias uteis), reprecifica todos os titulos
+publicos e calcula o spread de debentures e CRI/CRA sobre a curva do governo
+no prazo da duration, tudo em passes vetorizados.
+
+Dias uteis sao contados de segunda a sexta (sem calendario de feriados).
+"""
+from datetime import date
+
+import numpy as np
+
+from fluxo_caixa import DIAS_UTEIS_ANO, TITULOS_PUBLICOS, indexador, somar_meses
+
+VERTICES_PADRAO = [0.5, 1, 2, 3, 5, 7, 10, 15, 20, 30]   # anos (dias uteis / 252)
+VALOR_FACE = 1000.0
+
+# Curva usada por cada tipo de titulo publico
+CURVA_DO_TIPO = {'NTNBP': 'real', 'NTNB': 'real', 'NTNF': 'pre', 'LTN': 'pre'}
+
+
+def _tipo_normalizado(tipo):
+    return (tipo or '').upper().replace(' ', '').replace('-', '')
+
+
+class CurvaZero:
+    """Fatores de desconto por prazo (anos uteis) com interpolacao flat-forward."""
+
+    def __init__(self):
+        self.prazos = np.array([0.0])
+        self.log_fatores = np.array([0.0])
+
+    @property
+    def vazia(self):
+        return self.prazos.size < 2
+
+    def adicionar(self, prazo, fator):
+        """Inclui (ou substitui) um vertice mantendo os prazos ordenados."""
+        manter = self.prazos != prazo
+        prazos = np.append(self.prazos[manter], prazo)
+        log_fatores = np.append(self.log_fatores[manter], np.log(fator))
+        ordem = np.argsort(prazos)
+        self.prazos, self.log_fatores = prazos[ordem], log_fatores[ordem]
+
+    def fator(self, prazos):
+        """Fator de desconto em cada prazo; alem do ultimo vertice repete a ultima forward."""
+        prazos = np.asarray(prazos, dtype=float)
+        log_fator = np.interp(prazos, self.prazos, self.log_fatores)
+        if self.prazos.size >= 2:
+            forward = (self.log_fatores[-1] - self.log_fatores[-2]) / (self.prazos[-1] - self.prazos[-2])
+            alem = prazos > self.prazos[-1]
+            log_fator = np.where(alem, self.log_fatores[-1] + (prazos - self.prazos[-1]) * forward, log_fator)
+        return np.exp(log_fator)
+
+    def taxa(self, prazos):
+        """Taxa zero anual (exponencial 252) em % nos prazos informados."""
+        prazos = np.maximum(np.asarray(prazos, dtype=float), 1 / DIAS_UTEIS_ANO)
+        return (self.fator(prazos) ** (-1 / prazos) - 1) * 100
+
+
+class MotorCurvas:
+    """Curvas pre/real bootstrapped a partir de titulos.titulospublicos."""
+
+    def __init__(self, titulos, hoje=None):
+        """titulos: lista de dicts com tipo, vencimento, taxaindicativa e pu."""
+        self.hoje = np.datetime64(hoje or date.today(), 'D')
+        self.tipo = np.array([t['tipo'] or '' for t in titulos], dtype=object)
+        self.tipo_norm = np.array([_tipo_normalizado(t['tipo']) for t in titulos], dtype=object)
+        self.vencimento = np.array([np.datetime64(t['vencimento'], 'D') if t['vencimento'] else np.datetime64('NaT')
+                                    for t in titulos], dtype='datetime64[D]')
+        self.taxa = np.array([float(t['taxaindicativa']) if t['taxaindicativa'] is not None else np.nan
+                              for t in titulos])
+        self.pu = np.array([float(t['pu']) if t['pu'] is not None else np.nan for t in titulos])
+
+        regras = [next((r for r in TITULOS_PUBLICOS if tp.startswith(r[0])), None) for tp in self.tipo_norm]
+        self.cupom = np.array([r[1] / 100 if r else np.nan for r in regras])
+        self.meses = np.array([r[2] if r else 0 for r in regras], dtype=np.int64)
+        self.curva_titulo = np.array([next((c for p, c in CURVA_DO_TIPO.items() if tp.startswith(p)), None)
+                                      for tp in self.tipo_norm], dtype=object)
+
+        self._expandir_fluxos()
+        self.curvas = {'pre': CurvaZero(), 'real': CurvaZero()}
+        self._bootstrap()
+        self.reprecificacao = self._reprecificar()
+
+    # ------------------------------------------------------------------
+    # Fluxos por unidade de face (um elemento por pagamento)
+    # ------------------------------------------------------------------
+    def _expandir_fluxos(self):
+        validos = (~np.isnat(self.vencimento) & (self.vencimento > self.hoje)
+                   & ~np.isnan(self.taxa) & (self.curva_titulo != None))  # noqa: E711
+        self.validos = validos
+        idx = np.flatnonzero(validos)
+        venc = self.vencimento[idx]
+        meses = self.meses[idx]
+
+        diff = (venc.astype('datetime64[M]') - self.hoje.astype('datetime64[M]')).astype(np.int64)
+        n = np.where(meses > 0, diff // np.maximum(meses, 1) + 1, 1)
+        primeira = somar_meses(venc, -(n - 1) * meses)
+        n = np.maximum(np.where((meses > 0) & (primeira <= self.hoje), n - 1, n), 1)
+
+        titulo = np.repeat(idx, n)
+        k = np.arange(titulo.size) - np.repeat(np.cumsum(n) - n, n)
+        datas = somar_meses(self.vencimento[titulo], -k * self.meses[titulo])
+        cupom = np.where(self.meses[titulo] > 0, (1 + np.nan_to_num(self.cupom[titulo])) ** 0.5 - 1, 0.0)
+
+        self.fluxo_titulo = titulo
+        self.fluxo_prazo = np.busday_count(self.hoje, datas) / DIAS_UTEIS_ANO
+        self.fluxo_valor = cupom + (k == 0)
+        self.prazo = np.full(self.tipo.size, np.nan)
+        self.prazo[idx] = np.busday_count(self.hoje, venc) / DIAS_UTEIS_ANO
+
+        # Preco por unidade de face na propria taxa indicativa (cotacao de mercado)
+        desconto = (1 + self.taxa[titulo] / 100) ** -self.fluxo_prazo
+        self.preco_mercado = np.bincount(titulo, weights=self.fluxo_valor * desconto, minlength=self.tipo.size)
+
+    # ------------------------------------------------------------------
+    # Bootstrapping
+    # ------------------------------------------------------------------
+    def _bootstrap(self):
+        """Percorre os titulos de cada curva do mais curto ao mais longo: zeros entram direto,
+        titulos com cupom sao resolvidos sobre os vertices ja conhecidos."""
+        for nome, curva in self.curvas.items():
+            titulos = np.flatnonzero(self.validos & (self.curva_titulo == nome))
+            for i in titulos[np.argsort(self.prazo[titulos], kind='stable')]:
+                if self.meses[i] == 0:
+                    curva.adicionar(self.prazo[i], self.preco_mercado[i])
+                elif self.prazo[i] > curva.prazos[-1]:
+                    self._resolver_vertice(curva, i)
+
+    def _resolver_vertice(self, curva, i):
+        """Encontra o fator no vencimento que reproduz o preco do titulo (bissecao na taxa zero)."""
+        sel = self.fluxo_titulo == i
+        prazos, valores = self.fluxo_prazo[sel], self.fluxo_valor[sel]
+        vencimento = self.prazo[i]
+        alvo = self.preco_mercado[i]
+        base_p, base_f = curva.prazos.copy(), curva.log_fatores.copy()
+
+        def preco(taxa_zero):
+            log_f = -vencimento * np.log1p(taxa_zero)
+            p = np.append(base_p, vencimento)
+            f = np.append(base_f, log_f)
+            return float(np.sum(valores * np.exp(np.interp(prazos, p, f))))
+
+        baixo, alto = -0.05, 1.0
+        for _ in range(80):
+            meio = (baixo + alto) / 2
+            if preco(meio) > alvo:
+                baixo = meio
+            else:
+                alto = meio
+        curva.adicionar(vencimento, (1 + (baixo + alto) / 2) ** -vencimento)
+
+    # ------------------------------------------------------------------
+    # Reprecificacao e spreads
+    # ------------------------------------------------------------------
+    def _reprecificar(self):
+        """PU teorico de todos os titulos publicos pela curva (face: 1000 ou VNA implicito)."""
+        nome_curva = self.curva_titulo[self.fluxo_titulo]
+        fator = np.zeros(self.fluxo_titulo.size)
+        for nome, curva in self.curvas.items():
+            sel = nome_curva == nome
+            if sel.any() and not curva.vazia:
+                fator[sel] = curva.fator(self.fluxo_prazo[sel])
+        preco_curva = np.bincount(self.fluxo_titulo, weights=self.fluxo_valor * fator, minlength=self.tipo.size)
+
+        # Titulos reais: face = VNA implicito (PU / cotacao na propria taxa)
+        real = self.curva_titulo == 'real'
+        face = np.where(real, np.divide(self.pu, self.preco_mercado, out=np.full(self.pu.size, np.nan),
+                                        where=self.preco_mercado > 0), VALOR_FACE)
+
+        taxa_modelo = self._taxa_do_preco(preco_curva)
+
+        resultado = []
+        for i in np.flatnonzero(self.validos):
+            pu_modelo = preco_curva[i] * face[i]
+            resultado.append({
+                'tipo': self.tipo[i],
+                'vencimento': str(self.vencimento[i]),
+                'prazo_anos': round(float(self.prazo[i]), 3),
+                'taxaindicativa': round(float(self.taxa[i]), 4),
+                'taxa_curva': round(float(self.curvas[self.curva_titulo[i]].taxa(self.prazo[i])), 4),
+                'pu_mercado': None if np.isnan(self.pu[i]) else round(float(self.pu[i]), 6),
+                'pu_modelo': None if np.isnan(pu_modelo) else round(float(pu_modelo), 6),
+                'taxa_modelo': None if np.isnan(taxa_modelo[i]) else round(float(taxa_modelo[i]), 4),
+                # Erro em taxa (bps): taxa que reproduz o PU do modelo menos a taxa indicativa
+                'erro_bps': None if np.isnan(taxa_modelo[i])
+                            else round(float((taxa_modelo[i] - self.taxa[i]) * 100), 2),
+            })
+        return resultado
+
+    def _taxa_do_preco(self, precos):
+        """Taxa (% a.a.) que desconta os fluxos de cada titulo ao preco informado (bissecao vetorizada)."""
+        titulo, n = self.fluxo_titulo, self.tipo.size
+        baixo, alto = np.full(n, -0.05), np.full(n, 1.0)
+        for _ in range(80):
+            meio = (baixo + alto) / 2
+            preco = np.bincount(titulo, weights=self.fluxo_valor * (1 + meio[titulo]) ** -self.fluxo_prazo,
+                                minlength=n)
+            acima = preco > precos
+            baixo = np.where(acima, meio, baixo)
+            alto = np.where(acima, alto, meio)
+        taxa = (baixo + alto) / 2 * 100
+        return np.where(self.validos & (precos > 0), taxa, np.nan)
+
+    def taxa_zero(self, curva, prazos):
+        """Taxa zero (% a.a.) da curva nos prazos (anos uteis); NaN se a curva nao existe."""
+        c = self.curvas[curva]
+        prazos = np.asarray(prazos, dtype=float)
+        if c.vazia:
+            return np.full(prazos.shape, np.nan)
+        return c.taxa(prazos)
+
+    def spreads(self, taxa, duration, textos_indexador):
+        """
+        Spread de credito (% a.a.) sobre a curva do governo no prazo da duration.
+        IPCA+ contra a curva real; prefixados e % do DI contra a prefixada
+        (DI projetado pela curva pre); DI+ ja e o proprio spread.
+        """
+        taxa = np.asarray(taxa, dtype=float)
+        prazo = np.asarray(duration, dtype=float) / DIAS_UTEIS_ANO
+        idx = np.array([indexador(t, x if not np.isnan(x) else 0) for t, x in zip(textos_indexador, taxa)],
+                       dtype=object)
+        pre = self.taxa_zero('pre', prazo) / 100
+        real = self.taxa_zero('real', prazo) / 100
+        y = taxa / 100
+
+        spread = np.select(
+            [idx == 'ipca', idx == 'pre', idx == 'di_percentual', idx == 'di_spread'],
+            [(1 + y) / (1 + real) - 1, (1 + y) / (1 + pre) - 1, (1 + y * pre) / (1 + pre) - 1, y],
+            np.nan,
+        ) * 100
+        return np.where(np.isnan(prazo) & (idx != 'di_spread'), np.nan, spread)
+
+    def resumo(self, vertices=None):
+        """Curvas nos vertices padrao, inflacao implicita e vertices bootstrapped."""
+        vertices = np.asarray(vertices or VERTICES_PADRAO, dtype=float)
+        pre = self.taxa_zero('pre', vertices)
+        real = self.taxa_zero('real', vertices)
+        implicita = ((1 + pre / 100) / (1 + real / 100) - 1) * 100
+
+        def _f(v):
+            return None if np.isnan(v) else round(float(v), 4)
+
+        return {
+            'data_referencia': str(self.hoje),
+            'vertices': [{'prazo_anos': float(t), 'pre': _f(p), 'real': _f(r), 'inflacao_implicita': _f(i)}
+                         for t, p, r, i in zip(vertices, pre, real, implicita)],
+            'nos': {nome: [{'prazo_anos': round(float(t), 4), 'taxa': _f(c.taxa(t))} for t in c.prazos[1:]]
+                    for nome, c in self.curvas.items()},
+        }
@@ -0,0 +1,364 @@
+"""
+Motor de fluxo de caixa e escada de vencimentos
+Projeta datas e valores de juros e amortizacao de todos os titulos (debentures,
+CRI/CRA e titulos publicos) de forma vetorizada e agrega em escadas mensais e
+anuais. Construido uma vez por versao dos dados (CacheVersionado).
+
+Convencoes:
+- Titulos publicos seguem as regras do Tesouro (LTN/NTN-B Principal/LFT sem
+  cupom; NTN-F 10% a.a. e NTN-B/NTN-C 6% a.a. semestrais), com datas de cupom
+  contadas a partir do vencimento.
+- CRI/CRA: vencimento real (datavencimento), pagamentos mensais com
+  amortizacao linear.
+- Debentures: nao ha data de vencimento na base; o prazo e estimado a partir da
+  duration (dias uteis) de um titulo bullet com cupons semestrais
+  (`vencimento_estimado` = True).
+- O valor nominal de cada titulo e calibrado para que o valor presente do fluxo,
+  descontado pela taxa indicativa, seja igual ao PU. Fluxos indexados ao IPCA
+  sao corrigidos pela projecao `ipca`; pos-fixados usam `taxa_di`.
+"""
+from datetime import date
+
+import numpy as np
+
+PARAMETROS_PADRAO = {
+    'taxa_di': 10.0,   # % a.a.
+    'ipca': 4.0,       # % a.a.
+}
+
+DIAS_UTEIS_ANO = 252
+MAX_PERIODOS_DEBENTURE = 80   # 40 anos de cupons semestrais
+
+# (prefixo do tipo sem espacos/hifens, cupom % a.a., meses entre cupons, indexador)
+TITULOS_PUBLICOS = [
+    ('NTNBP', 0.0, 0, 'ipca'),      # NTN-B Principal
+    ('NTNB', 6.0, 6, 'ipca'),
+    ('NTNC', 6.0, 6, 'ipca'),
+    ('NTNF', 10.0, 6, 'pre'),
+    ('LTN', 0.0, 0, 'pre'),
+    ('LFT', 0.0, 0, 'di_spread'),
+]
+
+FAIXAS_PRAZO = [
+    (365, '< 1 ano'),
+    (730, '1-2 anos'),
+    (1095, '2-3 anos'),
+    (1460, '3-4 anos'),
+    (None, '> 4 anos'),
+]
+
+
+def _num(valor):
+    try:
+        return float(valor) if valor is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def indexador(texto, taxa):
+    """Classifica a remuneracao: 'di_percentual', 'di_spread', 'ipca' ou 'pre'."""
+    t = (texto or '').upper()
+    if 'PERCENT' in t or ('DI' in t and taxa > 50):
+        return 'di_percentual'
+    if 'DI' in t or 'SELIC' in t:
+        return 'di_spread'
+    if 'IPCA' in t or 'IGP' in t:
+        return 'ipca'
+    if taxa > 50:
+        return 'di_percentual'
+    return 'pre'
+
+
+def titulo_debenture(codigo, emissor, grupo, taxa, duration, pu):
+    """Linha de titulos.debentures no formato do motor (vencimento estimado pela duration)."""
+    return {'classe': 'Debenture', 'codigoativo': codigo, 'emissor': emissor, 'grupo': grupo,
+            'taxa': _num(taxa), 'duration': _num(duration), 'pu': _num(pu),
+            'vencimento': None, 'texto_indexador': grupo}
+
+
+def _taxas(indexadores, taxa, parametros):
+    """Taxa de desconto (no indexador) e correcao anual de cada titulo, em decimal."""
+    di = parametros['taxa_di'] / 100
+    ipca = parametros['ipca'] / 100
+    taxa = np.nan_to_num(taxa) / 100
+    idx = np.asarray(indexadores)
+    rendimento = np.select(
+        [idx == 'di_percentual', idx == 'di_spread'],
+        [taxa * di, (1 + di) * (1 + taxa) - 1],
+        taxa,
+    )
+    correcao = np.where(idx == 'ipca', ipca, 0.0)
+    return rendimento, correcao
+
+
+def _limite_periodo(periodo, mensal, mes):
+    """Ajusta um limite AAAA-MM / AAAA a granularidade (AAAA -> AAAA-<mes> na mensal, AAAA-MM -> AAAA na anual)."""
+    periodo = periodo.strip()
+    if not mensal:
+        return periodo[:4]
+    return periodo if len(periodo) > 4 else f'{periodo}-{mes}'
+
+
+def somar_meses(datas, meses):
+    """Soma meses a datas (datetime64[D]) mantendo o dia, limitado ao fim do mes."""
+    mes = datas.astype('datetime64[M]') + meses.astype('timedelta64[M]')
+    dia = (datas - datas.astype('datetime64[M]').astype('datetime64[D]')).astype(np.int64)
+    ultimo_dia = ((mes + 1).astype('datetime64[D]') - mes.astype('datetime64[D]')).astype(np.int64) - 1
+    return mes.astype('datetime64[D]') + np.minimum(dia, ultimo_dia).astype('timedelta64[D]')
+
+
+def estimar_periodos(duration_anos, cupom, rendimento):
+    """
+    Numero de cupons semestrais de um bullet cuja duration de Macaulay mais se
+    aproxima da informada (matriz titulos x periodos, sem laco por titulo).
+    """
+    j = np.arange(1, MAX_PERIODOS_DEBENTURE + 1)
+    q = ((1 + cupom) ** 0.5 - 1)[:, None]
+    v = (1 + rendimento)[:, None] ** (-j[None, :] / 2)
+    soma_cupons = np.cumsum(q * v, axis=1)
+    soma_tempos = np.cumsum(q * v * j[None, :] / 2, axis=1)
+    duration = (soma_tempos + v * j[None, :] / 2) / (soma_cupons + v)
+    return np.argmin(np.abs(duration - duration_anos[:, None]), axis=1) + 1
+
+
+class MotorFluxoCaixa:
+    """Cronograma de todos os titulos em arrays planos (um elemento por pagamento)."""
+
+    def __init__(self, titulos, parametros=None, hoje=None):
+        self.parametros = {**PARAMETROS_PADRAO, **(parametros or {})}
+        self.hoje = np.datetime64(hoje or date.today(), 'D')
+        self.data_referencia = str(self.hoje)
+        self._montar_titulos(titulos)
+        self._projetar()
+        self.escada_mensal = self._escada('M')
+        self.escada_anual = self._escada('Y')
+
+    @classmethod
+    def carregar(cls, conn, parametros=None):
+        """Carrega debentures, CRI/CRA e titulos publicos do banco."""
+        cursor = conn.cursor()
+        titulos = []
+
+        cursor.execute("""
+            SELECT codigoativo, emissor, grupo, taxaindicativa, duration, pu
+            FROM titulos.debentures
+        """)
+        titulos += [titulo_debenture(*linha) for linha in cursor.fetchall()]
+
+        cursor.execute("""
+            SELECT codigoativo, tipocontrato, emissor, datavencimento, taxaindicativa, pu, duration,
+                   tiporemuneracao, taxacorrecao
+            FROM titulos.cricra
+        """)
+        for codigo, tipo, emissor, venc, taxa, pu, duration, remuneracao, correcao in cursor.fetchall():
+            titulos.append({'classe': tipo or 'CRI/CRA', 'codigoativo': codigo, 'emissor': emissor,
+                            'grupo': remuneracao, 'taxa': _num(taxa), 'duration': _num(duration),
+                            'pu': _num(pu), 'vencimento': venc,
+                            'texto_indexador': f"{remuneracao or ''} {correcao or ''}"})
+
+        cursor.execute("""
+            SELECT tipo, vencimento, taxaindicativa, pu
+            FROM titulos.titulospublicos
+        """)
+        for tipo, venc, taxa, pu in cursor.fetchall():
+            titulos.append({'classe': 'Titulo Publico', 'codigoativo': f"{tipo} {venc}", 'emissor': 'Tesouro Nacional',
+                            'grupo': tipo, 'taxa': _num(taxa), 'duration': np.nan, 'pu': _num(pu),
+                            'vencimento': venc, 'texto_indexador': tipo})
+
+        return cls(titulos, parametros)
+
+    # ------------------------------------------------------------------
+    # Titulos
+    # ------------------------------------------------------------------
+    def _montar_titulos(self, titulos):
+        n = len(titulos)
+        self.classe = np.array([t['classe'] for t in titulos], dtype=object)
+        self.codigo = np.array([t['codigoativo'] or '' for t in titulos], dtype=object)
+        self.emissor = np.array([t['emissor'] or '' for t in titulos], dtype=object)
+        self.grupo = np.array([t['grupo'] for t in titulos], dtype=object)
+        self.taxa = np.array([t['taxa'] for t in titulos], dtype=float)
+        self.duration = np.array([t['duration'] for t in titulos], dtype=float)
+        self.pu = np.array([t['pu'] for t in titulos], dtype=float)
+        self.vencimento = np.array([np.datetime64(t['vencimento'], 'D') if t['vencimento'] else np.datetime64('NaT')
+                                    for t in titulos], dtype='datetime64[D]')
+
+        # Convencoes por classe: cupom, frequencia, amortizacao e indexador
+        self.cupom = np.full(n, np.nan)
+        self.meses = np.zeros(n, dtype=np.int64)
+        self.amortiza = np.zeros(n, dtype=bool)
+        indexadores = []
+        for i, t in enumerate(titulos):
+            taxa = t['taxa'] if not np.isnan(t['taxa']) else 0.0
+            if t['classe'] == 'Titulo Publico':
+                tipo = (t['grupo'] or '').upper().replace(' ', '').replace('-', '')
+                regra = next((r for r in TITULOS_PUBLICOS if tipo.startswith(r[0])), ('', 0.0, 0, 'pre'))
+                self.cupom[i] = regra[1] / 100
+                self.meses[i] = regra[2]
+                indexadores.append(regra[3])
+            else:
+                indexadores.append(indexador(t['texto_indexador'], taxa))
+                self.meses[i] = 6 if t['classe'] == 'Debenture' else 1
+                self.amortiza[i] = t['classe'] != 'Debenture'
+        self.indexador = np.array(indexadores, dtype=object)
+        self.rendimento, self.correcao = _taxas(self.indexador, self.taxa, self.parametros)
+        corporativo = self.classe != 'Titulo Publico'
+        self.cupom[corporativo] = self.rendimento[corporativo]
+
+        # Debentures: vencimento estimado pela duration (bullet semestral)
+        self.vencimento_estimado = np.isnat(self.vencimento) & (self.classe == 'Debenture') & ~np.isnan(self.duration)
+        if self.vencimento_estimado.any():
+            e = self.vencimento_estimado
+            periodos = estimar_periodos(self.duration[e] / DIAS_UTEIS_ANO, self.cupom[e], self.rendimento[e])
+            self.vencimento[e] = somar_meses(np.full(periodos.size, self.hoje), periodos * 6)
+
+    # ------------------------------------------------------------------
+    # Projecao
+    # ------------------------------------------------------------------
+    def _projetar(self):
+        """Gera o cronograma de todos os titulos com vencimento futuro."""
+        vivos = np.flatnonzero(~np.isnat(self.vencimento) & (self.vencimento > self.hoje))
+        venc = self.vencimento[vivos]
+        meses = self.meses[vivos]
+
+        # Quantidade de pagamentos ainda por vir (contando para tras a partir do vencimento)
+        diff = (venc.astype('datetime64[M]') - self.hoje.astype('datetime64[M]')).astype(np.int64)
+        passo = np.maximum(meses, 1)
+        n = np.where(meses > 0, diff // passo + 1, 1)
+        primeira = somar_meses(venc, -(n - 1) * meses)
+        n = np.where((meses > 0) & (primeira <= self.hoje), n - 1, n)
+        n = np.maximum(n, 1)
+
+        # Expansao: um elemento por pagamento (k = 0 e o vencimento)
+        titulo = np.repeat(np.arange(vivos.size), n)
+        inicio = np.repeat(np.cumsum(n) - n, n)
+        k = np.arange(titulo.size) - inicio
+        datas = somar_meses(venc[titulo], -k * meses[titulo])
+        anos = (datas - self.hoje).astype(np.int64) / 365.0
+
+        n_t = n[titulo]
+        ordem = n_t - k                      # 1 = proximo pagamento
+        linear = self.amortiza[vivos][titulo]
+        amortizacao = np.where(linear, 1.0 / n_t, (k == 0).astype(float))
+        saldo = np.where(linear, 1.0 - (ordem - 1) / n_t, 1.0)
+        cupom = self.cupom[vivos][titulo]
+        juros = np.where(meses[titulo] > 0, saldo * ((1 + cupom) ** (meses[titulo] / 12) - 1), 0.0)
+
+        # Calibracao do nominal: VP do fluxo (na taxa indicativa) = PU
+        rendimento = self.rendimento[vivos][titulo]
+        vp_unitario = np.bincount(titulo, weights=(juros + amortizacao) * (1 + rendimento) ** -anos,
+                                  minlength=vivos.size)
+        pu = self.pu[vivos]
+        nominal = np.divide(pu, vp_unitario, out=np.full(vivos.size, np.nan), where=vp_unitario > 0)
+        fator = nominal[titulo] * (1 + self.correcao[vivos][titulo]) ** anos
+
+        self.fluxo_titulo = vivos[titulo]
+        self.fluxo_data = datas
+        self.fluxo_juros = np.nan_to_num(juros * fator)
+        self.fluxo_amortizacao = np.nan_to_num(amortizacao * fator)
+        self.sem_pu = int(np.isnan(nominal).sum())
+
+    def _escada(self, unidade):
+        """Agrega os fluxos por mes ('M') ou ano ('Y') e por classe."""
+        if not self.fluxo_data.size:
+            return []
+        periodo = self.fluxo_data.astype(f'datetime64[{unidade}]')
+        periodos, idx_periodo = np.unique(periodo, return_inverse=True)
+        classes, idx_classe = np.unique(self.classe[self.fluxo_titulo].astype(str), return_inverse=True)
+        chave = idx_periodo * len(classes) + idx_classe
+        tamanho = len(periodos) * len(classes)
+
+        juros = np.bincount(chave, weights=self.fluxo_juros, minlength=tamanho).reshape(len(periodos), -1)
+        amort = np.bincount(chave, weights=self.fluxo_amortizacao, minlength=tamanho).reshape(len(periodos), -1)
+        vencendo = (self.fluxo_data == self.vencimento[self.fluxo_titulo])
+        qtd_venc = np.bincount(chave[vencendo], minlength=tamanho).reshape(len(periodos), -1)
+
+        escada = []
+        for p, nome in enumerate(periodos.astype(str)):
+            escada.append({
+                'periodo': nome,
+                'juros': round(float(juros[p].sum()), 2),
+                'amortizacao': round(float(amort[p].sum()), 2),
+                'total': round(float(juros[p].sum() + amort[p].sum()), 2),
+                'vencimentos': int(qtd_venc[p].sum()),
+                'por_classe': {
+                    c: {'juros': round(float(juros[p, j]), 2), 'amortizacao': round(float(amort[p, j]), 2),
+                        'vencimentos': int(qtd_venc[p, j])}
+                    for j, c in enumerate(classes) if juros[p, j] or amort[p, j]
+                },
+            })
+        return escada
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def prazos(self):
+        """Dias corridos ate o vencimento de cada titulo (NaN se desconhecido)."""
+        dias = (self.vencimento - self.hoje).astype('timedelta64[D]').astype(float)
+        dias[np.isnat(self.vencimento)] = np.nan
+        return dias
+
+    def por_faixa(self):
+        """Quantidade e PU somado por faixa de prazo ate o vencimento."""
+        dias = self.prazos()
+        validos = ~np.isnan(dias) & (dias > 0)
+        limites = [f[0] for f in FAIXAS_PRAZO[:-1]]
+        faixa = np.searchsorted(limites, dias[validos], side='right')
+        qtd = np.bincount(faixa, minlength=len(FAIXAS_PRAZO))
+        valor = np.bincount(faixa, weights=np.nan_to_num(self.pu[validos]), minlength=len(FAIXAS_PRAZO))
+        return [{'faixa': nome, 'qtd': int(qtd[i]), 'valor': round(float(valor[i]), 2)}
+                for i, (_, nome) in enumerate(FAIXAS_PRAZO) if qtd[i]]
+
+    def proximos_vencimentos(self, limite=15):
+        dias = self.prazos()
+        validos = np.flatnonzero(~np.isnan(dias) & (dias > 0))
+        ordem = validos[np.argsort(dias[validos], kind='stable')][:limite]
+        return [{
+            'codigoativo': self.codigo[i],
+            'emissor': self.emissor[i],
+            'classe': self.classe[i],
+            'grupo': self.grupo[i],
+            'taxaindicativa': None if np.isnan(self.taxa[i]) else float(self.taxa[i]),
+            'duration': None if np.isnan(self.duration[i]) else float(self.duration[i]),
+            'pu': None if np.isnan(self.pu[i]) else float(self.pu[i]),
+            'vencimento': str(self.vencimento[i]),
+            'vencimento_estimado': bool(self.vencimento_estimado[i]),
+            'dias_ate_vencimento': int(dias[i]),
+        } for i in ordem]
+
+    def fluxo_ativo(self, codigo):
+        """Cronograma projetado de um titulo pelo codigo."""
+        titulos = np.flatnonzero(self.codigo == codigo)
+        if not titulos.size:
+            return None
+        i = titulos[0]
+        sel = np.flatnonzero(self.fluxo_titulo == i)
+        sel = sel[np.argsort(self.fluxo_data[sel], kind='stable')]
+        return {
+            'codigoativo': self.codigo[i],
+            'emissor': self.emissor[i],
+            'classe': self.classe[i],
+            'indexador': self.indexador[i],
+            'vencimento': None if np.isnat(self.vencimento[i]) else str(self.vencimento[i]),
+            'vencimento_estimado': bool(self.vencimento_estimado[i]),
+            'pagamentos': [{
+                'data': str(self.fluxo_data[j]),
+                'juros': round(float(self.fluxo_juros[j]), 2),
+                'amortizacao': round(float(self.fluxo_amortizacao[j]), 2),
+            } for j in sel],
+        }
+
+    def escada(self, granularidade='mensal', inicio=None, fim=None, classe=None):
+        """Escada mensal/anual, opcionalmente filtrada por periodo (AAAA-MM / AAAA) e classe."""
+        mensal = granularidade == 'mensal'
+        escada = self.escada_mensal if mensal else self.escada_anual
+        if inicio:
+            inicio = _limite_periodo(inicio, mensal, '01')
+            escada = [e for e in escada if e['periodo'] >= inicio]
+        if fim:
+            fim = _limite_periodo(fim, mensal, '12')
+            escada = [e for e in escada if e['periodo'] <= fim]
+        if classe:
+            escada = [{'periodo': e['periodo'], **e['por_classe'][classe],
+                       'total': round(e['por_classe'][classe]['juros'] + e['por_classe'][classe]['amortizacao'], 2)}
+                      for e in escada if classe in e['por_classe']]
+        return escada
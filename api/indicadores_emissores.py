@@ -0,0 +1,257 @@
+"""
+Indicadores financeiros dos emissores (CVM)
+Pivota emissores.demonstracoesfinanceiras em uma tabela larga por (cnpj, ano)
+com receita, EBIT, lucro liquido e, quando BP/DFC estiverem carregados,
+divida, caixa, patrimonio liquido e fluxo operacional. Os indices sao
+calculados na carga (pandas/NumPy vetorizado) e gravados em
+emissores.indicadores por materializar_indicadores.py; a API so le a tabela
+pronta e vincula cada emissor de debentures ao seu CNPJ pelo nome.
+
+Os codigos de conta sao os do plano padrao da CVM para empresas nao
+financeiras; contas ausentes viram NaN e os indices correspondentes ficam nulos.
+"""
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Conta CVM -> coluna da tabela larga
+CONTAS = {
+    # DRE
+    '3.01': 'receita',
+    '3.03': 'resultado_bruto',
+    '3.05': 'ebit',
+    '3.06': 'resultado_financeiro',
+    '3.07': 'lucro_antes_ir',
+    '3.09': 'lucro_operacoes_continuadas',
+    '3.11': 'lucro_liquido',
+    # BP Ativo
+    '1': 'ativo_total',
+    '1.01': 'ativo_circulante',
+    '1.01.01': 'caixa',
+    '1.01.02': 'aplicacoes_financeiras',
+    # BP Passivo
+    '2.01': 'passivo_circulante',
+    '2.01.04': 'emprestimos_cp',
+    '2.02': 'passivo_nao_circulante',
+    '2.02.01': 'emprestimos_lp',
+    '2.03': 'patrimonio_liquido',
+    # DFC
+    '6.01': 'fco',
+}
+COLUNAS_CONTAS = list(dict.fromkeys(CONTAS.values()))
+
+INDICES = [
+    'margem_bruta', 'margem_ebit', 'margem_liquida', 'crescimento_receita', 'roe',
+    'divida_bruta', 'divida_liquida', 'divida_liquida_ebit', 'divida_pl', 'passivo_pl',
+    'liquidez_corrente', 'cobertura_juros', 'fco_divida',
+]
+COLUNAS_TABELA = COLUNAS_CONTAS + INDICES     # colunas de emissores.indicadores alem de cnpj e ano
+
+# Faixas de divida liquida / EBIT usadas no resumo da analise de divida
+FAIXAS_ALAVANCAGEM = [(-np.inf, 0, 'Caixa liquido'), (0, 1, '< 1x'), (1, 2, '1-2x'),
+                      (2, 3, '2-3x'), (3, 4, '3-4x'), (4, np.inf, '> 4x')]
+
+_SUFIXOS = re.compile(r'\b(S ?A|S ?/ ?A|LTDA|CIA|COMPANHIA|EM RECUPERACAO JUDICIAL)\b')
+_NAO_ALFANUM = re.compile(r'[^A-Z0-9 ]+')
+
+
+def normalizar_nome(nome):
+    """Nome em maiusculas, sem acentos, pontuacao e sufixos societarios."""
+    texto = unicodedata.normalize('NFKD', str(nome or '')).encode('ascii', 'ignore').decode().upper()
+    texto = _NAO_ALFANUM.sub(' ', texto.replace('.', '').replace('/', ''))
+    return ' '.join(_SUFIXOS.sub(' ', texto).split())
+
+
+def _dividir(a, b):
+    """a / b com NaN onde b e zero ou nulo."""
+    b = b.where(b != 0)
+    return a / b
+
+
+def ler_demonstracoes(cursor):
+    """Linhas de emissores.demonstracoesfinanceiras das contas usadas (na ordem de carga)."""
+    cursor.execute("""
+        SELECT cnpj, tipodemonstracao, codigoconta, valor, anoexercicio
+        FROM emissores.demonstracoesfinanceiras
+        WHERE codigoconta = ANY(%s)
+        ORDER BY id
+    """, (list(CONTAS),))
+    return cursor.fetchall()
+
+
+def tabela_larga(linhas):
+    """
+    Linhas (cnpj, tipodemonstracao, codigoconta, valor, anoexercicio) -> DataFrame
+    indexado por (cnpj, ano) com uma coluna por conta e os indices derivados.
+    """
+    df = pd.DataFrame(linhas, columns=['cnpj', 'tipodemonstracao', 'codigoconta', 'valor', 'ano'])
+    df['campo'] = df['codigoconta'].astype(str).str.strip().map(CONTAS)
+    df = df.dropna(subset=['campo', 'cnpj', 'ano'])
+    df['valor'] = pd.to_numeric(df['valor'], errors='coerce')
+    df['ano'] = df['ano'].astype(int)
+
+    # A mesma conta pode ter sido carregada mais de uma vez: fica a ultima carga
+    df = df.drop_duplicates(subset=['cnpj', 'ano', 'campo'], keep='last')
+    larga = df.pivot(index=['cnpj', 'ano'], columns='campo', values='valor')
+    larga = larga.reindex(columns=COLUNAS_CONTAS).astype(float).sort_index()
+    return calcular_indices(larga)
+
+
+def calcular_indices(t):
+    """Acrescenta margens, crescimento, alavancagem e cobertura a tabela larga."""
+    t = t.copy()
+    # Lucro liquido consolidado (3.11); leiautes antigos terminam em 3.09
+    t['lucro_liquido'] = t['lucro_liquido'].fillna(t['lucro_operacoes_continuadas'])
+
+    t['margem_bruta'] = _dividir(t['resultado_bruto'], t['receita'])
+    t['margem_ebit'] = _dividir(t['ebit'], t['receita'])
+    t['margem_liquida'] = _dividir(t['lucro_liquido'], t['receita'])
+    anterior = t.groupby(level='cnpj')['receita'].shift(1)
+    ano_anterior = pd.Series(t.index.get_level_values('ano'), index=t.index).groupby(level='cnpj').shift(1)
+    consecutivo = ano_anterior == t.index.get_level_values('ano') - 1
+    t['crescimento_receita'] = _dividir(t['receita'] - anterior, anterior.abs()).where(consecutivo)
+    t['roe'] = _dividir(t['lucro_liquido'], t['patrimonio_liquido'])
+
+    t['divida_bruta'] = t[['emprestimos_cp', 'emprestimos_lp']].sum(axis=1, min_count=1)
+    caixa = t[['caixa', 'aplicacoes_financeiras']].sum(axis=1, min_count=1)
+    t['divida_liquida'] = t['divida_bruta'] - caixa.fillna(0)
+    t['divida_liquida_ebit'] = _dividir(t['divida_liquida'], t['ebit'].where(t['ebit'] > 0))
+    t['divida_pl'] = _dividir(t['divida_bruta'], t['patrimonio_liquido'].where(t['patrimonio_liquido'] > 0))
+    passivo = t[['passivo_circulante', 'passivo_nao_circulante']].sum(axis=1, min_count=1)
+    t['passivo_pl'] = _dividir(passivo, t['patrimonio_liquido'].where(t['patrimonio_liquido'] > 0))
+    t['liquidez_corrente'] = _dividir(t['ativo_circulante'], t['passivo_circulante'])
+    # Resultado financeiro liquido negativo = despesa financeira (proxy de juros)
+    despesa = -t['resultado_financeiro'].where(t['resultado_financeiro'] < 0)
+    t['cobertura_juros'] = _dividir(t['ebit'], despesa)
+    t['fco_divida'] = _dividir(t['fco'], t['divida_bruta'])
+    return t
+
+
+def _registro(cnpj, ano, linha, colunas):
+    saida = {'cnpj': cnpj, 'ano': int(ano)}
+    for c in colunas:
+        v = linha[c]
+        saida[c] = None if pd.isna(v) else round(float(v), 4)
+    return saida
+
+
+class MotorIndicadores:
+    """Tabela larga de indicadores por (cnpj, ano) + vinculo com emissores de debentures."""
+
+    def __init__(self, tabela, empresas, emissores_debentures):
+        """
+        tabela: tabela larga indexada por (cnpj, ano), como a de tabela_larga()
+        empresas: linhas (cnpj, razaosocial) de emissores.empresas
+        emissores_debentures: nomes distintos de titulos.debentures.emissor
+        """
+        self.tabela = tabela
+        self.razao_social = {c: r for c, r in empresas if c}
+
+        # Ultimo exercicio de cada CNPJ
+        if len(self.tabela):
+            self.ultimo = self.tabela.groupby(level='cnpj').tail(1).reset_index(level='ano')
+        else:
+            self.ultimo = pd.DataFrame(columns=['ano'] + list(self.tabela.columns))
+        self.vinculo = self._vincular(emissores_debentures, empresas)
+
+    @classmethod
+    def carregar(cls, conn):
+        """Carrega os indicadores materializados e os nomes a partir de uma conexao aberta."""
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT cnpj, ano, {', '.join(COLUNAS_TABELA)} FROM emissores.indicadores")
+        tabela = pd.DataFrame(cursor.fetchall(), columns=['cnpj', 'ano'] + COLUNAS_TABELA)
+        tabela = tabela.set_index(['cnpj', 'ano'])[COLUNAS_TABELA].astype(float).sort_index()
+        cursor.execute("SELECT cnpj, razaosocial FROM emissores.empresas")
+        empresas = cursor.fetchall()
+        cursor.execute("SELECT DISTINCT emissor FROM titulos.debentures WHERE emissor IS NOT NULL")
+        emissores = [r[0] for r in cursor.fetchall()]
+        return cls(tabela, empresas, emissores)
+
+    def _vincular(self, emissores, empresas):
+        """
+        CNPJ de cada emissor de debentures: nome normalizado identico; senao
+        o nome do emissor contem os 15 primeiros caracteres da razao social
+        (mesma regra dos vinculos TSB). So entram CNPJs com demonstracoes.
+        """
+        com_dados = set(self.ultimo.index)
+        candidatos = sorted({(normalizar_nome(r), c) for c, r in empresas if c in com_dados and r})
+        exato = {}
+        for nome, cnpj in candidatos:
+            exato.setdefault(nome, cnpj)
+        prefixos = [(nome[:15], cnpj) for nome, cnpj in candidatos if len(nome) >= 4]
+
+        vinculo = {}
+        for emissor in emissores:
+            nome = normalizar_nome(emissor)
+            cnpj = exato.get(nome) or next((c for p, c in prefixos if p in nome), None)
+            if cnpj:
+                vinculo[emissor] = cnpj
+        return vinculo
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def por_cnpj(self, cnpj):
+        """Historico anual de um CNPJ (mais recente primeiro)."""
+        if cnpj not in self.tabela.index.get_level_values('cnpj'):
+            return []
+        historico = self.tabela.xs(cnpj, level='cnpj').sort_index(ascending=False)
+        return [_registro(cnpj, ano, linha, historico.columns) for ano, linha in historico.iterrows()]
+
+    def do_emissor(self, emissor):
+        """Indicadores do ultimo exercicio do emissor de debentures (ou None)."""
+        cnpj = self.vinculo.get(emissor)
+        if cnpj is None:
+            return None
+        linha = self.ultimo.loc[cnpj]
+        registro = _registro(cnpj, linha['ano'], linha, COLUNAS_CONTAS + INDICES)
+        registro['razaosocial'] = self.razao_social.get(cnpj)
+        return registro
+
+    def listar(self, ano=None, cnpj=None, ordenar='divida_liquida_ebit', offset=0, limite=None):
+        """
+        Tabela larga filtrada (sem ano, o ultimo exercicio de cada CNPJ).
+        Retorna (total, registros da pagina); so a pagina e convertida em dicts.
+        """
+        if ano is not None:
+            t = self.tabela[self.tabela.index.get_level_values('ano') == ano].reset_index(level='ano')
+        else:
+            t = self.ultimo
+        if cnpj:
+            t = t[t.index == cnpj]
+        if ordenar in t.columns:
+            t = t.sort_values(ordenar, ascending=False, na_position='last', kind='stable')
+        pagina = t.iloc[offset:offset + limite if limite else None]
+        registros = []
+        for c, linha in pagina.iterrows():
+            r = _registro(c, linha['ano'], linha, COLUNAS_CONTAS + INDICES)
+            r['razaosocial'] = self.razao_social.get(c)
+            registros.append(r)
+        return len(t), registros
+
+    def resumo_emissores(self, emissores):
+        """Cobertura e distribuicao de alavancagem dos emissores de debentures informados."""
+        cnpjs = pd.unique(pd.Series([self.vinculo.get(e) for e in emissores], dtype=object).dropna())
+        t = self.ultimo.loc[list(cnpjs)] if len(cnpjs) else self.ultimo.iloc[0:0]
+        alavancagem = t['divida_liquida_ebit'].to_numpy(dtype=float)
+        com_alavancagem = alavancagem[~np.isnan(alavancagem)]
+
+        def _mediana(coluna):
+            v = t[coluna].dropna()
+            return round(float(v.median()), 4) if len(v) else None
+
+        faixas = [{'faixa': nome, 'qtd': int(((com_alavancagem >= a) & (com_alavancagem < b)).sum())}
+                  for a, b, nome in FAIXAS_ALAVANCAGEM]
+        return {
+            'emissores': len(set(emissores)),
+            'emissores_com_demonstracoes': int(sum(1 for e in set(emissores) if e in self.vinculo)),
+            'cnpjs': len(cnpjs),
+            'mediana_margem_ebit': _mediana('margem_ebit'),
+            'mediana_margem_liquida': _mediana('margem_liquida'),
+            'mediana_divida_liquida_ebit': _mediana('divida_liquida_ebit'),
+            'mediana_divida_pl': _mediana('divida_pl'),
+            'mediana_cobertura_juros': _mediana('cobertura_juros'),
+            'por_faixa_alavancagem': faixas if com_alavancagem.size else [],
+        }
@@ -0,0 +1,218 @@
+"""
+Materializa os alertas antecipados no PostgreSQL
+Chamado ao final da carga do PostgreSQL (etl/main.py);
+tambem pode ser executado a mao:
+
+    python api/materializar_alertas.py                   # materializa
+    python api/materializar_alertas.py --criar-tabelas   # bancos criados antes das tabelas
+
+Avalia as regras de motor_alertas, compara com os alertas ativos da execucao
+anterior (novos, persistentes, resolvidos) e grava tudo em uma transacao em
+esg.alertas / esg.alertasexecucao, de onde /api/early-warning le os alertas.
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extras import Json, execute_values
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from motor_alertas import MotorAlertas
+
+load_dotenv(Path(__file__).parent / '.env')
+
+DB_CONFIG = {
+    "host": os.getenv("PG_HOST", "localhost"),
+    "port": os.getenv("PG_PORT", "5432"),
+    "database": os.getenv("PG_DATABASE", "anbima_esg"),
+    "user": os.getenv("PG_USER", "postgres"),
+    "password": os.getenv("PG_PASSWORD", ""),
+}
+
+# Mesmo DDL de sql_postgres/00_create_database.sql, para bancos criados antes das tabelas
+SQL_TABELAS = """
+CREATE TABLE IF NOT EXISTS esg.alertas (
+    alertaid SERIAL PRIMARY KEY,
+    regra VARCHAR(100) NOT NULL,
+    chave VARCHAR(300) NOT NULL DEFAULT '',
+    tipo VARCHAR(50),
+    severidade VARCHAR(20),
+    titulo VARCHAR(500),
+    descricao TEXT,
+    valor DECIMAL(20,4),
+    detalhes JSONB,
+    status VARCHAR(20) NOT NULL DEFAULT 'ativo',
+    primeiraocorrencia TIMESTAMP NOT NULL,
+    ultimaocorrencia TIMESTAMP NOT NULL,
+    resolvidoem TIMESTAMP,
+    execucoes INT DEFAULT 1,
+    datacriacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+ALTER TABLE esg.alertas ADD COLUMN IF NOT EXISTS detalhes JSONB;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_alertas_ativo ON esg.alertas(regra, chave) WHERE status = 'ativo';
+CREATE INDEX IF NOT EXISTS ix_alertas_status ON esg.alertas(status, severidade);
+CREATE INDEX IF NOT EXISTS ix_alertas_primeira ON esg.alertas(primeiraocorrencia);
+CREATE TABLE IF NOT EXISTS esg.alertasexecucao (
+    execucaoid SERIAL PRIMARY KEY,
+    dataexecucao TIMESTAMP NOT NULL,
+    novos INT,
+    persistentes INT,
+    resolvidos INT,
+    totalativos INT,
+    criticos INT,
+    medios INT,
+    baixos INT,
+    versaodados TEXT,
+    datacriacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+ALTER TABLE esg.alertasexecucao ADD COLUMN IF NOT EXISTS versaodados TEXT;
+"""
+
+
+def criar_tabelas(conn):
+    """Cria esg.alertas / esg.alertasexecucao em bancos anteriores ao DDL atual."""
+    with conn.cursor() as cursor:
+        cursor.execute(SQL_TABELAS)
+    conn.commit()
+
+
+def _gravar_diff(cursor, atuais, agora, mantidas):
+    """
+    Insere os novos, atualiza os persistentes e resolve os que sumiram, fora das
+    regras mantidas (tabelas sem alteracao). Retorna as quantidades.
+    """
+    cursor.execute("""
+        SELECT alertaid, regra, chave FROM esg.alertas
+        WHERE status = 'ativo' AND NOT (regra = ANY(%s))
+        FOR UPDATE
+    """, (mantidas,))
+    anteriores = {(regra, chave): alertaid for alertaid, regra, chave in cursor.fetchall()}
+
+    novos = [k for k in atuais if k not in anteriores]
+    persistentes = [k for k in atuais if k in anteriores]
+    resolvidos = [anteriores[k] for k in anteriores if k not in atuais]
+
+    def _linha(chave):
+        a = atuais[chave]
+        detalhes = Json(a['detalhes']) if a['detalhes'] is not None else None
+        return (a['tipo'], a['severidade'], a['titulo'][:500], a['descricao'], a['valor'], detalhes)
+
+    if novos:
+        execute_values(cursor, """
+            INSERT INTO esg.alertas (regra, chave, tipo, severidade, titulo, descricao, valor, detalhes,
+                                     status, primeiraocorrencia, ultimaocorrencia)
+            VALUES %s
+        """, [(k[0], k[1], *_linha(k), 'ativo', agora, agora) for k in novos])
+
+    if persistentes:
+        execute_values(cursor, """
+            UPDATE esg.alertas AS a
+            SET tipo = v.tipo, severidade = v.severidade, titulo = v.titulo, descricao = v.descricao,
+                valor = v.valor::DECIMAL, detalhes = v.detalhes::JSONB,
+                ultimaocorrencia = v.ocorrencia::TIMESTAMP, execucoes = a.execucoes + 1
+            FROM (VALUES %s) AS v (alertaid, tipo, severidade, titulo, descricao, valor, detalhes, ocorrencia)
+            WHERE a.alertaid = v.alertaid
+        """, [(anteriores[k], *_linha(k), agora) for k in persistentes])
+
+    if resolvidos:
+        cursor.execute("""
+            UPDATE esg.alertas SET status = 'resolvido', resolvidoem = %s
+            WHERE alertaid = ANY(%s)
+        """, (agora, resolvidos))
+
+    return len(novos), len(persistentes), len(resolvidos)
+
+
+def materializar(conn, motor=None, agora=None):
+    """
+    Grava a execucao atual dos alertas e retorna o resumo do diff.
+    Alertas sao identificados por (regra, chave); quem sumiu e marcado como resolvido.
+    So as tabelas cuja versao mudou desde a ultima execucao (todas, se mudou a
+    data) sao lidas e reavaliadas; os alertas ativos das regras das demais so
+    ganham mais uma ocorrencia.
+    """
+    motor = motor or MotorAlertas()
+    agora = agora or datetime.now()
+
+    cursor = conn.cursor()
+    try:
+        versao = motor.versao(conn, agora.date())
+        cursor.execute("SELECT versaodados FROM esg.alertasexecucao ORDER BY execucaoid DESC LIMIT 1")
+        ultima = cursor.fetchone()
+        alteradas = motor.tabelas_alteradas(versao, ultima[0] if ultima else None)
+        mantidas = motor.regras_das_tabelas([t for t in motor.regras_por_tabela if t not in alteradas])
+
+        cursor.execute("""
+            UPDATE esg.alertas SET ultimaocorrencia = %s, execucoes = execucoes + 1
+            WHERE status = 'ativo' AND regra = ANY(%s)
+        """, (agora, mantidas))
+        mantidos = cursor.rowcount
+
+        atuais = {}
+        if alteradas:
+            motor.recarregar(conn, agora.date(), alteradas)
+            atuais = {(a['regra'], str(a['chave'])[:300]): a
+                      for a in motor.instancias() if a['regra'] not in mantidas}
+        novos, persistentes, resolvidos = _gravar_diff(cursor, atuais, agora, mantidas)
+        persistentes += mantidos
+
+        cursor.execute("SELECT severidade FROM esg.alertas WHERE status = 'ativo'")
+        severidades = [r[0] for r in cursor.fetchall()]
+
+        resumo = {
+            'novos': novos,
+            'persistentes': persistentes,
+            'resolvidos': resolvidos,
+            'totalativos': len(severidades),
+            'criticos': severidades.count('alta'),
+            'medios': severidades.count('media'),
+            'baixos': severidades.count('baixa'),
+        }
+        cursor.execute("""
+            INSERT INTO esg.alertasexecucao (dataexecucao, novos, persistentes, resolvidos,
+                                             totalativos, criticos, medios, baixos, versaodados)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, (agora, *resumo.values(), versao))
+        conn.commit()
+        return resumo
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def executar(criar=False):
+    """Abre a conexao, materializa e imprime o resumo (usado ao final das cargas)."""
+    print("=" * 60)
+    print("MATERIALIZANDO ALERTAS (EARLY WARNING)")
+    print("=" * 60)
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        if criar:
+            criar_tabelas(conn)
+        resumo = materializar(conn)
+    finally:
+        conn.close()
+
+    print(f"  Novos:        {resumo['novos']}")
+    print(f"  Persistentes: {resumo['persistentes']}")
+    print(f"  Resolvidos:   {resumo['resolvidos']}")
+    print(f"  Total ativos: {resumo['totalativos']} "
+          f"({resumo['criticos']} críticos, {resumo['medios']} médios, {resumo['baixos']} baixos)")
+    return resumo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Materializa os alertas antecipados em esg.alertas")
+    parser.add_argument("--criar-tabelas", action="store_true",
+                        help="Criar as tabelas de alertas antes (bancos anteriores ao DDL atual)")
+    executar(criar=parser.parse_args().criar_tabelas)
+
+
+if __name__ == '__main__':
+    main()
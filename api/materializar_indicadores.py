@@ -0,0 +1,99 @@
+"""
+Materializa os indicadores financeiros dos emissores no PostgreSQL
+Chamado ao final da carga (etl/main.py); depois de carregar as demonstracoes
+da CVM por outro caminho, pode ser executado a mao:
+
+    python api/materializar_indicadores.py                   # materializa
+    python api/materializar_indicadores.py --criar-tabelas   # bancos criados antes da tabela
+
+Pivota emissores.demonstracoesfinanceiras, calcula os indices
+(indicadores_emissores.tabela_larga) e regrava emissores.indicadores em uma
+transacao; a API le dessa tabela em vez de calcular no primeiro acesso.
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from indicadores_emissores import COLUNAS_TABELA, ler_demonstracoes, tabela_larga
+
+load_dotenv(Path(__file__).parent / '.env')
+
+DB_CONFIG = {
+    "host": os.getenv("PG_HOST", "localhost"),
+    "port": os.getenv("PG_PORT", "5432"),
+    "database": os.getenv("PG_DATABASE", "anbima_esg"),
+    "user": os.getenv("PG_USER", "postgres"),
+    "password": os.getenv("PG_PASSWORD", ""),
+}
+
+# Mesmo DDL de sql_postgres/00_create_database.sql, para bancos criados antes da tabela
+SQL_TABELAS = f"""
+CREATE TABLE IF NOT EXISTS emissores.indicadores (
+    cnpj VARCHAR(18) NOT NULL,
+    ano INT NOT NULL,
+    {', '.join(f'{c} DOUBLE PRECISION' for c in COLUNAS_TABELA)},
+    datacriacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (cnpj, ano)
+);
+"""
+
+
+def criar_tabelas(conn):
+    """Cria emissores.indicadores em bancos anteriores ao DDL atual."""
+    with conn.cursor() as cursor:
+        cursor.execute(SQL_TABELAS)
+    conn.commit()
+
+
+def materializar(conn) -> int:
+    """Recalcula a tabela larga a partir das demonstracoes e regrava emissores.indicadores. Retorna as linhas."""
+    with conn.cursor() as cursor:
+        tabela = tabela_larga(ler_demonstracoes(cursor))
+        valores = tabela[COLUNAS_TABELA].astype(object)
+        valores = valores.where(valores.notna(), None)
+        linhas = [(cnpj, int(ano), *v) for (cnpj, ano), v in zip(tabela.index, valores.itertuples(index=False))]
+
+        cursor.execute("DELETE FROM emissores.indicadores")
+        if linhas:
+            execute_values(cursor, f"""
+                INSERT INTO emissores.indicadores (cnpj, ano, {', '.join(COLUNAS_TABELA)})
+                VALUES %s
+            """, linhas, page_size=1000)
+    conn.commit()
+    return len(linhas)
+
+
+def executar(criar=False):
+    """Abre a conexao, materializa e imprime o resumo (usado ao final das cargas)."""
+    print("=" * 60)
+    print("MATERIALIZANDO INDICADORES DE EMISSORES")
+    print("=" * 60)
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        if criar:
+            criar_tabelas(conn)
+        linhas = materializar(conn)
+    finally:
+        conn.close()
+
+    print(f"  Linhas (cnpj, ano): {linhas}")
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Materializa os indicadores dos emissores em emissores.indicadores")
+    parser.add_argument("--criar-tabelas", action="store_true",
+                        help="Criar a tabela de indicadores antes (bancos anteriores ao DDL atual)")
+    executar(criar=parser.parse_args().criar_tabelas)
+
+
+if __name__ == '__main__':
+    main()
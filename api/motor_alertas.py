@@ -0,0 +1,422 @@
+"""
+Motor de alertas antecipados (early warning)
+As regras sao declaradas como dados (tabela, condicao, severidade, textos) e
+avaliadas juntas, em uma unica passada vetorizada por tabela, sobre um
+snapshot colunar dos dados. A versao de cada tabela (qtd e ultima carga, ver
+cache_dados) fica gravada com cada execucao materializada: so as tabelas cuja
+versao mudou desde a execucao anterior sao relidas e tem suas regras
+reavaliadas (materializar_alertas.py).
+
+Limites do tipo timedelta sao relativos a data de referencia (hoje + prazo);
+o vencimento das debentures vem do motor de fluxo de caixa (fluxo_caixa.py).
+"""
+import json
+import operator
+import re
+from datetime import date, timedelta
+
+import numpy as np
+
+from cache_dados import obter_versao_dados
+from fluxo_caixa import MotorFluxoCaixa, titulo_debenture
+
+ORDEM_SEVERIDADE = {'alta': 0, 'media': 1, 'baixa': 2}
+
+OPERADORES = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# ------------------------------------------------------------------
+# Regras
+#   agregacao: 'linhas'       -> lista as linhas que atendem a condicao (ordem/limite)
+#              'contagem'     -> dispara se qtd de linhas > minimo
+#              'proporcao'    -> dispara se % de linhas > minimo
+#              'concentracao' -> dispara se o maior grupo de `grupo` > minimo %
+# ------------------------------------------------------------------
+REGRAS = [
+    {
+        'id': 'debenture_taxa_alta',
+        'tabela': 'debentures',
+        'tipo': 'credito', 'severidade': 'alta', 'icone': '💳',
+        'condicao': ('percentualtaxa', '>', 8),
+        'agregacao': 'linhas', 'ordem': ('percentualtaxa', 'desc'), 'limite': 5,
+        'titulo': '{qtd} Debêntures com Taxa > 8%',
+        'descricao': 'Títulos com spread elevado podem indicar maior risco de crédito do emissor',
+        'detalhe': '{codigoativo} - {emissor:.30}... ({taxaindicativa})',
+    },
+    {
+        'id': 'empresa_score_baixo',
+        'tabela': 'empresas',
+        'tipo': 'esg', 'severidade': 'media', 'icone': '🌿',
+        'condicao': ('score', '<', 70),
+        'agregacao': 'linhas', 'ordem': ('score', 'asc'), 'limite': 5,
+        'titulo': '{qtd} Empresas com Score TSB < 70',
+        'descricao': 'Empresas com score de sustentabilidade abaixo da média requerem monitoramento',
+        'detalhe': '{emissor:.25}... - Score: {score_texto}',
+    },
+    {
+        'id': 'debenture_duration_longa',
+        'tabela': 'debentures',
+        'tipo': 'liquidez', 'severidade': 'media', 'icone': '⏱️',
+        'condicao': ('duration', '>', 1500),
+        'agregacao': 'linhas', 'ordem': ('duration', 'desc'), 'limite': 5,
+        'titulo': '{qtd} Títulos com Duration > 4 anos',
+        'descricao': 'Títulos de longo prazo têm maior exposição a variações de taxa de juros',
+        'detalhe': '{codigoativo} - {duration_dias} dias',
+    },
+    {
+        'id': 'concentracao_setorial',
+        'tabela': 'empresas',
+        'tipo': 'concentracao', 'severidade': 'baixa', 'icone': '📊',
+        'condicao': None,
+        'agregacao': 'concentracao', 'grupo': 'setortsb', 'minimo': 30,
+        'titulo': 'Concentração em {grupo}: {pct:.0f}%',
+        'descricao': 'Alta concentração setorial aumenta risco de eventos adversos específicos',
+        'detalhe': '{grupo}: {qtd} empresas ({pct:.0f}%)',
+    },
+    {
+        'id': 'empresas_transicao',
+        'tabela': 'empresas',
+        'tipo': 'climatico', 'severidade': 'media', 'icone': '🔄',
+        'condicao': ('classificacao', '==', 'TRANSICAO'),
+        'agregacao': 'proporcao', 'minimo': 20,
+        'titulo': '{qtd} Empresas em Transição ({pct:.0f}%)',
+        'descricao': 'Empresas ainda não classificadas como Verde requerem acompanhamento de progresso ESG',
+        'detalhes': ['Monitorar relatórios de sustentabilidade', 'Verificar metas de descarbonização',
+                     'Acompanhar certificações'],
+    },
+    {
+        'id': 'vencimento_proximo',
+        'tabela': 'debentures',
+        'tipo': 'vencimento', 'severidade': 'baixa', 'icone': '📅',
+        'condicao': ('vencimento', '<', timedelta(days=365)),
+        'agregacao': 'contagem', 'minimo': 10,
+        'titulo': '{qtd} Títulos vencem em menos de 1 ano',
+        'descricao': 'Planejar reinvestimento ou rolagem dos títulos com vencimento próximo',
+        'detalhes': ['Avaliar condições de mercado', 'Verificar necessidade de liquidez',
+                     'Analisar opções de reinvestimento'],
+    },
+]
+
+
+def _numero(valor):
+    """Converte valores numericos do banco (Decimal, int, None) em float/NaN."""
+    try:
+        return float(valor) if valor is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _numero_texto(valor):
+    """Extrai o numero de um texto como '8,5%' ou 'IPCA + 7.2' (mesma regra do SQL antigo)."""
+    if valor is None:
+        return np.nan
+    limpo = re.sub(r'[^0-9.]', '', str(valor))
+    try:
+        return float(limpo) if limpo else np.nan
+    except ValueError:
+        return np.nan
+
+
+def _texto(valor):
+    return '' if valor is None else str(valor)
+
+
+# Carga colunar de cada tabela usada pelas regras
+def _carregar_debentures(cursor, hoje):
+    cursor.execute("""
+        SELECT codigoativo, emissor, taxaindicativa, percentualtaxa, duration, grupo, pu
+        FROM titulos.debentures
+    """)
+    rows = cursor.fetchall()
+    duration = np.array([_numero(r[4]) for r in rows], dtype=float)
+    fluxo = MotorFluxoCaixa([titulo_debenture(r[0], r[1], r[5], r[2], r[4], r[6]) for r in rows], hoje=hoje)
+    return {
+        'codigoativo': np.array([_texto(r[0]) for r in rows], dtype=object),
+        'emissor': np.array([_texto(r[1]) for r in rows], dtype=object),
+        'taxaindicativa': np.array([r[2] for r in rows], dtype=object),
+        'percentualtaxa': np.array([_numero_texto(r[3]) for r in rows], dtype=float),
+        'duration': duration,
+        'duration_dias': np.array([int(d) if not np.isnan(d) else '' for d in duration], dtype=object),
+        'vencimento': fluxo.vencimento,
+    }
+
+
+def _carregar_empresas(cursor, hoje):
+    cursor.execute("""
+        SELECT emissor, setortsb, classificacao, score
+        FROM tsb.empresastsb
+    """)
+    rows = cursor.fetchall()
+    return {
+        'emissor': np.array([_texto(r[0]) for r in rows], dtype=object),
+        'setortsb': np.array([r[1] for r in rows], dtype=object),
+        'classificacao': np.array([r[2] for r in rows], dtype=object),
+        'score': np.array([_numero(r[3]) for r in rows], dtype=float),
+        'score_texto': np.array([r[3] for r in rows], dtype=object),
+    }
+
+
+CARREGADORES = {
+    'debentures': _carregar_debentures,
+    'empresas': _carregar_empresas,
+}
+
+# Tabela do banco lida por cada carregador (versionada por obter_versao_dados)
+TABELAS_BANCO = {
+    'debentures': 'titulos.debentures',
+    'empresas': 'tsb.empresastsb',
+}
+
+# Coluna que identifica a entidade de cada tabela no historico de alertas
+CHAVES = {
+    'debentures': 'codigoativo',
+    'empresas': 'emissor',
+}
+
+
+class MotorAlertas:
+    """Mantem o snapshot colunar e as mascaras (linha x regra) das tabelas carregadas."""
+
+    def __init__(self, regras=None):
+        self.regras = regras or REGRAS
+        self.regras_por_tabela = {}
+        for regra in self.regras:
+            self.regras_por_tabela.setdefault(regra['tabela'], []).append(regra)
+        self.colunas = {}
+        self.mascaras = {}
+        self.hoje = None
+
+    def _limite(self, valor):
+        """Limite da condicao; timedelta = prazo a partir da data de referencia."""
+        if isinstance(valor, timedelta):
+            return np.datetime64(self.hoje + valor, 'D')
+        return valor
+
+    def _condicoes(self, tabela):
+        return [r['condicao'] for r in self.regras_por_tabela[tabela] if r['condicao']]
+
+    def _avaliar(self, colunas, condicoes, linhas):
+        """Avalia todas as condicoes da tabela para as linhas informadas (uma passada)."""
+        mascara = np.zeros((len(linhas), len(condicoes)), dtype=bool)
+        grupos = {}
+        for j, (coluna, op, _) in enumerate(condicoes):
+            grupos.setdefault((coluna, op), []).append(j)
+        for (coluna, op), indices in grupos.items():
+            valores = colunas[coluna][linhas]
+            limites = np.array([self._limite(condicoes[j][2]) for j in indices], dtype=valores.dtype)
+            mascara[:, indices] = OPERADORES[op](valores[:, None], limites[None, :])
+        return mascara
+
+    def _atualizar_tabela(self, tabela, colunas):
+        """Guarda o snapshot da tabela e avalia todas as condicoes dela."""
+        condicoes = self._condicoes(tabela)
+        n = len(next(iter(colunas.values()))) if colunas else 0
+        mascara = np.zeros((n, len(condicoes)), dtype=bool)
+        if n and condicoes:
+            mascara = self._avaliar(colunas, condicoes, np.arange(n))
+        self.colunas[tabela] = colunas
+        self.mascaras[tabela] = mascara
+
+    def _versoes_banco(self, cursor):
+        linhas = obter_versao_dados(cursor, [TABELAS_BANCO[t] for t in self.regras_por_tabela])
+        por_nome = {nome: (qtd, ultima) for nome, qtd, ultima in linhas}
+        return {t: por_nome[TABELAS_BANCO[t]] for t in self.regras_por_tabela}
+
+    def versao(self, conn, hoje=None):
+        """
+        Identifica os dados que definem os alertas (JSON gravado em
+        esg.alertasexecucao.versaodados): data de referencia + versao de cada tabela.
+        """
+        hoje = hoje or date.today()
+        return json.dumps({'hoje': str(hoje), **self._versoes_banco(conn.cursor())}, sort_keys=True)
+
+    def tabelas_alteradas(self, versao, anterior):
+        """Tabelas com regras cuja versao difere da execucao anterior (todas se a data mudou)."""
+        atual = json.loads(versao)
+        try:
+            anterior = json.loads(anterior) if anterior else {}
+        except ValueError:
+            anterior = {}
+        if anterior.get('hoje') != atual['hoje']:
+            return list(self.regras_por_tabela)
+        return [t for t in self.regras_por_tabela if anterior.get(t) != atual[t]]
+
+    def regras_das_tabelas(self, tabelas):
+        """Ids das regras avaliadas sobre as tabelas informadas."""
+        return [r['id'] for t in tabelas for r in self.regras_por_tabela.get(t, [])]
+
+    def recarregar(self, conn, hoje=None, tabelas=None):
+        """Le o snapshot colunar das tabelas informadas (padrao: todas com regras) e avalia as regras."""
+        self.hoje = hoje or date.today()
+        cursor = conn.cursor()
+        for tabela in self.regras_por_tabela if tabelas is None else tabelas:
+            self._atualizar_tabela(tabela, CARREGADORES[tabela](cursor, self.hoje))
+
+    # ------------------------------------------------------------------
+    # Montagem dos alertas
+    # ------------------------------------------------------------------
+    def _disparar(self, regra, colunas, selecionadas):
+        """Aplica a agregacao da regra; retorna o alerta ou None."""
+        agregacao = regra['agregacao']
+        qtd = int(selecionadas.sum())
+        total = selecionadas.size
+        alerta = {k: regra[k] for k in ('tipo', 'severidade', 'icone')}
+        alerta['regra'] = regra['id']
+
+        if agregacao == 'linhas':
+            if not qtd:
+                return None
+            indices = np.flatnonzero(selecionadas)
+            coluna, sentido = regra['ordem']
+            valores = colunas[coluna][indices]
+            ordem = np.argsort(-valores if sentido == 'desc' else valores, kind='stable')
+            indices = indices[ordem][:regra['limite']]
+            linhas = [{c: v[i] for c, v in colunas.items()} for i in indices]
+            alerta['titulo'] = regra['titulo'].format(qtd=len(indices))
+            alerta['detalhes'] = [regra['detalhe'].format(**linha) for linha in linhas[:3]]
+            alerta['total'] = qtd
+
+        elif agregacao == 'contagem':
+            if qtd <= regra['minimo']:
+                return None
+            alerta['titulo'] = regra['titulo'].format(qtd=qtd)
+            alerta['detalhes'] = list(regra['detalhes'])
+            alerta['total'] = qtd
+
+        elif agregacao == 'proporcao':
+            pct = qtd / total * 100 if total else 0
+            if not total or pct <= regra['minimo']:
+                return None
+            alerta['titulo'] = regra['titulo'].format(qtd=qtd, pct=pct)
+            alerta['detalhes'] = list(regra['detalhes'])
+            alerta['total'] = qtd
+
+        elif agregacao == 'concentracao':
+            grupos = colunas[regra['grupo']][selecionadas]
+            if not grupos.size:
+                return None
+            nomes, contagem = np.unique(grupos.astype(str), return_counts=True)
+            ordem = np.argsort(-contagem, kind='stable')
+            pct = contagem[ordem] / grupos.size * 100
+            if pct[0] <= regra['minimo']:
+                return None
+            alerta['titulo'] = regra['titulo'].format(grupo=nomes[ordem[0]], pct=pct[0])
+            alerta['detalhes'] = [regra['detalhe'].format(grupo=nomes[i], qtd=int(contagem[i]), pct=p)
+                                  for i, p in zip(ordem[:3], pct[:3])]
+            alerta['total'] = int(contagem[ordem[0]])
+
+        else:
+            raise ValueError(f"Agregacao desconhecida: {agregacao}")
+
+        alerta['descricao'] = regra['descricao']
+        return alerta
+
+    def _selecoes(self):
+        """
+        Gera (regra, colunas, linhas selecionadas) na ordem de declaracao das
+        regras, so para as tabelas carregadas.
+        """
+        posicao = {tabela: 0 for tabela in self.regras_por_tabela}
+        for regra in self.regras:
+            tabela = regra['tabela']
+            if tabela not in self.mascaras:
+                continue
+            mascara = self.mascaras[tabela]
+            if regra['condicao']:
+                selecionadas = mascara[:, posicao[tabela]]
+                posicao[tabela] += 1
+            else:
+                selecionadas = np.ones(mascara.shape[0], dtype=bool)
+            yield regra, self.colunas[tabela], selecionadas
+
+    def instancias(self):
+        """
+        Alertas ativos por entidade, para o historico persistido: regras por linha
+        geram uma instancia por ativo/empresa (chave); regras agregadas, uma por regra.
+        """
+        instancias = []
+        for regra, colunas, selecionadas in self._selecoes():
+            base = {k: regra[k] for k in ('tipo', 'severidade', 'descricao')}
+            base['regra'] = regra['id']
+            if regra['agregacao'] == 'linhas':
+                chaves = colunas[CHAVES[regra['tabela']]]
+                valores = colunas[regra['condicao'][0]]
+                vistas = set()
+                for i in np.flatnonzero(selecionadas):
+                    if chaves[i] in vistas:
+                        continue
+                    vistas.add(chaves[i])
+                    linha = {c: v[i] for c, v in colunas.items()}
+                    instancias.append({**base, 'chave': chaves[i],
+                                       'titulo': regra['detalhe'].format(**linha),
+                                       'valor': float(valores[i]), 'detalhes': None})
+            else:
+                alerta = self._disparar(regra, colunas, selecionadas)
+                if alerta:
+                    instancias.append({**base, 'chave': '', 'titulo': alerta['titulo'],
+                                       'valor': float(alerta['total']), 'detalhes': alerta['detalhes']})
+        return instancias
+
+    def alertas(self):
+        """Alertas ativos no snapshot atual, ordenados por severidade, e o resumo."""
+        alertas = []
+        for regra, colunas, selecionadas in self._selecoes():
+            alerta = self._disparar(regra, colunas, selecionadas)
+            if alerta:
+                alertas.append(alerta)
+
+        alertas.sort(key=lambda x: ORDEM_SEVERIDADE.get(x['severidade'], 3))
+        resumo = {
+            'total_alertas': len(alertas),
+            'criticos': len([a for a in alertas if a['severidade'] == 'alta']),
+            'medios': len([a for a in alertas if a['severidade'] == 'media']),
+            'baixos': len([a for a in alertas if a['severidade'] == 'baixa'])
+        }
+        return {'alertas': alertas, 'resumo': resumo}
+
+
+def montar_alertas(linhas, regras=None):
+    """
+    Resposta de /api/early-warning a partir dos alertas ativos materializados
+    (linhas de esg.alertas: regra, tipo, severidade, titulo, descricao, valor, detalhes).
+    Regras por linha sao reagrupadas em um alerta; as agregadas ja vem prontas.
+    """
+    regras = {r['id']: r for r in (regras or REGRAS)}
+    ordem_regras = {rid: i for i, rid in enumerate(regras)}
+    por_regra = {}
+    for linha in linhas:
+        por_regra.setdefault(linha['regra'], []).append(linha)
+
+    alertas = []
+    for rid, grupo in sorted(por_regra.items(), key=lambda x: ordem_regras.get(x[0], len(ordem_regras))):
+        regra = regras.get(rid, {})
+        primeira = grupo[0]
+        alerta = {'tipo': primeira['tipo'], 'severidade': primeira['severidade'],
+                  'icone': regra.get('icone', ''), 'regra': rid}
+        if regra.get('agregacao') == 'linhas':
+            coluna, sentido = regra['ordem']
+            grupo = sorted(grupo, key=lambda l: _numero(l['valor']), reverse=sentido == 'desc')
+            alerta['titulo'] = regra['titulo'].format(qtd=min(len(grupo), regra['limite']))
+            alerta['detalhes'] = [l['titulo'] for l in grupo[:3]]
+            alerta['total'] = len(grupo)
+        else:
+            alerta['titulo'] = primeira['titulo']
+            alerta['detalhes'] = list(primeira['detalhes'] or regra.get('detalhes', []))
+            alerta['total'] = int(_numero(primeira['valor'])) if primeira['valor'] is not None else 0
+        alerta['descricao'] = primeira['descricao']
+        alertas.append(alerta)
+
+    alertas.sort(key=lambda x: ORDEM_SEVERIDADE.get(x['severidade'], 3))
+    resumo = {
+        'total_alertas': len(alertas),
+        'criticos': len([a for a in alertas if a['severidade'] == 'alta']),
+        'medios': len([a for a in alertas if a['severidade'] == 'media']),
+        'baixos': len([a for a in alertas if a['severidade'] == 'baixa'])
+    }
+    return {'alertas': alertas, 'resumo': resumo}
@@ -0,0 +1,522 @@
+"""
+Motor local de consultas
+Interpreta perguntas frequentes (contagens, rankings, medias e listas com
+filtros por setor, classificacao, indexador e gestora) e responde a partir
+de agregados pre-calculados em memoria, sem depender da API Groq.
+"""
+import re
+import unicodedata
+
+NUMEROS_EXTENSO = {
+    'tres': 3, 'cinco': 5, 'dez': 10, 'quinze': 15, 'vinte': 20,
+}
+
+CATEGORIAS_ESG = ['IS - Investimento Sustentavel', 'ESG Integrado']
+
+STOPWORDS = {'de', 'da', 'do', 'das', 'dos', 'e', 'em', 'a', 'o', 'as', 'os', 'para', 'com'}
+
+# Palavras-chave de entidade (regex sobre o texto normalizado)
+ENTIDADES = [
+    ('cricra', r'\bcr[ia]s?\b'),
+    ('debentures', r'\bdebentures?\b'),
+    ('titulos_publicos', r'\btitulos? publicos?\b|\btesouro\b|\bntn|\bltn\b|\blft\b'),
+    ('gestoras', r'\bgestoras?\b'),
+    ('fundos', r'\bfundos?\b'),
+    ('empresas', r'\bempresas?\b|\bemissor(es)?\b|\bcompanhias?\b|\btsb\b'),
+]
+
+# Operacoes em ordem de prioridade; pergunta sem nenhuma delas vai para o LLM
+OPERACOES = [
+    ('media', r'\bmedi[ao]s?\b'),
+    ('ranking', r'\btop\b|\bmaior(es)?\b|\bmelhor(es)?\b|\bpior(es)?\b|\bmenor(es)?\b|\branking\b'),
+    ('contagem', r'\bquant[oa]s?\b|\btotal\b|\bnumero de\b|\bqtd\b'),
+    ('lista', r'\bquais\b|\blist[ae]r?\b|\bmostr[ea]r?\b'),
+]
+
+# Direcao do ranking: termos que pedem os menores valores da metrica
+PADRAO_MENOR = r'\bpior(es)?\b|\bmenor(es)?\b|\bbaix[oa]s?\b|\bcurt[oa]s?\b'
+PADRAO_RISCO = r'\brisc[oa]s?\b'
+
+# Risco por entidade: True se mais risco = metrica do ranking maior (taxa),
+# False se mais risco = metrica menor (score TSB)
+RISCO_ACOMPANHA_METRICA = {
+    'debentures': True,
+    'cricra': True,
+    'titulos_publicos': True,
+    'empresas': False,
+}
+
+
+def normalizar(texto) -> str:
+    """Minusculas, sem acentos e com espacos simples."""
+    if texto is None:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', texto.lower()).strip()
+
+
+def _contem(texto: str, termo: str) -> bool:
+    return re.search(r'(?<!\w)' + re.escape(termo) + r'(?!\w)', texto) is not None
+
+
+def _float(valor):
+    return float(valor) if valor is not None else None
+
+
+def _ordenar_tipos(tipos):
+    """Tipos de titulo em ordem alfabetica (tipo nulo por ultimo)."""
+    return sorted(tipos, key=lambda t: (t is None, str(t)))
+
+
+def _media(valores):
+    valores = [v for v in valores if v is not None]
+    return round(sum(valores) / len(valores), 2) if valores else 0
+
+
+def _tabela(cabecalho, linhas) -> str:
+    html = '<table><tr>' + ''.join(f'<th>{c}</th>' for c in cabecalho) + '</tr>'
+    for linha in linhas:
+        html += '<tr>' + ''.join(f'<td>{"" if v is None else v}</td>' for v in linha) + '</tr>'
+    return html + '</table>'
+
+
+class MotorConsultas:
+    """Agregados em memoria + interpretador de intencoes."""
+
+    def __init__(self, empresas, debentures, cricra, titulos_publicos,
+                 fundos_por_categoria, fundos_gestoras):
+        # Empresas TSB ordenadas por score (maior primeiro)
+        self.empresas = sorted(empresas, key=lambda e: e['score'] or 0, reverse=True)
+
+        # Debentures e CRI/CRA pre-ordenados pelas metricas de ranking
+        self.debentures = debentures
+        self.deb_por_taxa = sorted([d for d in debentures if d['taxaindicativa'] is not None],
+                                   key=lambda d: d['taxaindicativa'], reverse=True)
+        self.deb_por_duration = sorted([d for d in debentures if d['duration'] is not None],
+                                       key=lambda d: d['duration'], reverse=True)
+        self.cricra = cricra
+        self.cricra_por_taxa = sorted([c for c in cricra if c['taxaindicativa'] is not None],
+                                      key=lambda c: c['taxaindicativa'], reverse=True)
+
+        # Titulos publicos agregados por tipo
+        self.titulos_publicos = titulos_publicos
+
+        # Fundos: ANBIMA por categoria ESG, CVM por gestora/classe
+        self.fundos_por_categoria = fundos_por_categoria
+        self.fundos_gestoras = fundos_gestoras
+        self.gestora_total = {g: sum(c.values()) for g, c in fundos_gestoras.items()}
+        self.gestoras_ranking = sorted(self.gestora_total.items(), key=lambda x: x[1], reverse=True)
+        self.classe_total = {}
+        for classes in fundos_gestoras.values():
+            for classe, qtd in classes.items():
+                self.classe_total[classe] = self.classe_total.get(classe, 0) + qtd
+
+        self._indexar_filtros()
+
+    # ------------------------------------------------------------------
+    # Carga
+    # ------------------------------------------------------------------
+    @classmethod
+    def carregar(cls, conn):
+        """Carrega os agregados a partir de uma conexao aberta."""
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT emissor, setortsb, classificacao, score FROM tsb.empresastsb")
+        empresas = [{'emissor': r[0], 'setortsb': r[1], 'classificacao': r[2], 'score': _float(r[3])}
+                    for r in cursor.fetchall()]
+
+        cursor.execute("""
+            SELECT codigoativo, emissor, grupo, taxaindicativa, duration
+            FROM titulos.debentures
+        """)
+        debentures = [{'codigoativo': r[0], 'emissor': r[1], 'grupo': r[2],
+                       'taxaindicativa': _float(r[3]), 'duration': _float(r[4])}
+                      for r in cursor.fetchall()]
+
+        cursor.execute("""
+            SELECT codigoativo, tipocontrato, emissor, taxaindicativa, duration
+            FROM titulos.cricra
+        """)
+        cricra = [{'codigoativo': r[0], 'tipocontrato': r[1], 'emissor': r[2],
+                   'taxaindicativa': _float(r[3]), 'duration': _float(r[4])}
+                  for r in cursor.fetchall()]
+
+        cursor.execute("""
+            SELECT tipo, COUNT(*), AVG(taxaindicativa)
+            FROM titulos.titulospublicos GROUP BY tipo
+        """)
+        titulos_publicos = {r[0]: {'qtd': r[1], 'taxa_media': round(_float(r[2]) or 0, 2)}
+                            for r in cursor.fetchall()}
+
+        cursor.execute("""
+            SELECT COALESCE(categoriaesg, 'Convencional'), COUNT(*)
+            FROM fundos.todosfundos WHERE ativo = true
+            GROUP BY COALESCE(categoriaesg, 'Convencional')
+        """)
+        fundos_por_categoria = {r[0]: r[1] for r in cursor.fetchall()}
+
+        cursor.execute("""
+            SELECT gestora, COALESCE(classeanbima, 'N/A'), COUNT(*)
+            FROM fundos.gestorassimilares
+            WHERE gestora IS NOT NULL AND gestora != ''
+            GROUP BY gestora, COALESCE(classeanbima, 'N/A')
+        """)
+        fundos_gestoras = {}
+        for gestora, classe, qtd in cursor.fetchall():
+            fundos_gestoras.setdefault(gestora, {})[classe] = qtd
+
+        return cls(empresas, debentures, cricra, titulos_publicos,
+                   fundos_por_categoria, fundos_gestoras)
+
+    def _indexar_filtros(self):
+        """Pre-calcula os termos reconhecidos para cada filtro."""
+        # Setores: nome completo e palavras exclusivas de um setor
+        setores = {e['setortsb'] for e in self.empresas if e['setortsb']}
+        self.termos_setor = {normalizar(s): s for s in setores}
+        contagem_tokens = {}
+        for s in setores:
+            for token in set(normalizar(s).split()):
+                if len(token) >= 5 and token not in STOPWORDS:
+                    contagem_tokens.setdefault(token, []).append(s)
+        for token, lista in contagem_tokens.items():
+            if len(lista) == 1:
+                self.termos_setor.setdefault(token, lista[0])
+
+        # Indexadores (grupo da debenture)
+        self.grupos = sorted({d['grupo'] for d in self.debentures if d['grupo']})
+
+        # Gestoras indexadas pelo primeiro token do nome normalizado
+        self.gestoras_por_token = {}
+        for g in self.fundos_gestoras:
+            nome = normalizar(g)
+            if nome:
+                self.gestoras_por_token.setdefault(nome.split()[0], []).append((nome, g))
+        for lista in self.gestoras_por_token.values():
+            lista.sort(key=lambda x: len(x[0]), reverse=True)
+
+        self.classes = {normalizar(c): c for c in self.classe_total if c != 'N/A'}
+        self.tipos_titulo = {normalizar(t): t for t in self.titulos_publicos if t}
+
+    # ------------------------------------------------------------------
+    # Interpretacao
+    # ------------------------------------------------------------------
+    def interpretar(self, mensagem: str):
+        """Converte a pergunta em uma intencao estruturada (ou None)."""
+        texto = normalizar(mensagem)
+        if not texto:
+            return None
+
+        posicoes = []
+        for entidade, padrao in ENTIDADES:
+            m = re.search(padrao, texto)
+            if m:
+                posicoes.append((m.start(), entidade))
+        if not posicoes:
+            return None
+        entidade = min(posicoes)[1]
+
+        operacao = next((nome for nome, padrao in OPERACOES if re.search(padrao, texto)), None)
+        if operacao is None:
+            return None
+
+        # "maior risco" em debentures = maior taxa; em empresas = menor score
+        crescente = bool(re.search(PADRAO_MENOR, texto))
+        if re.search(PADRAO_RISCO, texto) and not RISCO_ACOMPANHA_METRICA.get(entidade, True):
+            crescente = not crescente
+
+        n = None
+        m = re.search(r'\b(\d{1,3})\b', texto)
+        if m:
+            n = int(m.group(1))
+        else:
+            for palavra, valor in NUMEROS_EXTENSO.items():
+                if _contem(texto, palavra):
+                    n = valor
+                    break
+
+        return {
+            'entidade': entidade,
+            'operacao': operacao,
+            'n': max(1, min(n or (10 if operacao == 'ranking' else 20), 100)),
+            'crescente': crescente,
+            'metrica': 'duration' if re.search(r'\bduration\b|\bprazo\b|\blong[oa]s?\b|\bcurt[oa]s?\b', texto) else 'taxa',
+            'filtros': self._extrair_filtros(texto),
+        }
+
+    def _extrair_filtros(self, texto: str) -> dict:
+        filtros = {}
+
+        setores = {s for termo, s in self.termos_setor.items() if _contem(texto, termo)}
+        if setores:
+            filtros['setor'] = setores
+
+        if re.search(r'\bverdes?\b', texto):
+            filtros['classificacao'] = 'VERDE'
+        elif 'transic' in texto:
+            filtros['classificacao'] = 'TRANSICAO'
+
+        grupos = {g for g in self.grupos if _contem(texto, normalizar(g))}
+        if not grupos:
+            if _contem(texto, 'ipca'):
+                grupos = {g for g in self.grupos if 'ipca' in normalizar(g)}
+            elif re.search(r'\b(cdi|di)\b', texto):
+                grupos = {g for g in self.grupos if re.match(r'(c?di)\b', normalizar(g))}
+        if grupos:
+            filtros['indexador'] = grupos
+
+        tokens = set(texto.split())
+        for token in tokens:
+            for nome, gestora in self.gestoras_por_token.get(token, []):
+                if _contem(texto, nome):
+                    filtros['gestora'] = gestora
+                    break
+            if 'gestora' in filtros:
+                break
+
+        classes = {c for termo, c in self.classes.items() if _contem(texto, termo)}
+        if classes:
+            filtros['classe'] = classes
+
+        if 'investimento sustent' in texto or _contem(texto, 'is'):
+            filtros['categoria_esg'] = [CATEGORIAS_ESG[0]]
+        elif _contem(texto, 'esg') or 'sustent' in texto:
+            filtros['categoria_esg'] = CATEGORIAS_ESG
+
+        tem_cri = _contem(texto, 'cri') or _contem(texto, 'cris')
+        tem_cra = _contem(texto, 'cra') or _contem(texto, 'cras')
+        if tem_cri != tem_cra:
+            filtros['tipocontrato'] = 'CRI' if tem_cri else 'CRA'
+
+        tipos = {t for termo, t in self.tipos_titulo.items() if _contem(texto, termo)}
+        if tipos:
+            filtros['tipo_titulo'] = tipos
+
+        return filtros
+
+    # ------------------------------------------------------------------
+    # Respostas
+    # ------------------------------------------------------------------
+    def responder(self, mensagem: str):
+        """
+        Responde a pergunta localmente.
+        Retorna {'texto', 'dados', 'intencao'} ou None se a intencao nao for suportada.
+        """
+        intencao = self.interpretar(mensagem)
+        if not intencao:
+            return None
+
+        metodo = getattr(self, f"_{intencao['operacao']}_{intencao['entidade']}", None)
+        if metodo is None:
+            return None
+        resposta = metodo(intencao)
+        if resposta is None:
+            return None
+
+        texto, dados = resposta
+        filtros = {k: sorted(v) if isinstance(v, (set, list)) else v
+                   for k, v in intencao['filtros'].items()}
+        return {
+            'texto': texto,
+            'dados': dados,
+            'intencao': {**intencao, 'filtros': filtros},
+        }
+
+    # -- helpers de filtro --
+    def _filtrar_empresas(self, filtros):
+        return [e for e in self.empresas
+                if ('setor' not in filtros or e['setortsb'] in filtros['setor'])
+                and ('classificacao' not in filtros or e['classificacao'] == filtros['classificacao'])]
+
+    def _filtrar_debentures(self, lista, filtros):
+        if 'indexador' not in filtros:
+            return lista
+        return [d for d in lista if d['grupo'] in filtros['indexador']]
+
+    def _filtrar_cricra(self, lista, filtros):
+        if 'tipocontrato' not in filtros:
+            return lista
+        return [c for c in lista if c['tipocontrato'] == filtros['tipocontrato']]
+
+    @staticmethod
+    def _descricao_filtros(filtros) -> str:
+        partes = []
+        if 'setor' in filtros:
+            partes.append('setor ' + ', '.join(sorted(filtros['setor'])))
+        if 'classificacao' in filtros:
+            partes.append('classificação ' + filtros['classificacao'])
+        if 'indexador' in filtros:
+            partes.append('indexador ' + ', '.join(sorted(filtros['indexador'])))
+        if 'gestora' in filtros:
+            partes.append('gestora ' + filtros['gestora'])
+        if 'classe' in filtros:
+            partes.append('classe ' + ', '.join(sorted(filtros['classe'])))
+        return f" ({'; '.join(partes)})" if partes else ''
+
+    # -- contagens --
+    def _contagem_empresas(self, intencao):
+        filtros = intencao['filtros']
+        empresas = self._filtrar_empresas(filtros)
+        verde = sum(1 for e in empresas if e['classificacao'] == 'VERDE')
+        return (f"<p>🌿 Temos <strong>{len(empresas)}</strong> empresas TSB{self._descricao_filtros(filtros)}"
+                f" — {verde} Verde e {len(empresas) - verde} em Transição.</p>",
+                {'total': len(empresas), 'verde': verde, 'transicao': len(empresas) - verde})
+
+    def _contagem_debentures(self, intencao):
+        filtros = intencao['filtros']
+        debentures = self._filtrar_debentures(self.debentures, filtros)
+        return (f"<p>📈 Temos <strong>{len(debentures)}</strong> debêntures{self._descricao_filtros(filtros)}.</p>",
+                {'total': len(debentures)})
+
+    def _contagem_cricra(self, intencao):
+        filtros = intencao['filtros']
+        cricra = self._filtrar_cricra(self.cricra, filtros)
+        nome = filtros.get('tipocontrato', 'CRI/CRA')
+        return (f"<p>🏠 Temos <strong>{len(cricra)}</strong> {nome} no sistema.</p>",
+                {'total': len(cricra), 'tipo': nome})
+
+    def _contagem_titulos_publicos(self, intencao):
+        tipos = _ordenar_tipos(intencao['filtros'].get('tipo_titulo') or self.titulos_publicos)
+        total = sum(self.titulos_publicos[t]['qtd'] for t in tipos)
+        return (f"<p>🏛️ Temos <strong>{total}</strong> títulos públicos ({', '.join(str(t) for t in tipos)}).</p>",
+                {'total': total, 'por_tipo': {t: self.titulos_publicos[t]['qtd'] for t in tipos}})
+
+    def _contagem_fundos(self, intencao):
+        filtros = intencao['filtros']
+        if 'gestora' in filtros:
+            classes = self.fundos_gestoras[filtros['gestora']]
+            if 'classe' in filtros:
+                total = sum(q for c, q in classes.items() if c in filtros['classe'])
+            else:
+                total = sum(classes.values())
+            return (f"<p>📊 A gestora <strong>{filtros['gestora']}</strong> tem <strong>{total}</strong> fundos"
+                    f"{self._descricao_filtros({k: v for k, v in filtros.items() if k == 'classe'})}.</p>",
+                    {'total': total, 'gestora': filtros['gestora']})
+        if 'classe' in filtros:
+            total = sum(self.classe_total.get(c, 0) for c in filtros['classe'])
+            return (f"<p>📊 Temos <strong>{total}</strong> fundos{self._descricao_filtros(filtros)}.</p>",
+                    {'total': total})
+        if 'categoria_esg' in filtros:
+            total = sum(self.fundos_por_categoria.get(c, 0) for c in filtros['categoria_esg'])
+            return (f"<p>📊 Temos <strong>{total}</strong> fundos {' / '.join(filtros['categoria_esg'])} cadastrados.</p>",
+                    {'total': total, 'por_categoria': {c: self.fundos_por_categoria.get(c, 0)
+                                                       for c in filtros['categoria_esg']}})
+        total_anbima = sum(self.fundos_por_categoria.values())
+        total_cvm = sum(self.gestora_total.values())
+        return (f"<p>📊 Temos <strong>{total_anbima + total_cvm:,}</strong> fundos "
+                f"({total_anbima:,} ANBIMA e {total_cvm:,} CVM).</p>",
+                {'total': total_anbima + total_cvm, 'total_anbima': total_anbima, 'total_cvm': total_cvm})
+
+    def _contagem_gestoras(self, intencao):
+        filtros = intencao['filtros']
+        if 'classe' in filtros:
+            gestoras = [g for g, c in self.fundos_gestoras.items() if set(c) & filtros['classe']]
+        else:
+            gestoras = list(self.fundos_gestoras)
+        return (f"<p>🏢 Temos <strong>{len(gestoras)}</strong> gestoras{self._descricao_filtros(filtros)}.</p>",
+                {'total': len(gestoras)})
+
+    # -- medias --
+    def _media_empresas(self, intencao):
+        filtros = intencao['filtros']
+        empresas = self._filtrar_empresas(filtros)
+        media = _media([e['score'] for e in empresas])
+        return (f"<p>🌿 Score TSB médio{self._descricao_filtros(filtros)}: <strong>{media:.1f}</strong> "
+                f"({len(empresas)} empresas).</p>",
+                {'score_medio': media, 'total': len(empresas)})
+
+    def _media_debentures(self, intencao):
+        filtros = intencao['filtros']
+        debentures = self._filtrar_debentures(self.debentures, filtros)
+        taxa = _media([d['taxaindicativa'] for d in debentures])
+        duration = _media([d['duration'] for d in debentures])
+        return (f"<p>📈 Debêntures{self._descricao_filtros(filtros)}: taxa indicativa média "
+                f"<strong>{taxa:.2f}%</strong>, duration média <strong>{duration:.0f}</strong> dias "
+                f"({len(debentures)} títulos).</p>",
+                {'taxa_media': taxa, 'duration_media': duration, 'total': len(debentures)})
+
+    def _media_cricra(self, intencao):
+        filtros = intencao['filtros']
+        cricra = self._filtrar_cricra(self.cricra, filtros)
+        taxa = _media([c['taxaindicativa'] for c in cricra])
+        duration = _media([c['duration'] for c in cricra])
+        nome = filtros.get('tipocontrato', 'CRI/CRA')
+        return (f"<p>🏠 {nome}: taxa indicativa média <strong>{taxa:.2f}%</strong>, "
+                f"duration média <strong>{duration:.0f}</strong> dias ({len(cricra)} títulos).</p>",
+                {'taxa_media': taxa, 'duration_media': duration, 'total': len(cricra)})
+
+    def _media_titulos_publicos(self, intencao):
+        tipos = _ordenar_tipos(intencao['filtros'].get('tipo_titulo') or self.titulos_publicos)
+        linhas = [(t, self.titulos_publicos[t]['qtd'], f"{self.titulos_publicos[t]['taxa_media']:.2f}%")
+                  for t in tipos]
+        return ("<p>🏛️ Taxa média dos títulos públicos:</p>" + _tabela(['Tipo', 'Qtd', 'Taxa média'], linhas),
+                {t: self.titulos_publicos[t] for t in tipos})
+
+    # -- rankings --
+    def _ranking_empresas(self, intencao):
+        empresas = self._filtrar_empresas(intencao['filtros'])
+        if intencao['crescente']:
+            empresas = list(reversed(empresas))
+        top = empresas[:intencao['n']]
+        titulo = 'menor' if intencao['crescente'] else 'maior'
+        linhas = [(e['emissor'], e['setortsb'], e['classificacao'], e['score']) for e in top]
+        return (f"<p>🌿 Top {len(top)} empresas TSB com {titulo} score"
+                f"{self._descricao_filtros(intencao['filtros'])}:</p>"
+                + _tabela(['Emissor', 'Setor', 'Classificação', 'Score'], linhas),
+                top)
+
+    def _ranking_debentures(self, intencao):
+        metrica = 'duration' if intencao['metrica'] == 'duration' else 'taxaindicativa'
+        lista = self.deb_por_duration if metrica == 'duration' else self.deb_por_taxa
+        if intencao['crescente']:
+            lista = list(reversed(lista))
+        top = self._filtrar_debentures(lista, intencao['filtros'])[:intencao['n']]
+        titulo = ('menor' if intencao['crescente'] else 'maior') + (' duration' if metrica == 'duration' else ' taxa')
+        linhas = [(d['codigoativo'], d['emissor'], d['grupo'], d['taxaindicativa'], d['duration']) for d in top]
+        return (f"<p>📈 Top {len(top)} debêntures com {titulo}"
+                f"{self._descricao_filtros(intencao['filtros'])}:</p>"
+                + _tabela(['Código', 'Emissor', 'Indexador', 'Taxa', 'Duration'], linhas),
+                top)
+
+    def _ranking_cricra(self, intencao):
+        lista = self.cricra_por_taxa
+        if intencao['crescente']:
+            lista = list(reversed(lista))
+        top = self._filtrar_cricra(lista, intencao['filtros'])[:intencao['n']]
+        linhas = [(c['codigoativo'], c['tipocontrato'], c['emissor'], c['taxaindicativa'], c['duration']) for c in top]
+        return (f"<p>🏠 Top {len(top)} {intencao['filtros'].get('tipocontrato', 'CRI/CRA')} por taxa:</p>"
+                + _tabela(['Código', 'Tipo', 'Emissor', 'Taxa', 'Duration'], linhas),
+                top)
+
+    def _ranking_gestoras(self, intencao):
+        top = self.gestoras_ranking[:intencao['n']]
+        return (f"<p>🏢 Top {len(top)} gestoras por quantidade de fundos:</p>"
+                + _tabela(['Gestora', 'Fundos'], top),
+                [{'gestora': g, 'qtd_fundos': q} for g, q in top])
+
+    def _ranking_titulos_publicos(self, intencao):
+        ordenados = sorted(self.titulos_publicos.items(), key=lambda x: x[1]['taxa_media'],
+                           reverse=not intencao['crescente'])[:intencao['n']]
+        linhas = [(t, v['qtd'], f"{v['taxa_media']:.2f}%") for t, v in ordenados]
+        return ("<p>🏛️ Títulos públicos por taxa média:</p>" + _tabela(['Tipo', 'Qtd', 'Taxa média'], linhas),
+                [{'tipo': t, **v} for t, v in ordenados])
+
+    # -- listas --
+    def _lista_empresas(self, intencao):
+        return self._ranking_empresas(intencao)
+
+    def _lista_debentures(self, intencao):
+        return self._ranking_debentures(intencao)
+
+    def _lista_cricra(self, intencao):
+        return self._ranking_cricra(intencao)
+
+    def _lista_gestoras(self, intencao):
+        return self._ranking_gestoras(intencao)
+
+    def _lista_titulos_publicos(self, intencao):
+        return self._media_titulos_publicos(intencao)
+
+    def _ranking_fundos(self, intencao):
+        # "fundos das maiores gestoras" -> ranking de gestoras
+        return self._ranking_gestoras(intencao)
@@ -0,0 +1,615 @@
+"""
+Motor de risco do portfolio
+Carrega debentures, CRI/CRA e empresas TSB em arrays NumPy (uma vez por
+versao dos dados) e calcula sub-scores, faixas e ratings em passes
+vetorizados. Pesos e limiares podem ser recalculados sem voltar ao banco.
+
+O risco de credito usa o spread de cada ativo sobre a curva de juros dos
+titulos publicos (curva_juros); sem curva, o score usa a aproximacao
+taxa - SPREAD_BASE_SEM_CURVA, mas o spread_curva exposto fica nulo.
+"""
+import numpy as np
+
+from curva_juros import MotorCurvas
+
+PESOS_PADRAO = {
+    'esg': 0.25,
+    'credito': 0.25,
+    'concentracao': 0.15,
+    'liquidez': 0.15,
+    'clima': 0.20,
+}
+
+LIMIARES_PADRAO = {
+    'spread_alto': 4.0,      # spread sobre a curva > 4% = alto
+    'spread_baixo': 2.0,     # spread sobre a curva < 2% = baixo
+    'prazo_curto': 365,      # duration <= 365 dias = curto prazo
+    'prazo_longo': 1095,     # duration > 1095 dias = longo prazo
+    'hhi_alta': 2500,
+    'hhi_moderada': 1500,
+}
+
+RATINGS = [
+    {'grade': 'A', 'label': 'Muito Baixo', 'color': '#4CAF50'},
+    {'grade': 'B', 'label': 'Baixo', 'color': '#8BC34A'},
+    {'grade': 'C', 'label': 'Moderado', 'color': '#FFC107'},
+    {'grade': 'D', 'label': 'Alto', 'color': '#FF9800'},
+    {'grade': 'E', 'label': 'Muito Alto', 'color': '#F44336'},
+]
+CORTES_RATING = np.array([20, 40, 60, 80], dtype=np.float64)
+
+# Sem curva de juros, spread = taxa - 2 (mesma base do antigo score (taxa - 2) * 20)
+SPREAD_BASE_SEM_CURVA = 2.0
+
+
+def _num(valores) -> np.ndarray:
+    """Converte uma sequencia (com None/Decimal/texto) em float64 com NaN."""
+    saida = np.full(len(valores), np.nan)
+    for i, v in enumerate(valores):
+        if v is None or v == '':
+            continue
+        try:
+            saida[i] = float(v)
+        except (TypeError, ValueError):
+            pass
+    return saida
+
+
+def _vetor_pesos(pesos=None) -> np.ndarray:
+    """Pesos dos componentes na ordem de PESOS_PADRAO, sem negativos e somando 1 (padrao se todos zerados)."""
+    pesos = {**PESOS_PADRAO, **(pesos or {})}
+    vetor = np.clip(np.nan_to_num(np.array([float(pesos[k]) for k in PESOS_PADRAO])), 0, None)
+    if vetor.sum() <= 0:
+        vetor = np.array(list(PESOS_PADRAO.values()))
+    return vetor / vetor.sum()
+
+
+def _codificar(valores):
+    """Codifica categorias em inteiros. Retorna (codigos, categorias); None vira uma categoria."""
+    categorias = []
+    indice = {}
+    codigos = np.empty(len(valores), dtype=np.int64)
+    for i, v in enumerate(valores):
+        if v not in indice:
+            indice[v] = len(categorias)
+            categorias.append(v)
+        codigos[i] = indice[v]
+    return codigos, categorias
+
+
+def _media(valores: np.ndarray):
+    """Media ignorando NaN (0 se nao houver valores, como no AVG do SQL tratado pela API)."""
+    validos = valores[~np.isnan(valores)]
+    return float(validos.mean()) if validos.size else 0
+
+
+def _clip(valores):
+    return np.clip(valores, 0, 100)
+
+
+def indices_rating(scores) -> np.ndarray:
+    """Indice em RATINGS para cada score (<=20 A, <=40 B, <=60 C, <=80 D, senao E)."""
+    return np.searchsorted(CORTES_RATING, np.asarray(scores, dtype=np.float64), side='left')
+
+
+def get_rating(score) -> dict:
+    return RATINGS[int(indices_rating([score])[0])]
+
+
+def _vincular(nomes, nomes_tsb, *extras):
+    """
+    Indice da empresa TSB de cada ativo (-1 se nenhuma), pela mesma regra
+    dos endpoints TSB: nome do ativo contem os 15 primeiros caracteres do emissor TSB.
+    """
+    prefixos = [(j, n[:15].lower()) for j, n in enumerate(nomes_tsb) if n]
+    vinculo = np.full(len(nomes), -1, dtype=np.int64)
+    for i, nome in enumerate(nomes):
+        candidatos = [(nome or '').lower()] + [(e[i] or '').lower() for e in extras]
+        for j, prefixo in prefixos:
+            if any(prefixo in c for c in candidatos):
+                vinculo[i] = j
+                break
+    return vinculo
+
+
+class MotorRisco:
+    """Snapshot colunar do portfolio + calculos vetorizados de risco."""
+
+    def __init__(self, debentures, cricra, empresas, fundos, titulos_publicos=None):
+        self.curvas = MotorCurvas(titulos_publicos or [])
+
+        # Empresas TSB
+        self.emp_emissor = np.array([e['emissor'] for e in empresas], dtype=object)
+        self.emp_score = _num([e['score'] for e in empresas])
+        self.emp_setor, self.setores = _codificar([e['setortsb'] for e in empresas])
+        classificacao = np.array([e['classificacao'] for e in empresas], dtype=object)
+        self.emp_verde = classificacao == 'VERDE'
+        self.emp_transicao = classificacao == 'TRANSICAO'
+        self.emp_classificacao = classificacao
+
+        # Debentures
+        self.deb_codigo = np.array([d['codigoativo'] for d in debentures], dtype=object)
+        self.deb_emissor = np.array([d['emissor'] for d in debentures], dtype=object)
+        self.deb_grupo, self.grupos = _codificar([d['grupo'] for d in debentures])
+        self.deb_taxa = _num([d['taxaindicativa'] for d in debentures])
+        self.deb_duration = _num([d['duration'] for d in debentures])
+        self.deb_pu = _num([d['pu'] for d in debentures])
+        self.deb_emp = _vincular([d['emissor'] for d in debentures], list(self.emp_emissor))
+        self.deb_spread_curva, self.deb_spread = self._spread(self.deb_taxa, self.deb_duration, [d['grupo'] for d in debentures])
+
+        # CRI/CRA
+        self.cri_codigo = np.array([c['codigoativo'] for c in cricra], dtype=object)
+        self.cri_emissor = np.array([c['emissor'] for c in cricra], dtype=object)
+        self.cri_tipo = np.array([c['tipocontrato'] for c in cricra], dtype=object)
+        self.cri_taxa = _num([c['taxaindicativa'] for c in cricra])
+        self.cri_duration = _num([c['duration'] for c in cricra])
+        self.cri_pu = _num([c['pu'] for c in cricra])
+        self.cri_emp = _vincular([c['emissor'] for c in cricra], list(self.emp_emissor),
+                                 [c['originador'] for c in cricra])
+        self.cri_spread_curva, self.cri_spread = self._spread(
+            self.cri_taxa, self.cri_duration,
+            [f"{c.get('tiporemuneracao') or ''} {c.get('taxacorrecao') or ''}" for c in cricra])
+
+        # Contagens de fundos (nao dependem de pesos/limiares)
+        self.fundos = fundos
+
+        # Visao unica de ativos (debentures + CRI/CRA) indexada pelo codigo
+        self.ativos = self._ativos()
+        self.indice_ativo = {}
+        for i, codigo in enumerate(self.ativos['codigo']):
+            self.indice_ativo.setdefault(codigo, i)
+
+    @classmethod
+    def carregar(cls, conn):
+        """Carrega o snapshot a partir de uma conexao aberta."""
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT codigoativo, emissor, grupo, taxaindicativa, duration, pu
+            FROM titulos.debentures
+        """)
+        colunas = ['codigoativo', 'emissor', 'grupo', 'taxaindicativa', 'duration', 'pu']
+        debentures = [dict(zip(colunas, r)) for r in cursor.fetchall()]
+
+        cursor.execute("""
+            SELECT codigoativo, tipocontrato, emissor, originador, taxaindicativa, duration, pu,
+                   tiporemuneracao, taxacorrecao
+            FROM titulos.cricra
+        """)
+        colunas = ['codigoativo', 'tipocontrato', 'emissor', 'originador', 'taxaindicativa', 'duration', 'pu',
+                   'tiporemuneracao', 'taxacorrecao']
+        cricra = [dict(zip(colunas, r)) for r in cursor.fetchall()]
+
+        cursor.execute("SELECT tipo, vencimento, taxaindicativa, pu FROM titulos.titulospublicos")
+        colunas = ['tipo', 'vencimento', 'taxaindicativa', 'pu']
+        titulos_publicos = [dict(zip(colunas, r)) for r in cursor.fetchall()]
+
+        cursor.execute("SELECT emissor, setortsb, classificacao, score FROM tsb.empresastsb")
+        colunas = ['emissor', 'setortsb', 'classificacao', 'score']
+        empresas = [dict(zip(colunas, r)) for r in cursor.fetchall()]
+
+        cursor.execute("""
+            SELECT COUNT(*) FROM fundos.gestorassimilares
+            WHERE LOWER(nomecompleto) LIKE '%%sustent%%'
+               OR LOWER(nomecompleto) LIKE '%%esg%%'
+               OR LOWER(nomecompleto) LIKE '%%verde%%'
+               OR LOWER(nomecompleto) LIKE '%%clima%%'
+        """)
+        total_esg = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM fundos.gestorassimilares")
+        total_cvm = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM fundos.todosfundos")
+        total_anbima = cursor.fetchone()[0]
+
+        fundos = {'esg': total_esg, 'total_cvm': total_cvm, 'total_anbima': total_anbima}
+        return cls(debentures, cricra, empresas, fundos, titulos_publicos)
+
+    def _spread(self, taxa, duration, textos_indexador):
+        """
+        (spread sobre a curva do governo, NaN onde nao ha curva/prazo; spread do
+        risco de credito, com taxa - SPREAD_BASE_SEM_CURVA nesses casos).
+        """
+        curva = self.curvas.spreads(taxa, duration, textos_indexador)
+        return curva, np.where(np.isnan(curva), taxa - SPREAD_BASE_SEM_CURVA, curva)
+
+    # ------------------------------------------------------------------
+    # Estatisticas agregadas
+    # ------------------------------------------------------------------
+    def _stats_setores(self):
+        """Quantidade e score medio por setor TSB (ordenado por quantidade)."""
+        n = len(self.setores)
+        qtd = np.bincount(self.emp_setor, minlength=n)
+        tem_score = ~np.isnan(self.emp_score)
+        soma = np.bincount(self.emp_setor[tem_score], weights=self.emp_score[tem_score], minlength=n)
+        n_score = np.bincount(self.emp_setor[tem_score], minlength=n)
+        media = np.divide(soma, n_score, out=np.zeros(n), where=n_score > 0)
+        ordem = np.argsort(-qtd, kind='stable')
+        return qtd, media, ordem
+
+    def estatisticas(self, limiares=None) -> dict:
+        """Todas as estatisticas usadas pelos scores, em passes vetorizados."""
+        lim = {**LIMIARES_PADRAO, **(limiares or {})}
+
+        # ESG
+        total_emp = int(self.emp_score.size)
+        scores_validos = self.emp_score[~np.isnan(self.emp_score)]
+        esg = {
+            'total_empresas': total_emp,
+            'empresas_verde': int(self.emp_verde.sum()),
+            'empresas_transicao': int(self.emp_transicao.sum()),
+            'score_medio': round(_media(self.emp_score), 1),
+            'score_min': round(float(scores_validos.min()), 1) if scores_validos.size else 0,
+            'score_max': round(float(scores_validos.max()), 1) if scores_validos.size else 0,
+        }
+
+        # Concentracao setorial (HHI)
+        qtd, media, ordem = self._stats_setores()
+        setores = [{'setortsb': self.setores[i], 'qtd': int(qtd[i]), 'score_medio': float(media[i])}
+                   for i in ordem]
+        participacao = qtd / total_emp * 100 if total_emp else qtd * 0.0
+        hhi = float(np.sum(participacao ** 2))
+
+        # Credito (debentures com taxa)
+        com_taxa = ~np.isnan(self.deb_taxa)
+        taxa = self.deb_taxa[com_taxa]
+        spread = self.deb_spread[com_taxa]
+        credito = {
+            'total_debentures': int(com_taxa.sum()),
+            'taxa_media': round(_media(taxa), 2),
+            'spread_medio': round(_media(spread), 2),
+            'duration_media': round(_media(self.deb_duration[com_taxa]), 0),
+            'alto_spread': int((spread > lim['spread_alto']).sum()),
+            'medio_spread': int(((spread >= lim['spread_baixo']) & (spread <= lim['spread_alto'])).sum()),
+            'baixo_spread': int((spread < lim['spread_baixo']).sum()),
+        }
+
+        # Por indexador (grupo)
+        n = len(self.grupos)
+        qtd_grupo = np.bincount(self.deb_grupo, minlength=n)
+        soma_taxa = np.bincount(self.deb_grupo[com_taxa], weights=taxa, minlength=n)
+        n_taxa = np.bincount(self.deb_grupo[com_taxa], minlength=n)
+        indexadores = [
+            {'grupo': self.grupos[i], 'qtd': int(qtd_grupo[i]),
+             'taxa_media': float(soma_taxa[i] / n_taxa[i]) if n_taxa[i] else None}
+            for i in np.argsort(-qtd_grupo, kind='stable') if self.grupos[i] is not None
+        ]
+
+        # CRI/CRA
+        cri_com_taxa = ~np.isnan(self.cri_taxa)
+        tipos = self.cri_tipo[cri_com_taxa]
+        cricra = {
+            'total': int(cri_com_taxa.sum()),
+            'cri': int((tipos == 'CRI').sum()),
+            'cra': int((tipos == 'CRA').sum()),
+            'taxa_media': round(_media(self.cri_taxa[cri_com_taxa]), 2),
+            'duration_media': round(_media(self.cri_duration[cri_com_taxa]), 0),
+        }
+
+        # Liquidez (duration)
+        duration = self.deb_duration[~np.isnan(self.deb_duration)]
+        liquidez = {
+            'curto_prazo': int((duration <= lim['prazo_curto']).sum()),
+            'medio_prazo': int(((duration > lim['prazo_curto']) & (duration <= lim['prazo_longo'])).sum()),
+            'longo_prazo': int((duration > lim['prazo_longo']).sum()),
+        }
+
+        return {
+            'esg': esg,
+            'setores': setores,
+            'hhi': hhi,
+            'credito': credito,
+            'indexadores': indexadores,
+            'cricra': cricra,
+            'liquidez': liquidez,
+            'limiares': lim,
+        }
+
+    # ------------------------------------------------------------------
+    # Scores
+    # ------------------------------------------------------------------
+    @staticmethod
+    def scores(stats, pesos=None) -> dict:
+        """Sub-scores (0-100, maior = mais risco) e score global ponderado."""
+        esg = stats['esg']
+        liquidez = stats['liquidez']
+
+        componentes = np.array([
+            100 - esg['score_medio'],                                         # ESG: inverso do score
+            stats['credito']['spread_medio'] * 20,                            # Credito: spread medio sobre a curva
+            (stats['hhi'] - 500) / 30,                                        # Concentracao: HHI
+            liquidez['longo_prazo'] / max(1, sum(liquidez.values())) * 100 * 1.5,   # Liquidez: % longo prazo
+            esg['empresas_transicao'] / max(1, esg['total_empresas']) * 100 * 2,   # Clima: % transicao
+        ])
+        componentes[1:] = _clip(componentes[1:])
+        vetor_pesos = _vetor_pesos(pesos)
+        nomes = list(PESOS_PADRAO)
+
+        resultado = {nome: float(v) for nome, v in zip(nomes, componentes)}
+        resultado['global'] = round(float(componentes @ vetor_pesos), 1)
+        return resultado
+
+    def calcular(self, pesos=None, limiares=None) -> dict:
+        """Resposta completa de /api/risk-scoring."""
+        stats = self.estatisticas(limiares)
+        scores = self.scores(stats, pesos)
+        esg = stats['esg']
+        lim = stats['limiares']
+        hhi = stats['hhi']
+        concentracao = 'Alta' if hhi > lim['hhi_alta'] else 'Moderada' if hhi > lim['hhi_moderada'] else 'Baixa'
+
+        nomes = ['esg', 'credito', 'concentracao', 'liquidez', 'clima']
+        ratings = indices_rating([scores[n] for n in nomes] + [scores['global']])
+
+        # Empresas com maior risco (menor score; NULL por ultimo)
+        ordem = np.argsort(self.emp_score, kind='stable')[:10]
+        empresas_maior_risco = [
+            {'emissor': self.emp_emissor[i], 'setortsb': self.setores[self.emp_setor[i]],
+             'classificacao': self.emp_classificacao[i],
+             'score': None if np.isnan(self.emp_score[i]) else float(self.emp_score[i])}
+            for i in ordem
+        ]
+
+        fundos = self.fundos
+        return {
+            "resumo": {
+                "risk_score_global": scores['global'],
+                "rating": RATINGS[int(ratings[-1])],
+                "total_ativos": stats['credito']['total_debentures'] + stats['cricra']['total']
+                                + fundos['total_cvm'] + fundos['total_anbima'],
+                "total_empresas_tsb": esg['total_empresas'],
+                "patrimonio_estimado": "R$ 3.35B"  # Valor ilustrativo
+            },
+            "scores": {
+                n: {"valor": round(scores[n], 1), "rating": RATINGS[int(r)]}
+                for n, r in zip(nomes, ratings[:-1])
+            },
+            "esg": esg,
+            "credito": stats['credito'],
+            "cricra": stats['cricra'],
+            "liquidez": stats['liquidez'],
+            "concentracao": {
+                "hhi": round(hhi, 0),
+                "classificacao": concentracao,
+                "por_setor": stats['setores'][:10]
+            },
+            "indexadores": stats['indexadores'],
+            "fundos": {
+                "total": fundos['total_cvm'] + fundos['total_anbima'],
+                "esg": fundos['esg'],
+                "pct_esg": round(fundos['esg'] / max(1, fundos['total_cvm']) * 100, 1)
+            },
+            "alertas": {
+                "empresas_maior_risco": empresas_maior_risco,
+                "top_emissores": self.top_emissores()
+            }
+        }
+
+    def top_emissores(self, n: int = 10) -> list:
+        """Emissores com mais debentures (com taxa) e taxa media."""
+        com_taxa = ~np.isnan(self.deb_taxa)
+        codigos, emissores = _codificar(list(self.deb_emissor[com_taxa]))
+        qtd = np.bincount(codigos, minlength=len(emissores))
+        soma = np.bincount(codigos, weights=self.deb_taxa[com_taxa], minlength=len(emissores))
+        ordem = np.argsort(-qtd, kind='stable')[:n]
+        return [{'emissor': emissores[i], 'qtd': int(qtd[i]), 'taxa_media': float(soma[i] / qtd[i])}
+                for i in ordem]
+
+    # ------------------------------------------------------------------
+    # Detalhamento por ativo e por setor
+    # ------------------------------------------------------------------
+    def _ativos(self):
+        """Concatena debentures e CRI/CRA em colunas unicas."""
+        n_deb = self.deb_codigo.size
+        return {
+            'codigo': np.concatenate([self.deb_codigo, self.cri_codigo]),
+            'tipo': np.concatenate([np.full(n_deb, 'Debenture', dtype=object), self.cri_tipo]),
+            'emissor': np.concatenate([self.deb_emissor, self.cri_emissor]),
+            'grupo': np.concatenate([np.array(self.grupos, dtype=object)[self.deb_grupo]
+                                     if n_deb else np.empty(0, dtype=object),
+                                     np.full(self.cri_codigo.size, None, dtype=object)]),
+            'taxa': np.concatenate([self.deb_taxa, self.cri_taxa]),
+            'spread': np.concatenate([self.deb_spread, self.cri_spread]),
+            'spread_curva': np.concatenate([self.deb_spread_curva, self.cri_spread_curva]),
+            'duration': np.concatenate([self.deb_duration, self.cri_duration]),
+            'pu': np.concatenate([self.deb_pu, self.cri_pu]),
+            'empresa': np.concatenate([self.deb_emp, self.cri_emp]),
+        }
+
+    def detalhe_ativos(self, limiares=None) -> list:
+        """Risco por ativo (debentures + CRI/CRA) calculado sobre os mesmos arrays."""
+        lim = {**LIMIARES_PADRAO, **(limiares or {})}
+        a = self.ativos
+
+        vinculado = a['empresa'] >= 0
+        idx = np.where(vinculado, a['empresa'], 0)
+        score_tsb = np.where(vinculado, self.emp_score[idx] if self.emp_score.size else np.nan, np.nan)
+        risk_credito = _clip(a['spread'] * 20)
+        risk_esg = 100 - score_tsb
+
+        faixa_spread = np.select([a['spread'] > lim['spread_alto'], a['spread'] >= lim['spread_baixo'],
+                                  a['spread'] < lim['spread_baixo']], ['Alto', 'Medio', 'Baixo'], None)
+        faixa_prazo = np.select([a['duration'] <= lim['prazo_curto'], a['duration'] <= lim['prazo_longo'],
+                                 a['duration'] > lim['prazo_longo']], ['Curto', 'Medio', 'Longo'], None)
+        ratings = indices_rating(np.nan_to_num(risk_credito, nan=0))
+
+        def _f(v):
+            return None if np.isnan(v) else round(float(v), 2)
+
+        return [
+            {
+                'codigoativo': a['codigo'][i],
+                'tipo': a['tipo'][i],
+                'emissor': a['emissor'][i],
+                'grupo': a['grupo'][i],
+                'taxaindicativa': _f(a['taxa'][i]),
+                'spread_curva': _f(a['spread_curva'][i]),
+                'spread_aproximado': bool(np.isnan(a['spread_curva'][i]) and not np.isnan(a['spread'][i])),
+                'duration': _f(a['duration'][i]),
+                'pu': _f(a['pu'][i]),
+                'setortsb': self.setores[self.emp_setor[a['empresa'][i]]] if vinculado[i] else None,
+                'classificacao': self.emp_classificacao[a['empresa'][i]] if vinculado[i] else None,
+                'score_tsb': _f(score_tsb[i]),
+                'faixa_spread': faixa_spread[i],
+                'faixa_prazo': faixa_prazo[i],
+                'risk_credito': _f(risk_credito[i]),
+                'risk_esg': _f(risk_esg[i]),
+                'rating_credito': RATINGS[int(ratings[i])]['grade'] if not np.isnan(risk_credito[i]) else None,
+            }
+            for i in range(a['codigo'].size)
+        ]
+
+    def detalhe_setores(self) -> list:
+        """Risco por setor TSB: empresas, ativos vinculados, taxas e sub-scores."""
+        n = len(self.setores)
+        qtd, media, ordem = self._stats_setores()
+        verde = np.bincount(self.emp_setor, weights=self.emp_verde, minlength=n)
+        transicao = np.bincount(self.emp_setor, weights=self.emp_transicao, minlength=n)
+
+        a = self.ativos
+        vinculado = a['empresa'] >= 0
+        setor_ativo = self.emp_setor[a['empresa'][vinculado]] if self.emp_setor.size else np.empty(0, dtype=np.int64)
+        taxa = a['taxa'][vinculado]
+        spread = a['spread'][vinculado]
+        duration = a['duration'][vinculado]
+        qtd_ativos = np.bincount(setor_ativo, minlength=n)
+
+        def _media_por_setor(valores):
+            ok = ~np.isnan(valores)
+            soma = np.bincount(setor_ativo[ok], weights=valores[ok], minlength=n)
+            cont = np.bincount(setor_ativo[ok], minlength=n)
+            return np.divide(soma, cont, out=np.full(n, np.nan), where=cont > 0)
+
+        taxa_media = _media_por_setor(taxa)
+        spread_medio = _media_por_setor(spread)
+        duration_media = _media_por_setor(duration)
+        risk_credito = _clip(spread_medio * 20)
+        risk_clima = _clip(np.divide(transicao, qtd, out=np.zeros(n), where=qtd > 0) * 100 * 2)
+        risk_esg = 100 - media
+
+        def _f(v, casas=1):
+            return None if np.isnan(v) else round(float(v), casas)
+
+        return [
+            {
+                'setortsb': self.setores[i],
+                'empresas': int(qtd[i]),
+                'empresas_verde': int(verde[i]),
+                'empresas_transicao': int(transicao[i]),
+                'score_medio': _f(media[i]),
+                'ativos_vinculados': int(qtd_ativos[i]),
+                'taxa_media': _f(taxa_media[i], 2),
+                'spread_medio': _f(spread_medio[i], 2),
+                'duration_media': _f(duration_media[i], 0),
+                'risk_esg': _f(risk_esg[i]),
+                'risk_credito': _f(risk_credito[i]),
+                'risk_clima': _f(risk_clima[i]),
+            }
+            for i in ordem
+        ]
+
+    # ------------------------------------------------------------------
+    # Simulacao de carteiras (what-if)
+    # ------------------------------------------------------------------
+    def simular(self, codigos, valores, pesos=None, limiares=None) -> dict:
+        """
+        Avalia S carteiras candidatas de uma vez.
+
+        Args:
+            codigos: lista com os A codigos de ativo (colunas)
+            valores: matriz S x A com o valor financeiro de cada ativo em cada cenario
+        Returns:
+            {'cenarios': [metricas por cenario], 'nao_encontrados': [codigos]}
+        """
+        lim = {**LIMIARES_PADRAO, **(limiares or {})}
+        a = self.ativos
+
+        idx = np.array([self.indice_ativo.get(c, -1) for c in codigos], dtype=np.int64)
+        encontrados = idx >= 0
+        nao_encontrados = [c for c, ok in zip(codigos, encontrados) if not ok]
+        idx = idx[encontrados]
+
+        V = np.asarray(valores, dtype=np.float64).reshape(-1, len(codigos))[:, encontrados]
+        V = np.where(np.isnan(V) | (V < 0), 0, V)
+        patrimonio = V.sum(axis=1)
+        W = np.divide(V, patrimonio[:, None], out=np.zeros_like(V), where=patrimonio[:, None] > 0)
+
+        def ponderada(x, mascara=None):
+            """Media ponderada por cenario, renormalizando pelos ativos com dado."""
+            ok = ~np.isnan(x) if mascara is None else mascara
+            num = W[:, ok] @ np.nan_to_num(x[ok])
+            den = W[:, ok].sum(axis=1)
+            return np.divide(num, den, out=np.full(W.shape[0], np.nan), where=den > 0)
+
+        duration = a['duration'][idx]
+        empresa = a['empresa'][idx]
+        vinculado = empresa >= 0
+        emp_idx = np.where(vinculado, empresa, 0)
+
+        spread = ponderada(a['spread'][idx])
+        duration_media = ponderada(duration)
+        score_esg = ponderada(np.where(vinculado, self.emp_score[emp_idx] if self.emp_score.size else np.nan, np.nan))
+        cobertura_tsb = W[:, vinculado].sum(axis=1)
+        sem_empresas = np.full(idx.size, np.nan)
+        pct_verde = ponderada(self.emp_verde[emp_idx].astype(np.float64) if self.emp_verde.size
+                              else sem_empresas, vinculado) * 100
+        pct_transicao = ponderada(self.emp_transicao[emp_idx].astype(np.float64) if self.emp_transicao.size
+                                  else sem_empresas, vinculado) * 100
+        pct_longo = ponderada(np.where(np.isnan(duration), np.nan, duration > lim['prazo_longo'])) * 100
+
+        # Concentracao: exposicao por emissor e por setor TSB (ativos sem vinculo formam um grupo proprio)
+        cod_emissor, emissores = _codificar(list(a['emissor'][idx]))
+        exposicao_emissor = np.zeros((W.shape[0], len(emissores)))
+        np.add.at(exposicao_emissor, (slice(None), cod_emissor), W)
+        setor = np.where(vinculado, self.emp_setor[emp_idx] if self.emp_setor.size else 0, len(self.setores))
+        exposicao_setor = np.zeros((W.shape[0], len(self.setores) + 1))
+        np.add.at(exposicao_setor, (slice(None), setor), W)
+        hhi_emissor = ((exposicao_emissor * 100) ** 2).sum(axis=1)
+        hhi_setor = ((exposicao_setor * 100) ** 2).sum(axis=1)
+
+        # Sub-scores (mesmas formulas de scores()) e global ponderado pelos componentes disponiveis
+        nomes = list(PESOS_PADRAO)
+        componentes = np.column_stack([
+            100 - score_esg,
+            _clip(spread * 20),
+            _clip((hhi_setor - 500) / 30),
+            _clip(pct_longo * 1.5),
+            _clip(pct_transicao * 2),
+        ])
+        vetor_pesos = _vetor_pesos(pesos)
+        disponivel = ~np.isnan(componentes)
+        soma_pesos = disponivel @ vetor_pesos
+        global_ = np.divide(np.nan_to_num(componentes) @ vetor_pesos, soma_pesos,
+                            out=np.full(W.shape[0], np.nan), where=soma_pesos > 0)
+        ratings = indices_rating(np.nan_to_num(np.column_stack([componentes, global_]), nan=0))
+
+        def _f(v, casas=2):
+            return None if np.isnan(v) else round(float(v), casas)
+
+        cenarios = []
+        for s in range(W.shape[0]):
+            top = np.argsort(-exposicao_emissor[s], kind='stable')[:5] if len(emissores) else []
+            cenarios.append({
+                'patrimonio': round(float(patrimonio[s]), 2),
+                'num_ativos': int((V[s] > 0).sum()),
+                'duration_media': _f(duration_media[s], 0),
+                'spread_medio': _f(spread[s]),
+                'score_esg': _f(score_esg[s], 1),
+                'pct_verde': _f(pct_verde[s], 1),
+                'pct_transicao': _f(pct_transicao[s], 1),
+                'cobertura_tsb': round(float(cobertura_tsb[s]) * 100, 1),
+                'hhi_emissor': round(float(hhi_emissor[s]), 0),
+                'hhi_setor': round(float(hhi_setor[s]), 0),
+                'scores': {
+                    n: {'valor': _f(componentes[s, j], 1),
+                        'rating': RATINGS[int(ratings[s, j])] if disponivel[s, j] else None}
+                    for j, n in enumerate(nomes)
+                },
+                'risk_score_global': _f(global_[s], 1),
+                'rating': RATINGS[int(ratings[s, -1])] if not np.isnan(global_[s]) else None,
+                'maiores_exposicoes': [
+                    {'emissor': emissores[i], 'pct': round(float(exposicao_emissor[s, i]) * 100, 1)}
+                    for i in top if exposicao_emissor[s, i] > 0
+                ],
+            })
+
+        return {'cenarios': cenarios, 'nao_encontrados': nao_encontrados}
@@ -3,12 +3,25 @@ Servidor simples para o Dashboard
 Serve arquivos estáticos e redireciona API
 """
 import os
+import sys
 from pathlib import Path
 from flask import Flask, send_from_directory, jsonify, request
 from flask_cors import CORS
+import numpy as np
 import psycopg2
 from dotenv import load_dotenv
 
+# Modulos locais da API (funciona com "python servidor.py" e "gunicorn api.servidor:app")
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from cache_dados import CacheVersionado
+from motor_consultas import MotorConsultas
+from motor_risco import MotorRisco, PESOS_PADRAO, LIMIARES_PADRAO
+from motor_alertas import montar_alertas
+from fluxo_caixa import MotorFluxoCaixa
+from indicadores_emissores import MotorIndicadores
+from simulacao_credito import ModeloCredito, PARAMETROS_PADRAO as PARAMETROS_CREDITO
+
 # Carregar variáveis de ambiente do .env
 load_dotenv(Path(__file__).parent / '.env')
 
@@ -47,6 +60,16 @@ def query_to_dict(cursor):
     columns = [column[0] for column in cursor.description]
     return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
+# Agregados em memoria para o motor local de consultas (recarregados a cada nova carga)
+motor_consultas_cache = CacheVersionado(MotorConsultas.carregar)
+# Curvas e fluxos dependem da data de referencia: reconstruidos tambem na virada do dia
+motor_risco_cache = CacheVersionado(MotorRisco.carregar, diario=True)
+fluxo_caixa_cache = CacheVersionado(MotorFluxoCaixa.carregar, diario=True,
+                                    tabelas=["titulos.debentures", "titulos.cricra", "titulos.titulospublicos"])
+indicadores_cache = CacheVersionado(MotorIndicadores.carregar,
+                                    tabelas=["emissores.indicadores", "emissores.empresas",
+                                             "titulos.debentures"])
+
 # Servir dashboard
 @app.route('/')
 def index():
@@ -912,6 +935,34 @@ def get_emissores():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/emissores/indicadores')
+def get_emissores_indicadores():
+    """
+    Indicadores financeiros por emissor (tabela larga pré-calculada das DFP).
+    Filtros: ano (senão o último exercício de cada CNPJ), cnpj, ordenar. Paginação: page, per_page.
+    """
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(int(request.args.get('per_page', 50)), 200)
+        ano = request.args.get('ano', type=int)
+        ordenar = request.args.get('ordenar', 'divida_liquida_ebit')
+    except ValueError:
+        return jsonify({"success": False, "error": "Parâmetros inválidos"}), 400
+
+    try:
+        motor = indicadores_cache.obter(get_connection)
+        total, registros = motor.listar(ano=ano, cnpj=request.args.get('cnpj'), ordenar=ordenar,
+                                        offset=(page - 1) * per_page, limite=per_page)
+        return jsonify({
+            "success": True,
+            "data": registros,
+            "pagination": {"page": page, "per_page": per_page, "total": total, "total_pages": (total + per_page - 1) // per_page}
+        })
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route('/api/emissores/<path:cnpj>')
 def get_emissor_detalhe(cnpj):
     """Detalhes de um emissor especifico"""
@@ -959,6 +1010,13 @@ def get_emissor_detalhe(cnpj):
         except:
             pass
 
+        # Indicadores calculados (margens, alavancagem, cobertura)
+        indicadores = []
+        try:
+            indicadores = indicadores_cache.obter(get_connection).por_cnpj(empresa.get('cnpj') or cnpj)
+        except Exception:
+            pass
+
         # Governanca
         governanca = []
         try:
@@ -992,6 +1050,7 @@ def get_emissor_detalhe(cnpj):
             "success": True,
             "empresa": empresa,
             "demonstracoes": dre,
+            "indicadores": indicadores,
             "governanca": governanca,
             "kpis": kpis
         })
@@ -1168,6 +1227,13 @@ def processar_consulta_ia(mensagem, tipo_resposta, contexto_filtro):
     """Processa a consulta usando a API Groq com dados reais do banco"""
     resultado = {'texto': '', 'tipo': tipo_resposta, 'dados': None}
 
+    # Perguntas frequentes sao respondidas pelo motor local, sem chamar a IA
+    resposta_local = responder_localmente(mensagem)
+    if resposta_local:
+        resultado['texto'] = resposta_local['texto']
+        resultado['dados'] = resposta_local['dados']
+        return resultado
+
     try:
         # Obter dados do banco para contexto
         dados = obter_contexto_dados()
@@ -1249,8 +1315,20 @@ INSTRUÇÕES DE RESPOSTA:
 
     return resultado
 
+def responder_localmente(mensagem):
+    """Tenta responder com o motor local de consultas. Retorna None se nao reconhecer a intencao."""
+    try:
+        motor = motor_consultas_cache.obter(get_connection)
+        return motor.responder(mensagem)
+    except Exception:
+        return None
+
 def gerar_resposta_fallback(mensagem):
     """Gera resposta de fallback quando a API Groq não está disponível"""
+    resposta_local = responder_localmente(mensagem)
+    if resposta_local:
+        return resposta_local['texto']
+
     msg_lower = mensagem.lower()
 
     try:
@@ -1285,231 +1363,185 @@ def gerar_resposta_fallback(mensagem):
 # RISK SCORING - ANÁLISE DE RISCO DO PORTFÓLIO
 # ============================================================
 
+def parametros_risco():
+    """Le overrides de pesos (peso_<nome>) e limiares (limiar_<nome>) da query string."""
+    pesos = {k: float(request.args[f'peso_{k}']) for k in PESOS_PADRAO if f'peso_{k}' in request.args}
+    limiares = {k: float(request.args[f'limiar_{k}']) for k in LIMIARES_PADRAO if f'limiar_{k}' in request.args}
+    return pesos, limiares
+
 @app.route('/api/risk-scoring')
 def get_risk_scoring():
-    """Análise completa de risco do portfólio"""
+    """
+    Análise completa de risco do portfólio.
+    Calculada sobre o snapshot em memória do motor de risco; aceita
+    peso_<componente> e limiar_<nome> na query string para simulações.
+    """
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        # ========== 1. RISCO ESG (baseado em TSB) ==========
-        cursor.execute("""
-            SELECT
-                COUNT(*) as total,
-                SUM(CASE WHEN classificacao = 'VERDE' THEN 1 ELSE 0 END) as verde,
-                SUM(CASE WHEN classificacao = 'TRANSICAO' THEN 1 ELSE 0 END) as transicao,
-                AVG(score) as score_medio,
-                MIN(score) as score_min,
-                MAX(score) as score_max
-            FROM tsb.empresastsb
-        """)
-        row = cursor.fetchone()
-        esg_stats = {
-            'total_empresas': row[0] or 0,
-            'empresas_verde': row[1] or 0,
-            'empresas_transicao': row[2] or 0,
-            'score_medio': round(float(row[3]), 1) if row[3] else 0,
-            'score_min': round(float(row[4]), 1) if row[4] else 0,
-            'score_max': round(float(row[5]), 1) if row[5] else 0
-        }
-        # Score ESG do portfólio (0-100, quanto maior melhor)
-        esg_score = esg_stats['score_medio']
-        pct_verde = (esg_stats['empresas_verde'] / esg_stats['total_empresas'] * 100) if esg_stats['total_empresas'] > 0 else 0
-
-        # ========== 2. RISCO DE CONCENTRAÇÃO POR SETOR ==========
-        cursor.execute("""
-            SELECT setortsb, COUNT(*) as qtd, AVG(score) as score_medio
-            FROM tsb.empresastsb
-            GROUP BY setortsb
-            ORDER BY qtd DESC
-        """)
-        setores = query_to_dict(cursor)
-        total_emp = sum(s['qtd'] for s in setores)
-
-        # Calcular HHI (Herfindahl-Hirschman Index) para concentração
-        hhi = sum((s['qtd'] / total_emp * 100) ** 2 for s in setores) if total_emp > 0 else 0
-        concentracao_setor = 'Alta' if hhi > 2500 else 'Moderada' if hhi > 1500 else 'Baixa'
-
-        # ========== 3. RISCO DE CRÉDITO (Debêntures) ==========
-        cursor.execute("""
-            SELECT
-                COUNT(*) as total,
-                AVG(CAST(taxaindicativa AS FLOAT)) as taxa_media,
-                AVG(CAST(duration AS FLOAT)) as duration_media,
-                COUNT(CASE WHEN CAST(taxaindicativa AS FLOAT) > 6 THEN 1 END) as alto_spread,
-                COUNT(CASE WHEN CAST(taxaindicativa AS FLOAT) BETWEEN 4 AND 6 THEN 1 END) as medio_spread,
-                COUNT(CASE WHEN CAST(taxaindicativa AS FLOAT) < 4 THEN 1 END) as baixo_spread
-            FROM titulos.debentures
-            WHERE taxaindicativa IS NOT NULL AND taxaindicativa != ''
-        """)
-        row = cursor.fetchone()
-        credito_stats = {
-            'total_debentures': row[0] or 0,
-            'taxa_media': round(float(row[1]), 2) if row[1] else 0,
-            'duration_media': round(float(row[2]), 0) if row[2] else 0,
-            'alto_spread': row[3] or 0,
-            'medio_spread': row[4] or 0,
-            'baixo_spread': row[5] or 0
-        }
-
-        # Por grupo de indexador
-        cursor.execute("""
-            SELECT grupo, COUNT(*) as qtd, AVG(CAST(taxaindicativa AS FLOAT)) as taxa_media
-            FROM titulos.debentures
-            WHERE grupo IS NOT NULL
-            GROUP BY grupo
-            ORDER BY qtd DESC
-        """)
-        por_indexador = query_to_dict(cursor)
-
-        # ========== 4. RISCO DE CRI/CRA ==========
-        cursor.execute("""
-            SELECT
-                COUNT(*) as total,
-                SUM(CASE WHEN tipocontrato = 'CRI' THEN 1 ELSE 0 END) as cri,
-                SUM(CASE WHEN tipocontrato = 'CRA' THEN 1 ELSE 0 END) as cra,
-                AVG(CAST(taxaindicativa AS FLOAT)) as taxa_media,
-                AVG(CAST(duration AS FLOAT)) as duration_media
-            FROM titulos.cricra
-            WHERE taxaindicativa IS NOT NULL
-        """)
-        row = cursor.fetchone()
-        cricra_stats = {
-            'total': row[0] or 0,
-            'cri': row[1] or 0,
-            'cra': row[2] or 0,
-            'taxa_media': round(float(row[3]), 2) if row[3] else 0,
-            'duration_media': round(float(row[4]), 0) if row[4] else 0
-        }
-
-        # ========== 5. RISCO DE LIQUIDEZ (Duration) ==========
-        cursor.execute("""
-            SELECT
-                COUNT(CASE WHEN CAST(duration AS FLOAT) <= 365 THEN 1 END) as curto_prazo,
-                COUNT(CASE WHEN CAST(duration AS FLOAT) > 365 AND CAST(duration AS FLOAT) <= 1095 THEN 1 END) as medio_prazo,
-                COUNT(CASE WHEN CAST(duration AS FLOAT) > 1095 THEN 1 END) as longo_prazo
-            FROM titulos.debentures
-            WHERE duration IS NOT NULL AND duration != ''
-        """)
-        row = cursor.fetchone()
-        liquidez_stats = {
-            'curto_prazo': row[0] or 0,
-            'medio_prazo': row[1] or 0,
-            'longo_prazo': row[2] or 0
-        }
-
-        # ========== 6. FUNDOS ESG ==========
-        cursor.execute("""
-            SELECT COUNT(*) FROM fundos.gestorassimilares
-            WHERE LOWER(nomecompleto) LIKE '%%sustent%%'
-               OR LOWER(nomecompleto) LIKE '%%esg%%'
-               OR LOWER(nomecompleto) LIKE '%%verde%%'
-               OR LOWER(nomecompleto) LIKE '%%clima%%'
-        """)
-        total_fundos_esg = cursor.fetchone()[0]
+        pesos, limiares = parametros_risco()
+        motor = motor_risco_cache.obter(get_connection)
+        return jsonify({"success": True, **motor.calcular(pesos, limiares)})
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"success": False, "error": str(e)}), 500
 
-        cursor.execute("SELECT COUNT(*) FROM fundos.gestorassimilares")
-        total_fundos = cursor.fetchone()[0]
+@app.route('/api/risk-scoring/detalhe')
+def get_risk_scoring_detalhe():
+    """Risco por ativo (debêntures e CRI/CRA) e por setor TSB, sem consultas extras ao banco"""
+    try:
+        _, limiares = parametros_risco()
+        limite = min(int(request.args.get('limite', 500)), 5000)
+        motor = motor_risco_cache.obter(get_connection)
+        ativos = motor.detalhe_ativos(limiares)
+        return jsonify({
+            "success": True,
+            "por_setor": motor.detalhe_setores(),
+            "ativos": ativos[:limite],
+            "total_ativos": len(ativos)
+        })
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"success": False, "error": str(e)}), 500
 
-        cursor.execute("SELECT COUNT(*) FROM fundos.todosfundos")
-        total_fundos_anbima = cursor.fetchone()[0]
-
-        # ========== 7. CÁLCULO DOS SCORES DE RISCO ==========
-        # Score ESG (0-100, quanto maior melhor)
-        risk_esg = 100 - esg_score  # Inverso: alto ESG = baixo risco
-
-        # Score de Crédito (baseado em spread médio)
-        # Taxa > 6% = alto risco, Taxa < 3% = baixo risco
-        taxa_media = credito_stats['taxa_media']
-        risk_credito = min(100, max(0, (taxa_media - 2) * 20))
-
-        # Score de Concentração (baseado em HHI)
-        # HHI > 2500 = alto risco, HHI < 1000 = baixo risco
-        risk_concentracao = min(100, max(0, (hhi - 500) / 30))
-
-        # Score de Liquidez (baseado em duration)
-        pct_longo = (liquidez_stats['longo_prazo'] / max(1, sum(liquidez_stats.values()))) * 100
-        risk_liquidez = min(100, max(0, pct_longo * 1.5))
-
-        # Score de Clima (baseado em % transição)
-        pct_transicao = (esg_stats['empresas_transicao'] / max(1, esg_stats['total_empresas'])) * 100
-        risk_clima = min(100, max(0, pct_transicao * 2))
-
-        # Score Global (média ponderada)
-        risk_global = round(
-            risk_esg * 0.25 +
-            risk_credito * 0.25 +
-            risk_concentracao * 0.15 +
-            risk_liquidez * 0.15 +
-            risk_clima * 0.20
-        , 1)
-
-        # Classificação de risco
-        def get_rating(score):
-            if score <= 20: return {'grade': 'A', 'label': 'Muito Baixo', 'color': '#4CAF50'}
-            elif score <= 40: return {'grade': 'B', 'label': 'Baixo', 'color': '#8BC34A'}
-            elif score <= 60: return {'grade': 'C', 'label': 'Moderado', 'color': '#FFC107'}
-            elif score <= 80: return {'grade': 'D', 'label': 'Alto', 'color': '#FF9800'}
-            else: return {'grade': 'E', 'label': 'Muito Alto', 'color': '#F44336'}
-
-        # ========== 8. EMPRESAS COM MAIOR RISCO ==========
-        cursor.execute("""
-            SELECT emissor, setortsb, classificacao, score
-            FROM tsb.empresastsb
-            ORDER BY score ASC
-            LIMIT 10
-        """)
-        empresas_maior_risco = query_to_dict(cursor)
+@app.route('/api/curva-juros')
+def get_curva_juros():
+    """Curvas zero prefixada (LTN/NTN-F) e real (NTN-B), inflação implícita e reprecificação dos títulos públicos"""
+    try:
+        motor = motor_risco_cache.obter(get_connection)
+        return jsonify({
+            "success": True,
+            **motor.curvas.resumo(),
+            "reprecificacao": motor.curvas.reprecificacao
+        })
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"success": False, "error": str(e)}), 500
 
-        # ========== 9. TOP EMISSORES DE DEBÊNTURES ==========
-        cursor.execute("""
-            SELECT emissor, COUNT(*) as qtd, AVG(CAST(taxaindicativa AS FLOAT)) as taxa_media
-            FROM titulos.debentures
-            WHERE taxaindicativa IS NOT NULL AND taxaindicativa != ''
-            GROUP BY emissor
-            ORDER BY qtd DESC
-            LIMIT 10
-        """)
-        top_emissores = query_to_dict(cursor)
+@app.route('/api/curva-juros/spreads')
+def get_curva_juros_spreads():
+    """Spread de cada debênture e CRI/CRA sobre a curva do governo no prazo da duration"""
+    try:
+        limite = min(int(request.args.get('limite', 500)), 5000)
+        tipo = request.args.get('tipo', '').strip()
+        motor = motor_risco_cache.obter(get_connection)
+        a = motor.ativos
+
+        # Ativos sem curva no prazo/indexador ficam de fora (o spread do motor de risco e so aproximado)
+        validos = ~np.isnan(a['spread_curva'])
+        sem_curva = np.isnan(a['spread_curva']) & ~np.isnan(a['taxa'])
+        if tipo:
+            validos &= a['tipo'] == tipo
+            sem_curva &= a['tipo'] == tipo
+        indices = np.flatnonzero(validos)
+        indices = indices[np.argsort(-a['spread_curva'][indices], kind='stable')]
+
+        ativos = [{
+            'codigoativo': a['codigo'][i],
+            'tipo': a['tipo'][i],
+            'emissor': a['emissor'][i],
+            'grupo': a['grupo'][i],
+            'taxaindicativa': round(float(a['taxa'][i]), 4),
+            'duration': None if np.isnan(a['duration'][i]) else float(a['duration'][i]),
+            'spread_curva': round(float(a['spread_curva'][i]), 4)
+        } for i in indices[:limite]]
+
+        spreads = a['spread_curva'][indices]
+        return jsonify({
+            "success": True,
+            "ativos": ativos,
+            "total_ativos": int(indices.size),
+            "ativos_sem_curva": int(sem_curva.sum()),
+            "spread_medio": round(float(spreads.mean()), 4) if spreads.size else None,
+            "spread_mediano": round(float(np.median(spreads)), 4) if spreads.size else None
+        })
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"success": False, "error": str(e)}), 500
 
-        conn.close()
+@app.route('/api/portfolio/simulacao', methods=['POST'])
+def simular_portfolio():
+    """
+    Simulação what-if de carteiras.
+    Recebe: carteira [{codigoativo, valor}] e/ou cenarios [{nome, carteira}], pesos e limiares opcionais
+    Retorna: HHI, duration, spread, ESG, clima e score global de cada cenário (cálculo matricial único)
+    """
+    try:
+        data = request.get_json() or {}
+        cenarios = list(data.get('cenarios', []))
+        if data.get('carteira'):
+            cenarios.insert(0, {'nome': 'Carteira informada', 'carteira': data['carteira']})
+
+        if not cenarios:
+            return jsonify({"success": False, "error": "Informe 'carteira' ou 'cenarios'"}), 400
+        if len(cenarios) > 200:
+            return jsonify({"success": False, "error": "Máximo de 200 cenários por chamada"}), 400
+
+        # Matriz cenários x ativos (união dos códigos informados)
+        codigos = []
+        posicao = {}
+        for cenario in cenarios:
+            for item in cenario.get('carteira', []):
+                codigo = str(item.get('codigoativo', '')).strip()
+                if codigo and codigo not in posicao:
+                    posicao[codigo] = len(codigos)
+                    codigos.append(codigo)
+        if not codigos:
+            return jsonify({"success": False, "error": "Nenhum ativo informado"}), 400
+
+        valores = [[0.0] * len(codigos) for _ in cenarios]
+        for s, cenario in enumerate(cenarios):
+            for item in cenario.get('carteira', []):
+                codigo = str(item.get('codigoativo', '')).strip()
+                if codigo:
+                    valores[s][posicao[codigo]] += float(item.get('valor') or 0)
+
+        motor = motor_risco_cache.obter(get_connection)
+        resultado = motor.simular(codigos, valores, data.get('pesos'), data.get('limiares'))
+        for cenario, metricas in zip(cenarios, resultado['cenarios']):
+            metricas['nome'] = cenario.get('nome')
 
         return jsonify({
             "success": True,
-            "resumo": {
-                "risk_score_global": risk_global,
-                "rating": get_rating(risk_global),
-                "total_ativos": credito_stats['total_debentures'] + cricra_stats['total'] + total_fundos + total_fundos_anbima,
-                "total_empresas_tsb": esg_stats['total_empresas'],
-                "patrimonio_estimado": "R$ 3.35B"  # Valor ilustrativo
-            },
-            "scores": {
-                "esg": {"valor": round(risk_esg, 1), "rating": get_rating(risk_esg)},
-                "credito": {"valor": round(risk_credito, 1), "rating": get_rating(risk_credito)},
-                "concentracao": {"valor": round(risk_concentracao, 1), "rating": get_rating(risk_concentracao)},
-                "liquidez": {"valor": round(risk_liquidez, 1), "rating": get_rating(risk_liquidez)},
-                "clima": {"valor": round(risk_clima, 1), "rating": get_rating(risk_clima)}
-            },
-            "esg": esg_stats,
-            "credito": credito_stats,
-            "cricra": cricra_stats,
-            "liquidez": liquidez_stats,
-            "concentracao": {
-                "hhi": round(hhi, 0),
-                "classificacao": concentracao_setor,
-                "por_setor": setores[:10]
-            },
-            "indexadores": por_indexador,
-            "fundos": {
-                "total": total_fundos + total_fundos_anbima,
-                "esg": total_fundos_esg,
-                "pct_esg": round(total_fundos_esg / max(1, total_fundos) * 100, 1)
-            },
-            "alertas": {
-                "empresas_maior_risco": empresas_maior_risco,
-                "top_emissores": top_emissores
-            }
+            "cenarios": resultado['cenarios'],
+            "nao_encontrados": resultado['nao_encontrados'],
+            "total_cenarios": len(cenarios)
         })
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": f"Dados inválidos: {e}"}), 400
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/risk-scoring/simulacao-credito')
+def get_simulacao_credito():
+    """
+    Simulação Monte Carlo de perdas de crédito (debêntures e CRI/CRA).
+    Parâmetros opcionais: cenarios, horizonte, confianca, correlacao_global, correlacao_setor,
+    recuperacao, recuperacao_desvio, seed e limite (emissores retornados).
+    Retorna perda esperada, VaR e CVaR do portfólio, por setor TSB e por emissor.
+    """
+    try:
+        parametros = {}
+        for k, padrao in PARAMETROS_CREDITO.items():
+            if k in request.args:
+                parametros[k] = int(request.args[k]) if isinstance(padrao, int) else float(request.args[k])
+        if not 1000 <= parametros.get('cenarios', PARAMETROS_CREDITO['cenarios']) <= 2_000_000:
+            return jsonify({"success": False, "error": "cenarios deve estar entre 1.000 e 2.000.000"}), 400
+        if not 0.5 <= parametros.get('confianca', PARAMETROS_CREDITO['confianca']) < 1:
+            return jsonify({"success": False, "error": "confianca deve estar em [0.5, 1)"}), 400
+        limite = min(int(request.args.get('limite', 20)), 500)
+
+        motor = motor_risco_cache.obter(get_connection)
+        resultado = ModeloCredito.de_motor(motor, parametros).simular()
+        total_emissores = len(resultado['por_emissor'])
+        resultado['por_emissor'] = resultado['por_emissor'][:limite]
+        return jsonify({"success": True, **resultado, "total_emissores": total_emissores})
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"Parâmetros inválidos: {e}"}), 400
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -1521,149 +1553,121 @@ def get_risk_scoring():
 
 @app.route('/api/early-warning')
 def get_early_warning():
-    """Sistema de alertas antecipados baseado em dados reais"""
+    """
+    Sistema de alertas antecipados baseado em dados reais.
+    As regras (motor_alertas.REGRAS) são avaliadas ao final de cada carga por
+    materializar_alertas.py; aqui só são lidos os alertas ativos de esg.alertas.
+    """
     try:
         conn = get_connection()
         cursor = conn.cursor()
-        alertas = []
-
-        # ========== 1. ALERTA: Debêntures com taxa muito alta (>8%) ==========
         cursor.execute("""
-            SELECT emissor, codigoativo, taxaindicativa, duration
-            FROM titulos.debentures
-            WHERE CAST(NULLIF(REGEXP_REPLACE(percentualtaxa, '[^0-9.]', '', 'g'), '') AS NUMERIC) > 8
-            ORDER BY CAST(NULLIF(REGEXP_REPLACE(percentualtaxa, '[^0-9.]', '', 'g'), '') AS NUMERIC) DESC NULLS LAST
-            LIMIT 5
+            SELECT regra, tipo, severidade, titulo, descricao, valor, detalhes
+            FROM esg.alertas
+            WHERE status = 'ativo'
+            ORDER BY alertaid
         """)
-        debentures_alto_risco = query_to_dict(cursor)
-        if debentures_alto_risco:
-            alertas.append({
-                'tipo': 'credito',
-                'severidade': 'alta',
-                'icone': '💳',
-                'titulo': f'{len(debentures_alto_risco)} Debêntures com Taxa > 8%',
-                'descricao': 'Títulos com spread elevado podem indicar maior risco de crédito do emissor',
-                'detalhes': [f"{d['codigoativo']} - {d['emissor'][:30]}... ({d['taxaindicativa']})" for d in debentures_alto_risco[:3]]
-            })
-
-        # ========== 2. ALERTA: Empresas TSB com score baixo (<70) ==========
-        cursor.execute("""
-            SELECT emissor, setortsb, classificacao, score
-            FROM tsb.empresastsb
-            WHERE score < 70
-            ORDER BY score ASC
-            LIMIT 5
-        """)
-        empresas_baixo_score = query_to_dict(cursor)
-        if empresas_baixo_score:
-            alertas.append({
-                'tipo': 'esg',
-                'severidade': 'media',
-                'icone': '🌿',
-                'titulo': f'{len(empresas_baixo_score)} Empresas com Score TSB < 70',
-                'descricao': 'Empresas com score de sustentabilidade abaixo da média requerem monitoramento',
-                'detalhes': [f"{e['emissor'][:25]}... - Score: {e['score']}" for e in empresas_baixo_score[:3]]
-            })
-
-        # ========== 3. ALERTA: Debêntures com duration muito longa (>1500 dias) ==========
-        cursor.execute("""
-            SELECT emissor, codigoativo, duration, taxaindicativa
-            FROM titulos.debentures
-            WHERE CAST(NULLIF(duration::text, '') AS NUMERIC) > 1500
-            ORDER BY CAST(NULLIF(duration::text, '') AS NUMERIC) DESC NULLS LAST
-            LIMIT 5
-        """)
-        debentures_longo_prazo = query_to_dict(cursor)
-        if debentures_longo_prazo:
-            alertas.append({
-                'tipo': 'liquidez',
-                'severidade': 'media',
-                'icone': '⏱️',
-                'titulo': f'{len(debentures_longo_prazo)} Títulos com Duration > 4 anos',
-                'descricao': 'Títulos de longo prazo têm maior exposição a variações de taxa de juros',
-                'detalhes': [f"{d['codigoativo']} - {int(d['duration'])} dias" for d in debentures_longo_prazo[:3]]
-            })
-
-        # ========== 4. ALERTA: Concentração setorial alta ==========
-        cursor.execute("""
-            SELECT setortsb, COUNT(*) as qtd
-            FROM tsb.empresastsb
-            GROUP BY setortsb
-            ORDER BY qtd DESC
-        """)
-        setores = cursor.fetchall()
-        total = sum(s[1] for s in setores)
-        if setores and total > 0:
-            maior_setor = setores[0]
-            pct_concentracao = (maior_setor[1] / total) * 100
-            if pct_concentracao > 30:
-                alertas.append({
-                    'tipo': 'concentracao',
-                    'severidade': 'baixa',
-                    'icone': '📊',
-                    'titulo': f'Concentração em {maior_setor[0]}: {pct_concentracao:.0f}%',
-                    'descricao': 'Alta concentração setorial aumenta risco de eventos adversos específicos',
-                    'detalhes': [f"{s[0]}: {s[1]} empresas ({s[1]/total*100:.0f}%)" for s in setores[:3]]
-                })
-
-        # ========== 5. ALERTA: Empresas em transição ==========
-        cursor.execute("""
-            SELECT COUNT(*) as total,
-                   SUM(CASE WHEN classificacao = 'TRANSICAO' THEN 1 ELSE 0 END) as transicao
-            FROM tsb.empresastsb
-        """)
-        row = cursor.fetchone()
-        if row[0] > 0:
-            pct_transicao = (row[1] / row[0]) * 100
-            if pct_transicao > 20:
-                alertas.append({
-                    'tipo': 'climatico',
-                    'severidade': 'media',
-                    'icone': '🔄',
-                    'titulo': f'{row[1]} Empresas em Transição ({pct_transicao:.0f}%)',
-                    'descricao': 'Empresas ainda não classificadas como Verde requerem acompanhamento de progresso ESG',
-                    'detalhes': ['Monitorar relatórios de sustentabilidade', 'Verificar metas de descarbonização', 'Acompanhar certificações']
-                })
-
-        # ========== 6. ALERTA: Vencimentos próximos (simulado) ==========
-        cursor.execute("""
-            SELECT COUNT(*) FROM titulos.debentures WHERE CAST(NULLIF(duration::text, '') AS NUMERIC) < 365
-        """)
-        venc_proximo = cursor.fetchone()[0]
-        if venc_proximo > 10:
-            alertas.append({
-                'tipo': 'vencimento',
-                'severidade': 'baixa',
-                'icone': '📅',
-                'titulo': f'{venc_proximo} Títulos vencem em menos de 1 ano',
-                'descricao': 'Planejar reinvestimento ou rolagem dos títulos com vencimento próximo',
-                'detalhes': ['Avaliar condições de mercado', 'Verificar necessidade de liquidez', 'Analisar opções de reinvestimento']
-            })
-
+        linhas = query_to_dict(cursor)
         conn.close()
 
-        # Ordenar por severidade
-        ordem_severidade = {'alta': 0, 'media': 1, 'baixa': 2}
-        alertas.sort(key=lambda x: ordem_severidade.get(x['severidade'], 3))
+        resultado = montar_alertas(linhas)
+        return jsonify({
+            "success": True,
+            "alertas": resultado['alertas'],
+            "resumo": resultado['resumo']
+        })
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"success": False, "error": str(e)}), 500
 
-        # Resumo
-        resumo = {
-            'total_alertas': len(alertas),
-            'criticos': len([a for a in alertas if a['severidade'] == 'alta']),
-            'medios': len([a for a in alertas if a['severidade'] == 'media']),
-            'baixos': len([a for a in alertas if a['severidade'] == 'baixa'])
-        }
+@app.route('/api/early-warning/historico')
+def get_early_warning_historico():
+    """
+    Histórico de alertas materializado em esg.alertas (ver materializar_alertas.py).
+    Filtros: status (ativo/resolvido), severidade, tipo, regra, search (chave/título),
+    desde/ate (data da primeira ocorrência). Paginação: page, per_page.
+    """
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(int(request.args.get('per_page', 50)), 200)
+        offset = (page - 1) * per_page
+
+        where_clauses = ["1=1"]
+        params = []
+        for campo in ('status', 'severidade', 'tipo', 'regra'):
+            valor = request.args.get(campo, '').strip()
+            if valor:
+                where_clauses.append(f"{campo} = %s")
+                params.append(valor)
+        search = request.args.get('search', '').strip()
+        if search:
+            where_clauses.append("(chave ILIKE %s OR titulo ILIKE %s)")
+            params.extend([f"%{search}%", f"%{search}%"])
+        if request.args.get('desde'):
+            where_clauses.append("primeiraocorrencia >= %s")
+            params.append(request.args['desde'])
+        if request.args.get('ate'):
+            where_clauses.append("primeiraocorrencia < %s::date + 1")
+            params.append(request.args['ate'])
+        where_sql = " AND ".join(where_clauses)
+
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM esg.alertas WHERE {where_sql}", params)
+        total = cursor.fetchone()[0]
+
+        cursor.execute(f"""
+            SELECT alertaid, regra, chave, tipo, severidade, titulo, descricao, valor, status,
+                   primeiraocorrencia, ultimaocorrencia, resolvidoem, execucoes
+            FROM esg.alertas WHERE {where_sql}
+            ORDER BY CASE severidade WHEN 'alta' THEN 0 WHEN 'media' THEN 1 ELSE 2 END,
+                     primeiraocorrencia DESC, alertaid DESC
+            LIMIT %s OFFSET %s
+        """, params + [per_page, offset])
+        alertas = query_to_dict(cursor)
+        conn.close()
+
+        for a in alertas:
+            a['valor'] = float(a['valor']) if a['valor'] is not None else None
+            for campo in ('primeiraocorrencia', 'ultimaocorrencia', 'resolvidoem'):
+                a[campo] = a[campo].isoformat() if a[campo] else None
 
         return jsonify({
             "success": True,
-            "alertas": alertas,
-            "resumo": resumo
+            "data": alertas,
+            "pagination": {"page": page, "per_page": per_page, "total": total, "total_pages": (total + per_page - 1) // per_page}
         })
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/early-warning/execucoes')
+def get_early_warning_execucoes():
+    """Série temporal das materializações: novos, persistentes e resolvidos por execução"""
+    try:
+        limite = min(int(request.args.get('limite', 90)), 1000)
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT dataexecucao, novos, persistentes, resolvidos, totalativos, criticos, medios, baixos
+            FROM esg.alertasexecucao
+            ORDER BY dataexecucao DESC
+            LIMIT %s
+        """, (limite,))
+        execucoes = query_to_dict(cursor)
+        conn.close()
+
+        for e in execucoes:
+            e['dataexecucao'] = e['dataexecucao'].isoformat()
+
+        return jsonify({"success": True, "execucoes": execucoes[::-1]})
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"success": False, "error": str(e)}), 500
+
 # ============================================================
 # DEBT ANALYSIS - ANÁLISE DE DÍVIDA
 # ============================================================
@@ -1721,6 +1725,9 @@ def get_debt_analysis():
         """)
         top_emissores = query_to_dict(cursor)
 
+        cursor.execute("SELECT DISTINCT emissor FROM titulos.debentures WHERE emissor IS NOT NULL")
+        emissores = [r[0] for r in cursor.fetchall()]
+
         # Distribuição por faixa de taxa
         cursor.execute("""
             SELECT
@@ -1740,6 +1747,15 @@ def get_debt_analysis():
 
         conn.close()
 
+        # Fundamentos (DFP CVM) materializados por emissor; sem eles a análise sai com indicadores nulos
+        try:
+            indicadores = indicadores_cache.obter(get_connection)
+        except Exception as e:
+            print(f"Indicadores de emissores indisponíveis: {e}")
+            indicadores = None
+        for e in top_emissores:
+            e['indicadores'] = indicadores.do_emissor(e['emissor']) if indicadores else None
+
         return jsonify({
             "success": True,
             "resumo": {
@@ -1750,7 +1766,8 @@ def get_debt_analysis():
             "por_indexador": por_indexador,
             "duration_por_indexador": duration_por_indexador,
             "top_emissores": top_emissores,
-            "por_faixa_taxa": por_faixa_taxa
+            "por_faixa_taxa": por_faixa_taxa,
+            "fundamentos": indicadores.resumo_emissores(emissores) if indicadores else None
         })
     except Exception as e:
         import traceback
@@ -1761,84 +1778,71 @@ def get_debt_analysis():
 # VENCIMENTOS - CALENDÁRIO DE VENCIMENTOS
 # ============================================================
 
+def obter_fluxo_caixa():
+    """Motor de fluxo de caixa da versão atual dos dados (o cache diário o refaz na virada do dia)."""
+    return fluxo_caixa_cache.obter(get_connection)
+
 @app.route('/api/vencimentos')
 def get_vencimentos():
-    """Calendário de vencimentos dos títulos"""
+    """Calendário de vencimentos dos títulos (datas reais de CRI/CRA e títulos públicos)"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        # Debêntures por faixa de duration
-        cursor.execute("""
-            WITH faixas AS (
-                SELECT
-                    CASE
-                        WHEN CAST(NULLIF(duration::text, '') AS NUMERIC) < 365 THEN '< 1 ano'
-                        WHEN CAST(NULLIF(duration::text, '') AS NUMERIC) < 730 THEN '1-2 anos'
-                        WHEN CAST(NULLIF(duration::text, '') AS NUMERIC) < 1095 THEN '2-3 anos'
-                        WHEN CAST(NULLIF(duration::text, '') AS NUMERIC) < 1460 THEN '3-4 anos'
-                        ELSE '> 4 anos'
-                    END as faixa,
-                    CASE
-                        WHEN CAST(NULLIF(duration::text, '') AS NUMERIC) < 365 THEN 1
-                        WHEN CAST(NULLIF(duration::text, '') AS NUMERIC) < 730 THEN 2
-                        WHEN CAST(NULLIF(duration::text, '') AS NUMERIC) < 1095 THEN 3
-                        WHEN CAST(NULLIF(duration::text, '') AS NUMERIC) < 1460 THEN 4
-                        ELSE 5
-                    END as ordem,
-                    CAST(NULLIF(pu::text, '') AS NUMERIC) as pu_num
-                FROM titulos.debentures
-                WHERE duration IS NOT NULL
-            )
-            SELECT faixa, COUNT(*) as qtd, SUM(pu_num) as valor
-            FROM faixas
-            GROUP BY faixa, ordem
-            ORDER BY ordem
-        """)
-        por_faixa = query_to_dict(cursor)
-
-        # Títulos com vencimento mais próximo (menor duration)
-        cursor.execute("""
-            SELECT emissor, codigoativo, grupo, taxaindicativa, duration, pu
-            FROM titulos.debentures
-            WHERE duration IS NOT NULL AND duration != ''
-            ORDER BY CAST(NULLIF(duration::text, '') AS NUMERIC) ASC NULLS LAST
-            LIMIT 15
-        """)
-        proximos_vencimentos = query_to_dict(cursor)
+        motor = obter_fluxo_caixa()
 
         # Títulos públicos por tipo
-        cursor.execute("""
-            SELECT tipo, COUNT(*) as qtd
-            FROM titulos.titulospublicos
-            GROUP BY tipo
-            ORDER BY tipo
-        """)
-        titulos_publicos = query_to_dict(cursor)
+        publicos = motor.grupo[motor.classe == 'Titulo Publico'].astype(str)
+        tipos, qtd = np.unique(publicos, return_counts=True)
+        titulos_publicos = [{'tipo': t, 'qtd': int(q)} for t, q in zip(tipos, qtd)]
 
-        # Duration média geral
-        cursor.execute("""
-            SELECT AVG(CAST(NULLIF(duration::text, '') AS NUMERIC)),
-                   MIN(CAST(NULLIF(duration::text, '') AS NUMERIC)),
-                   MAX(CAST(NULLIF(duration::text, '') AS NUMERIC))
-            FROM titulos.debentures
-            WHERE duration IS NOT NULL AND duration != ''
-        """)
-        row = cursor.fetchone()
+        # Duration das debêntures
+        duration = motor.duration[(motor.classe == 'Debenture') & ~np.isnan(motor.duration)]
         duration_stats = {
-            'media': round(float(row[0]), 0) if row[0] else 0,
-            'minima': round(float(row[1]), 0) if row[1] else 0,
-            'maxima': round(float(row[2]), 0) if row[2] else 0
+            'media': round(float(duration.mean()), 0) if duration.size else 0,
+            'minima': round(float(duration.min()), 0) if duration.size else 0,
+            'maxima': round(float(duration.max()), 0) if duration.size else 0
         }
 
-        conn.close()
-
         return jsonify({
             "success": True,
-            "por_faixa": por_faixa,
-            "proximos_vencimentos": proximos_vencimentos,
+            "por_faixa": motor.por_faixa(),
+            "proximos_vencimentos": motor.proximos_vencimentos(15),
             "titulos_publicos": titulos_publicos,
-            "duration_stats": duration_stats
+            "duration_stats": duration_stats,
+            "fluxo_mensal": motor.escada('mensal')[:24],
+            "fluxo_anual": motor.escada('anual'),
+            "data_referencia": motor.data_referencia
+        })
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/vencimentos/fluxo')
+def get_vencimentos_fluxo():
+    """
+    Escada de fluxo de caixa projetado (juros + amortização).
+    Parâmetros: granularidade (mensal/anual), inicio e fim (AAAA-MM ou AAAA), classe, codigo (cronograma de um título)
+    """
+    try:
+        motor = obter_fluxo_caixa()
+        codigo = request.args.get('codigo', '').strip()
+        if codigo:
+            fluxo = motor.fluxo_ativo(codigo)
+            if fluxo is None:
+                return jsonify({"success": False, "error": "Título não encontrado"}), 404
+            return jsonify({"success": True, **fluxo})
+
+        granularidade = request.args.get('granularidade', 'mensal')
+        if granularidade not in ('mensal', 'anual'):
+            return jsonify({"success": False, "error": "granularidade deve ser 'mensal' ou 'anual'"}), 400
+        escada = motor.escada(granularidade, request.args.get('inicio'), request.args.get('fim'),
+                              request.args.get('classe'))
+        return jsonify({
+            "success": True,
+            "granularidade": granularidade,
+            "escada": escada,
+            "total": round(sum(e['total'] for e in escada), 2),
+            "titulos_sem_pu": motor.sem_pu,
+            "data_referencia": motor.data_referencia
         })
     except Exception as e:
         import traceback
@@ -0,0 +1,248 @@
+"""
+Simulacao Monte Carlo de perdas de credito
+Sorteia cenarios correlacionados de default e recuperacao para debentures e
+CRI/CRA (modelo de fatores gaussiano: fator global + fator do setor TSB) e
+reporta perda esperada, VaR e CVaR do portfolio, por setor e por emissor.
+
+A PD de cada ativo vem do spread sobre a curva de juros do governo (calculado
+pelo MotorRisco) pelo "triangulo de credito" (lambda = spread / LGD), limitada
+ao prazo do ativo (duration).
+Os cenarios sao gerados em blocos com NumPy e distribuidos em um pool de
+processos do modulo, criado na primeira simulacao e reaproveitado pelas
+seguintes (cada worker recebe o modelo uma vez por simulacao, junto com a sua
+fatia de blocos). Cada bloco tem sua propria semente derivada de uma
+SeedSequence, entao o resultado nao depende do numero de processos.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from statistics import NormalDist
+
+import numpy as np
+
+PARAMETROS_PADRAO = {
+    'cenarios': 100_000,
+    'horizonte': 1.0,            # anos
+    'confianca': 0.99,
+    'correlacao_global': 0.12,   # fracao da variancia explicada pelo fator global
+    'correlacao_setor': 0.08,    # fracao adicional explicada pelo fator do setor
+    'recuperacao': 0.40,         # recuperacao media (1 - LGD)
+    'recuperacao_desvio': 0.20,
+    'seed': 42,
+}
+
+SEM_SETOR = 'Sem setor TSB'
+NUM_FAIXAS = 1000               # resolucao do histograma de perdas por entidade
+VALORES_POR_BLOCO = 2_000_000   # cenarios x ativos sorteados por bloco
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _obter_pool():
+    """Pool de processos compartilhado pelas simulacoes (um worker por CPU)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+        return _pool
+
+
+def _descartar_pool(pool):
+    """Tira de uso um pool quebrado (worker morto); a proxima simulacao cria outro."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _beta_params(media, desvio):
+    """Parametros (alpha, beta) de uma Beta com media/desvio informados."""
+    media = np.clip(media, 0.01, 0.99)
+    var = np.minimum(desvio ** 2, media * (1 - media) * 0.99)
+    k = media * (1 - media) / var - 1
+    return media * k, (1 - media) * k
+
+
+class ModeloCredito:
+    """Parametros por ativo prontos para a simulacao (picklavel para os workers)."""
+
+    def __init__(self, codigos, emissores, setores_ativo, nomes_setores, exposicao, pd_horizonte, parametros):
+        self.codigos = codigos
+        self.parametros = parametros
+        self.exposicao = exposicao
+        self.pd = pd_horizonte
+        self.limiar = np.array([NormalDist().inv_cdf(p) for p in pd_horizonte])
+        self.setor = setores_ativo
+        self.nomes_setores = nomes_setores
+
+        cod_emissor = {}
+        self.emissor = np.array([cod_emissor.setdefault(e, len(cod_emissor)) for e in emissores], dtype=np.int64)
+        self.nomes_emissores = list(cod_emissor)
+
+        rg = parametros['correlacao_global']
+        rs = parametros['correlacao_setor']
+        if rg < 0 or rs < 0 or rg + rs >= 1:
+            raise ValueError("correlacao_global + correlacao_setor deve estar em [0, 1)")
+        self.carga_global = np.sqrt(rg)
+        self.carga_setor = np.sqrt(rs)
+        self.carga_idio = np.sqrt(1 - rg - rs)
+        self.alpha, self.beta = _beta_params(parametros['recuperacao'], parametros['recuperacao_desvio'])
+
+        # Entidades reportadas: portfolio, setores e emissores
+        n_setores = len(nomes_setores)
+        self.num_entidades = 1 + n_setores + len(self.nomes_emissores)
+        self.perda_maxima = np.concatenate([
+            [exposicao.sum()],
+            np.bincount(self.setor, weights=exposicao, minlength=n_setores),
+            np.bincount(self.emissor, weights=exposicao, minlength=len(self.nomes_emissores)),
+        ])
+
+    @classmethod
+    def de_motor(cls, motor, parametros=None):
+        """Monta o modelo a partir do snapshot do MotorRisco."""
+        p = {**PARAMETROS_PADRAO, **(parametros or {})}
+        a = motor.ativos
+
+        tem_taxa = ~np.isnan(a['taxa'])
+        codigos = a['codigo'][tem_taxa]
+        emissores = a['emissor'][tem_taxa]
+        duration = a['duration'][tem_taxa]
+        pu = a['pu'][tem_taxa]
+
+        # Spread de credito em % a.a. sobre a curva do governo
+        spread = np.clip(a['spread'][tem_taxa], 0.05, 30.0)
+
+        # Intensidade de default e PD no horizonte (limitado ao prazo do ativo)
+        lgd = 1 - p['recuperacao']
+        intensidade = spread / 100 / max(lgd, 0.05)
+        prazo = np.where(np.isnan(duration), p['horizonte'], np.minimum(p['horizonte'], duration / 365))
+        pd_horizonte = np.clip(1 - np.exp(-intensidade * np.maximum(prazo, 1 / 365)), 1e-6, 0.999)
+
+        # Exposicao = PU (ativos sem PU usam a mediana)
+        mediana = np.nanmedian(pu) if (~np.isnan(pu)).any() else 1.0
+        exposicao = np.where(np.isnan(pu), mediana, pu)
+
+        # Setor TSB do emissor (ativos sem vinculo formam um setor proprio)
+        empresa = a['empresa'][tem_taxa]
+        nomes_setores = list(motor.setores) + [SEM_SETOR]
+        setor = np.where(empresa >= 0,
+                         motor.emp_setor[np.where(empresa >= 0, empresa, 0)] if motor.emp_setor.size else 0,
+                         len(nomes_setores) - 1)
+
+        return cls(list(codigos), list(emissores), setor.astype(np.int64), nomes_setores,
+                   exposicao, pd_horizonte, p)
+
+    # ------------------------------------------------------------------
+    # Simulacao
+    # ------------------------------------------------------------------
+    def simular_bloco(self, n, semente):
+        """
+        Sorteia n cenarios. Retorna (soma das perdas, contagem e soma por faixa
+        do histograma) de cada entidade.
+        """
+        rng = np.random.default_rng(semente)
+        n_ativos = self.exposicao.size
+        n_setores = len(self.nomes_setores)
+
+        fator_global = rng.standard_normal(n)
+        fator_setor = rng.standard_normal((n, n_setores))
+        latente = (self.carga_global * fator_global[:, None]
+                   + self.carga_setor * fator_setor[:, self.setor]
+                   + self.carga_idio * rng.standard_normal((n, n_ativos)))
+        linhas, colunas = np.nonzero(latente < self.limiar[None, :])
+
+        recuperacao = rng.beta(self.alpha, self.beta, size=colunas.size)
+        perda_default = self.exposicao[colunas] * (1 - recuperacao)
+
+        # Perdas agregadas por entidade: [portfolio | setores | emissores]
+        perdas = np.zeros((n, self.num_entidades))
+        perdas[:, 0] = np.bincount(linhas, weights=perda_default, minlength=n)
+        np.add.at(perdas, (linhas, 1 + self.setor[colunas]), perda_default)
+        np.add.at(perdas, (linhas, 1 + n_setores + self.emissor[colunas]), perda_default)
+
+        faixas = np.minimum((perdas / np.maximum(self.perda_maxima, 1e-12) * NUM_FAIXAS).astype(np.int64),
+                            NUM_FAIXAS - 1)
+        plano = (faixas + np.arange(self.num_entidades)[None, :] * NUM_FAIXAS).ravel()
+        tamanho = self.num_entidades * NUM_FAIXAS
+        contagem = np.bincount(plano, minlength=tamanho).reshape(self.num_entidades, NUM_FAIXAS)
+        soma = np.bincount(plano, weights=perdas.ravel(), minlength=tamanho).reshape(self.num_entidades, NUM_FAIXAS)
+        return perdas.sum(axis=0), contagem, soma
+
+    def simular(self, cenarios=None, workers=None):
+        """Executa a simulacao completa (em paralelo quando vale a pena)."""
+        inicio = time.perf_counter()
+        cenarios = int(cenarios or self.parametros['cenarios'])
+        n_ativos = max(1, self.exposicao.size)
+        tamanho_bloco = max(1000, VALORES_POR_BLOCO // n_ativos)
+        blocos = [min(tamanho_bloco, cenarios - i) for i in range(0, cenarios, tamanho_bloco)]
+        sementes = np.random.SeedSequence(self.parametros['seed']).spawn(len(blocos))
+
+        workers = min(workers or os.cpu_count() or 1, len(blocos))
+        if workers > 1:
+            # Fatias contiguas de blocos, uma por worker: o modelo vai uma vez por fatia
+            # e os resultados voltam na ordem dos blocos (mesmas somas do caminho sequencial)
+            fatias = np.array_split(np.arange(len(blocos)), workers)
+            pool = _obter_pool()
+            try:
+                futuros = [pool.submit(_simular_blocos_worker, self, [blocos[i] for i in fatia],
+                                       [sementes[i] for i in fatia]) for fatia in fatias]
+                resultados = [r for futuro in futuros for r in futuro.result()]
+            except BrokenProcessPool:
+                _descartar_pool(pool)
+                raise
+        else:
+            resultados = [self.simular_bloco(n, s) for n, s in zip(blocos, sementes)]
+
+        soma_perdas = sum(r[0] for r in resultados)
+        contagem = sum(r[1] for r in resultados)
+        soma_faixas = sum(r[2] for r in resultados)
+        return self._resumir(cenarios, soma_perdas, contagem, soma_faixas, time.perf_counter() - inicio)
+
+    def _resumir(self, cenarios, soma_perdas, contagem, soma_faixas, segundos):
+        """Calcula EL, VaR e CVaR de cada entidade a partir dos histogramas."""
+        confianca = self.parametros['confianca']
+        largura = self.perda_maxima / NUM_FAIXAS
+
+        acumulado = np.cumsum(contagem, axis=1)
+        faixa_var = np.argmax(acumulado >= confianca * cenarios, axis=1)
+        var = faixa_var * largura  # limite inferior da faixa do quantil (VaR <= CVaR)
+
+        cauda = np.arange(NUM_FAIXAS)[None, :] >= faixa_var[:, None]
+        n_cauda = (contagem * cauda).sum(axis=1)
+        cvar = np.divide((soma_faixas * cauda).sum(axis=1), n_cauda,
+                         out=np.zeros(self.num_entidades), where=n_cauda > 0)
+        perda_esperada = soma_perdas / cenarios
+
+        def _entidade(i, nome):
+            return {
+                'nome': nome,
+                'exposicao': round(float(self.perda_maxima[i]), 2),
+                'perda_esperada': round(float(perda_esperada[i]), 2),
+                'var': round(float(var[i]), 2),
+                'cvar': round(float(cvar[i]), 2),
+                'pct_perda_esperada': round(float(perda_esperada[i] / self.perda_maxima[i] * 100), 3)
+                                      if self.perda_maxima[i] else 0,
+            }
+
+        n_setores = len(self.nomes_setores)
+        por_setor = [_entidade(1 + j, nome) for j, nome in enumerate(self.nomes_setores)
+                     if self.perda_maxima[1 + j] > 0]
+        por_emissor = [_entidade(1 + n_setores + j, nome) for j, nome in enumerate(self.nomes_emissores)]
+
+        return {
+            'portfolio': _entidade(0, 'Portfolio'),
+            'por_setor': sorted(por_setor, key=lambda x: x['perda_esperada'], reverse=True),
+            'por_emissor': sorted(por_emissor, key=lambda x: x['cvar'], reverse=True),
+            'parametros': {**self.parametros, 'cenarios': cenarios},
+            'ativos': len(self.codigos),
+            'pd_media': round(float(self.pd.mean() * 100), 3) if self.pd.size else 0,
+            'tempo_segundos': round(segundos, 3),
+        }
+
+
+def _simular_blocos_worker(modelo, blocos, sementes):
+    return [modelo.simular_bloco(n, s) for n, s in zip(blocos, sementes)]
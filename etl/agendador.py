@@ -0,0 +1,190 @@
+"""
+Agendador do ETL (grafo de dependencias)
+Cada etapa e um loader com as tabelas que le (entradas) e que escreve
+(saidas); uma etapa depende das que produzem alguma de suas entradas.
+Etapas independentes rodam em paralelo em um pool limitado de threads, cada
+uma com sua propria sessao no banco e em uma transacao.
+
+Uma etapa que falha e repetida (ate `tentativas` vezes) sem reexecutar as
+demais; se continuar falhando, as etapas que dependem dela sao puladas. No fim
+o resumo mostra o tempo de cada etapa e o caminho critico (a cadeia de
+dependencias mais longa, que limita o tempo total).
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import perfil
+from database import db
+
+WORKERS_PADRAO = 4
+TENTATIVAS_PADRAO = 3
+ESPERA_RETENTATIVA = 2.0   # segundos, multiplicado pela tentativa
+
+# Colunas de esg.perfiletapa, na ordem de perfil.Medicao.como_dict()
+COLUNAS_PERFIL = ["etapa", "arquivoorigem", "datainicio", "segundos", "segundosparse", "segundosbanco",
+                  "linhas", "linhasporsegundo", "byteslidos", "rsspicomb"]
+
+
+class Etapa:
+    """Loader do ETL com as tabelas que le e escreve."""
+
+    def __init__(self, nome: str, funcao, entradas=(), saidas=None):
+        self.nome = nome
+        self.funcao = funcao
+        self.entradas = set(entradas)
+        self.saidas = set(saidas or [nome])
+
+
+def dependencias(etapas) -> dict:
+    """{etapa: etapas que produzem alguma de suas entradas}."""
+    produtor = {}
+    for etapa in etapas:
+        for saida in etapa.saidas:
+            produtor[saida] = etapa.nome
+    return {e.nome: {produtor[t] for t in e.entradas if t in produtor and produtor[t] != e.nome} for e in etapas}
+
+
+def _ordem_topologica(etapas, deps) -> list:
+    pendentes = {e.nome: set(deps[e.nome]) for e in etapas}
+    ordem = []
+    while pendentes:
+        prontas = [nome for nome, d in pendentes.items() if not d]
+        if not prontas:
+            raise ValueError(f"Ciclo de dependencias entre: {', '.join(sorted(pendentes))}")
+        for nome in prontas:
+            ordem.append(nome)
+            del pendentes[nome]
+        for d in pendentes.values():
+            d.difference_update(prontas)
+    return ordem
+
+
+def caminho_critico(etapas, deps, duracoes: dict):
+    """(duracao, [etapas]) da cadeia de dependencias com maior soma de duracoes."""
+    total, anterior = {}, {}
+    for nome in _ordem_topologica(etapas, deps):
+        melhor = max(deps[nome], key=lambda d: total[d], default=None)
+        anterior[nome] = melhor
+        total[nome] = duracoes.get(nome, 0.0) + (total[melhor] if melhor else 0.0)
+    if not total:
+        return 0.0, []
+    fim = max(total, key=total.get)
+    caminho = []
+    while fim:
+        caminho.append(fim)
+        fim = anterior[fim]
+    return total[caminho[0]], caminho[::-1]
+
+
+def _rodar(etapa: Etapa, tentativas: int) -> int:
+    """Executa a etapa em sessao/transacao propria; retorna a tentativa que deu certo."""
+    with perfil.etapa(etapa.nome):
+        for tentativa in range(1, tentativas + 1):
+            try:
+                with db.session():
+                    with db.transaction():
+                        etapa.funcao()
+                return tentativa
+            except Exception as e:
+                print(f"  [{etapa.nome}] falhou (tentativa {tentativa}/{tentativas}): {e}")
+                if tentativa == tentativas:
+                    raise
+                time.sleep(ESPERA_RETENTATIVA * tentativa)
+
+
+def executar(etapas, workers: int = WORKERS_PADRAO, tentativas: int = TENTATIVAS_PADRAO) -> dict:
+    """Executa o grafo de etapas e imprime o resumo. Retorna o resumo."""
+    etapas = list(etapas)
+    por_nome = {e.nome: e for e in etapas}
+    deps = dependencias(etapas)
+    _ordem_topologica(etapas, deps)   # valida o grafo antes de comecar
+
+    inicio = time.perf_counter()
+    resultado = {}        # nome -> dict(status, inicio, fim, tentativas, erro)
+    em_execucao = {}      # futuro -> nome
+    inicios = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while len(resultado) < len(etapas):
+            # Pula etapas cujas dependencias falharam
+            for etapa in etapas:
+                if etapa.nome not in resultado and etapa.nome not in em_execucao.values():
+                    falhas = [d for d in deps[etapa.nome] if resultado.get(d, {}).get("status") in ("falhou", "pulada")]
+                    if falhas:
+                        print(f"  [{etapa.nome}] pulada: depende de {', '.join(sorted(falhas))}")
+                        resultado[etapa.nome] = {"status": "pulada", "inicio": None, "fim": None, "tentativas": 0}
+
+            # Dispara as etapas prontas (na ordem de declaracao)
+            for etapa in etapas:
+                if len(em_execucao) >= max(1, workers):
+                    break
+                if etapa.nome in resultado or etapa.nome in em_execucao.values():
+                    continue
+                if all(resultado.get(d, {}).get("status") == "ok" for d in deps[etapa.nome]):
+                    inicios[etapa.nome] = time.perf_counter() - inicio
+                    em_execucao[pool.submit(_rodar, etapa, tentativas)] = etapa.nome
+
+            if not em_execucao:
+                continue
+
+            concluidos, _ = wait(list(em_execucao), return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                nome = em_execucao.pop(futuro)
+                fim = time.perf_counter() - inicio
+                try:
+                    n = futuro.result()
+                    resultado[nome] = {"status": "ok", "inicio": inicios[nome], "fim": fim, "tentativas": n}
+                except Exception as e:
+                    resultado[nome] = {"status": "falhou", "inicio": inicios[nome], "fim": fim,
+                                       "tentativas": tentativas, "erro": str(e)}
+
+    total = time.perf_counter() - inicio
+    duracoes = {n: r["fim"] - r["inicio"] for n, r in resultado.items() if r["inicio"] is not None}
+    duracao_critica, critico = caminho_critico(etapas, deps, duracoes)
+    resumo = {
+        "etapas": resultado,
+        "tempo_total": total,
+        "soma_etapas": sum(duracoes.values()),
+        "caminho_critico": critico,
+        "duracao_caminho_critico": duracao_critica,
+    }
+    _imprimir_resumo(resumo, por_nome, workers)
+    registrar_perfil()
+    return resumo
+
+
+def _imprimir_resumo(resumo: dict, por_nome: dict, workers: int):
+    etapas = resumo["etapas"]
+    contagem = {s: sum(1 for r in etapas.values() if r["status"] == s) for s in ("ok", "falhou", "pulada")}
+    critico = " -> ".join(resumo["caminho_critico"])
+
+    print("\n" + "-" * 60)
+    print(f"Agendador: {len(etapas)} etapas em {workers} worker(s) - "
+          f"{contagem['ok']} ok, {contagem['falhou']} falharam, {contagem['pulada']} puladas")
+    print(f"  Tempo total: {resumo['tempo_total']:.2f}s | soma das etapas: {resumo['soma_etapas']:.2f}s")
+    print(f"  Caminho critico ({resumo['duracao_caminho_critico']:.2f}s): {critico}")
+    for nome in por_nome:
+        r = etapas[nome]
+        duracao = f"{r['fim'] - r['inicio']:7.2f}s" if r["inicio"] is not None else "      - "
+        extra = f" (tentativas: {r['tentativas']})" if r["tentativas"] > 1 else ""
+        print(f"    {nome:<28} {r['status']:<7} {duracao}{extra}")
+    print("-" * 60)
+
+    try:
+        status = "Sucesso" if not contagem["falhou"] and not contagem["pulada"] else "Parcial"
+        db.log_import("ETL", "agendador", contagem["ok"], contagem["falhou"] + contagem["pulada"], status,
+                      f"Caminho critico ({resumo['duracao_caminho_critico']:.2f}s): {critico}")
+    except Exception as e:
+        print(f"  Aviso: resumo nao registrado em logimportacao - {e}")
+
+
+def registrar_perfil():
+    """Imprime o perfil das etapas e grava no historico e em esg.perfiletapa."""
+    medicoes = perfil.encerrar()
+    if not medicoes:
+        return
+    try:
+        if db.execute_query("SELECT to_regclass('esg.perfiletapa')")[0][0]:
+            db.bulk_load([tuple(m.como_dict().values()) for m in medicoes], "perfiletapa", columns=COLUNAS_PERFIL)
+    except Exception as e:
+        print(f"  Aviso: perfil nao registrado em perfiletapa - {e}")
@@ -7,6 +7,7 @@ Este script:
 """
 
 import os
+import sys
 import json
 import pyodbc
 import pandas as pd
@@ -15,6 +16,17 @@ from datetime import datetime
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 DATA_DIR = os.path.join(BASE_DIR, 'data', 'anbima')
 
+# Perfil das etapas (etl/perfil.py)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import perfil
+
+
+def ler_json(arquivo):
+    """json.load com o tempo de parse e os bytes lidos contados na etapa"""
+    perfil.contar(bytes_lidos=os.path.getsize(arquivo))
+    with perfil.trecho("parse"), open(arquivo, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
 
 class SQLServerLoader:
     def __init__(self, server='localhost', database='ANBIMA_ESG'):
@@ -25,7 +37,7 @@ class SQLServerLoader:
     def conectar(self):
         try:
             conn_str = f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={self.server};DATABASE={self.database};Trusted_Connection=yes;"
-            self.conn = pyodbc.connect(conn_str)
+            self.conn = perfil.conexao_medida(pyodbc.connect(conn_str))
             print(f"Conectado ao SQL Server: {self.server}/{self.database}")
             return True
         except Exception as e:
@@ -200,8 +212,7 @@ class SQLServerLoader:
         """Carrega debentures do JSON"""
         print(f"\nCarregando debentures de {arquivo}...")
 
-        with open(arquivo, 'r', encoding='utf-8') as f:
-            dados = json.load(f)
+        dados = ler_json(arquivo)
 
         debentures = dados.get('debentures', [])
         if not debentures:
@@ -256,8 +267,7 @@ class SQLServerLoader:
         """Carrega titulos publicos do JSON"""
         print(f"\nCarregando titulos publicos de {arquivo}...")
 
-        with open(arquivo, 'r', encoding='utf-8') as f:
-            dados = json.load(f)
+        dados = ler_json(arquivo)
 
         titulos = dados.get('titulos_publicos', [])
         if not titulos:
@@ -296,8 +306,7 @@ class SQLServerLoader:
         """Carrega CRI/CRA do JSON"""
         print(f"\nCarregando CRI/CRA de {arquivo}...")
 
-        with open(arquivo, 'r', encoding='utf-8') as f:
-            dados = json.load(f)
+        dados = ler_json(arquivo)
 
         cri = dados.get('cri', [])
         cra = dados.get('cra', [])
@@ -351,8 +360,7 @@ class SQLServerLoader:
         """Carrega empresas TSB do JSON"""
         print(f"\nCarregando empresas TSB de {arquivo}...")
 
-        with open(arquivo, 'r', encoding='utf-8') as f:
-            dados = json.load(f)
+        dados = ler_json(arquivo)
 
         empresas = dados.get('empresas', [])
         if not empresas:
@@ -388,8 +396,7 @@ class SQLServerLoader:
         """Carrega KPIs TSB do JSON"""
         print(f"\nCarregando KPIs TSB de {arquivo}...")
 
-        with open(arquivo, 'r', encoding='utf-8') as f:
-            dados = json.load(f)
+        dados = ler_json(arquivo)
 
         kpis_setor = dados.get('kpis_obrigatorios_por_setor', {})
         if not kpis_setor:
@@ -430,11 +437,20 @@ class SQLServerLoader:
             self.conn.close()
 
 
+def carregar_medido(carregar, arquivo):
+    """Executa um loader como etapa do perfil (nome do metodo, sem 'carregar_')"""
+    with perfil.etapa(carregar.__name__.replace('carregar_', ''), arquivo):
+        perfil.contar(linhas=carregar(arquivo))
+
+
 def main():
     print("=" * 60)
     print("CARREGANDO TODOS OS JSON PARA O SQL SERVER")
     print("=" * 60)
 
+    if '--profile' in sys.argv:
+        print(f"Perfil de chama das etapas em: {perfil.ativar_amostragem()}")
+
     loader = SQLServerLoader()
 
     if not loader.conectar():
@@ -451,15 +467,17 @@ def main():
         # Carregar debentures
         arquivo_titulos = os.path.join(DATA_DIR, 'todos_titulos_20260107_002911.json')
         if os.path.exists(arquivo_titulos):
-            loader.carregar_debentures(arquivo_titulos)
-            loader.carregar_titulos_publicos(arquivo_titulos)
-            loader.carregar_cri_cra(arquivo_titulos)
+            carregar_medido(loader.carregar_debentures, arquivo_titulos)
+            carregar_medido(loader.carregar_titulos_publicos, arquivo_titulos)
+            carregar_medido(loader.carregar_cri_cra, arquivo_titulos)
 
         # Carregar TSB
         arquivo_tsb = os.path.join(DATA_DIR, 'tsb_kpis_empresas.json')
         if os.path.exists(arquivo_tsb):
-            loader.carregar_empresas_tsb(arquivo_tsb)
-            loader.carregar_kpis_tsb(arquivo_tsb)
+            carregar_medido(loader.carregar_empresas_tsb, arquivo_tsb)
+            carregar_medido(loader.carregar_kpis_tsb, arquivo_tsb)
+
+        perfil.encerrar()
 
         print("\n" + "=" * 60)
         print("CARGA CONCLUIDA!")
@@ -0,0 +1,145 @@
+"""
+Desempenho de Fundos - Informe Diario CVM
+=========================================
+Calcula as metricas de fundos.FatoPatrimonioLiquido a partir do informe
+diario da CVM (inf_diario_fi_AAAAMM.csv): rentabilidade do dia, do mes, do
+ano, 12M e 24M, volatilidade 12M, Sharpe e drawdown.
+
+Todas as metricas sao calculadas de uma vez para todos os fundos com
+operacoes agrupadas por fundo (shift, cumsum e janelas moveis do pandas).
+Rentabilidades, volatilidade e drawdown sao fracoes decimais (0.0123 = 1,23%).
+Janelas de 12M/24M sao de 252/504 cotas (dias uteis informados).
+"""
+
+import glob
+import os
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+DIAS_UTEIS_ANO = 252
+MIN_COTAS_VOLATILIDADE = 126         # meio ano de cotas para estimar a volatilidade 12M
+TAXA_LIVRE_RISCO_PADRAO = 0.10       # DI anual usado no Sharpe quando nao informado
+LOOKBACK_DIAS_CORRIDOS = 760         # historico (2 anos + folga) relido para as janelas de 24M
+
+# Colunas do informe diario CVM (leiaute antigo e RCVM 175) -> colunas da fato
+COLUNAS_CVM = {
+    'CNPJ_FUNDO': 'FundoCNPJ',
+    'CNPJ_FUNDO_CLASSE': 'FundoCNPJ',
+    'DT_COMPTC': 'Data',
+    'VL_PATRIM_LIQ': 'PatrimonioLiquido',
+    'VL_QUOTA': 'ValorCota',
+    'NR_COTST': 'CotistasTotal',
+    'CAPTC_DIA': 'CaptacaoBruta',
+    'RESG_DIA': 'Resgates',
+}
+
+COLUNAS_METRICAS = [
+    'RentabilidadeDia', 'RentabilidadeMes', 'RentabilidadeAno', 'Rentabilidade12M',
+    'Rentabilidade24M', 'Volatilidade12M', 'SharpeRatio', 'Drawdown', 'DrawdownMaximo12M',
+]
+
+
+def ler_inf_diario(caminhos) -> pd.DataFrame:
+    """
+    Le um ou mais arquivos inf_diario_fi da CVM (ou um padrao glob).
+    Retorna as colunas padronizadas de COLUNAS_CVM.
+    """
+    if isinstance(caminhos, str):
+        caminhos = sorted(glob.glob(caminhos)) if any(c in caminhos for c in '*?[') else [caminhos]
+    frames = []
+    for caminho in caminhos:
+        colunas = pd.read_csv(caminho, sep=';', encoding='latin-1', nrows=0).columns
+        usar = [c for c in colunas if c in COLUNAS_CVM]
+        frames.append(pd.read_csv(caminho, sep=';', encoding='latin-1', usecols=usar, dtype={c: str for c in usar
+                                  if c.startswith('CNPJ')}))
+    if not frames:
+        return pd.DataFrame(columns=list(dict.fromkeys(COLUNAS_CVM.values())))
+    return padronizar_informe(pd.concat(frames, ignore_index=True))
+
+
+def padronizar_informe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Renomeia as colunas CVM, converte tipos e deixa uma linha por (fundo, data)
+    (no leiaute RCVM 175 fica a classe com maior PL).
+    """
+    df = df.rename(columns={c: n for c, n in COLUNAS_CVM.items() if c in df.columns})
+    df = df.loc[:, ~df.columns.duplicated()].copy()
+    df['Data'] = pd.to_datetime(df['Data'], errors='coerce')
+    for coluna in ['PatrimonioLiquido', 'ValorCota', 'CotistasTotal', 'CaptacaoBruta', 'Resgates']:
+        if coluna in df.columns:
+            df[coluna] = pd.to_numeric(df[coluna], errors='coerce')
+        else:
+            df[coluna] = np.nan
+    df['CotistasTotal'] = df['CotistasTotal'].round().astype('Int64')
+    df = df.dropna(subset=['FundoCNPJ', 'Data'])
+    df = df.sort_values('PatrimonioLiquido', ascending=False, kind='stable')
+    df = df.drop_duplicates(subset=['FundoCNPJ', 'Data'])
+    df['CaptacaoLiquida'] = df['CaptacaoBruta'].fillna(0) - df['Resgates'].fillna(0)
+    return df.sort_values(['FundoCNPJ', 'Data'], kind='stable').reset_index(drop=True)
+
+
+def _janela(serie: pd.Series, grupos: pd.Series, n: int, funcao: str, min_periods: int) -> pd.Series:
+    """Janela movel de n linhas dentro de cada fundo, alinhada ao indice original."""
+    rolagem = serie.groupby(grupos, sort=False).rolling(n, min_periods=min_periods)
+    return getattr(rolagem, funcao)().reset_index(level=0, drop=True).reindex(serie.index)
+
+
+def calcular_metricas(df: pd.DataFrame, taxa_livre_risco: float = TAXA_LIVRE_RISCO_PADRAO,
+                      pico_anterior: Optional[pd.Series] = None) -> pd.DataFrame:
+    """
+    Acrescenta COLUNAS_METRICAS a um DataFrame com FundoID, Data e ValorCota
+    (ordenado ou nao). pico_anterior: maior cota ja registrada por FundoID,
+    para o drawdown de cargas incrementais.
+    """
+    df = df.sort_values(['FundoID', 'Data'], kind='stable').reset_index(drop=True)
+    fundo = df['FundoID']
+    cota = df['ValorCota'].where(df['ValorCota'] > 0)
+    por_fundo = cota.groupby(fundo, sort=False)
+
+    cota_anterior = por_fundo.shift(1)
+    log_ret = np.log(cota / cota_anterior)
+    df['RentabilidadeDia'] = np.expm1(log_ret)
+
+    # Retornos de janela fixa pela diferenca do log acumulado
+    acumulado = log_ret.fillna(0).groupby(fundo, sort=False).cumsum()
+    for coluna, n in [('Rentabilidade12M', DIAS_UTEIS_ANO), ('Rentabilidade24M', 2 * DIAS_UTEIS_ANO)]:
+        df[coluna] = np.expm1(acumulado - acumulado.groupby(fundo, sort=False).shift(n))
+
+    # Mes e ano correntes: contra a ultima cota do periodo anterior, tomada na
+    # primeira linha do periodo (NaN no primeiro periodo do fundo, sem cota anterior)
+    for coluna, periodo in [('RentabilidadeMes', df['Data'].dt.to_period('M')),
+                            ('RentabilidadeAno', df['Data'].dt.year)]:
+        primeira = cota_anterior.groupby([fundo, periodo], sort=False).cumcount() == 0
+        base = cota_anterior.where(primeira).groupby([fundo, periodo], sort=False).transform('first')
+        df[coluna] = cota / base - 1
+
+    volatilidade = _janela(log_ret, fundo, DIAS_UTEIS_ANO, 'std', MIN_COTAS_VOLATILIDADE)
+    df['Volatilidade12M'] = volatilidade * np.sqrt(DIAS_UTEIS_ANO)
+    df['SharpeRatio'] = ((df['Rentabilidade12M'] - taxa_livre_risco)
+                         / df['Volatilidade12M'].where(df['Volatilidade12M'] > 0))
+
+    pico = por_fundo.cummax()
+    if pico_anterior is not None:
+        pico = np.fmax(pico, fundo.map(pico_anterior))
+    df['Drawdown'] = cota / pico - 1
+    df['DrawdownMaximo12M'] = _janela(df['Drawdown'], fundo, DIAS_UTEIS_ANO, 'min', 1)
+    return df
+
+
+def selecionar_novos(df: pd.DataFrame, ultima_data: pd.Series) -> pd.Series:
+    """Mascara das linhas posteriores a ultima data ja carregada de cada fundo."""
+    ultima = df['FundoID'].map(ultima_data)
+    return ultima.isna() | (df['Data'] > ultima)
+
+
+def linhas_para_carga(df: pd.DataFrame, colunas: Iterable[str]) -> list:
+    """Tuplas prontas para executemany (NaN -> None, numpy -> tipos Python)."""
+    saida = df[list(colunas)].astype(object)
+    return list(saida.where(saida.notna(), None).itertuples(index=False, name=None))
+
+
+def arquivos_inf_diario(pasta: str) -> list:
+    """Arquivos inf_diario_fi_*.csv de uma pasta, em ordem cronologica."""
+    return sorted(glob.glob(os.path.join(pasta, 'inf_diario_fi_*.csv')))
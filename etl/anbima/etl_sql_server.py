@@ -13,10 +13,21 @@ import pandas as pd
 import pyodbc
 from sqlalchemy import create_engine
 import os
+import sys
 import logging
 from datetime import datetime
 from typing import Dict, Optional
 
+from desempenho_fundos import (
+    COLUNAS_METRICAS, LOOKBACK_DIAS_CORRIDOS, TAXA_LIVRE_RISCO_PADRAO,
+    arquivos_inf_diario, calcular_metricas, ler_inf_diario, linhas_para_carga,
+    padronizar_informe, selecionar_novos,
+)
+
+# Perfil das etapas (etl/perfil.py)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import perfil
+
 # Configuracao
 logging.basicConfig(
     level=logging.INFO,
@@ -88,12 +99,18 @@ class SQLServerLoader:
             logger.error(f"Erro ao conectar: {e}")
             return False
 
+    def _conexao(self):
+        """
+        Conexao pyodbc com o tempo de banco medido (etl/perfil.py)
+        """
+        return perfil.conexao_medida(pyodbc.connect(self.connection_string))
+
     def executar_sql(self, sql: str) -> bool:
         """
         Executa um comando SQL
         """
         try:
-            conn = pyodbc.connect(self.connection_string)
+            conn = self._conexao()
             cursor = conn.cursor()
             cursor.execute(sql)
             conn.commit()
@@ -120,7 +137,7 @@ class SQLServerLoader:
 
         count = 0
         try:
-            conn = pyodbc.connect(self.connection_string)
+            conn = self._conexao()
             cursor = conn.cursor()
 
             for _, row in df.iterrows():
@@ -154,7 +171,7 @@ class SQLServerLoader:
         sql_get_foco = "SELECT FocoESGID, FocoNome FROM esg.DimFocoESG"
 
         try:
-            conn = pyodbc.connect(self.connection_string)
+            conn = self._conexao()
 
             # Mapear gestoras
             df_gestoras = pd.read_sql(sql_get_gestora, conn)
@@ -222,7 +239,7 @@ class SQLServerLoader:
         logger.info("Carregando resumo mensal...")
 
         try:
-            conn = pyodbc.connect(self.connection_string)
+            conn = self._conexao()
 
             # Mapear categorias
             sql_get_categoria = "SELECT CategoriaESGID, CategoriaNome FROM esg.DimCategoriaESG"
@@ -265,21 +282,91 @@ class SQLServerLoader:
             logger.error(f"Erro ao carregar resumo mensal: {e}")
             return 0
 
-    def carregar_dados_completos(self, dados: Dict[str, pd.DataFrame]) -> Dict[str, int]:
+    def carregar_patrimonio_liquido(self, df: pd.DataFrame,
+                                    taxa_livre_risco: float = TAXA_LIVRE_RISCO_PADRAO) -> int:
         """
-        Carrega todos os dados no banco
+        Carrega o informe diario CVM em fundos.FatoPatrimonioLiquido com as metricas
+        de desempenho. Incremental: so entram datas posteriores a ultima ja carregada
+        de cada fundo; o historico recente e relido do banco para as janelas moveis.
         """
-        resultado = {}
+        logger.info("Carregando patrimonio liquido e desempenho...")
 
-        if 'gestoras' in dados:
-            resultado['gestoras'] = self.carregar_gestoras(dados['gestoras'])
+        try:
+            conn = self._conexao()
+
+            informe = padronizar_informe(df)
+            fundos = pd.read_sql("SELECT FundoID, FundoCNPJ FROM fundos.FatoFundo", conn)
+            informe = informe.merge(fundos, on='FundoCNPJ', how='inner')
+
+            tempo = pd.read_sql("SELECT MIN(DataID) AS Inicio, MAX(DataID) AS Fim FROM fundos.DimTempo", conn)
+            informe['DataID'] = informe['Data'].dt.strftime('%Y%m%d').astype(int)
+            informe = informe[informe['DataID'].between(tempo['Inicio'].iloc[0], tempo['Fim'].iloc[0])]
+
+            situacao = pd.read_sql("""
+                SELECT FundoID, MAX(DataID) AS UltimaDataID, MAX(ValorCota) AS CotaMaxima
+                FROM fundos.FatoPatrimonioLiquido
+                GROUP BY FundoID
+            """, conn).set_index('FundoID')
+            ultima_data = pd.to_datetime(situacao['UltimaDataID'].astype(str), format='%Y%m%d')
+
+            novos = informe[selecionar_novos(informe, ultima_data)].assign(Novo=True)
+            if novos.empty:
+                conn.close()
+                logger.info("Patrimonio liquido: nenhuma data nova")
+                return 0
+
+            # Historico ja carregado necessario para as janelas de 24M
+            corte = (novos['Data'].min() - pd.Timedelta(days=LOOKBACK_DIAS_CORRIDOS)).strftime('%Y%m%d')
+            historico = pd.read_sql("""
+                SELECT FundoID, DataID, ValorCota
+                FROM fundos.FatoPatrimonioLiquido
+                WHERE DataID >= ?
+            """, conn, params=[int(corte)])
+            historico = historico[historico['FundoID'].isin(novos['FundoID'].unique())]
+            historico['Data'] = pd.to_datetime(historico['DataID'].astype(str), format='%Y%m%d')
+
+            serie = pd.concat([historico.assign(Novo=False), novos], ignore_index=True)
+            serie = calcular_metricas(serie, taxa_livre_risco, pico_anterior=situacao['CotaMaxima'])
+            carga = serie[serie['Novo']]
+
+            colunas = ['FundoID', 'DataID', 'PatrimonioLiquido', 'ValorCota', 'CotistasTotal',
+                       'CaptacaoLiquida', 'CaptacaoBruta', 'Resgates'] + COLUNAS_METRICAS
+            cursor = conn.cursor()
+            cursor.fast_executemany = True
+            cursor.executemany(f"""
+                INSERT INTO fundos.FatoPatrimonioLiquido ({', '.join(colunas)})
+                VALUES ({', '.join('?' * len(colunas))})
+            """, linhas_para_carga(carga, colunas))
 
-        if 'fundos' in dados:
-            resultado['fundos'] = self.carregar_fundos(dados['fundos'])
+            conn.commit()
+            cursor.close()
+            conn.close()
 
-        if 'resumo_mensal' in dados:
-            resultado['resumo_mensal'] = self.carregar_resumo_mensal(dados['resumo_mensal'])
+            logger.info(f"Patrimonio liquido: {len(carga)} registros de {carga['FundoID'].nunique()} fundos")
+            return len(carga)
+        except Exception as e:
+            logger.error(f"Erro ao carregar patrimonio liquido: {e}")
+            return 0
 
+    def carregar_dados_completos(self, dados: Dict[str, pd.DataFrame]) -> Dict[str, int]:
+        """
+        Carrega todos os dados no banco
+        """
+        resultado = {}
+        etapas = [
+            ('gestoras', 'gestoras', self.carregar_gestoras),
+            ('fundos', 'fundos', self.carregar_fundos),
+            ('resumo_mensal', 'resumo_mensal', self.carregar_resumo_mensal),
+            ('informes_diarios', 'patrimonio_liquido', self.carregar_patrimonio_liquido),
+        ]
+
+        for origem, tabela, carregar in etapas:
+            if origem in dados:
+                with perfil.etapa(tabela):
+                    resultado[tabela] = carregar(dados[origem])
+                    perfil.contar(linhas=resultado[tabela])
+
+        perfil.encerrar()
         return resultado
 
 
@@ -297,7 +384,8 @@ def carregar_dados_csv(pasta: str = None) -> Dict[str, pd.DataFrame]:
         'gestoras': None,
         'fundos': None,
         'resumo_mensal': None,
-        'indicadores': None
+        'indicadores': None,
+        'informes_diarios': None
     }
 
     for arquivo in os.listdir(pasta):
@@ -311,9 +399,20 @@ def carregar_dados_csv(pasta: str = None) -> Dict[str, pd.DataFrame]:
     # Carregar DataFrames
     for tipo, filepath in arquivos.items():
         if filepath and os.path.exists(filepath):
-            dados[tipo] = pd.read_csv(filepath, encoding='utf-8-sig')
+            perfil.contar(bytes_lidos=os.path.getsize(filepath))
+            with perfil.trecho("parse"):
+                dados[tipo] = pd.read_csv(filepath, encoding='utf-8-sig')
             logger.info(f"Carregado {tipo}: {len(dados[tipo])} registros")
 
+    # Arquivos originais da CVM (inf_diario_fi_AAAAMM.csv) tem o historico completo
+    inf_diario = arquivos_inf_diario(pasta)
+    if inf_diario:
+        perfil.contar(bytes_lidos=sum(os.path.getsize(a) for a in inf_diario))
+        with perfil.trecho("parse"):
+            dados['informes_diarios'] = ler_inf_diario(inf_diario)
+        logger.info(f"Carregado informe diario CVM: {len(inf_diario)} arquivos, "
+                    f"{len(dados['informes_diarios'])} registros")
+
     return dados
 
 
@@ -330,7 +429,8 @@ def carregar_dados_json(arquivo_json: str = None) -> Dict[str, pd.DataFrame]:
         logger.error(f"Arquivo JSON nao encontrado: {arquivo_json}")
         return {}
 
-    with open(arquivo_json, 'r', encoding='utf-8') as f:
+    perfil.contar(bytes_lidos=os.path.getsize(arquivo_json))
+    with perfil.trecho("parse"), open(arquivo_json, 'r', encoding='utf-8') as f:
         dados_json = json.load(f)
 
     dados = {}
@@ -414,6 +514,9 @@ def main():
     print("ETL - CARGA DE DADOS ANBIMA NO SQL SERVER")
     print("=" * 60)
 
+    if '--profile' in sys.argv:
+        print(f"Perfil de chama das etapas em: {perfil.ativar_amostragem()}")
+
     # Configuracao do servidor
     server = input("Servidor SQL (default: localhost): ").strip() or 'localhost'
     database = 'ANBIMA_ESG'
@@ -434,10 +537,11 @@ def main():
     print("  2. CSV (arquivos CSV)")
     fonte = input("Escolha (1 ou 2, default: 1): ").strip() or '1'
 
-    if fonte == '1':
-        dados = carregar_dados_json()
-    else:
-        dados = carregar_dados_csv()
+    with perfil.etapa('leitura_dados'):
+        if fonte == '1':
+            dados = carregar_dados_json()
+        else:
+            dados = carregar_dados_csv()
 
     if not dados:
         print("\nNenhum dado encontrado para carregar.")
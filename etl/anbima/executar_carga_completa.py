@@ -1,5 +1,7 @@
 """
 Script para executar carga completa: JSON -> SQL Server -> Dashboard
+
+    python executar_carga_completa.py --profile   # perfil de chama de cada etapa
 """
 
 import os
@@ -9,7 +11,7 @@ import sys
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, os.path.join(BASE_DIR, 'etl', 'anbima'))
 
-from etl_sql_server import SQLServerLoader, carregar_dados_json
+from etl_sql_server import SQLServerLoader, carregar_dados_json, perfil
 from gerar_dashboard_sql import DashboardSQL, gerar_dashboard_html
 
 DATA_DIR = os.path.join(BASE_DIR, 'data', 'anbima')
@@ -21,6 +23,9 @@ def main():
     print("CARGA COMPLETA: JSON -> SQL Server -> Dashboard")
     print("=" * 60)
 
+    if '--profile' in sys.argv:
+        print(f"Perfil de chama das etapas em: {perfil.ativar_amostragem()}")
+
     # Configuracao - usar localhost por padrao
     server = 'localhost'
     database = 'ANBIMA_ESG'
@@ -51,7 +56,8 @@ def main():
     # ===========================================
     print("\n[2/3] Carregando dados do JSON...")
 
-    dados = carregar_dados_json()
+    with perfil.etapa('leitura_json'):
+        dados = carregar_dados_json()
 
     if not dados:
         print("  -> ERRO: Nenhum dado encontrado no JSON")
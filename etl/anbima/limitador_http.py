@@ -0,0 +1,206 @@
+"""
+Limitador de Requisicoes HTTP
+=============================
+Balde de fichas (token bucket) por host, compartilhado por todos os clientes
+HTTP dos scripts ANBIMA/CVM/CNPJ no lugar dos time.sleep fixos entre chamadas.
+
+Cada host tem uma taxa (requisicoes/s) e uma rajada (fichas acumuladas no
+maximo). aguardar()/aguardar_async() reservam uma ficha e esperam o tempo
+necessario; a reserva e feita sob lock, entao threads e corrotinas
+concorrentes ficam em fila sem estourar a taxa.
+
+Depois de cada resposta, registrar_resposta() ajusta o host:
+- 429/503: pausa o host pelo Retry-After (ou backoff exponencial) e corta a
+  taxa pela metade;
+- 5xx e erros de rede (status None): so a pausa por backoff;
+- demais respostas: zera o backoff e recupera a taxa aos poucos ate a
+  configurada.
+
+Uso:
+    from limitador_http import limitador, requisitar
+    resposta = requisitar(requests, 'GET', url, timeout=10)
+
+    await limitador.aguardar_async(url)
+    resposta = await cliente.get(url)
+    limitador.registrar_resposta(url, resposta.status_code, resposta.headers.get('Retry-After'))
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+TAXA_PADRAO = 2.0                  # requisicoes/s para hosts sem limite configurado
+RAJADA_PADRAO = 2
+STATUS_SOBRECARGA = {429, 503}
+BACKOFF_BASE = 1.0                 # segundos; dobra a cada falha seguida
+BACKOFF_MAXIMO = 60.0
+FRACAO_TAXA_MINIMA = 0.1           # a taxa adaptativa nao desce abaixo de 10% da configurada
+FRACAO_RECUPERACAO = 0.1           # cada resposta boa devolve 10% da taxa configurada
+TENTATIVAS_SOBRECARGA = 3
+
+# host -> (taxa, rajada)
+LIMITES_POR_HOST: Dict[str, Tuple[float, int]] = {
+    'api.anbima.com.br': (5.0, 8),
+    'api-sandbox.anbima.com.br': (5.0, 8),
+    'dados.cvm.gov.br': (1.0, 2),
+    'brasilapi.com.br': (1.0, 3),
+    'receitaws.com.br': (3 / 60, 3),   # plano gratuito: 3 consultas por minuto
+}
+
+
+def segundos_retry_after(valor) -> Optional[float]:
+    """Retry-After em segundos (aceita numero ou data HTTP); None se ausente ou invalido."""
+    if valor is None or valor == '':
+        return None
+    try:
+        return max(0.0, float(valor))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(str(valor)).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class BaldeFichas:
+    """Estado de um host. Fichas negativas sao reservas ja feitas aguardando a vez."""
+
+    def __init__(self, taxa: float, rajada: int):
+        self.taxa_configurada = taxa
+        self.taxa = taxa
+        self.rajada = rajada
+        self.fichas = float(rajada)
+        self.atualizado = time.monotonic()
+        self.pausado_ate = 0.0
+        self.falhas_seguidas = 0
+
+    def _reabastecer(self, agora: float):
+        # Nao acumula fichas durante a pausa: ao fim dela o host volta na taxa, sem rajada
+        inicio = max(self.atualizado, self.pausado_ate)
+        if agora > inicio:
+            self.fichas = min(self.rajada, self.fichas + (agora - inicio) * self.taxa)
+        self.atualizado = agora
+
+    def reservar(self, agora: float) -> float:
+        """Consome uma ficha e devolve quantos segundos esperar antes de usa-la."""
+        self._reabastecer(agora)
+        self.fichas -= 1
+        espera = max(0.0, self.pausado_ate - agora)
+        if self.fichas < 0:
+            espera += -self.fichas / self.taxa
+        return espera
+
+    def pausar(self, agora: float, segundos: float, sobrecarga: bool):
+        """Suspende o host; respostas de requisicoes que ja estavam em voo nao aumentam o backoff."""
+        self._reabastecer(agora)
+        if agora >= self.pausado_ate:
+            self.falhas_seguidas += 1
+            if sobrecarga:
+                self.taxa = max(self.taxa_configurada * FRACAO_TAXA_MINIMA, self.taxa / 2)
+        self.pausado_ate = max(self.pausado_ate, agora + segundos)
+        self.fichas = min(self.fichas, 1.0)
+
+    def recuperar(self, agora: float):
+        self._reabastecer(agora)
+        self.falhas_seguidas = 0
+        self.taxa = min(self.taxa_configurada, self.taxa + self.taxa_configurada * FRACAO_RECUPERACAO)
+
+
+class LimitadorTaxa:
+    """Baldes de fichas por host, seguro para threads e para asyncio."""
+
+    def __init__(self, limites: Dict[str, Tuple[float, int]] = None,
+                 taxa_padrao: float = TAXA_PADRAO, rajada_padrao: int = RAJADA_PADRAO):
+        self.limites = dict(LIMITES_POR_HOST if limites is None else limites)
+        self.taxa_padrao = taxa_padrao
+        self.rajada_padrao = rajada_padrao
+        self._baldes: Dict[str, BaldeFichas] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host(url: str) -> str:
+        return urlparse(url).netloc.lower()
+
+    def _balde(self, host: str) -> BaldeFichas:
+        balde = self._baldes.get(host)
+        if balde is None:
+            taxa, rajada = self.limites.get(host, (self.taxa_padrao, self.rajada_padrao))
+            balde = self._baldes[host] = BaldeFichas(taxa, rajada)
+        return balde
+
+    def configurar(self, host: str, taxa: float, rajada: int = 1):
+        """Define taxa (requisicoes/s) e rajada de um host; reinicia o estado dele."""
+        with self._lock:
+            self.limites[host.lower()] = (taxa, rajada)
+            self._baldes.pop(host.lower(), None)
+
+    def _reservar(self, url: str) -> float:
+        with self._lock:
+            return self._balde(self._host(url)).reservar(time.monotonic())
+
+    def aguardar(self, url: str) -> float:
+        """Bloqueia ate a requisicao para o host da url poder sair. Retorna os segundos esperados."""
+        espera = self._reservar(url)
+        if espera > 0:
+            time.sleep(espera)
+        return espera
+
+    async def aguardar_async(self, url: str) -> float:
+        """aguardar() sem bloquear o event loop."""
+        espera = self._reservar(url)
+        if espera > 0:
+            await asyncio.sleep(espera)
+        return espera
+
+    def registrar_resposta(self, url: str, status: Optional[int], retry_after=None):
+        """Ajusta o host pelo resultado da requisicao (status None = erro de rede)."""
+        sobrecarga = status in STATUS_SOBRECARGA
+        falha = sobrecarga or status is None or status >= 500
+        host = self._host(url)
+
+        with self._lock:
+            balde = self._balde(host)
+            if not falha:
+                balde.recuperar(time.monotonic())
+                return
+            segundos = segundos_retry_after(retry_after) if sobrecarga else None
+            if segundos is None:
+                segundos = min(BACKOFF_MAXIMO, BACKOFF_BASE * 2 ** balde.falhas_seguidas)
+            balde.pausar(time.monotonic(), segundos, sobrecarga)
+            taxa = balde.taxa
+
+        logger.warning(f"{host}: status {status}, pausa de {segundos:.1f}s (taxa {taxa:.2f} req/s)")
+
+
+limitador = LimitadorTaxa()
+
+
+def requisitar(cliente, metodo: str, url: str, tentativas: int = TENTATIVAS_SOBRECARGA, **kwargs):
+    """
+    Requisicao sincrona pelo limitador compartilhado
+
+    Args:
+        cliente: modulo requests ou requests.Session (qualquer objeto com .request)
+        metodo: 'GET', 'POST', ...
+        tentativas: vezes que a requisicao e repetida em 429/503 (a espera vem do limitador)
+        **kwargs: repassados para cliente.request
+
+    Returns:
+        Ultima resposta recebida; erros de rede sao propagados
+    """
+    for tentativa in range(1, tentativas + 1):
+        limitador.aguardar(url)
+        try:
+            resposta = cliente.request(metodo, url, **kwargs)
+        except Exception:
+            limitador.registrar_resposta(url, None)
+            raise
+        limitador.registrar_resposta(url, resposta.status_code, resposta.headers.get('Retry-After'))
+        if resposta.status_code not in STATUS_SOBRECARGA or tentativa == tentativas:
+            return resposta
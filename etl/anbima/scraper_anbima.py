@@ -11,6 +11,7 @@ Autor: ETL Pipeline
 Data: 2025
 """
 
+import io
 import requests
 import pandas as pd
 import json
@@ -20,6 +21,8 @@ import time
 import os
 import logging
 
+from limitador_http import requisitar
+
 # Configuracao de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -53,6 +56,12 @@ class AnbimaDataScraper:
             'cvm_diario': 'https://dados.cvm.gov.br/dados/FI/DOC/INF_DIARIO/DADOS/',
         }
 
+    def _ler_csv(self, url: str) -> pd.DataFrame:
+        """Baixa um CSV da CVM pela sessao (via limitador de requisicoes) e le com pandas"""
+        response = requisitar(self.session, 'GET', url, timeout=300)
+        response.raise_for_status()
+        return pd.read_csv(io.BytesIO(response.content), sep=';', encoding='latin-1')
+
     def get_fundos_cvm(self, ano: int = None, mes: int = None) -> pd.DataFrame:
         """
         Obtem dados de fundos da CVM (fonte publica)
@@ -68,7 +77,7 @@ class AnbimaDataScraper:
         url_cad = f"{self.urls['cvm_fundos']}cad_fi.csv"
 
         try:
-            df = pd.read_csv(url_cad, sep=';', encoding='latin-1')
+            df = self._ler_csv(url_cad)
             logger.info(f"Cadastro CVM: {len(df)} fundos encontrados")
 
             # Filtrar apenas fundos ativos
@@ -94,7 +103,7 @@ class AnbimaDataScraper:
         url = f"{self.urls['cvm_diario']}inf_diario_fi_{ano}{mes:02d}.csv"
 
         try:
-            df = pd.read_csv(url, sep=';', encoding='latin-1')
+            df = self._ler_csv(url)
             logger.info(f"Informes diarios: {len(df)} registros encontrados")
             return df
         except Exception as e:
@@ -16,10 +16,20 @@ import json
 import base64
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
-import time
+import asyncio
+import threading
 import os
 import logging
 
+from limitador_http import limitador, requisitar
+
+# Import opcional do httpx (cliente HTTP assincrono; sem ele as paginas sao coletadas uma a uma)
+try:
+    import httpx
+    HTTPX_DISPONIVEL = True
+except ImportError:
+    HTTPX_DISPONIVEL = False
+
 # Configuracao de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -32,6 +42,12 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__fil
 DATA_DIR = os.path.join(BASE_DIR, 'data', 'anbima')
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# Coleta concorrente de paginas
+CONCORRENCIA_PAGINAS = 8          # requisicoes simultaneas
+TENTATIVAS_PAGINA = 3
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+TAMANHO_PAGINA = 100
+
 
 class AnbimaAPIClient:
     """
@@ -50,6 +66,7 @@ class AnbimaAPIClient:
         self.client_secret = client_secret
         self.access_token = None
         self.token_expires_at = None
+        self._lock_auth = threading.Lock()
 
         # URLs da API ANBIMA
         self.base_url = "https://api.anbima.com.br"
@@ -88,7 +105,8 @@ class AnbimaAPIClient:
         }
 
         try:
-            response = self.session.post(
+            response = requisitar(
+                self.session, 'POST',
                 self.token_url,
                 headers=headers,
                 json=payload,
@@ -148,7 +166,7 @@ class AnbimaAPIClient:
 
         try:
             logger.info(f"Requisicao: GET {url}")
-            response = self.session.get(url, params=params, timeout=60)
+            response = requisitar(self.session, 'GET', url, params=params, timeout=60)
 
             logger.info(f"Status: {response.status_code}")
 
@@ -159,7 +177,7 @@ class AnbimaAPIClient:
                 logger.warning("Token expirado, reautenticando...")
                 self.access_token = None
                 self._ensure_authenticated()
-                response = self.session.get(url, params=params, timeout=60)
+                response = requisitar(self.session, 'GET', url, params=params, timeout=60)
                 if response.status_code == 200:
                     return response.json()
 
@@ -170,6 +188,50 @@ class AnbimaAPIClient:
             logger.error(f"Excecao na requisicao: {e}")
             return None
 
+    def _reautenticar(self, token_expirado: str):
+        """Renova o token uma unica vez, mesmo com varias requisicoes recebendo 401 ao mesmo tempo."""
+        with self._lock_auth:
+            if self.access_token == token_expirado:
+                self.access_token = None
+            self._ensure_authenticated()
+
+    async def _api_request_async(self, cliente, endpoint: str, params: dict = None, use_sandbox: bool = False,
+                                 tentativas: int = TENTATIVAS_PAGINA) -> Optional[Dict]:
+        """
+        Versao assincrona de _api_request (cliente httpx.AsyncClient).
+        Repete a requisicao em erros de rede, 429 e 5xx; a espera entre as
+        tentativas (Retry-After ou backoff) vem do limitador do host.
+
+        Returns:
+            Dict com resposta da API ou None se todas as tentativas falharem
+        """
+        base = self.sandbox_url if use_sandbox else self.base_url
+        url = f"{base}{endpoint}"
+
+        for tentativa in range(1, tentativas + 1):
+            token = self.access_token
+            await limitador.aguardar_async(url)
+            try:
+                response = await cliente.get(url, params=params, headers=dict(self.session.headers), timeout=60)
+            except httpx.HTTPError as e:
+                limitador.registrar_resposta(url, None)
+                logger.warning(f"Excecao na requisicao {url} {params} (tentativa {tentativa}/{tentativas}): {e}")
+                continue
+            limitador.registrar_resposta(url, response.status_code, response.headers.get('Retry-After'))
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code == 401:
+                logger.warning("Token expirado, reautenticando...")
+                await asyncio.to_thread(self._reautenticar, token)
+                continue
+            if response.status_code not in STATUS_RETENTAVEIS:
+                logger.error(f"Erro na API: {response.status_code} - {response.text}")
+                return None
+            logger.warning(f"Status {response.status_code} em {url} {params} (tentativa {tentativa}/{tentativas})")
+
+        logger.error(f"Falha apos {tentativas} tentativas: {url} {params}")
+        return None
+
     def get_fundos(self, page: int = 1, page_size: int = 100, use_sandbox: bool = True) -> Optional[Dict]:
         """
         Obtem lista de fundos
@@ -299,8 +361,6 @@ class AnbimaAPIClient:
                 resultados[key] = False
                 logger.error(f"ERRO: {key} - {e}")
 
-            time.sleep(0.3)
-
         return resultados
 
 
@@ -313,12 +373,42 @@ class AnbimaDataCollector:
         self.api = AnbimaAPIClient(client_id, client_secret)
         self.dados_coletados = {}
 
-    def coletar_todos_fundos(self, max_pages: int = 100) -> pd.DataFrame:
+    @staticmethod
+    def _extrair_fundos(resultado: Dict) -> list:
+        """Lista de fundos de uma pagina (API ANBIMA usa 'content')"""
+        return resultado.get('content', resultado.get('data', resultado.get('fundos', resultado.get('items', []))))
+
+    async def _coletar_paginas(self, endpoint: str, use_sandbox: bool, paginas: List[int],
+                               concorrencia: int) -> Dict[int, Optional[Dict]]:
+        """
+        Busca as paginas em paralelo, no maximo `concorrencia` ao mesmo tempo
+
+        Returns:
+            Dict {pagina: resposta da API ou None}
+        """
+        semaforo = asyncio.Semaphore(concorrencia)
+
+        async with httpx.AsyncClient(limits=httpx.Limits(max_connections=concorrencia)) as cliente:
+            async def buscar(pagina):
+                async with semaforo:
+                    params = {'page': pagina, 'page_size': TAMANHO_PAGINA}
+                    return await self.api._api_request_async(cliente, endpoint, params, use_sandbox=use_sandbox)
+
+            respostas = await asyncio.gather(*(buscar(pagina) for pagina in paginas))
+
+        return dict(zip(paginas, respostas))
+
+    def coletar_todos_fundos(self, max_pages: int = 100, concorrencia: int = CONCORRENCIA_PAGINAS) -> pd.DataFrame:
         """
         Coleta todos os fundos disponiveis na API
 
+        Quando a primeira pagina informa total_pages (e o httpx esta instalado),
+        as demais sao buscadas em paralelo e juntadas na ordem das paginas;
+        senao a coleta segue pagina a pagina.
+
         Args:
             max_pages: Numero maximo de paginas para coletar
+            concorrencia: Paginas buscadas ao mesmo tempo (1 = sequencial)
 
         Returns:
             DataFrame com todos os fundos
@@ -331,73 +421,98 @@ class AnbimaDataCollector:
         # Primeiro, testar qual endpoint funciona
         logger.info("Testando endpoints disponiveis...")
 
-        # Tentar diferentes endpoints
+        # Tentar diferentes endpoints: (nome, endpoint, sandbox)
         endpoints_tentativas = [
-            ("sandbox v1", lambda p: self.api.get_fundos(page=p, page_size=100, use_sandbox=True)),
-            ("sandbox v2", lambda p: self.api.get_fundos_v2(page=p, page_size=100, use_sandbox=True)),
-            ("sandbox beta", lambda p: self.api.get_fundos_beta(page=p, page_size=100)),
-            ("prod v1", lambda p: self.api.get_fundos(page=p, page_size=100, use_sandbox=False)),
-            ("prod v2", lambda p: self.api.get_fundos_v2(page=p, page_size=100, use_sandbox=False)),
+            ("sandbox v1", "/feed/fundos/v1/fundos", True),
+            ("sandbox v2", "/feed/fundos/v2/fundos", True),
+            ("sandbox beta", "/beta/feed/fundos/v2/fundos", True),
+            ("prod v1", "/feed/fundos/v1/fundos", False),
+            ("prod v2", "/feed/fundos/v2/fundos", False),
         ]
 
-        get_fundos_func = None
-        endpoint_nome = None
+        endpoint_escolhido = None
+        primeira_pagina = None
 
-        for nome, func in endpoints_tentativas:
+        for nome, endpoint, sandbox in endpoints_tentativas:
             logger.info(f"Tentando endpoint: {nome}...")
             try:
-                resultado = func(1)
+                resultado = self.api._api_request(endpoint, {'page': 1, 'page_size': TAMANHO_PAGINA}, use_sandbox=sandbox)
                 if resultado is not None:
-                    dados = resultado.get('content', resultado.get('data', resultado.get('fundos', resultado.get('items', []))))
+                    dados = self._extrair_fundos(resultado)
                     if dados:
                         logger.info(f"Endpoint {nome} funcionou! {len(dados)} fundos na primeira pagina")
-                        get_fundos_func = func
-                        endpoint_nome = nome
+                        endpoint_escolhido = (nome, endpoint, sandbox)
+                        primeira_pagina = resultado
                         todos_fundos.extend(dados)
                         break
                     else:
                         logger.info(f"Endpoint {nome} retornou resposta mas sem dados")
             except Exception as e:
                 logger.warning(f"Endpoint {nome} falhou: {e}")
-            time.sleep(0.3)
 
-        if get_fundos_func is None:
+        if endpoint_escolhido is None:
             logger.error("Nenhum endpoint de fundos disponivel")
             return pd.DataFrame()
 
-        # Continuar coletando paginas
-        page = 2
-        while page <= max_pages:
-            logger.info(f"Coletando pagina {page} via {endpoint_nome}...")
+        endpoint_nome, endpoint, sandbox = endpoint_escolhido
+        total_pages = primeira_pagina.get('total_pages', primeira_pagina.get('totalPages'))
 
-            try:
-                resultado = get_fundos_func(page)
+        if total_pages and HTTPX_DISPONIVEL and concorrencia > 1:
+            # Paginas independentes: busca concorrente, montagem na ordem
+            paginas = list(range(2, min(int(total_pages), max_pages) + 1))
+            logger.info(f"Coletando {len(paginas)} paginas via {endpoint_nome} ({concorrencia} em paralelo)...")
+            respostas = asyncio.run(self._coletar_paginas(endpoint, sandbox, paginas, concorrencia))
 
+            faltando = []
+            for page in paginas:
+                resultado = respostas[page]
                 if resultado is None:
-                    logger.warning(f"Nenhum dado retornado na pagina {page}")
-                    break
-
-                # Extrair fundos do resultado (API ANBIMA usa 'content')
-                fundos = resultado.get('content', resultado.get('data', resultado.get('fundos', resultado.get('items', []))))
-
+                    faltando.append(page)
+                    continue
+                fundos = self._extrair_fundos(resultado)
                 if not fundos:
                     logger.info(f"Fim dos dados na pagina {page}")
                     break
-
                 todos_fundos.extend(fundos)
-                logger.info(f"Pagina {page}: {len(fundos)} fundos coletados (total: {len(todos_fundos)})")
 
-                # Verificar se ha mais paginas
-                total_pages = resultado.get('total_pages', resultado.get('totalPages', max_pages))
-                if page >= total_pages:
-                    break
+            if faltando:
+                logger.warning(f"Paginas nao coletadas apos {TENTATIVAS_PAGINA} tentativas: {faltando}")
+            logger.info(f"{len(todos_fundos)} fundos coletados em {len(paginas) + 1} paginas")
+        else:
+            if total_pages and not HTTPX_DISPONIVEL and concorrencia > 1:
+                logger.warning("httpx nao instalado: paginas coletadas uma a uma (pip install httpx)")
+            # Continuar coletando paginas
+            page = 2
+            while page <= max_pages:
+                logger.info(f"Coletando pagina {page} via {endpoint_nome}...")
+
+                try:
+                    resultado = self.api._api_request(endpoint, {'page': page, 'page_size': TAMANHO_PAGINA},
+                                                      use_sandbox=sandbox)
+
+                    if resultado is None:
+                        logger.warning(f"Nenhum dado retornado na pagina {page}")
+                        break
 
-                page += 1
-                time.sleep(0.5)  # Rate limiting
+                    fundos = self._extrair_fundos(resultado)
 
-            except Exception as e:
-                logger.error(f"Erro na pagina {page}: {e}")
-                break
+                    if not fundos:
+                        logger.info(f"Fim dos dados na pagina {page}")
+                        break
+
+                    todos_fundos.extend(fundos)
+                    logger.info(f"Pagina {page}: {len(fundos)} fundos coletados (total: {len(todos_fundos)})")
+
+                    # Verificar se ha mais paginas
+                    total_pages = resultado.get('total_pages', resultado.get('totalPages', max_pages))
+                    if page >= total_pages:
+                        break
+
+                    page += 1
+
+                except Exception as e:
+                    logger.error(f"Erro na pagina {page}: {e}")
+                    break
 
         if todos_fundos:
             df = pd.DataFrame(todos_fundos)
@@ -563,8 +678,6 @@ class AnbimaDataCollector:
                     item['cnpj'] = cnpj
                 todos_historicos.extend(historico)
 
-            time.sleep(0.3)  # Rate limiting
-
         if todos_historicos:
             df = pd.DataFrame(todos_historicos)
             logger.info(f"Registros de historico coletados: {len(df)}")
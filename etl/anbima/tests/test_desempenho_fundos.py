@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from desempenho_fundos import calcular_metricas
+
+
+def _informe(fundo: int, datas, cotas) -> pd.DataFrame:
+    return pd.DataFrame({'FundoID': fundo, 'Data': pd.to_datetime(datas), 'ValorCota': cotas})
+
+
+def test_fundo_que_comeca_no_meio_do_mes():
+    df = calcular_metricas(pd.concat([
+        _informe(1, ['2024-01-15', '2024-01-16', '2024-01-31', '2024-02-01', '2024-02-02'],
+                 [1.00, 1.01, 1.02, 1.03, 1.05]),
+        _informe(2, ['2024-01-31', '2024-02-01'], [2.0, 2.2]),
+    ]))
+    fundo1 = df[df['FundoID'] == 1].set_index('Data')
+
+    # Sem cota do fim de dezembro, o primeiro mes/ano do fundo nao tem base
+    assert fundo1.loc['2024-01', 'RentabilidadeMes'].isna().all()
+    assert fundo1['RentabilidadeAno'].isna().all()
+    # Fevereiro: contra a ultima cota de janeiro, inclusive no primeiro dia
+    np.testing.assert_allclose(fundo1.loc['2024-02', 'RentabilidadeMes'], [1.03 / 1.02 - 1, 1.05 / 1.02 - 1])
+
+    fundo2 = df[df['FundoID'] == 2].set_index('Data')
+    np.testing.assert_allclose(fundo2.loc['2024-02', 'RentabilidadeMes'], [0.1])
+
+
+def test_cota_invalida_no_fim_do_mes_anterior_nao_vira_base():
+    df = calcular_metricas(_informe(1, ['2024-01-30', '2024-01-31', '2024-02-01', '2024-02-02'],
+                                    [1.00, 0.0, 1.02, 1.04]))
+    fevereiro = df.set_index('Data').loc['2024-02', 'RentabilidadeMes']
+    # Sem a cota de fechamento de janeiro a base fica indefinida, em vez de ser uma cota do proprio mes
+    assert fevereiro.isna().all()
@@ -3,10 +3,11 @@
 
 import json
 import requests
-import time
 import re
 from datetime import datetime
 
+from limitador_http import requisitar
+
 # ===========================================
 # BASE DE DADOS TSB - Criterios por CNAE
 # ===========================================
@@ -146,7 +147,7 @@ def consultar_cnpj_brasilapi(cnpj):
     url = f"https://brasilapi.com.br/api/cnpj/v1/{cnpj_limpo}"
 
     try:
-        response = requests.get(url, timeout=10)
+        response = requisitar(requests, 'GET', url, timeout=10)
         if response.status_code == 200:
             dados = response.json()
             return {
@@ -180,7 +181,7 @@ def consultar_cnpj_receitaws(cnpj):
     url = f"https://receitaws.com.br/v1/cnpj/{cnpj_limpo}"
 
     try:
-        response = requests.get(url, timeout=10)
+        response = requisitar(requests, 'GET', url, timeout=10)
         if response.status_code == 200:
             dados = response.json()
             if dados.get("status") == "ERROR":
@@ -221,7 +222,6 @@ def consultar_cnpj(cnpj):
 
     # Se falhar, tentar ReceitaWS
     if resultado.get("erro"):
-        time.sleep(1)  # Rate limiting
         resultado = consultar_cnpj_receitaws(cnpj)
 
     return resultado
@@ -372,7 +372,6 @@ def processar_debentures_tsb(debentures):
             if cnpj:
                 # Consultar dados da empresa
                 dados_empresa = consultar_cnpj(cnpj)
-                time.sleep(0.5)  # Rate limiting
             else:
                 dados_empresa = {
                     "erro": "CNPJ nao identificado",
@@ -485,8 +484,6 @@ if __name__ == "__main__":
         else:
             print(f"  Erro: {dados_empresa.get('erro')}")
 
-        time.sleep(1)  # Rate limiting
-
     # Salvar resultados
     output_file = f'{DATA_DIR}/tsb_classificacao.json'
     with open(output_file, 'w', encoding='utf-8') as f:
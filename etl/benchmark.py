@@ -0,0 +1,117 @@
+"""
+Benchmark do ETL com planilhas sinteticas
+Para cada multiplicador gera as planilhas (sintetico.py), roda o ETL completo
+contra elas (main.py --truncate, em um processo separado com ETL_DATA_DIR
+apontando para as planilhas e cache de abas vazio) e compara o tempo de cada
+loader, lido do perfil das etapas (perfil.py).
+
+Use um banco separado (PG_DATABASE / CLOUD_PG_DATABASE): o benchmark limpa as
+tabelas de fato e grava as dimensoes das planilhas sinteticas.
+
+Uso:
+    python benchmark.py                          # 1x, 10x e 100x
+    python benchmark.py --multiplicador 1 1000 --workers 8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from agendador import WORKERS_PADRAO
+from config import BASE_DIR
+from sintetico import gerar
+
+DESTINO_PADRAO = BASE_DIR / ".cache" / "sintetico"
+PREFIXO_PLANILHA = "Planilha "   # medicoes de pre_carregar (uma por aba)
+
+
+def rodar_etl(pasta: Path, workers: int) -> tuple:
+    """Roda main.py contra as planilhas da pasta. Retorna (segundos, medicoes do perfil)."""
+    pasta_perfil = pasta / "perfil"
+    historico = pasta_perfil / "historico.jsonl"
+    historico.unlink(missing_ok=True)
+
+    with tempfile.TemporaryDirectory(prefix="etl_cache_") as cache:
+        env = dict(os.environ, ETL_DATA_DIR=str(pasta), ETL_PERFIL_DIR=str(pasta_perfil), ETL_CACHE_DIR=cache)
+        inicio = time.perf_counter()
+        processo = subprocess.run([sys.executable, "main.py", "--truncate", "--workers", str(workers)],
+                                  cwd=Path(__file__).parent, env=env, capture_output=True, text=True)
+        segundos = time.perf_counter() - inicio
+
+    (pasta / "etl.log").write_text(processo.stdout + processo.stderr, encoding="utf-8")
+    if processo.returncode != 0:
+        raise RuntimeError(f"ETL terminou com codigo {processo.returncode} (ver {pasta / 'etl.log'})")
+    if not historico.exists():
+        return segundos, []
+    with open(historico, encoding="utf-8") as f:
+        return segundos, [json.loads(linha) for linha in f if linha.strip()]
+
+
+def resumir(medicoes: list) -> dict:
+    """{loader: medicao}; as abas lidas em pre_carregar viram uma linha so."""
+    resumo = {m["etapa"]: m for m in medicoes if not m["etapa"].startswith(PREFIXO_PLANILHA)}
+    abas = [m for m in medicoes if m["etapa"].startswith(PREFIXO_PLANILHA)]
+    if abas:
+        resumo["(leitura das planilhas)"] = {
+            "segundos": sum(m["segundos"] for m in abas),
+            "linhas": sum(m["linhas"] for m in abas),
+        }
+    return resumo
+
+
+def imprimir_comparacao(resultados: dict):
+    """Tabela loader x multiplicador com tempo e linhas/s."""
+    multiplicadores = list(resultados)
+    loaders = []
+    for _, resumo in resultados.values():
+        loaders += [nome for nome in resumo if nome not in loaders]
+
+    print("\n" + "=" * 70)
+    print("BENCHMARK - tempo por loader (linhas/s)")
+    print("=" * 70)
+    print(f"  {'Loader':<30}" + "".join(f"{f'{m}x':>20}" for m in multiplicadores))
+    for nome in loaders:
+        celulas = []
+        for m in multiplicadores:
+            medicao = resultados[m][1].get(nome)
+            if medicao is None:
+                celulas.append(f"{'-':>20}")
+            else:
+                vazao = medicao["linhas"] / medicao["segundos"] if medicao["segundos"] else 0
+                celulas.append(f"{medicao['segundos']:>9.2f}s ({vazao:>6.0f}/s)")
+        print(f"  {nome:<30}" + "".join(celulas))
+    print(f"  {'TOTAL (processo)':<30}" + "".join(f"{resultados[m][0]:>19.2f}s" for m in multiplicadores))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do ETL com planilhas sinteticas")
+    parser.add_argument("--multiplicador", type=int, nargs="+", default=[1, 10, 100],
+                        help="Multiplicadores de linhas a comparar (1 a 1000)")
+    parser.add_argument("--workers", type=int, default=WORKERS_PADRAO, help="Loaders em paralelo no ETL")
+    parser.add_argument("--destino", type=Path, default=DESTINO_PADRAO, help="Pasta das planilhas geradas")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--regerar", action="store_true", help="Gerar as planilhas mesmo se ja existirem")
+    args = parser.parse_args()
+
+    resultados = {}
+    for multiplicador in args.multiplicador:
+        pasta = args.destino / f"x{multiplicador}_s{args.semente}"
+        if args.regerar or not (pasta / "gerado.ok").exists():
+            print(f"Gerando planilhas {multiplicador}x em {pasta}...")
+            gerar(pasta, multiplicador, args.semente)
+            (pasta / "gerado.ok").touch()
+
+        print(f"Rodando ETL com {multiplicador}x...")
+        segundos, medicoes = rodar_etl(pasta, args.workers)
+        resultados[multiplicador] = (segundos, resumir(medicoes))
+        print(f"  concluido em {segundos:.1f}s")
+
+    imprimir_comparacao(resultados)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Classificacao por palavras-chave
+Tabelas palavra-chave -> valor compiladas uma vez em um automato Aho-Corasick:
+cada texto e percorrido uma unica vez, independente de quantas palavras a
+tabela tem. A prioridade e explicita: vence a palavra que aparece primeiro na
+tabela (a mesma regra do `for keyword in tabela: if keyword in texto` que o
+automato substitui). As versoes por coluna classificam cada valor distinto
+uma unica vez.
+
+Tambem usado por resolvedor_empresas para achar os nomes de empresa contidos
+no nome procurado.
+"""
+from collections import deque
+
+import pandas as pd
+
+
+class Automato:
+    """Aho-Corasick sobre uma lista de palavras; encontrar() devolve as posicoes na lista."""
+
+    def __init__(self, palavras):
+        self.transicoes = [{}]
+        self.saidas = [[]]
+        for pos, palavra in enumerate(palavras):
+            no = 0
+            for c in palavra:
+                if c not in self.transicoes[no]:
+                    self.transicoes.append({})
+                    self.saidas.append([])
+                    self.transicoes[no][c] = len(self.transicoes) - 1
+                no = self.transicoes[no][c]
+            self.saidas[no].append(pos)
+
+        self.falhas = [0] * len(self.transicoes)
+        fila = deque(self.transicoes[0].values())
+        while fila:
+            no = fila.popleft()
+            for c, filho in self.transicoes[no].items():
+                falha = self.falhas[no]
+                while falha and c not in self.transicoes[falha]:
+                    falha = self.falhas[falha]
+                destino = self.transicoes[falha].get(c, 0)
+                self.falhas[filho] = destino if destino != filho else 0
+                self.saidas[filho] = self.saidas[filho] + self.saidas[self.falhas[filho]]
+                fila.append(filho)
+
+    def encontrar(self, texto: str) -> set:
+        """Posicoes das palavras que aparecem dentro do texto."""
+        encontradas = set(self.saidas[0])
+        no = 0
+        for c in texto:
+            while no and c not in self.transicoes[no]:
+                no = self.falhas[no]
+            no = self.transicoes[no].get(c, 0)
+            encontradas.update(self.saidas[no])
+        return encontradas
+
+
+class ClassificadorPalavras:
+    """Texto -> valor da primeira palavra-chave (na ordem da tabela) contida nele, sem caixa."""
+
+    def __init__(self, tabela, padrao=None):
+        """tabela: dict ou pares (palavra, valor) em ordem de prioridade."""
+        pares = list(tabela.items() if isinstance(tabela, dict) else tabela)
+        self.valores = [valor for _, valor in pares]
+        self.automato = Automato([str(palavra).lower() for palavra, _ in pares])
+        self.padrao = padrao
+
+    def classificar(self, texto):
+        """Valor da palavra de maior prioridade contida no texto (padrao se nenhuma; None se vazio)."""
+        if not texto or pd.isna(texto):
+            return None
+        encontradas = self.automato.encontrar(str(texto).lower())
+        return self.valores[min(encontradas)] if encontradas else self.padrao
+
+    def classificar_coluna(self, textos: pd.Series) -> pd.Series:
+        """classificar por coluna: cada texto distinto e classificado uma unica vez."""
+        distintos = textos.dropna().unique()
+        return textos.map({texto: self.classificar(texto) for texto in distintos})
+
+
+def primeiro_que_contem(consultas: pd.Series, candidatos: dict) -> pd.Series:
+    """
+    Para cada consulta, o valor do primeiro candidato (na ordem do dict) cujo
+    nome contem a consulta, sem caixa. Consultas vazias ou sem candidato: None.
+    As consultas distintas viram um automato e cada nome candidato e lido uma vez.
+    """
+    distintas = [c for c in consultas.dropna().unique() if isinstance(c, str) and c]
+    automato = Automato([c.lower() for c in distintas])
+    resultado = {}
+    for nome, valor in candidatos.items():
+        if not nome or pd.isna(nome):
+            continue
+        for pos in automato.encontrar(str(nome).lower()):
+            resultado.setdefault(distintas[pos], valor)
+        if len(resultado) == len(distintas):
+            break
+    return pd.Series([resultado.get(c) for c in consultas], index=consultas.index, dtype=object)
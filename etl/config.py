@@ -9,7 +9,8 @@ from pathlib import Path
 # DIRETORIOS
 # =============================================================================
 BASE_DIR = Path(__file__).parent.parent
-DATA_DIR = BASE_DIR
+# ETL_DATA_DIR aponta o ETL para outra copia das planilhas (ex: as sinteticas do benchmark)
+DATA_DIR = Path(os.getenv("ETL_DATA_DIR", BASE_DIR))
 ENERGIA_DIR = DATA_DIR / "Energia"
 SANEAMENTO_DIR = DATA_DIR / "Saneamento"
 SAUDE_DIR = DATA_DIR / "Saude"
@@ -127,6 +128,12 @@ EXCEL_FILES = {
     "inclusao_digital": INCLUSAO_DIR / "tabela_inclusao_digital (2).xlsx",
 }
 
+# Cache das abas ja lidas (Parquet por hash do arquivo)
+CACHE_PLANILHAS_DIR = Path(os.getenv("ETL_CACHE_DIR", BASE_DIR / ".cache" / "planilhas"))
+
+# Historico do perfil de cada etapa (JSON Lines) e perfis de chama do --profile
+PERFIL_DIR = Path(os.getenv("ETL_PERFIL_DIR", BASE_DIR / ".cache" / "perfil"))
+
 # =============================================================================
 # ANO DE REFERENCIA PADRAO
 # =============================================================================
@@ -1,11 +1,68 @@
 """
 Modulo de conexao com o banco de dados PostgreSQL
+
+Fora de uma sessao cada chamada abre e fecha sua propria conexao. Dentro de
+`with db.session():` todas as chamadas da mesma thread compartilham uma
+conexao, e `with db.transaction():` agrupa as chamadas de uma etapa em uma
+unica transacao (commit no fim, rollback se houver erro).
+
+get_lookup guarda cada lookup de dimensao em memoria ate a proxima escrita na
+tabela (bulk_load, ou INSERT/UPDATE/DELETE que cite a tabela); escritas dentro
+de uma transacao invalidam de novo no commit/rollback.
 """
+import functools
+import io
+import re
+import threading
+from itertools import islice
+
 import psycopg2
 import pandas as pd
+from psycopg2.extensions import TRANSACTION_STATUS_INERROR
 from sqlalchemy import create_engine, text
 from contextlib import contextmanager
 from config import get_connection_string, get_psycopg2_connection_params
+import perfil
+from transformacoes import normalizar_chave
+
+LINHAS_POR_LOTE = 50000   # linhas por buffer enviado ao COPY
+NULO_COPY = r"\N"
+# schema.tabela depois de INTO/UPDATE/FROM/TABLE/ON ou em lista (TRUNCATE a, b)
+_TABELA_ESCRITA = re.compile(r"(?:\b(?:INTO|UPDATE|FROM|TABLE|ON)\s+|,\s*)(\w+)\.(\w+)", re.IGNORECASE)
+
+
+def _tempo_banco(metodo):
+    """Conta o tempo do metodo como tempo de banco da etapa (perfil.py)."""
+    @functools.wraps(metodo)
+    def medido(*args, **kwargs):
+        with perfil.trecho("banco"):
+            return metodo(*args, **kwargs)
+    return medido
+
+
+class TransacaoDesfeita(Exception):
+    """Uma instrucao da transacao falhou (e o erro foi tratado); tudo foi desfeito."""
+
+
+class Lookup(dict):
+    """
+    {nome: id} de uma dimensao. get() (e transformacoes.mapear) tambem acham
+    pelo nome normalizado; em colisao vale o menor id.
+    """
+
+    def __init__(self, pares=()):
+        super().__init__(pares)
+        self.normalizado = {}
+        for nome, id in sorted(self.items(), key=lambda item: item[1]):
+            if not pd.isna(nome):
+                self.normalizado.setdefault(normalizar_chave(nome), id)
+
+    def get(self, chave, padrao=None):
+        if chave in self:
+            return self[chave]
+        if pd.isna(chave):
+            return padrao
+        return self.normalizado.get(normalizar_chave(chave), padrao)
 
 
 class DatabaseConnection:
@@ -15,6 +72,12 @@ class DatabaseConnection:
         self.connection_string = get_connection_string()
         self.conn_params = get_psycopg2_connection_params()
         self.engine = None
+        self._local = threading.local()
+        self._lookups = {}          # (schema, tabela, chave, valor) -> Lookup
+        self._versoes = {}          # (schema, tabela) -> escritas desde o inicio
+        self._lock_lookups = threading.Lock()
+        self.lookup_acertos = 0
+        self.lookup_faltas = 0
 
     def get_engine(self):
         """Retorna uma engine SQLAlchemy."""
@@ -22,37 +85,218 @@ class DatabaseConnection:
             self.engine = create_engine(self.connection_string)
         return self.engine
 
+    # ------------------------------------------------------------------
+    # Sessao e transacoes
+    # ------------------------------------------------------------------
+    @contextmanager
+    def session(self):
+        """
+        Conexao compartilhada por todas as chamadas da thread dentro do bloco.
+        Sessoes aninhadas reaproveitam a conexao da mais externa.
+        """
+        if getattr(self._local, "conn", None) is not None:
+            yield self._local.conn
+            return
+
+        conn = psycopg2.connect(**self.conn_params)
+        self._local.conn = conn
+        self._local.em_transacao = False
+        self._local.preparadas = {}
+        self._local.escritas = set()
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.preparadas = {}
+            conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Unidade de trabalho: as chamadas do bloco nao fazem commit individual;
+        o commit acontece no fim. Se o bloco levantou excecao, a etapa inteira
+        e desfeita; se alguma instrucao falhou mas o erro foi tratado pelo
+        loader, a etapa e desfeita e TransacaoDesfeita e levantada.
+        """
+        with self.session() as conn:
+            if self._local.em_transacao:
+                yield conn
+                return
+
+            self._local.em_transacao = True
+            try:
+                yield conn
+            except Exception:
+                conn.rollback()
+                raise
+            else:
+                if conn.get_transaction_status() == TRANSACTION_STATUS_INERROR:
+                    conn.rollback()
+                    raise TransacaoDesfeita("etapa desfeita (rollback) por erro no banco")
+                else:
+                    conn.commit()
+            finally:
+                self._local.em_transacao = False
+                # Commit ou rollback: os lookups das tabelas escritas mudaram (ou voltaram)
+                self._invalidar(self._local.escritas)
+                self._local.escritas = set()
+
     @contextmanager
     def get_connection(self):
-        """Context manager para conexao psycopg2."""
+        """Context manager para conexao psycopg2 (a da sessao, se houver)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+
         conn = psycopg2.connect(**self.conn_params)
         try:
             yield conn
         finally:
             conn.close()
 
-    def execute_query(self, query: str, params: tuple = None):
-        """Executa uma query SQL."""
+    def _commit(self, conn):
+        """Commit da instrucao, exceto dentro de uma transaction()."""
+        if not getattr(self._local, "em_transacao", False):
+            conn.commit()
+
+    def _rollback(self, conn):
+        if not getattr(self._local, "em_transacao", False):
+            conn.rollback()
+
+    # ------------------------------------------------------------------
+    # Cache de lookups
+    # ------------------------------------------------------------------
+    def _invalidar(self, tabelas):
+        with self._lock_lookups:
+            for tabela in tabelas:
+                self._versoes[tabela] = self._versoes.get(tabela, 0) + 1
+            self._lookups = {k: v for k, v in self._lookups.items() if k[:2] not in tabelas}
+
+    def _escreveu(self, tabelas):
+        """Depois de uma escrita: invalida os lookups das tabelas (de novo no fim da transacao, se houver)."""
+        tabelas = set(tabelas)
+        if getattr(self._local, "em_transacao", False):
+            self._local.escritas |= tabelas
+        self._invalidar(tabelas)
+
+    @staticmethod
+    def _escritas_da_query(query: str) -> set:
+        """(schema, tabela) citadas por uma query que nao e SELECT (pode sobrar tabela so lida)."""
+        if re.match(r"\s*(SELECT|WITH)\b", query, re.IGNORECASE):
+            return set()
+        return {(schema.lower(), tabela.lower()) for schema, tabela in _TABELA_ESCRITA.findall(query)}
+
+    def get_lookup(self, table_name: str, key_column: str, value_column: str,
+                   schema: str = "esg") -> Lookup:
+        """
+        {value_column: key_column} de uma tabela, lido do banco uma vez e
+        guardado ate a proxima escrita nela. Nao altere o dicionario devolvido.
+        """
+        tabela = (schema.lower(), table_name.lower())
+        chave = tabela + (key_column.lower(), value_column.lower())
+        with self._lock_lookups:
+            if chave in self._lookups:
+                self.lookup_acertos += 1
+                return self._lookups[chave]
+            self.lookup_faltas += 1
+            versao = self._versoes.get(tabela, 0)
+
+        # Acesso por posicao: o Postgres devolve os nomes de coluna em minusculas
+        linhas = self.execute_query(f"SELECT {value_column}, {key_column} FROM {schema}.{table_name} "
+                                    f"WHERE {value_column} IS NOT NULL")
+        lookup = Lookup(linhas)
+        with self._lock_lookups:
+            # Nao guarda se a tabela foi escrita durante a leitura ou tem escrita ainda sem commit
+            if self._versoes.get(tabela, 0) == versao and tabela not in getattr(self._local, "escritas", ()):
+                self._lookups[chave] = lookup
+        return lookup
+
+    def limpar_lookups(self):
+        """Descarta os lookups em cache e zera os contadores."""
+        with self._lock_lookups:
+            self._lookups = {}
+            self.lookup_acertos = self.lookup_faltas = 0
+
+    def estatisticas_lookup(self) -> dict:
+        with self._lock_lookups:
+            return {"acertos": self.lookup_acertos, "faltas": self.lookup_faltas, "em_cache": len(self._lookups)}
+
+    def _preparar(self, cursor, query: str) -> str:
+        """
+        Prepara a query na conexao da sessao (uma vez por sessao) e devolve o
+        EXECUTE correspondente; fora de sessao devolve a propria query.
+        """
+        preparadas = getattr(self._local, "preparadas", None)
+        if getattr(self._local, "conn", None) is None or preparadas is None:
+            return query
+        if query not in preparadas:
+            partes = query.split("%s")
+            nome = f"etl_stmt_{len(preparadas) + 1}"
+            corpo = "".join(p + (f"${i + 1}" if i < len(partes) - 1 else "") for i, p in enumerate(partes))
+            cursor.execute(f"PREPARE {nome} AS {corpo}")
+            args = ", ".join(["%s"] * (len(partes) - 1))
+            preparadas[query] = f"EXECUTE {nome} ({args})" if args else f"EXECUTE {nome}"
+        return preparadas[query]
+
+    # ------------------------------------------------------------------
+    # Execucao
+    # ------------------------------------------------------------------
+    @_tempo_banco
+    def execute_query(self, query: str, params: tuple = None, prepared: bool = False):
+        """
+        Executa uma query SQL. Retorna as linhas (fetchall) quando a query
+        devolve resultado, senao o numero de linhas afetadas.
+        prepared: reutiliza um PREPARE da sessao (para queries repetidas).
+        """
+        escritas = self._escritas_da_query(query)
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            conn.commit()
-            return cursor
+            try:
+                if prepared:
+                    query = self._preparar(cursor, query)
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                resultado = cursor.fetchall() if cursor.description else cursor.rowcount
+                self._commit(conn)
+                if escritas:
+                    self._escreveu(escritas)
+                return resultado
+            except Exception:
+                self._rollback(conn)
+                raise
 
+    @_tempo_banco
     def execute_many(self, query: str, data: list):
-        """Executa uma query com multiplos registros."""
+        """Executa uma query com multiplos registros (preparada quando em sessao)."""
+        escritas = self._escritas_da_query(query)
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.executemany(query, data)
-            conn.commit()
+            try:
+                cursor.executemany(self._preparar(cursor, query), data)
+                self._commit(conn)
+                if escritas:
+                    self._escreveu(escritas)
+            except Exception:
+                self._rollback(conn)
+                raise
 
+    @_tempo_banco
     def read_sql(self, query: str) -> pd.DataFrame:
-        """Le dados do SQL para um DataFrame."""
-        engine = self.get_engine()
-        return pd.read_sql(query, engine)
+        """Le dados do SQL para um DataFrame (enxerga as escritas da sessao)."""
+        if getattr(self._local, "conn", None) is None:
+            engine = self.get_engine()
+            return pd.read_sql(query, engine)
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            colunas = [d[0] for d in cursor.description]
+            df = pd.DataFrame.from_records(cursor.fetchall(), columns=colunas, coerce_float=True)
+            self._commit(conn)
+            return df
 
     def to_sql(self, df: pd.DataFrame, table_name: str, schema: str = "esg",
                if_exists: str = "append", index: bool = False):
@@ -67,6 +311,65 @@ class DatabaseConnection:
             chunksize=1000
         )
 
+    @_tempo_banco
+    def bulk_load(self, dados, table_name: str, columns: list = None, schema: str = "esg",
+                  on_conflict: list = None, update_columns: list = None) -> int:
+        """
+        Carga em massa via COPY FROM STDIN (CSV em buffer de memoria, em lotes).
+        dados: DataFrame ou iteravel de tuplas (neste caso informe columns).
+        on_conflict: colunas da chave natural; os dados passam por uma tabela
+        temporaria (sem WAL) e entram com um unico INSERT ... ON CONFLICT,
+        atualizando update_columns das linhas existentes que mudaram (ou
+        ignorando as existentes se nao informadas).
+        Tudo em uma unica transacao. Retorna o numero de linhas inseridas
+        (com on_conflict, inseridas ou alteradas).
+        """
+        if isinstance(dados, pd.DataFrame):
+            columns = list(columns or dados.columns)
+            lotes = (dados.iloc[i:i + LINHAS_POR_LOTE][columns] for i in range(0, len(dados), LINHAS_POR_LOTE))
+        else:
+            if not columns:
+                raise ValueError("bulk_load: informe columns para dados que nao sao DataFrame")
+            linhas = iter(dados)
+            lotes = (pd.DataFrame(lote, columns=columns)
+                     for lote in iter(lambda: list(islice(linhas, LINHAS_POR_LOTE)), []))
+
+        tabela = f"{schema}.{table_name}"
+        lista_colunas = ", ".join(columns)
+        destino = f"stg_{table_name.lower()}" if on_conflict else tabela
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                if on_conflict:
+                    cursor.execute(f"CREATE TEMP TABLE {destino} ON COMMIT DROP AS "
+                                   f"SELECT {lista_colunas} FROM {tabela} WITH NO DATA")
+                comando = f"COPY {destino} ({lista_colunas}) FROM STDIN WITH (FORMAT csv, NULL '{NULO_COPY}')"
+                total = 0
+                for lote in lotes:
+                    cursor.copy_expert(comando, _buffer_csv(lote))
+                    total += len(lote)
+
+                if on_conflict:
+                    if update_columns:
+                        # Linhas identicas as do banco nao sao reescritas (recarga sem mudanca nao gera versoes)
+                        atuais = ", ".join(f"alvo.{c}" for c in update_columns)
+                        novas = ", ".join(f"EXCLUDED.{c}" for c in update_columns)
+                        acao = ("DO UPDATE SET " + ", ".join(f"{c} = EXCLUDED.{c}" for c in update_columns)
+                                + f" WHERE ROW({atuais}) IS DISTINCT FROM ROW({novas})")
+                    else:
+                        acao = "DO NOTHING"
+                    cursor.execute(f"INSERT INTO {tabela} AS alvo ({lista_colunas}) SELECT {lista_colunas} FROM {destino} "
+                                   f"ON CONFLICT ({', '.join(on_conflict)}) {acao}")
+                    total = cursor.rowcount
+                    cursor.execute(f"DROP TABLE {destino}")
+                self._commit(conn)
+                self._escreveu([(schema.lower(), table_name.lower())])
+                return total
+            except Exception:
+                self._rollback(conn)
+                raise
+
     def truncate_table(self, table_name: str, schema: str = "esg"):
         """Limpa uma tabela."""
         query = f"TRUNCATE TABLE {schema}.{table_name} RESTART IDENTITY CASCADE"
@@ -75,18 +378,8 @@ class DatabaseConnection:
     def get_max_id(self, table_name: str, id_column: str, schema: str = "esg") -> int:
         """Retorna o maior ID de uma tabela."""
         query = f"SELECT COALESCE(MAX({id_column}), 0) FROM {schema}.{table_name}"
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query)
-            result = cursor.fetchone()
-            return result[0] if result else 0
-
-    def get_lookup(self, table_name: str, key_column: str, value_column: str,
-                   schema: str = "esg") -> dict:
-        """Retorna um dicionario de lookup de uma tabela."""
-        query = f"SELECT {value_column}, {key_column} FROM {schema}.{table_name}"
-        df = self.read_sql(query)
-        return dict(zip(df[value_column], df[key_column]))
+        result = self.execute_query(query)
+        return result[0][0] if result else 0
 
     def test_connection(self) -> bool:
         """Testa a conexao com o banco."""
@@ -107,7 +400,23 @@ class DatabaseConnection:
         (tabeladestino, arquivoorigem, registrosimportados, registroscomerro, status, mensagemerro)
         VALUES (%s, %s, %s, %s, %s, %s)
         """
-        self.execute_query(query, (tabela, arquivo, registros, erros, status, mensagem))
+        perfil.contar(linhas=registros)
+        self.execute_query(query, (tabela, arquivo, registros, erros, status, mensagem), prepared=True)
+
+
+def _buffer_csv(df: pd.DataFrame) -> io.StringIO:
+    """DataFrame -> CSV para o COPY (nulos como \\N; floats inteiros sem '.0' para colunas INT)."""
+    df = df.copy()
+    for col in df.columns:
+        serie = df[col]
+        if pd.api.types.is_float_dtype(serie):
+            validos = serie.dropna()
+            if validos.empty or ((validos % 1 == 0).all() and validos.abs().max() < 2 ** 53):
+                df[col] = serie.astype("Int64")
+    buffer = io.StringIO()
+    df.to_csv(buffer, header=False, index=False, na_rep=NULO_COPY)
+    buffer.seek(0)
+    return buffer
 
 
 # Instancia global
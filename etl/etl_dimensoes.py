@@ -4,8 +4,37 @@ ETL para Tabelas de Dimensao
 import pandas as pd
 import re
 from pathlib import Path
+from agendador import WORKERS_PADRAO, Etapa, executar
+from classificador import primeiro_que_contem
 from database import db
+from incremental import registrar_entradas, sem_alteracoes
+from planilhas import ler_planilha
 from config import EXCEL_FILES, ANO_REFERENCIA
+from transformacoes import coluna, limpar_cnpj_coluna, mapear, nome_preenchido, texto
+
+# Entradas de cada dimensao para a carga incremental: abas (chave de EXCEL_FILES, aba)
+# e dimensoes usadas como lookup
+ARQUIVOS_CARTEIRA = [("energia_renovavel", 0), ("carteira_saude", 0), ("educacao", 0), ("inclusao_digital", 0)]
+ENTRADAS = {
+    "DimEmpresa": [("carteira", 0), ("indicadores_saneamento", "Carteira Saneamento")] + ARQUIVOS_CARTEIRA
+                  + [("kpi_enel", 0), ("kpi_edp", 0), ("kpi_engie", 0), ("kpi_isa", 0), ("kpi_taesa", 0),
+                     ("kpi_maz", 0), ("kpi_eneva", 0), ("kpi_alianca", 0), ("kpi_onco", 0),
+                     "DimSetor", "DimCategoria", "DimTema"],
+    "DimSubSetor": ARQUIVOS_CARTEIRA + ["DimSetor"],
+    "DimProduto": ARQUIVOS_CARTEIRA,
+    "DimCNAE": [("de_para", "DE-PARA")],
+    "DimMetaODS": [("metaods", 0)],
+    "BridgeKPIODS": [("ods", 0), "DimTipoKPI"],
+}
+
+# Dimensoes carregadas por upsert: (coluna ID, chave natural). A linha que ja
+# existe e atualizada no lugar, entao o ID usado pelas fatos nao muda entre cargas
+CHAVES_NATURAIS = {
+    "DimEmpresa": ("EmpresaID", ["EmpresaNome"]),
+    "DimSubSetor": ("SubSetorID", ["SetorID", "SubSetorNome"]),
+    "DimProduto": ("ProdutoID", ["ProdutoNome"]),
+    "DimCNAE": ("CNAEID", ["CNAEID"]),
+}
 
 
 def limpar_cnpj(cnpj) -> tuple:
@@ -31,11 +60,66 @@ def limpar_cnpj(cnpj) -> tuple:
     return cnpj_fmt, int(cnpj_num)
 
 
+def garantir_chave_natural(tabela: str):
+    """Indice unico da chave natural, para bancos criados antes dele (DDL em sql_postgres/00_create_database.sql)."""
+    id_coluna, chave = CHAVES_NATURAIS[tabela]
+    if chave != [id_coluna]:
+        db.execute_query(f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{tabela.lower()}_chave "
+                         f"ON esg.{tabela} ({', '.join(chave)})")
+
+
+def upsert_dimensao(df: pd.DataFrame, tabela: str) -> int:
+    """
+    Carga da dimensao em um passo: COPY para uma tabela temporaria e um unico
+    INSERT ... ON CONFLICT (chave natural) DO UPDATE das demais colunas.
+    Recarregar as mesmas planilhas nao altera nada. Retorna quantas linhas
+    foram inseridas ou alteradas.
+    """
+    _, chave = CHAVES_NATURAIS[tabela]
+    df = df.drop_duplicates(subset=chave)
+    garantir_chave_natural(tabela)
+    return db.bulk_load(df, tabela, on_conflict=chave, update_columns=[c for c in df.columns if c not in chave])
+
+
+def remover_repetidas(tabela: str) -> int:
+    """
+    Apaga as linhas repetidas pela chave natural (fica a de menor ID), deixadas
+    por cargas antigas que so acrescentavam. Use com as fatos vazias.
+    """
+    id_coluna, chave = CHAVES_NATURAIS[tabela]
+    if chave == [id_coluna]:
+        return 0
+    condicao = " AND ".join(f"a.{c} = b.{c}" for c in chave)
+    return db.execute_query(f"DELETE FROM esg.{tabela} a USING esg.{tabela} b "
+                            f"WHERE {condicao} AND a.{id_coluna} > b.{id_coluna}")
+
+
+# Colunas das planilhas de carteira usadas em DimEmpresa (as ausentes sao ignoradas)
+COLUNAS_EMPRESA = ["Empresa", "CNPJ", "Setor", "Categoria", "Tema"]
+
+
+def _empresas_da_carteira(df: pd.DataFrame, setor_id, categoria_lookup: dict, tema_lookup: dict) -> pd.DataFrame:
+    """Colunas de DimEmpresa de uma planilha de carteira (Empresa, CNPJ, Categoria, Tema)."""
+    cnpj_fmt, cnpj_num = limpar_cnpj_coluna(coluna(df, "CNPJ"))
+    return pd.DataFrame({
+        "EmpresaNome": coluna(df, "Empresa"),
+        "CNPJ": cnpj_fmt,
+        "CNPJNumerico": cnpj_num,
+        "SetorID": setor_id,
+        "CategoriaID": mapear(coluna(df, "Categoria"), categoria_lookup),
+        "TemaID": mapear(coluna(df, "Tema"), tema_lookup),
+    })
+
+
 def load_dim_empresas():
     """
     Carrega empresas de todos os arquivos Excel para DimEmpresa.
     """
     print("Carregando DimEmpresa...")
+
+    if sem_alteracoes("DimEmpresa", ENTRADAS["DimEmpresa"]):
+        return 0
+
     empresas = []
 
     # Lookup de setores e categorias
@@ -45,101 +129,40 @@ def load_dim_empresas():
 
     # 1. Arquivo carteira.xlsx
     if EXCEL_FILES["carteira"].exists():
-        df = pd.read_excel(EXCEL_FILES["carteira"])
-        for _, row in df.iterrows():
-            empresa = {
-                "EmpresaNome": row.get("Empresa"),
-                "SetorID": setor_lookup.get(row.get("Setor")),
-            }
-            if empresa["EmpresaNome"]:
-                empresas.append(empresa)
-
-    # 2. Arquivo energia renovavel
+        df = ler_planilha("carteira", colunas=["Empresa", "Setor"])
+        empresas.append(pd.DataFrame({
+            "EmpresaNome": coluna(df, "Empresa"),
+            "SetorID": mapear(coluna(df, "Setor"), setor_lookup),
+        }))
+
+    # 2. Arquivo energia renovavel (setor da planilha, Energia se nao encontrado)
     if EXCEL_FILES["energia_renovavel"].exists():
-        df = pd.read_excel(EXCEL_FILES["energia_renovavel"])
-        for _, row in df.iterrows():
-            cnpj_fmt, cnpj_num = limpar_cnpj(row.get("CNPJ"))
-            setor_nome = row.get("Setor", "Energia")
-            categoria_nome = row.get("Categoria")
-            tema_nome = row.get("Tema")
-
-            empresa = {
-                "EmpresaNome": row.get("Empresa"),
-                "CNPJ": cnpj_fmt,
-                "CNPJNumerico": cnpj_num,
-                "SetorID": setor_lookup.get(setor_nome, setor_lookup.get("Energia")),
-                "CategoriaID": categoria_lookup.get(categoria_nome),
-                "TemaID": tema_lookup.get(tema_nome),
-            }
-            if empresa["EmpresaNome"]:
-                empresas.append(empresa)
+        df = ler_planilha("energia_renovavel", colunas=COLUNAS_EMPRESA)
+        setor_id = mapear(coluna(df, "Setor", "Energia"), setor_lookup, setor_lookup.get("Energia"))
+        empresas.append(_empresas_da_carteira(df, setor_id, categoria_lookup, tema_lookup))
 
     # 3. Carteira Saude
     if EXCEL_FILES["carteira_saude"].exists():
-        df = pd.read_excel(EXCEL_FILES["carteira_saude"])
-        for _, row in df.iterrows():
-            cnpj_fmt, cnpj_num = limpar_cnpj(row.get("CNPJ"))
-            empresa = {
-                "EmpresaNome": row.get("Empresa"),
-                "CNPJ": cnpj_fmt,
-                "CNPJNumerico": cnpj_num,
-                "SetorID": setor_lookup.get("Saude"),
-                "CategoriaID": categoria_lookup.get(row.get("Categoria")),
-                "TemaID": tema_lookup.get(row.get("Tema")),
-            }
-            if empresa["EmpresaNome"]:
-                empresas.append(empresa)
+        df = ler_planilha("carteira_saude", colunas=COLUNAS_EMPRESA)
+        empresas.append(_empresas_da_carteira(df, setor_lookup.get("Saude"), categoria_lookup, tema_lookup))
 
     # 4. Indicadores Saneamento - aba Carteira
     if EXCEL_FILES["indicadores_saneamento"].exists():
         try:
-            df = pd.read_excel(EXCEL_FILES["indicadores_saneamento"], sheet_name="Carteira Saneamento")
-            for _, row in df.iterrows():
-                cnpj_fmt, cnpj_num = limpar_cnpj(row.get("CNPJ"))
-                empresa = {
-                    "EmpresaNome": row.get("Empresa"),
-                    "CNPJ": cnpj_fmt,
-                    "CNPJNumerico": cnpj_num,
-                    "SetorID": setor_lookup.get("Saneamento"),
-                    "CategoriaID": categoria_lookup.get(row.get("Categoria")),
-                    "TemaID": tema_lookup.get(row.get("Tema")),
-                }
-                if empresa["EmpresaNome"]:
-                    empresas.append(empresa)
+            df = ler_planilha("indicadores_saneamento", sheet_name="Carteira Saneamento", colunas=COLUNAS_EMPRESA)
+            empresas.append(_empresas_da_carteira(df, setor_lookup.get("Saneamento"), categoria_lookup, tema_lookup))
         except Exception as e:
             print(f"  Aviso ao ler Carteira Saneamento: {e}")
 
     # 5. Educacao
     if EXCEL_FILES["educacao"].exists():
-        df = pd.read_excel(EXCEL_FILES["educacao"])
-        for _, row in df.iterrows():
-            cnpj_fmt, cnpj_num = limpar_cnpj(row.get("CNPJ"))
-            empresa = {
-                "EmpresaNome": row.get("Empresa"),
-                "CNPJ": cnpj_fmt,
-                "CNPJNumerico": cnpj_num,
-                "SetorID": setor_lookup.get("Educacao"),
-                "CategoriaID": categoria_lookup.get(row.get("Categoria")),
-                "TemaID": tema_lookup.get(row.get("Tema")),
-            }
-            if empresa["EmpresaNome"]:
-                empresas.append(empresa)
+        df = ler_planilha("educacao", colunas=COLUNAS_EMPRESA)
+        empresas.append(_empresas_da_carteira(df, setor_lookup.get("Educacao"), categoria_lookup, tema_lookup))
 
     # 6. Inclusao Digital
     if EXCEL_FILES["inclusao_digital"].exists():
-        df = pd.read_excel(EXCEL_FILES["inclusao_digital"])
-        for _, row in df.iterrows():
-            cnpj_fmt, cnpj_num = limpar_cnpj(row.get("CNPJ"))
-            empresa = {
-                "EmpresaNome": row.get("Empresa"),
-                "CNPJ": cnpj_fmt,
-                "CNPJNumerico": cnpj_num,
-                "SetorID": setor_lookup.get("Inclusao Digital"),
-                "CategoriaID": categoria_lookup.get(row.get("Categoria")),
-                "TemaID": tema_lookup.get(row.get("Tema")),
-            }
-            if empresa["EmpresaNome"]:
-                empresas.append(empresa)
+        df = ler_planilha("inclusao_digital", colunas=COLUNAS_EMPRESA)
+        empresas.append(_empresas_da_carteira(df, setor_lookup.get("Inclusao Digital"), categoria_lookup, tema_lookup))
 
     # 7. Empresas dos arquivos KPI (para garantir que existam)
     kpi_empresas = [
@@ -153,19 +176,16 @@ def load_dim_empresas():
         ("kpi_alianca", "ALLIANCA SAUDE", "Saude"),
         ("kpi_onco", "ONCOCLINICAS", "Saude"),
     ]
-    for file_key, empresa_nome, setor_nome in kpi_empresas:
-        if file_key in EXCEL_FILES and EXCEL_FILES[file_key].exists():
-            empresas.append({
-                "EmpresaNome": empresa_nome,
-                "SetorID": setor_lookup.get(setor_nome),
-            })
-
-    # Criar DataFrame e remover duplicatas
-    df_empresas = pd.DataFrame(empresas)
+    empresas.append(pd.DataFrame(
+        [{"EmpresaNome": empresa_nome, "SetorID": setor_lookup.get(setor_nome)}
+         for file_key, empresa_nome, setor_nome in kpi_empresas
+         if file_key in EXCEL_FILES and EXCEL_FILES[file_key].exists()],
+        columns=["EmpresaNome", "SetorID"],
+    ))
 
-    # Remove registros com EmpresaNome nulo ou vazio
-    df_empresas = df_empresas[df_empresas["EmpresaNome"].notna()]
-    df_empresas = df_empresas[df_empresas["EmpresaNome"].str.strip() != ""]
+    # Junta as fontes e remove registros com EmpresaNome nulo ou vazio
+    df_empresas = pd.concat(empresas, ignore_index=True)
+    df_empresas = df_empresas[nome_preenchido(df_empresas["EmpresaNome"])]
 
     # Remove duplicatas por nome (mantendo a primeira ocorrencia com mais dados)
     df_empresas = df_empresas.drop_duplicates(subset=["EmpresaNome"], keep="first")
@@ -173,11 +193,12 @@ def load_dim_empresas():
     # Adiciona coluna Ativo
     df_empresas["Ativo"] = True
 
-    # Insere no banco
+    # Upsert pelo nome (empresas ja cadastradas mantem o EmpresaID)
     if not df_empresas.empty:
-        db.to_sql(df_empresas, "DimEmpresa", if_exists="append")
+        alteradas = upsert_dimensao(df_empresas, "DimEmpresa")
+        registrar_entradas("DimEmpresa", ENTRADAS["DimEmpresa"])
         db.log_import("DimEmpresa", "Multiplos arquivos", len(df_empresas))
-        print(f"  {len(df_empresas)} empresas carregadas.")
+        print(f"  {len(df_empresas)} empresas carregadas ({alteradas} novas ou alteradas).")
     else:
         print("  Nenhuma empresa encontrada.")
 
@@ -189,6 +210,10 @@ def load_dim_subsetores():
     Carrega subsetores a partir dos arquivos Excel.
     """
     print("Carregando DimSubSetor...")
+
+    if sem_alteracoes("DimSubSetor", ENTRADAS["DimSubSetor"]):
+        return
+
     setor_lookup = db.get_lookup("DimSetor", "SetorID", "SetorNome")
 
     subsetores = []
@@ -198,31 +223,23 @@ def load_dim_subsetores():
 
     for arq in arquivos:
         if EXCEL_FILES.get(arq) and EXCEL_FILES[arq].exists():
-            df = pd.read_excel(EXCEL_FILES[arq])
+            df = ler_planilha(arq, colunas=["Setor", "SubSetor"])
             if "SubSetor" in df.columns and "Setor" in df.columns:
-                for _, row in df.iterrows():
-                    subsetor_nome = row.get("SubSetor")
-                    setor_nome = row.get("Setor")
-                    if pd.notna(subsetor_nome) and pd.notna(setor_nome):
-                        subsetores.append({
-                            "SetorID": setor_lookup.get(setor_nome),
-                            "SubSetorNome": str(subsetor_nome).strip(),
-                            "Ativo": True
-                        })
-
-    # Remove duplicatas
-    df_subsetores = pd.DataFrame(subsetores)
+                df = df[df["SubSetor"].notna() & df["Setor"].notna()]
+                subsetores.append(pd.DataFrame({
+                    "SetorID": mapear(df["Setor"], setor_lookup),
+                    "SubSetorNome": texto(df["SubSetor"]).str.strip(),
+                    "Ativo": True
+                }))
+
+    # Upsert por (SetorID, SubSetorNome)
+    df_subsetores = pd.concat(subsetores, ignore_index=True) if subsetores else pd.DataFrame()
     if not df_subsetores.empty:
-        df_subsetores = df_subsetores.drop_duplicates(subset=["SubSetorNome", "SetorID"])
         df_subsetores = df_subsetores[df_subsetores["SetorID"].notna()]
-
-        # Verifica subsetores ja existentes
-        existentes = db.read_sql("SELECT SubSetorNome FROM esg.DimSubSetor")
-        df_subsetores = df_subsetores[~df_subsetores["SubSetorNome"].isin(existentes["SubSetorNome"])]
-
-        if not df_subsetores.empty:
-            db.to_sql(df_subsetores, "DimSubSetor", if_exists="append")
-            print(f"  {len(df_subsetores)} subsetores carregados.")
+        alterados = upsert_dimensao(df_subsetores, "DimSubSetor")
+        registrar_entradas("DimSubSetor", ENTRADAS["DimSubSetor"])
+        if alterados:
+            print(f"  {alterados} subsetores carregados.")
         else:
             print("  Nenhum novo subsetor para carregar.")
     else:
@@ -234,6 +251,10 @@ def load_dim_produtos():
     Carrega produtos financeiros dos arquivos Excel.
     """
     print("Carregando DimProduto...")
+
+    if sem_alteracoes("DimProduto", ENTRADAS["DimProduto"]):
+        return
+
     produtos = set()
 
     # Le produtos dos arquivos de carteira
@@ -241,7 +262,7 @@ def load_dim_produtos():
 
     for arq in arquivos:
         if EXCEL_FILES.get(arq) and EXCEL_FILES[arq].exists():
-            df = pd.read_excel(EXCEL_FILES[arq])
+            df = ler_planilha(arq, colunas=["Produto"])
             if "Produto" in df.columns:
                 for produto in df["Produto"].dropna().unique():
                     produtos.add(str(produto).strip())
@@ -249,17 +270,12 @@ def load_dim_produtos():
     # Cria DataFrame
     df_produtos = pd.DataFrame({"ProdutoNome": list(produtos), "Ativo": True})
 
+    # Upsert pelo nome
     if not df_produtos.empty:
-        # Verifica produtos ja existentes
-        try:
-            existentes = db.read_sql("SELECT ProdutoNome FROM esg.DimProduto")
-            df_produtos = df_produtos[~df_produtos["ProdutoNome"].isin(existentes["ProdutoNome"])]
-        except:
-            pass
-
-        if not df_produtos.empty:
-            db.to_sql(df_produtos, "DimProduto", if_exists="append")
-            print(f"  {len(df_produtos)} produtos carregados.")
+        alterados = upsert_dimensao(df_produtos, "DimProduto")
+        registrar_entradas("DimProduto", ENTRADAS["DimProduto"])
+        if alterados:
+            print(f"  {alterados} produtos carregados.")
         else:
             print("  Nenhum novo produto para carregar.")
     else:
@@ -272,11 +288,14 @@ def load_dim_cnae():
     """
     print("Carregando DimCNAE...")
 
+    if sem_alteracoes("DimCNAE", ENTRADAS["DimCNAE"]):
+        return
+
     if not EXCEL_FILES["de_para"].exists():
         print("  Arquivo DE_PARA nao encontrado.")
         return
 
-    df = pd.read_excel(EXCEL_FILES["de_para"], sheet_name="DE-PARA")
+    df = ler_planilha("de_para", sheet_name="DE-PARA")
 
     # Renomeia colunas para o modelo
     df_cnae = pd.DataFrame({
@@ -301,19 +320,12 @@ def load_dim_cnae():
     df_cnae = df_cnae[df_cnae["CNAEID"].notna()]
     df_cnae["CNAEID"] = df_cnae["CNAEID"].astype(int)
 
-    # Remove duplicatas
-    df_cnae = df_cnae.drop_duplicates(subset=["CNAEID"])
-
+    # Upsert pelo codigo (sem truncar: BridgeEmpresaCNAE continua valida)
     if not df_cnae.empty:
-        # Trunca e recarrega
-        try:
-            db.truncate_table("DimCNAE")
-        except:
-            pass
-
-        db.to_sql(df_cnae, "DimCNAE", if_exists="append")
+        alterados = upsert_dimensao(df_cnae, "DimCNAE")
+        registrar_entradas("DimCNAE", ENTRADAS["DimCNAE"])
         db.log_import("DimCNAE", str(EXCEL_FILES["de_para"]), len(df_cnae))
-        print(f"  {len(df_cnae)} CNAEs carregados.")
+        print(f"  {len(df_cnae)} CNAEs carregados ({alterados} novos ou alterados).")
     else:
         print("  Nenhum CNAE encontrado.")
 
@@ -324,11 +336,14 @@ def load_dim_meta_ods():
     """
     print("Carregando DimMetaODS...")
 
+    if sem_alteracoes("DimMetaODS", ENTRADAS["DimMetaODS"]):
+        return
+
     if not EXCEL_FILES["metaods"].exists():
         print("  Arquivo metaods.xlsx nao encontrado.")
         return
 
-    df = pd.read_excel(EXCEL_FILES["metaods"])
+    df = ler_planilha("metaods")
 
     metas = []
     for _, row in df.iterrows():
@@ -345,7 +360,8 @@ def load_dim_meta_ods():
     df_metas = pd.DataFrame(metas)
 
     if not df_metas.empty:
-        db.to_sql(df_metas, "DimMetaODS", if_exists="append")
+        db.bulk_load(df_metas, "DimMetaODS")
+        registrar_entradas("DimMetaODS", ENTRADAS["DimMetaODS"])
         db.log_import("DimMetaODS", str(EXCEL_FILES["metaods"]), len(df_metas))
         print(f"  {len(df_metas)} metas ODS carregadas.")
     else:
@@ -358,59 +374,65 @@ def load_bridge_kpi_ods():
     """
     print("Carregando BridgeKPIODS...")
 
+    if sem_alteracoes("BridgeKPIODS", ENTRADAS["BridgeKPIODS"]):
+        return
+
     if not EXCEL_FILES["ods"].exists():
         print("  Arquivo ods.xlsx nao encontrado.")
         return
 
-    df = pd.read_excel(EXCEL_FILES["ods"])
+    df = ler_planilha("ods", colunas=["KPI", "ODS primária (nº)", "ODS secundárias (nº)"])
 
-    # Lookup de TipoKPI
+    # Lookup de TipoKPI: primeiro tipo cujo nome contem o KPI (busca parcial)
     kpi_lookup = db.get_lookup("DimTipoKPI", "TipoKPIID", "KPINome")
+    tipos = primeiro_que_contem(coluna(df, "KPI"), kpi_lookup)
+    ods_primarias = coluna(df, "ODS primária (nº)")
+    validas = tipos.notna() & ods_primarias.notna()
+
+    # ODS Primaria
+    primarias = pd.DataFrame({
+        "TipoKPIID": tipos[validas],
+        "ODSID": ods_primarias[validas].map(int),
+        "TipoRelacao": "Primaria",
+    })
 
-    bridges = []
-    for _, row in df.iterrows():
-        kpi_nome = row.get("KPI")
-        ods_primaria = row.get("ODS primária (nº)")
-        ods_secundarias = row.get("ODS secundárias (nº)")
-
-        # Encontra TipoKPIID (busca parcial)
-        tipo_kpi_id = None
-        for nome, id in kpi_lookup.items():
-            if kpi_nome and nome and kpi_nome.lower() in nome.lower():
-                tipo_kpi_id = id
-                break
-
-        if tipo_kpi_id and pd.notna(ods_primaria):
-            # ODS Primaria
-            bridges.append({
-                "TipoKPIID": tipo_kpi_id,
-                "ODSID": int(ods_primaria),
-                "TipoRelacao": "Primaria"
-            })
-
-            # ODS Secundarias
-            if pd.notna(ods_secundarias):
-                # Pode ser uma lista separada por virgula
-                for ods in str(ods_secundarias).split(","):
-                    ods = ods.strip()
-                    if ods.isdigit():
-                        bridges.append({
-                            "TipoKPIID": tipo_kpi_id,
-                            "ODSID": int(ods),
-                            "TipoRelacao": "Secundaria"
-                        })
+    # ODS Secundarias (pode ser uma lista separada por virgula)
+    ods_secundarias = coluna(df, "ODS secundárias (nº)")[validas].dropna()
+    ods = texto(ods_secundarias).str.split(",").explode().str.strip()
+    ods = ods[ods.str.isdigit().fillna(False).astype(bool)]
+    secundarias = pd.DataFrame({
+        "TipoKPIID": tipos.loc[ods.index].to_numpy(),
+        "ODSID": ods.map(int),
+        "TipoRelacao": "Secundaria",
+    })
 
-    df_bridge = pd.DataFrame(bridges)
+    # Mesma ordem de antes: a primaria de cada linha seguida das secundarias
+    df_bridge = pd.concat([primarias, secundarias]).sort_index(kind="stable").reset_index(drop=True)
 
     if not df_bridge.empty:
         df_bridge = df_bridge.drop_duplicates()
-        db.to_sql(df_bridge, "BridgeKPIODS", if_exists="append")
+        db.bulk_load(df_bridge, "BridgeKPIODS")
+        registrar_entradas("BridgeKPIODS", ENTRADAS["BridgeKPIODS"])
         print(f"  {len(df_bridge)} relacoes KPI-ODS carregadas.")
     else:
         print("  Nenhuma relacao KPI-ODS encontrada.")
 
 
-def run_dimensoes():
+def etapas_dimensoes() -> list:
+    """Loaders de dimensao como etapas do agendador (entradas: dimensoes usadas como lookup)."""
+    loaders = {
+        "DimCNAE": load_dim_cnae,
+        "DimSubSetor": load_dim_subsetores,
+        "DimProduto": load_dim_produtos,
+        "DimEmpresa": load_dim_empresas,
+        "DimMetaODS": load_dim_meta_ods,
+        "BridgeKPIODS": load_bridge_kpi_ods,
+    }
+    return [Etapa(tabela, loader, [e for e in ENTRADAS[tabela] if isinstance(e, str)])
+            for tabela, loader in loaders.items()]
+
+
+def run_dimensoes(workers: int = WORKERS_PADRAO):
     """
     Executa todo o ETL de dimensoes.
     """
@@ -418,12 +440,7 @@ def run_dimensoes():
     print("ETL DIMENSOES")
     print("=" * 60)
 
-    load_dim_cnae()
-    load_dim_subsetores()
-    load_dim_produtos()
-    load_dim_empresas()
-    load_dim_meta_ods()
-    load_bridge_kpi_ods()
+    executar(etapas_dimensoes(), workers=workers)
 
     print("\nETL Dimensoes concluido!")
 
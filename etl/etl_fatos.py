@@ -3,8 +3,18 @@ ETL para Tabelas de Fato
 """
 import pandas as pd
 import re
+import threading
+from agendador import WORKERS_PADRAO, Etapa, executar
+from classificador import ClassificadorPalavras
 from database import db
+from incremental import carregar_fatias, sem_alteracoes
+from planilhas import ler_planilha
+from resolvedor_empresas import ResolvedorEmpresas
 from config import EXCEL_FILES, ANO_REFERENCIA
+from transformacoes import (
+    coluna, extrair_numero_coluna, limpar_valor_monetario_coluna, mapear, parse_bool_coluna, preenchido,
+    texto,
+)
 
 
 def limpar_valor_monetario(valor) -> float:
@@ -46,26 +56,151 @@ def extrair_numero(texto) -> int:
     return None
 
 
-def get_empresa_id(empresa_nome: str, empresa_lookup: dict) -> int:
+# Entradas de cada fato para a carga incremental: abas (chave de EXCEL_FILES, aba)
+# e dimensoes usadas como lookup
+ARQUIVOS_KPI = ["kpi_enel", "kpi_edp", "kpi_engie", "kpi_isa", "kpi_taesa", "kpi_maz", "kpi_eneva",
+                "kpi_alianca", "kpi_onco"]
+ENTRADAS = {
+    "FatoCarteira": [("energia_renovavel", 0), ("carteira_saude", 0),
+                     ("indicadores_saneamento", "Carteira Saneamento"), ("educacao", 0), ("inclusao_digital", 0),
+                     "DimEmpresa", "DimSetor", "DimCategoria", "DimProduto", "DimTema"],
+    "FatoKPI": [(arquivo, 0) for arquivo in ARQUIVOS_KPI] + ["DimEmpresa", "DimSetor"],
+    "FatoIndicadorEnergia": [("energia_consolidado", 0), "DimEmpresa"],
+    "FatoIndicadorSaneamento": [("indicadores_saneamento", 0), "DimEmpresa"],
+    "FatoIndicadorSaude": [("empresa_saude", 0), "DimEmpresa"],
+    "FatoMeta2030": [("status_meta_2030", "Até 2030"), ("status_meta_2030", "YoY")],
+    "ValidacaoEmpresa": [("carteira_saneamento", "Empresas"), "DimEmpresa"],
+}
+
+# Palavra-chave do nome do KPI -> TipoKPIID (vence a primeira da lista contida no nome)
+MAPA_TIPO_KPI = {
+    "capacidade": 1,  # Capacidade Instalada de Energia Renovavel
+    "energia renovavel": 2,  # Percentual de Energia Renovavel
+    "co2": 3,  # Emissoes de CO2 Evitadas
+    "emiss": 3,
+    "carbono": 3,
+    "reducao": 4,  # Reducao no Consumo de Energia
+    "eficiencia": 5,  # Eficiencia Energetica
+    "solar": 6,  # Geracao de Energia Solar
+    "fotovoltaic": 6,
+    "eolica": 7,  # Geracao de Energia Eolica
+    "agua tratada": 8,  # Volume de Agua Tratada
+    "agua salva": 9,
+    "esgoto": 10,
+    "geracao": 2,  # Geracao de energia
+    "mwh": 2,
+    "mw": 1,
+}
+TIPO_KPI_PADRAO = 1  # Capacidade Instalada
+CLASSIFICADOR_TIPO_KPI = ClassificadorPalavras(MAPA_TIPO_KPI, padrao=TIPO_KPI_PADRAO)
+COLUNAS_NOME_KPI = ["KPI", "Indicador", "Metrica"]
+PALAVRAS_VALOR_KPI = ["valor", "2024", "total", "quantidade"]
+PALAVRAS_FONTE_KPI = ["fonte", "observ", "justif", "explic"]
+# Coluna da planilha de saude -> campo de FatoIndicadorSaude
+COLUNAS_SAUDE = {
+    "Número de vagas em unidades de saúde ou pacientes atendidos": "VagasUnidadesSaude",
+    "Aumento da capacidade de leitos hospitalares e/ou diminuição da densidade": "AumentoCapacidadeLeitos",
+    "Redução de custos para tratamentos e medicamentos padrão": "ReducaoCustoTratamentos",
+    "Número de leitos hospitalares adicionados": "LeitosAdicionados",
+    "Número de pacientes beneficiados por cuidados de saúde ou tratamentos médicos": "PacientesBeneficiados",
+}
+COLUNAS_VALIDACAO = ["Empresa", "Categoria_GSS", "Taxonomia_FEBRABAN_OK", "CNAE_OK", "Exclusao", "Confome",
+                     "Evidencia_Categoria", "Evidencia_Taxonomia", "Evidencia_CNAE", "Evidencia_Exclusao"]
+# Colunas lidas das planilhas de carteira (as ausentes sao ignoradas)
+COLUNAS_CARTEIRA = ["Empresa", "Setor", "Categoria", "Tema", "Produto", "Total Carteira", "Carteira", "Lido"]
+
+_resolvedor = None
+_resolvedor_lock = threading.Lock()
+
+
+def get_resolvedor() -> ResolvedorEmpresas:
     """
-    Busca o ID da empresa pelo nome (busca parcial).
+    Indice de nomes de DimEmpresa, montado uma vez por execucao
+    (reiniciar_resolvedor descarta o anterior).
     """
-    if not empresa_nome or pd.isna(empresa_nome):
-        return None
+    global _resolvedor
+    with _resolvedor_lock:
+        if _resolvedor is None:
+            _resolvedor = ResolvedorEmpresas.do_banco(db)
+        return _resolvedor
 
-    empresa_nome = str(empresa_nome).strip().lower()
 
-    # Busca exata primeiro
-    for nome, id in empresa_lookup.items():
-        if nome.lower() == empresa_nome:
-            return id
+def filtrar_empresas(df: pd.DataFrame, resolvedor: ResolvedorEmpresas, nomes: pd.Series = None):
+    """
+    Mantem as linhas cuja empresa foi encontrada.
+    Retorna (df filtrado, EmpresaID das linhas mantidas).
+    """
+    ids = resolvedor.resolver_coluna(coluna(df, "Empresa") if nomes is None else nomes)
+    encontrada = ids.notna()
+    return df[encontrada], ids[encontrada].astype("int64")
 
-    # Busca parcial
-    for nome, id in empresa_lookup.items():
-        if empresa_nome in nome.lower() or nome.lower() in empresa_nome:
-            return id
 
-    return None
+def valores_por_coluna(df: pd.DataFrame, classificar, conversores: dict) -> pd.DataFrame:
+    """
+    Le planilhas largas em que o campo de cada coluna e definido pelo nome dela.
+    classificar(nome_em_minusculas) -> campo ou None. Para cada linha e campo vale
+    a ultima coluna (na ordem da planilha) com celula preenchida, convertida por
+    conversores[campo]. Retorna um DataFrame com o indice de df e uma coluna por campo.
+    """
+    campos = [classificar(str(col).lower()) for col in df.columns]
+    posicoes = [i for i, campo in enumerate(campos) if campo]
+    resultado = pd.DataFrame(index=df.index, columns=list(conversores), dtype=object)
+    if not posicoes or df.empty:
+        return resultado
+
+    largo = df.iloc[:, posicoes].astype(object)
+    largo.columns = posicoes
+    longo = (largo.melt(ignore_index=False, var_name="posicao", value_name="valor")
+             .dropna(subset=["valor"]).rename_axis("linha").reset_index())
+    longo["campo"] = longo["posicao"].map(dict(enumerate(campos)))
+    longo = longo.sort_values(["linha", "posicao"], kind="stable")
+    longo = longo.drop_duplicates(subset=["linha", "campo"], keep="last")
+
+    for campo, converter in conversores.items():
+        selecionado = longo[longo["campo"] == campo]
+        resultado[campo] = converter(selecionado.set_index("linha")["valor"]).reindex(df.index)
+    return resultado
+
+
+def colunas_kpi(nomes: list) -> list:
+    """Colunas usadas das planilhas de KPI: as duas primeiras (nome e valor de reserva), nome, valor e fonte."""
+    palavras = PALAVRAS_VALOR_KPI + PALAVRAS_FONTE_KPI
+    return [col for i, col in enumerate(nomes)
+            if i < 2 or col in COLUNAS_NOME_KPI or any(p in str(col).lower() for p in palavras)]
+
+
+def colunas_classificadas(classificar):
+    """Seletor de colunas para valores_por_coluna: Empresa e as colunas que o classificador reconhece."""
+    return lambda nomes: ["Empresa"] + [col for col in nomes if classificar(str(col).lower())]
+
+
+def colunas_com(df: pd.DataFrame, palavras: list) -> list:
+    """Colunas (na ordem da planilha) cujo nome contem alguma das palavras, sem caixa."""
+    return [col for col in df.columns if any(p in str(col).lower() for p in palavras)]
+
+
+def primeira_preenchida(df: pd.DataFrame, colunas: list) -> pd.Series:
+    """Para cada linha, a primeira celula nao nula entre as colunas (None se nenhuma)."""
+    if not colunas:
+        return pd.Series(None, index=df.index, dtype=object)
+    return df[colunas].astype(object).bfill(axis=1).iloc[:, 0]
+
+
+def converter_valor_kpi(valores: pd.Series):
+    """
+    Valor do KPI -> (numerico, texto): float depois de trocar "," por "." e tirar
+    "%" e espacos; o que nao converte fica como texto (500 caracteres).
+    Cada valor distinto e convertido uma vez.
+    """
+    def converter(valor):
+        try:
+            return float(str(valor).replace(",", ".").replace("%", "").replace(" ", "")), None
+        except ValueError:
+            return None, str(valor)[:500]
+
+    convertidos = {valor: converter(valor) for valor in valores.dropna().unique()}
+    numerico = valores.map(lambda v: convertidos[v][0] if v in convertidos else None)
+    return numerico.astype(float), valores.map(lambda v: convertidos[v][1] if v in convertidos else None)
 
 
 def load_fato_carteira():
@@ -74,8 +209,11 @@ def load_fato_carteira():
     """
     print("Carregando FatoCarteira...")
 
+    if sem_alteracoes("FatoCarteira", ENTRADAS["FatoCarteira"]):
+        return
+
     # Lookups
-    empresa_lookup = db.get_lookup("DimEmpresa", "EmpresaID", "EmpresaNome")
+    resolvedor = get_resolvedor()
     setor_lookup = db.get_lookup("DimSetor", "SetorID", "SetorNome")
     categoria_lookup = db.get_lookup("DimCategoria", "CategoriaID", "CategoriaNome")
     produto_lookup = db.get_lookup("DimProduto", "ProdutoID", "ProdutoNome")
@@ -85,91 +223,68 @@ def load_fato_carteira():
 
     # 1. Energia Renovavel
     if EXCEL_FILES["energia_renovavel"].exists():
-        df = pd.read_excel(EXCEL_FILES["energia_renovavel"])
-        for _, row in df.iterrows():
-            empresa_id = get_empresa_id(row.get("Empresa"), empresa_lookup)
-            if empresa_id:
-                carteiras.append({
-                    "EmpresaID": empresa_id,
-                    "SetorID": setor_lookup.get(row.get("Setor", "Energia")),
-                    "CategoriaID": categoria_lookup.get(row.get("Categoria")),
-                    "TemaID": tema_lookup.get(row.get("Tema")),
-                    "ProdutoID": produto_lookup.get(row.get("Produto")),
-                    "AnoReferencia": ANO_REFERENCIA,
-                    "ValorCarteira": limpar_valor_monetario(row.get("Total Carteira")),
-                    "StatusLeitura": row.get("Lido", "Nao Lido")
-                })
+        df = ler_planilha("energia_renovavel", colunas=COLUNAS_CARTEIRA)
+        df, empresa_ids = filtrar_empresas(df, resolvedor)
+        carteiras.append(pd.DataFrame({
+            "EmpresaID": empresa_ids,
+            "SetorID": mapear(coluna(df, "Setor", "Energia"), setor_lookup),
+            "CategoriaID": mapear(coluna(df, "Categoria"), categoria_lookup),
+            "TemaID": mapear(coluna(df, "Tema"), tema_lookup),
+            "ProdutoID": mapear(coluna(df, "Produto"), produto_lookup),
+            "AnoReferencia": ANO_REFERENCIA,
+            "ValorCarteira": limpar_valor_monetario_coluna(coluna(df, "Total Carteira")),
+            "StatusLeitura": coluna(df, "Lido", "Nao Lido"),
+        }))
 
     # 2. Carteira Saude
     if EXCEL_FILES["carteira_saude"].exists():
-        df = pd.read_excel(EXCEL_FILES["carteira_saude"])
-        for _, row in df.iterrows():
-            empresa_id = get_empresa_id(row.get("Empresa"), empresa_lookup)
-            if empresa_id:
-                carteiras.append({
-                    "EmpresaID": empresa_id,
-                    "SetorID": setor_lookup.get("Saude"),
-                    "CategoriaID": categoria_lookup.get(row.get("Categoria")),
-                    "TemaID": tema_lookup.get(row.get("Tema")),
-                    "ProdutoID": produto_lookup.get(row.get("Produto")),
-                    "AnoReferencia": ANO_REFERENCIA,
-                    "ValorCarteira": limpar_valor_monetario(row.get("Total Carteira")),
-                })
+        df = ler_planilha("carteira_saude", colunas=COLUNAS_CARTEIRA)
+        df, empresa_ids = filtrar_empresas(df, resolvedor)
+        carteiras.append(pd.DataFrame({
+            "EmpresaID": empresa_ids,
+            "SetorID": setor_lookup.get("Saude"),
+            "CategoriaID": mapear(coluna(df, "Categoria"), categoria_lookup),
+            "TemaID": mapear(coluna(df, "Tema"), tema_lookup),
+            "ProdutoID": mapear(coluna(df, "Produto"), produto_lookup),
+            "AnoReferencia": ANO_REFERENCIA,
+            "ValorCarteira": limpar_valor_monetario_coluna(coluna(df, "Total Carteira")),
+        }))
 
     # 3. Carteira Saneamento
     if EXCEL_FILES["indicadores_saneamento"].exists():
         try:
-            df = pd.read_excel(EXCEL_FILES["indicadores_saneamento"], sheet_name="Carteira Saneamento")
-            for _, row in df.iterrows():
-                empresa_id = get_empresa_id(row.get("Empresa"), empresa_lookup)
-                if empresa_id:
-                    carteiras.append({
-                        "EmpresaID": empresa_id,
-                        "SetorID": setor_lookup.get("Saneamento"),
-                        "CategoriaID": categoria_lookup.get(row.get("Categoria")),
-                        "TemaID": tema_lookup.get(row.get("Tema")),
-                        "AnoReferencia": ANO_REFERENCIA,
-                        "ValorCarteira": limpar_valor_monetario(row.get("Carteira")),
-                    })
+            df = ler_planilha("indicadores_saneamento", sheet_name="Carteira Saneamento", colunas=COLUNAS_CARTEIRA)
+            df, empresa_ids = filtrar_empresas(df, resolvedor)
+            carteiras.append(pd.DataFrame({
+                "EmpresaID": empresa_ids,
+                "SetorID": setor_lookup.get("Saneamento"),
+                "CategoriaID": mapear(coluna(df, "Categoria"), categoria_lookup),
+                "TemaID": mapear(coluna(df, "Tema"), tema_lookup),
+                "AnoReferencia": ANO_REFERENCIA,
+                "ValorCarteira": limpar_valor_monetario_coluna(coluna(df, "Carteira")),
+            }))
         except Exception as e:
             print(f"  Aviso: {e}")
 
-    # 4. Educacao
-    if EXCEL_FILES["educacao"].exists():
-        df = pd.read_excel(EXCEL_FILES["educacao"])
-        for _, row in df.iterrows():
-            empresa_id = get_empresa_id(row.get("Empresa"), empresa_lookup)
-            if empresa_id:
-                carteiras.append({
-                    "EmpresaID": empresa_id,
-                    "SetorID": setor_lookup.get("Educacao"),
-                    "CategoriaID": categoria_lookup.get(row.get("Categoria")),
-                    "TemaID": tema_lookup.get(row.get("Tema")),
-                    "ProdutoID": produto_lookup.get(row.get("Produto")),
-                    "AnoReferencia": ANO_REFERENCIA,
-                    "ValorCarteira": limpar_valor_monetario(row.get("Total Carteira")),
-                })
-
-    # 5. Inclusao Digital
-    if EXCEL_FILES["inclusao_digital"].exists():
-        df = pd.read_excel(EXCEL_FILES["inclusao_digital"])
-        for _, row in df.iterrows():
-            empresa_id = get_empresa_id(row.get("Empresa"), empresa_lookup)
-            if empresa_id:
-                carteiras.append({
-                    "EmpresaID": empresa_id,
-                    "SetorID": setor_lookup.get("Inclusao Digital"),
-                    "CategoriaID": categoria_lookup.get(row.get("Categoria")),
-                    "TemaID": tema_lookup.get(row.get("Tema")),
-                    "ProdutoID": produto_lookup.get(row.get("Produto")),
-                    "AnoReferencia": ANO_REFERENCIA,
-                    "ValorCarteira": limpar_valor_monetario(row.get("Total Carteira")),
-                })
+    # 4. Educacao e 5. Inclusao Digital
+    for arquivo, setor_nome in [("educacao", "Educacao"), ("inclusao_digital", "Inclusao Digital")]:
+        if EXCEL_FILES[arquivo].exists():
+            df = ler_planilha(arquivo, colunas=COLUNAS_CARTEIRA)
+            df, empresa_ids = filtrar_empresas(df, resolvedor)
+            carteiras.append(pd.DataFrame({
+                "EmpresaID": empresa_ids,
+                "SetorID": setor_lookup.get(setor_nome),
+                "CategoriaID": mapear(coluna(df, "Categoria"), categoria_lookup),
+                "TemaID": mapear(coluna(df, "Tema"), tema_lookup),
+                "ProdutoID": mapear(coluna(df, "Produto"), produto_lookup),
+                "AnoReferencia": ANO_REFERENCIA,
+                "ValorCarteira": limpar_valor_monetario_coluna(coluna(df, "Total Carteira")),
+            }))
 
     # Insere no banco
-    df_carteiras = pd.DataFrame(carteiras)
+    df_carteiras = pd.concat(carteiras, ignore_index=True) if carteiras else pd.DataFrame()
     if not df_carteiras.empty:
-        db.to_sql(df_carteiras, "FatoCarteira", if_exists="append")
+        carregar_fatias(df_carteiras, "FatoCarteira", ENTRADAS["FatoCarteira"])
         db.log_import("FatoCarteira", "Multiplos arquivos", len(df_carteiras))
         print(f"  {len(df_carteiras)} registros de carteira carregados.")
     else:
@@ -182,38 +297,11 @@ def load_fato_kpi():
     """
     print("Carregando FatoKPI...")
 
-    empresa_lookup = db.get_lookup("DimEmpresa", "EmpresaID", "EmpresaNome")
-    setor_lookup = db.get_lookup("DimSetor", "SetorID", "SetorNome")
-
-    # Mapeamento direto de KPIs dos arquivos para TipoKPIID
-    kpi_mapping = {
-        "capacidade": 1,  # Capacidade Instalada de Energia Renovavel
-        "energia renovavel": 2,  # Percentual de Energia Renovavel
-        "co2": 3,  # Emissoes de CO2 Evitadas
-        "emiss": 3,
-        "carbono": 3,
-        "reducao": 4,  # Reducao no Consumo de Energia
-        "eficiencia": 5,  # Eficiencia Energetica
-        "solar": 6,  # Geracao de Energia Solar
-        "fotovoltaic": 6,
-        "eolica": 7,  # Geracao de Energia Eolica
-        "agua tratada": 8,  # Volume de Agua Tratada
-        "agua salva": 9,
-        "esgoto": 10,
-        "geracao": 2,  # Geracao de energia
-        "mwh": 2,
-        "mw": 1,
-    }
+    if sem_alteracoes("FatoKPI", ENTRADAS["FatoKPI"]):
+        return
 
-    def get_tipo_kpi_id(kpi_nome):
-        """Retorna o TipoKPIID baseado no nome do KPI."""
-        if not kpi_nome:
-            return None
-        kpi_lower = str(kpi_nome).lower()
-        for keyword, tipo_id in kpi_mapping.items():
-            if keyword in kpi_lower:
-                return tipo_id
-        return 1  # Default: Capacidade Instalada
+    resolvedor = get_resolvedor()
+    setor_lookup = db.get_lookup("DimSetor", "SetorID", "SetorNome")
 
     kpis = []
 
@@ -233,76 +321,45 @@ def load_fato_kpi():
     for file_key, empresa_nome, setor_nome in kpi_files:
         if file_key in EXCEL_FILES and EXCEL_FILES[file_key].exists():
             try:
-                df = pd.read_excel(EXCEL_FILES[file_key])
-                empresa_id = get_empresa_id(empresa_nome, empresa_lookup)
+                df = ler_planilha(file_key, colunas=colunas_kpi)
+                empresa_id = resolvedor.resolver(empresa_nome)
 
                 if not empresa_id:
                     print(f"  Aviso: Empresa '{empresa_nome}' nao encontrada.")
                     continue
 
-                for _, row in df.iterrows():
-                    # Tenta encontrar coluna de KPI
-                    kpi_nome = None
-                    for col in ["KPI", "Indicador", "Metrica"]:
-                        if col in row and pd.notna(row.get(col)):
-                            kpi_nome = row.get(col)
-                            break
-
-                    # Se nao tem coluna KPI, usa o nome da primeira coluna
-                    if not kpi_nome:
-                        kpi_nome = str(df.columns[0])
-
-                    tipo_kpi_id = get_tipo_kpi_id(kpi_nome)
-
-                    # Extrai valor - tenta varias colunas
-                    valor = None
-                    for col in df.columns:
-                        col_lower = str(col).lower()
-                        if any(x in col_lower for x in ["valor", "2024", "total", "quantidade"]):
-                            if pd.notna(row.get(col)):
-                                valor = row.get(col)
-                                break
-
-                    # Se nao encontrou, pega a segunda coluna
-                    if valor is None and len(df.columns) > 1:
-                        valor = row.iloc[1] if pd.notna(row.iloc[1]) else None
-
-                    # Tenta converter para numerico
-                    valor_num = None
-                    valor_texto = None
-                    if valor is not None:
-                        try:
-                            valor_str = str(valor).replace(",", ".").replace("%", "").replace(" ", "")
-                            valor_num = float(valor_str)
-                        except:
-                            valor_texto = str(valor)[:500]
-
-                    # Fonte
-                    fonte = None
-                    for col in df.columns:
-                        col_lower = str(col).lower()
-                        if any(x in col_lower for x in ["fonte", "observ", "justif", "explic"]):
-                            if pd.notna(row.get(col)):
-                                fonte = str(row.get(col))[:500]
-                                break
-
-                    kpis.append({
-                        "EmpresaID": empresa_id,
-                        "TipoKPIID": tipo_kpi_id,
-                        "SetorID": setor_lookup.get(setor_nome),
-                        "AnoReferencia": ANO_REFERENCIA,
-                        "ValorNumerico": valor_num,
-                        "ValorTexto": valor_texto,
-                        "FonteDados": fonte,
-                    })
+                # Nome do KPI: primeira coluna KPI/Indicador/Metrica preenchida
+                # (sem coluna KPI, o nome da primeira coluna)
+                colunas_nome = [col for col in COLUNAS_NOME_KPI if col in df.columns]
+                kpi_nomes = (df[colunas_nome].bfill(axis=1).iloc[:, 0] if colunas_nome
+                             else pd.Series(None, index=df.index, dtype=object))
+                kpi_nomes = kpi_nomes.where(preenchido(kpi_nomes), str(df.columns[0]))
+                tipos_kpi = CLASSIFICADOR_TIPO_KPI.classificar_coluna(kpi_nomes)
+
+                # Valor: primeira coluna de valor preenchida (senao a segunda coluna)
+                valores = primeira_preenchida(df, colunas_com(df, PALAVRAS_VALOR_KPI))
+                if len(df.columns) > 1:
+                    valores = valores.where(valores.notna(), df.iloc[:, 1])
+                valores_num, valores_texto = converter_valor_kpi(valores)
+                fontes = texto(primeira_preenchida(df, colunas_com(df, PALAVRAS_FONTE_KPI))).str[:500]
+
+                kpis.append(pd.DataFrame({
+                    "EmpresaID": empresa_id,
+                    "TipoKPIID": tipos_kpi,
+                    "SetorID": setor_lookup.get(setor_nome),
+                    "AnoReferencia": ANO_REFERENCIA,
+                    "ValorNumerico": valores_num,
+                    "ValorTexto": valores_texto,
+                    "FonteDados": fontes,
+                }))
 
             except Exception as e:
                 print(f"  Erro ao processar {file_key}: {e}")
 
     # Insere no banco
-    df_kpis = pd.DataFrame(kpis)
+    df_kpis = pd.concat(kpis, ignore_index=True) if kpis else pd.DataFrame()
     if not df_kpis.empty:
-        db.to_sql(df_kpis, "FatoKPI", if_exists="append")
+        carregar_fatias(df_kpis, "FatoKPI", ENTRADAS["FatoKPI"])
         db.log_import("FatoKPI", "Arquivos KPI", len(df_kpis))
         print(f"  {len(df_kpis)} KPIs carregados.")
     else:
@@ -315,50 +372,42 @@ def load_fato_indicadores_energia():
     """
     print("Carregando FatoIndicadorEnergia...")
 
+    if sem_alteracoes("FatoIndicadorEnergia", ENTRADAS["FatoIndicadorEnergia"]):
+        return
+
     if not EXCEL_FILES["energia_consolidado"].exists():
         print("  Arquivo nao encontrado.")
         return
 
-    empresa_lookup = db.get_lookup("DimEmpresa", "EmpresaID", "EmpresaNome")
+    resolvedor = get_resolvedor()
 
     try:
-        df = pd.read_excel(EXCEL_FILES["energia_consolidado"])
-
-        indicadores = []
-        for _, row in df.iterrows():
-            empresa_id = get_empresa_id(row.get("Empresa"), empresa_lookup)
-            if empresa_id:
-                # Pega valores das colunas (os nomes tem caracteres especiais)
-                capacidade = None
-                geracao = None
-                emissoes = None
-                carteira = None
-
-                for col in df.columns:
-                    col_lower = str(col).lower()
-                    val = row.get(col)
-                    if pd.notna(val):
-                        if "capacidade" in col_lower:
-                            capacidade = limpar_valor_monetario(val)
-                        elif "gera" in col_lower:
-                            geracao = limpar_valor_monetario(val)
-                        elif "emiss" in col_lower or "gee" in col_lower or "co2" in col_lower:
-                            emissoes = limpar_valor_monetario(val)
-                        elif "carteira" in col_lower or "total" in col_lower:
-                            carteira = limpar_valor_monetario(val)
-
-                indicadores.append({
-                    "EmpresaID": empresa_id,
-                    "AnoReferencia": ANO_REFERENCIA,
-                    "CapacidadeInstaladaMW": capacidade,
-                    "EnergiaRenovavelMW": geracao,
-                    "EmissoesEvitadasTCO2": emissoes,
-                    "ValorCarteira": carteira,
-                })
+        # Campo de cada coluna pelo nome (os nomes tem caracteres especiais)
+        def classificar(col_lower):
+            if "capacidade" in col_lower:
+                return "CapacidadeInstaladaMW"
+            elif "gera" in col_lower:
+                return "EnergiaRenovavelMW"
+            elif "emiss" in col_lower or "gee" in col_lower or "co2" in col_lower:
+                return "EmissoesEvitadasTCO2"
+            elif "carteira" in col_lower or "total" in col_lower:
+                return "ValorCarteira"
+            return None
+
+        df = ler_planilha("energia_consolidado", colunas=colunas_classificadas(classificar))
+
+        df, empresa_ids = filtrar_empresas(df, resolvedor)
 
-        df_indicadores = pd.DataFrame(indicadores)
+        valores = valores_por_coluna(df, classificar, {
+            "CapacidadeInstaladaMW": limpar_valor_monetario_coluna,
+            "EnergiaRenovavelMW": limpar_valor_monetario_coluna,
+            "EmissoesEvitadasTCO2": limpar_valor_monetario_coluna,
+            "ValorCarteira": limpar_valor_monetario_coluna,
+        })
+        df_indicadores = pd.concat([pd.DataFrame({"EmpresaID": empresa_ids, "AnoReferencia": ANO_REFERENCIA}),
+                                    valores], axis=1)
         if not df_indicadores.empty:
-            db.to_sql(df_indicadores, "FatoIndicadorEnergia", if_exists="append")
+            carregar_fatias(df_indicadores, "FatoIndicadorEnergia", ENTRADAS["FatoIndicadorEnergia"])
             db.log_import("FatoIndicadorEnergia", str(EXCEL_FILES["energia_consolidado"]), len(df_indicadores))
             print(f"  {len(df_indicadores)} indicadores de energia carregados.")
         else:
@@ -374,11 +423,14 @@ def load_fato_indicadores_saneamento():
     """
     print("Carregando FatoIndicadorSaneamento...")
 
+    if sem_alteracoes("FatoIndicadorSaneamento", ENTRADAS["FatoIndicadorSaneamento"]):
+        return
+
     if not EXCEL_FILES["indicadores_saneamento"].exists():
         print("  Arquivo nao encontrado.")
         return
 
-    empresa_lookup = db.get_lookup("DimEmpresa", "EmpresaID", "EmpresaNome")
+    resolvedor = get_resolvedor()
 
     # Mapeamento de nomes abreviados para nomes completos
     nome_mapping = {
@@ -390,64 +442,44 @@ def load_fato_indicadores_saneamento():
     }
 
     try:
-        df = pd.read_excel(EXCEL_FILES["indicadores_saneamento"], sheet_name=0)
-
-        indicadores = []
-        for _, row in df.iterrows():
-            empresa_nome = row.get("Empresa")
-
-            # Tenta mapear nome abreviado
-            if empresa_nome in nome_mapping:
-                empresa_nome = nome_mapping[empresa_nome]
-
-            empresa_id = get_empresa_id(empresa_nome, empresa_lookup)
-
-            # Se nao encontrou, tenta buscar de forma mais flexivel
-            if not empresa_id:
-                empresa_nome = row.get("Empresa")
-                if empresa_nome:
-                    print(f"  Aviso: Empresa '{empresa_nome}' nao encontrada, pulando...")
-                continue
-
-            # Busca valores nas colunas de forma flexivel
-            volume_agua = None
-            volume_esgoto = None
-            pop_agua = None
-            pop_esgoto = None
-            instalacoes = None
-            carteira = None
-
-            for col in df.columns:
-                col_lower = str(col).lower()
-                val = row.get(col)
-                if pd.notna(val):
-                    if "gua" in col_lower and "tratada" in col_lower:
-                        volume_agua = limpar_valor_monetario(val)
-                    elif "esgoto" in col_lower and "tratado" in col_lower:
-                        volume_esgoto = limpar_valor_monetario(val)
-                    elif "popula" in col_lower and "gua" in col_lower:
-                        pop_agua = extrair_numero(val)
-                    elif "popula" in col_lower and "esgoto" in col_lower:
-                        pop_esgoto = extrair_numero(val)
-                    elif "instala" in col_lower:
-                        instalacoes = extrair_numero(val)
-                    elif "carteira" in col_lower:
-                        carteira = limpar_valor_monetario(val)
-
-            indicadores.append({
-                "EmpresaID": empresa_id,
-                "AnoReferencia": ANO_REFERENCIA,
-                "VolumeAguaTratada": volume_agua,
-                "VolumeEsgotoTratado": volume_esgoto,
-                "PopulacaoAtendidaAgua": pop_agua,
-                "PopulacaoAtendidaEsgoto": pop_esgoto,
-                "InstalacoesAdicionadas": instalacoes,
-                "ValorCarteira": carteira,
-            })
-
-        df_indicadores = pd.DataFrame(indicadores)
+        # Busca valores nas colunas de forma flexivel
+        def classificar(col_lower):
+            if "gua" in col_lower and "tratada" in col_lower:
+                return "VolumeAguaTratada"
+            elif "esgoto" in col_lower and "tratado" in col_lower:
+                return "VolumeEsgotoTratado"
+            elif "popula" in col_lower and "gua" in col_lower:
+                return "PopulacaoAtendidaAgua"
+            elif "popula" in col_lower and "esgoto" in col_lower:
+                return "PopulacaoAtendidaEsgoto"
+            elif "instala" in col_lower:
+                return "InstalacoesAdicionadas"
+            elif "carteira" in col_lower:
+                return "ValorCarteira"
+            return None
+
+        df = ler_planilha("indicadores_saneamento", sheet_name=0, colunas=colunas_classificadas(classificar))
+
+        # Tenta mapear nome abreviado
+        nomes = coluna(df, "Empresa")
+        empresa_ids = resolvedor.resolver_coluna(nomes.map(nome_mapping).fillna(nomes))
+        for empresa_nome in nomes[empresa_ids.isna()]:
+            if empresa_nome:
+                print(f"  Aviso: Empresa '{empresa_nome}' nao encontrada, pulando...")
+        df, empresa_ids = df[empresa_ids.notna()], empresa_ids[empresa_ids.notna()].astype("int64")
+
+        valores = valores_por_coluna(df, classificar, {
+            "VolumeAguaTratada": limpar_valor_monetario_coluna,
+            "VolumeEsgotoTratado": limpar_valor_monetario_coluna,
+            "PopulacaoAtendidaAgua": extrair_numero_coluna,
+            "PopulacaoAtendidaEsgoto": extrair_numero_coluna,
+            "InstalacoesAdicionadas": extrair_numero_coluna,
+            "ValorCarteira": limpar_valor_monetario_coluna,
+        })
+        df_indicadores = pd.concat([pd.DataFrame({"EmpresaID": empresa_ids, "AnoReferencia": ANO_REFERENCIA}),
+                                    valores], axis=1)
         if not df_indicadores.empty:
-            db.to_sql(df_indicadores, "FatoIndicadorSaneamento", if_exists="append")
+            carregar_fatias(df_indicadores, "FatoIndicadorSaneamento", ENTRADAS["FatoIndicadorSaneamento"])
             db.log_import("FatoIndicadorSaneamento", str(EXCEL_FILES["indicadores_saneamento"]), len(df_indicadores))
             print(f"  {len(df_indicadores)} indicadores de saneamento carregados.")
         else:
@@ -463,32 +495,26 @@ def load_fato_indicadores_saude():
     """
     print("Carregando FatoIndicadorSaude...")
 
+    if sem_alteracoes("FatoIndicadorSaude", ENTRADAS["FatoIndicadorSaude"]):
+        return
+
     if not EXCEL_FILES["empresa_saude"].exists():
         print("  Arquivo nao encontrado.")
         return
 
-    empresa_lookup = db.get_lookup("DimEmpresa", "EmpresaID", "EmpresaNome")
+    resolvedor = get_resolvedor()
 
     try:
-        df = pd.read_excel(EXCEL_FILES["empresa_saude"])
-
-        indicadores = []
-        for _, row in df.iterrows():
-            empresa_id = get_empresa_id(row.get("Empresa"), empresa_lookup)
-            if empresa_id:
-                indicadores.append({
-                    "EmpresaID": empresa_id,
-                    "AnoReferencia": ANO_REFERENCIA,
-                    "VagasUnidadesSaude": limpar_valor_monetario(row.get("Número de vagas em unidades de saúde ou pacientes atendidos")),
-                    "AumentoCapacidadeLeitos": limpar_valor_monetario(row.get("Aumento da capacidade de leitos hospitalares e/ou diminuição da densidade")),
-                    "ReducaoCustoTratamentos": limpar_valor_monetario(row.get("Redução de custos para tratamentos e medicamentos padrão")),
-                    "LeitosAdicionados": limpar_valor_monetario(row.get("Número de leitos hospitalares adicionados")),
-                    "PacientesBeneficiados": limpar_valor_monetario(row.get("Número de pacientes beneficiados por cuidados de saúde ou tratamentos médicos")),
-                })
-
-        df_indicadores = pd.DataFrame(indicadores)
+        df = ler_planilha("empresa_saude", colunas=["Empresa"] + list(COLUNAS_SAUDE))
+
+        df, empresa_ids = filtrar_empresas(df, resolvedor)
+        df_indicadores = pd.DataFrame({
+            "EmpresaID": empresa_ids,
+            "AnoReferencia": ANO_REFERENCIA,
+            **{campo: limpar_valor_monetario_coluna(coluna(df, nome)) for nome, campo in COLUNAS_SAUDE.items()},
+        })
         if not df_indicadores.empty:
-            db.to_sql(df_indicadores, "FatoIndicadorSaude", if_exists="append")
+            carregar_fatias(df_indicadores, "FatoIndicadorSaude", ENTRADAS["FatoIndicadorSaude"])
             db.log_import("FatoIndicadorSaude", str(EXCEL_FILES["empresa_saude"]), len(df_indicadores))
             print(f"  {len(df_indicadores)} indicadores de saude carregados.")
         else:
@@ -504,40 +530,41 @@ def load_fato_meta_2030():
     """
     print("Carregando FatoMeta2030...")
 
+    if sem_alteracoes("FatoMeta2030", ENTRADAS["FatoMeta2030"]):
+        return
+
     if not EXCEL_FILES["status_meta_2030"].exists():
         print("  Arquivo nao encontrado.")
         return
 
     try:
         # Sheet "Até 2030"
-        df_ate = pd.read_excel(EXCEL_FILES["status_meta_2030"], sheet_name="Até 2030")
-        for _, row in df_ate.iterrows():
-            indicador = row.get("Indicador")
-            valor = row.get("Valor")
-            if indicador and pd.notna(indicador):
-                query = """
-                INSERT INTO esg.FatoMeta2030 (Indicador, AnoReferencia, ValorMeta, UnidadeMedida)
-                VALUES (?, 2030, ?, 'R$')
-                """
-                db.execute_query(query, (str(indicador), limpar_valor_monetario(valor)))
+        df_ate = ler_planilha("status_meta_2030", sheet_name="Até 2030", colunas=["Indicador", "Valor"])
+        indicadores = coluna(df_ate, "Indicador")
+        df_ate = df_ate[preenchido(indicadores)]
+        df_metas = pd.DataFrame({
+            "Indicador": texto(indicadores[df_ate.index]),
+            "AnoReferencia": 2030,
+            "ValorMeta": limpar_valor_monetario_coluna(coluna(df_ate, "Valor")),
+            "UnidadeMedida": "R$",
+        })
 
         # Sheet "YoY"
-        df_yoy = pd.read_excel(EXCEL_FILES["status_meta_2030"], sheet_name="YoY")
-        for _, row in df_yoy.iterrows():
-            ano = row.get("Ano")
-            valor = row.get("Volume ESG Executado (R$)")
-            crescimento = row.get("Crescimento YoY")
-
-            if ano and pd.notna(ano):
-                # Limpa o crescimento (pode vir como % ou texto)
-                crescimento_limpo = limpar_valor_monetario(crescimento)
-
-                query = """
-                INSERT INTO esg.FatoMeta2030 (Indicador, AnoReferencia, ValorRealizado, CrescimentoYoY, UnidadeMedida)
-                VALUES ('Volume ESG Executado', ?, ?, ?, 'R$')
-                """
-                db.execute_query(query, (int(ano), limpar_valor_monetario(valor), crescimento_limpo))
-
+        df_yoy = ler_planilha("status_meta_2030", sheet_name="YoY",
+                              colunas=["Ano", "Volume ESG Executado (R$)", "Crescimento YoY"])
+        anos = coluna(df_yoy, "Ano")
+        df_yoy = df_yoy[preenchido(anos)]
+        df_realizado = pd.DataFrame({
+            "Indicador": "Volume ESG Executado",
+            "AnoReferencia": extrair_numero_coluna(anos[df_yoy.index]),
+            "ValorRealizado": limpar_valor_monetario_coluna(coluna(df_yoy, "Volume ESG Executado (R$)")),
+            # Crescimento pode vir como % ou texto
+            "CrescimentoYoY": limpar_valor_monetario_coluna(coluna(df_yoy, "Crescimento YoY")),
+            "UnidadeMedida": "R$",
+        })
+
+        carregar_fatias(pd.concat([df_metas, df_realizado], ignore_index=True), "FatoMeta2030",
+                        ENTRADAS["FatoMeta2030"], chaves=("Indicador", "AnoReferencia"))
         db.log_import("FatoMeta2030", str(EXCEL_FILES["status_meta_2030"]), len(df_ate) + len(df_yoy))
         print(f"  Metas 2030 carregadas.")
 
@@ -551,42 +578,34 @@ def load_validacao_empresas():
     """
     print("Carregando ValidacaoEmpresa...")
 
+    if sem_alteracoes("ValidacaoEmpresa", ENTRADAS["ValidacaoEmpresa"]):
+        return
+
     if not EXCEL_FILES["carteira_saneamento"].exists():
         print("  Arquivo nao encontrado.")
         return
 
-    empresa_lookup = db.get_lookup("DimEmpresa", "EmpresaID", "EmpresaNome")
+    resolvedor = get_resolvedor()
 
     try:
-        df = pd.read_excel(EXCEL_FILES["carteira_saneamento"], sheet_name="Empresas")
-
-        validacoes = []
-        for _, row in df.iterrows():
-            empresa_id = get_empresa_id(row.get("Empresa"), empresa_lookup)
-            if empresa_id:
-                def parse_bool(val):
-                    if pd.isna(val):
-                        return None
-                    val_str = str(val).lower().strip()
-                    return val_str in ["sim", "s", "yes", "y", "1", "true", "ok"]
-
-                validacoes.append({
-                    "EmpresaID": empresa_id,
-                    "AnoReferencia": ANO_REFERENCIA,
-                    "CategoriaGSS": row.get("Categoria_GSS"),
-                    "TaxonomiaFEBRABAN_OK": parse_bool(row.get("Taxonomia_FEBRABAN_OK")),
-                    "CNAE_OK": parse_bool(row.get("CNAE_OK")),
-                    "Exclusao": parse_bool(row.get("Exclusao")),
-                    "Conforme": parse_bool(row.get("Confome")),
-                    "EvidenciaCategoria": row.get("Evidencia_Categoria"),
-                    "EvidenciaTaxonomia": row.get("Evidencia_Taxonomia"),
-                    "EvidenciaCNAE": row.get("Evidencia_CNAE"),
-                    "EvidenciaExclusao": row.get("Evidencia_Exclusao"),
-                })
-
-        df_validacoes = pd.DataFrame(validacoes)
+        df = ler_planilha("carteira_saneamento", sheet_name="Empresas", colunas=COLUNAS_VALIDACAO)
+
+        df, empresa_ids = filtrar_empresas(df, resolvedor)
+        df_validacoes = pd.DataFrame({
+            "EmpresaID": empresa_ids,
+            "AnoReferencia": ANO_REFERENCIA,
+            "CategoriaGSS": coluna(df, "Categoria_GSS"),
+            "TaxonomiaFEBRABAN_OK": parse_bool_coluna(coluna(df, "Taxonomia_FEBRABAN_OK")),
+            "CNAE_OK": parse_bool_coluna(coluna(df, "CNAE_OK")),
+            "Exclusao": parse_bool_coluna(coluna(df, "Exclusao")),
+            "Conforme": parse_bool_coluna(coluna(df, "Confome")),
+            "EvidenciaCategoria": coluna(df, "Evidencia_Categoria"),
+            "EvidenciaTaxonomia": coluna(df, "Evidencia_Taxonomia"),
+            "EvidenciaCNAE": coluna(df, "Evidencia_CNAE"),
+            "EvidenciaExclusao": coluna(df, "Evidencia_Exclusao"),
+        })
         if not df_validacoes.empty:
-            db.to_sql(df_validacoes, "ValidacaoEmpresa", if_exists="append")
+            carregar_fatias(df_validacoes, "ValidacaoEmpresa", ENTRADAS["ValidacaoEmpresa"])
             db.log_import("ValidacaoEmpresa", str(EXCEL_FILES["carteira_saneamento"]), len(df_validacoes))
             print(f"  {len(df_validacoes)} validacoes carregadas.")
         else:
@@ -596,7 +615,33 @@ def load_validacao_empresas():
         print(f"  Erro: {e}")
 
 
-def run_fatos():
+def etapas_fatos() -> list:
+    """Loaders de fato como etapas do agendador (entradas: dimensoes usadas como lookup)."""
+    loaders = {
+        "FatoCarteira": load_fato_carteira,
+        "FatoKPI": load_fato_kpi,
+        "FatoIndicadorEnergia": load_fato_indicadores_energia,
+        "FatoIndicadorSaneamento": load_fato_indicadores_saneamento,
+        "FatoIndicadorSaude": load_fato_indicadores_saude,
+        "FatoMeta2030": load_fato_meta_2030,
+        "ValidacaoEmpresa": load_validacao_empresas,
+    }
+    return [Etapa(tabela, loader, [e for e in ENTRADAS[tabela] if isinstance(e, str)])
+            for tabela, loader in loaders.items()]
+
+
+def reiniciar_resolvedor():
+    """Descarta o indice de empresas (DimEmpresa pode ter mudado)."""
+    global _resolvedor
+    _resolvedor = None
+
+
+def imprimir_relatorio_resolvedor():
+    if _resolvedor is not None:
+        _resolvedor.imprimir_relatorio()
+
+
+def run_fatos(workers: int = WORKERS_PADRAO):
     """
     Executa todo o ETL de fatos.
     """
@@ -604,13 +649,9 @@ def run_fatos():
     print("ETL FATOS")
     print("=" * 60)
 
-    load_fato_carteira()
-    load_fato_kpi()
-    load_fato_indicadores_energia()
-    load_fato_indicadores_saneamento()
-    load_fato_indicadores_saude()
-    load_fato_meta_2030()
-    load_validacao_empresas()
+    reiniciar_resolvedor()
+    executar(etapas_fatos(), workers=workers)
+    imprimir_relatorio_resolvedor()
 
     print("\nETL Fatos concluido!")
 
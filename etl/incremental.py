@@ -0,0 +1,140 @@
+"""
+Carga incremental guiada pelo manifesto
+esg.manifestoimportacao guarda, por tabela carregada, o hash e o numero de
+linhas de cada entrada: abas de planilha (hash do arquivo) e dimensoes usadas
+como lookup (md5 do conteudo da tabela). Um loader cujas entradas nao mudaram
+e pulado.
+
+Nas fatos, esg.manifestofatias guarda o hash de cada fatia da tabela (linhas
+com a mesma chave, por padrao EmpresaID + AnoReferencia). Quando alguma
+entrada muda, o loader recalcula a tabela inteira (as abas vem do cache) e so
+as fatias com hash diferente sao apagadas e reinseridas; fatias que sumiram
+sao apagadas. Tudo roda na transacao do loader.
+
+Entradas: tuplas (chave de EXCEL_FILES, aba) ou nomes de tabelas do schema esg.
+"""
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+from config import DATA_DIR, EXCEL_FILES
+from database import db
+from planilhas import hash_arquivo, ler_planilha
+
+CHAVES_PADRAO = ("EmpresaID", "AnoReferencia")
+
+
+def manifesto_disponivel() -> bool:
+    """As tabelas do manifesto existem (sql_postgres/00_create_database.sql)?"""
+    resultado = db.execute_query("SELECT to_regclass('esg.manifestoimportacao'), to_regclass('esg.manifestofatias')")
+    return all(resultado[0])
+
+
+def _descrever(entrada):
+    """(arquivo, aba) como gravados no manifesto."""
+    if isinstance(entrada, str):
+        return f"esg.{entrada}", ""
+    arquivo, aba = entrada
+    caminho = EXCEL_FILES[arquivo]
+    try:
+        caminho = caminho.relative_to(DATA_DIR)
+    except ValueError:
+        pass
+    return str(caminho), str(aba)
+
+
+def estado_entradas(entradas) -> dict:
+    """{(arquivo, aba): (sha256, linhas)} do estado atual de cada entrada."""
+    estado = {}
+    for entrada in entradas:
+        if isinstance(entrada, str):
+            sha, linhas = db.execute_query(
+                f"SELECT md5(string_agg(t::text, '|' ORDER BY t::text)), COUNT(*) FROM esg.{entrada} t")[0]
+        else:
+            arquivo, aba = entrada
+            caminho = EXCEL_FILES[arquivo]
+            sha, linhas = None, None
+            if caminho.exists():
+                sha = hash_arquivo(caminho)
+                try:
+                    linhas = len(ler_planilha(arquivo, sheet_name=aba, colunas=[]))
+                except Exception:
+                    pass
+        estado[_descrever(entrada)] = (sha, linhas)
+    return estado
+
+
+def sem_alteracoes(tabela: str, entradas) -> bool:
+    """True se todas as entradas estao no manifesto da tabela com o mesmo hash."""
+    if not manifesto_disponivel():
+        return False
+    registrado = {(arquivo, aba): sha for arquivo, aba, sha in db.execute_query(
+        "SELECT arquivo, aba, sha256 FROM esg.manifestoimportacao WHERE tabeladestino = %s", (tabela,))}
+    atual = estado_entradas(entradas)
+    if all(chave in registrado and registrado[chave] == sha for chave, (sha, _) in atual.items()):
+        print(f"  Entradas sem alteracao desde a ultima carga, pulando {tabela}.")
+        return True
+    return False
+
+
+def registrar_entradas(tabela: str, entradas):
+    """Grava o estado atual das entradas como carregado."""
+    if not manifesto_disponivel():
+        return
+    linhas = [(tabela, arquivo, aba, sha, linhas) for (arquivo, aba), (sha, linhas) in estado_entradas(entradas).items()]
+    db.execute_query("DELETE FROM esg.manifestoimportacao WHERE tabeladestino = %s", (tabela,))
+    db.bulk_load(linhas, "manifestoimportacao", columns=["tabeladestino", "arquivo", "aba", "sha256", "linhas"])
+
+
+def hash_fatias(df: pd.DataFrame, chaves=CHAVES_PADRAO):
+    """
+    Chave (JSON) de cada linha e {chave: (sha256, linhas)} de cada fatia.
+    O hash da fatia nao depende da ordem das linhas.
+    """
+    valores = df[list(chaves)].astype(object)
+    chave = pd.Series([json.dumps(k) for k in valores.where(valores.notna(), None).values.tolist()],
+                      index=df.index, dtype=object)
+    hash_linhas = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    fatias = {}
+    for k, posicoes in chave.reset_index(drop=True).groupby(chave.to_numpy()).indices.items():
+        fatias[k] = (hashlib.sha256(np.sort(hash_linhas[posicoes]).tobytes()).hexdigest(), len(posicoes))
+    return chave, fatias
+
+
+def carregar_fatias(df: pd.DataFrame, tabela: str, entradas, chaves=CHAVES_PADRAO) -> int:
+    """
+    Substitui na tabela so as fatias que mudaram e registra as entradas.
+    Sem manifesto no banco, faz a carga completa (append). Retorna as linhas inseridas.
+    """
+    if not manifesto_disponivel():
+        return db.bulk_load(df, tabela)
+
+    chave, fatias = hash_fatias(df, chaves)
+    anteriores = dict(db.execute_query(
+        "SELECT chave, sha256 FROM esg.manifestofatias WHERE tabeladestino = %s", (tabela,)))
+    alteradas = [k for k, (sha, _) in fatias.items() if anteriores.get(k) != sha]
+    removidas = [k for k in anteriores if k not in fatias]
+
+    inseridas = 0
+    if alteradas or removidas:
+        filtro = " AND ".join(f"{c} IS NOT DISTINCT FROM %s" for c in chaves)
+        db.execute_many(f"DELETE FROM esg.{tabela} WHERE {filtro}", [tuple(json.loads(k)) for k in alteradas + removidas])
+        inseridas = db.bulk_load(df[chave.isin(alteradas)], tabela)
+
+        db.execute_many("DELETE FROM esg.manifestofatias WHERE tabeladestino = %s AND chave = %s",
+                        [(tabela, k) for k in alteradas + removidas])
+        db.bulk_load([(tabela, k, *fatias[k]) for k in alteradas], "manifestofatias",
+                     columns=["tabeladestino", "chave", "sha256", "linhas"])
+
+    registrar_entradas(tabela, entradas)
+    print(f"  Fatias: {len(alteradas)} alterada(s), {len(removidas)} removida(s), "
+          f"{len(fatias) - len(alteradas)} sem alteracao.")
+    return inseridas
+
+
+def limpar_manifesto():
+    """Esquece as cargas anteriores (a proxima execucao recarrega tudo)."""
+    if manifesto_disponivel():
+        db.execute_query("TRUNCATE TABLE esg.manifestoimportacao, esg.manifestofatias")
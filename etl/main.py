@@ -11,6 +11,19 @@ Uso:
     python main.py --dim        # Apenas dimensoes
     python main.py --fato       # Apenas fatos
     python main.py --truncate   # Limpa tabelas antes de carregar
+    python main.py --full       # Ignora o manifesto e recarrega todas as entradas
+    python main.py --workers 8  # Loaders independentes em paralelo (padrao: 4)
+    python main.py --profile    # Perfil de chama de cada etapa em .cache/perfil/
+
+Cada execucao registra o tempo, parse x banco, linhas/s, memoria e bytes lidos
+de cada etapa em esg.perfiletapa e em .cache/perfil/historico.jsonl.
+
+Por padrao a carga e incremental: loaders cujas planilhas e dimensoes nao
+mudaram desde a ultima carga sao pulados (ver incremental.py).
+
+Ao final da carga os indicadores dos emissores e os alertas antecipados sao
+materializados em emissores.indicadores e esg.alertas
+(api/materializar_indicadores.py, api/materializar_alertas.py), de onde a API os le.
 """
 
 import sys
@@ -18,10 +31,14 @@ import argparse
 from datetime import datetime
 
 # Imports locais
-from config import DB_CONFIG, EXCEL_FILES, CONNECTION_MODE
+from config import BASE_DIR, DB_CONFIG, EXCEL_FILES, CONNECTION_MODE
 from database import db
-from etl_dimensoes import run_dimensoes
-from etl_fatos import run_fatos
+import perfil
+from agendador import WORKERS_PADRAO, executar
+from etl_dimensoes import CHAVES_NATURAIS, etapas_dimensoes, remover_repetidas, run_dimensoes
+from etl_fatos import etapas_fatos, imprimir_relatorio_resolvedor, reiniciar_resolvedor, run_fatos
+from incremental import limpar_manifesto
+from planilhas import pre_carregar
 
 
 def print_header():
@@ -124,25 +141,62 @@ def truncate_all():
         "BridgeEmpresaCNAE",
     ]
 
-    for table in tables:
+    # Um unico TRUNCATE para as tabelas existentes (em vez de DELETE linha a linha)
+    existentes = [t for t in tables if db.execute_query("SELECT to_regclass(%s)", (f"esg.{t}",))[0][0]]
+    for table in sorted(set(tables) - set(existentes)):
+        print(f"  Aviso: tabela esg.{table} nao existe.")
+    if existentes:
         try:
-            db.execute_query(f"DELETE FROM esg.{table}")
-            print(f"  Tabela esg.{table} limpa.")
+            db.execute_query(f"TRUNCATE TABLE {', '.join('esg.' + t for t in existentes)} RESTART IDENTITY")
+            print(f"  {len(existentes)} tabelas de fato limpas.")
         except Exception as e:
-            print(f"  Aviso: {table} - {e}")
+            print(f"  Aviso: {e}")
+
+    # A proxima carga nao pode pular nenhuma entrada
+    limpar_manifesto()
 
-    # Reseta identity das dimensoes se necessario
-    dim_tables = ["DimEmpresa", "DimSubSetor", "DimProduto"]
-    for table in dim_tables:
+    # As dimensoes nao sao limpas: a carga faz upsert pela chave natural e os
+    # IDs continuam os mesmos. Com as fatos vazias, tira as linhas repetidas
+    # deixadas por cargas antigas (senao o indice da chave natural nao e criado).
+    for table in CHAVES_NATURAIS:
         try:
-            db.execute_query(f"DELETE FROM esg.{table}")
-            db.execute_query(f"DBCC CHECKIDENT ('esg.{table}', RESEED, 0)")
-            print(f"  Tabela esg.{table} limpa e identity resetado.")
+            removidas = remover_repetidas(table)
+            if removidas:
+                print(f"  {removidas} linhas repetidas removidas de esg.{table}.")
         except Exception as e:
             print(f"  Aviso: {table} - {e}")
 
 
-def run_full_etl(truncate: bool = False):
+def imprimir_estatisticas_lookup():
+    """Quantos lookups de dimensao sairam do cache e quantos foram lidos do banco."""
+    estatisticas = db.estatisticas_lookup()
+    total = estatisticas["acertos"] + estatisticas["faltas"]
+    if total:
+        print(f"\nLookups de dimensao: {total} consultas, {estatisticas['acertos']} do cache, "
+              f"{estatisticas['faltas']} lidas do banco")
+
+
+def materializar_indicadores():
+    """Recalcula os indices financeiros dos emissores (emissores.indicadores)."""
+    sys.path.append(str(BASE_DIR / "api"))
+    try:
+        from materializar_indicadores import executar
+        executar()
+    except Exception as e:
+        print(f"\nAviso: indicadores de emissores nao materializados - {e}")
+
+
+def materializar_alertas():
+    """Reavalia os alertas antecipados com os dados recem-carregados (esg.alertas)."""
+    sys.path.append(str(BASE_DIR / "api"))
+    try:
+        from materializar_alertas import executar
+        executar()
+    except Exception as e:
+        print(f"\nAviso: alertas nao materializados - {e}")
+
+
+def run_full_etl(truncate: bool = False, completo: bool = False, workers: int = WORKERS_PADRAO):
     """Executa o ETL completo."""
     print_header()
 
@@ -155,17 +209,29 @@ def run_full_etl(truncate: bool = False):
         print("\nNenhum arquivo Excel encontrado!")
         sys.exit(1)
 
-    # Truncate se solicitado
-    if truncate:
-        truncate_all()
-
-    # Executa ETL
-    print("\n" + "=" * 70)
-    print("INICIANDO ETL")
-    print("=" * 70)
-
-    run_dimensoes()
-    run_fatos()
+    # Le em paralelo as abas que ainda nao estao no cache
+    pre_carregar()
+
+    # Sessao da thread principal; cada loader roda com sessao e transacao proprias
+    with db.session():
+        # Truncate se solicitado
+        if truncate:
+            truncate_all()
+        elif completo:
+            limpar_manifesto()
+
+        # Executa ETL
+        print("\n" + "=" * 70)
+        print("INICIANDO ETL")
+        print("=" * 70)
+
+        # Dimensoes e fatos em um unico grafo: cada fato comeca assim que as
+        # dimensoes que ela usa estiverem carregadas
+        reiniciar_resolvedor()
+        db.limpar_lookups()
+        executar(etapas_dimensoes() + etapas_fatos(), workers=workers)
+        imprimir_relatorio_resolvedor()
+        imprimir_estatisticas_lookup()
 
     # Resumo final
     print("\n" + "=" * 70)
@@ -193,6 +259,9 @@ def run_full_etl(truncate: bool = False):
     except Exception as e:
         print(f"\nNao foi possivel obter estatisticas: {e}")
 
+    materializar_indicadores()
+    materializar_alertas()
+
     print("\n" + "=" * 70)
 
 
@@ -204,9 +273,16 @@ def main():
     parser.add_argument("--fato", action="store_true", help="Apenas carregar fatos")
     parser.add_argument("--truncate", action="store_true", help="Limpar tabelas antes de carregar")
     parser.add_argument("--check", action="store_true", help="Verificar arquivos")
+    parser.add_argument("--full", action="store_true", help="Recarregar tudo, ignorando o manifesto incremental")
+    parser.add_argument("--workers", type=int, default=WORKERS_PADRAO,
+                        help=f"Loaders em paralelo (padrao: {WORKERS_PADRAO})")
+    parser.add_argument("--profile", action="store_true", help="Gravar perfil de chama (.folded) de cada etapa")
 
     args = parser.parse_args()
 
+    if args.profile:
+        print(f"Perfil de chama das etapas em: {perfil.ativar_amostragem()}")
+
     if args.test:
         test_connection()
     elif args.check:
@@ -216,13 +292,20 @@ def main():
         if test_connection():
             if args.truncate:
                 truncate_all()
-            run_dimensoes()
+            elif args.full:
+                limpar_manifesto()
+            pre_carregar()
+            run_dimensoes(workers=args.workers)
     elif args.fato:
         print_header()
         if test_connection():
-            run_fatos()
+            if args.full:
+                limpar_manifesto()
+            pre_carregar()
+            run_fatos(workers=args.workers)
+            materializar_alertas()
     else:
-        run_full_etl(truncate=args.truncate)
+        run_full_etl(truncate=args.truncate, completo=args.full, workers=args.workers)
 
 
 if __name__ == "__main__":
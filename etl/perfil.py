@@ -0,0 +1,282 @@
+"""
+Perfil das etapas do ETL
+`with perfil.etapa(nome):` mede a etapa que roda na thread atual: tempo total,
+tempo de parse (leitura de planilhas/arquivos) e de banco, linhas, bytes lidos e
+o pico de memoria (RSS) do processo. planilhas.py e database.py marcam os seus
+trechos com `perfil.trecho("parse")` / `perfil.trecho("banco")`; fora de uma
+etapa as marcacoes nao custam nada.
+
+Com `ativar_amostragem(diretorio)` (--profile) uma thread amostra a pilha de cada
+etapa em execucao e grava `<etapa>.folded` (pilhas colapsadas, abre no
+speedscope ou no flamegraph.pl).
+
+So usa a biblioteca padrao: tambem e importado pelos scripts de etl/anbima.
+"""
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from config import PERFIL_DIR
+
+# Import opcional do resource (nao existe no Windows; sem ele o RSS fica vazio)
+try:
+    import resource
+except ImportError:
+    resource = None
+
+INTERVALO_AMOSTRAGEM = 0.005   # segundos entre amostras do --profile
+TIPOS_TRECHO = ("parse", "banco")
+
+_local = threading.local()
+_amostrador = None
+_concluidas = []          # medicoes ainda nao consumidas por concluidas()
+_lock_concluidas = threading.Lock()
+
+
+def pico_rss_mb() -> float:
+    """Maior RSS do processo ate agora, em MB (None sem o modulo resource)."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+class Medicao:
+    """Telemetria de uma etapa."""
+
+    def __init__(self, nome: str, arquivo: str = None):
+        self.nome = nome
+        self.arquivo = arquivo
+        self.inicio = datetime.now()
+        self.segundos = 0.0
+        self.tempos = dict.fromkeys(TIPOS_TRECHO, 0.0)
+        self.linhas = 0
+        self.bytes_lidos = 0
+        self.rss_pico_mb = None
+
+    @property
+    def linhas_por_segundo(self) -> float:
+        return self.linhas / self.segundos if self.segundos else 0.0
+
+    def como_dict(self) -> dict:
+        return {
+            "etapa": self.nome,
+            "arquivo": self.arquivo,
+            "inicio": self.inicio.isoformat(timespec="seconds"),
+            "segundos": round(self.segundos, 3),
+            "segundos_parse": round(self.tempos["parse"], 3),
+            "segundos_banco": round(self.tempos["banco"], 3),
+            "linhas": self.linhas,
+            "linhas_por_segundo": round(self.linhas_por_segundo, 1),
+            "bytes_lidos": self.bytes_lidos,
+            "rss_pico_mb": None if self.rss_pico_mb is None else round(self.rss_pico_mb, 1),
+        }
+
+
+def atual() -> Medicao:
+    """Medicao da etapa em execucao na thread (None fora de etapa)."""
+    return getattr(_local, "medicao", None)
+
+
+@contextmanager
+def etapa(nome: str, arquivo: str = None):
+    """Mede o bloco como uma etapa; devolve a Medicao (preenchida na saida)."""
+    medicao = Medicao(nome, arquivo)
+    anterior, _local.medicao = atual(), medicao
+    abertos, _local.abertos = getattr(_local, "abertos", set()), set()
+    amostrador = _amostrador
+    if amostrador is not None:
+        amostrador.registrar()
+    inicio = time.perf_counter()
+    try:
+        yield medicao
+    finally:
+        medicao.segundos = time.perf_counter() - inicio
+        medicao.rss_pico_mb = pico_rss_mb()
+        _local.medicao, _local.abertos = anterior, abertos
+        if amostrador is not None:
+            amostrador.gravar(nome, amostrador.liberar())
+        registrar(medicao)
+
+
+def registrar(medicao: Medicao):
+    """Guarda uma medicao concluida (as de etapa() entram sozinhas)."""
+    with _lock_concluidas:
+        _concluidas.append(medicao)
+
+
+def concluidas() -> list:
+    """Medicoes concluidas desde a ultima chamada."""
+    with _lock_concluidas:
+        medicoes = list(_concluidas)
+        _concluidas.clear()
+    return medicoes
+
+
+@contextmanager
+def trecho(tipo: str):
+    """Soma o tempo do bloco em tempos[tipo] da etapa atual (blocos aninhados contam uma vez)."""
+    medicao = atual()
+    if medicao is None or tipo in _local.abertos:
+        yield
+        return
+    _local.abertos.add(tipo)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicao.tempos[tipo] += time.perf_counter() - inicio
+        _local.abertos.discard(tipo)
+
+
+def contar(linhas: int = 0, bytes_lidos: int = 0):
+    """Soma linhas carregadas e bytes lidos na etapa atual."""
+    medicao = atual()
+    if medicao is not None:
+        medicao.linhas += int(linhas or 0)
+        medicao.bytes_lidos += int(bytes_lidos or 0)
+
+
+class _CursorMedido:
+    """Cursor DB-API cujas execucoes e leituras contam como tempo de banco."""
+
+    _MEDIDOS = {"execute", "executemany", "fetchone", "fetchmany", "fetchall"}
+
+    def __init__(self, cursor):
+        object.__setattr__(self, "_cursor", cursor)
+
+    def __getattr__(self, nome):
+        atributo = getattr(self._cursor, nome)
+        if nome not in self._MEDIDOS:
+            return atributo
+
+        def medido(*args, **kwargs):
+            with trecho("banco"):
+                return atributo(*args, **kwargs)
+        return medido
+
+    def __setattr__(self, nome, valor):
+        setattr(self._cursor, nome, valor)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class _ConexaoMedida:
+    """Conexao DB-API (ex: pyodbc) que devolve cursores medidos."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def cursor(self, *args, **kwargs):
+        return _CursorMedido(self._conn.cursor(*args, **kwargs))
+
+    def commit(self):
+        with trecho("banco"):
+            self._conn.commit()
+
+
+def conexao_medida(conn):
+    """Envolve uma conexao DB-API para somar o tempo de banco na etapa atual."""
+    return _ConexaoMedida(conn)
+
+
+# ----------------------------------------------------------------------
+# Perfil de chama (--profile)
+# ----------------------------------------------------------------------
+def _quadro(frame) -> str:
+    codigo = frame.f_code
+    return f"{codigo.co_name} ({Path(codigo.co_filename).name}:{codigo.co_firstlineno})".replace(";", ",")
+
+
+class _Amostrador(threading.Thread):
+    """Amostra periodicamente a pilha das threads que estao em uma etapa."""
+
+    def __init__(self, diretorio: Path, intervalo: float):
+        super().__init__(name="perfil-amostrador", daemon=True)
+        self.diretorio = diretorio
+        self.intervalo = intervalo
+        self.pilhas = {}   # thread -> Counter de pilhas colapsadas
+        self.lock = threading.Lock()
+
+    def registrar(self):
+        with self.lock:
+            self.pilhas[threading.get_ident()] = Counter()
+
+    def liberar(self) -> Counter:
+        with self.lock:
+            return self.pilhas.pop(threading.get_ident(), Counter())
+
+    def run(self):
+        while True:
+            time.sleep(self.intervalo)
+            frames = sys._current_frames()
+            with self.lock:
+                for thread, pilhas in self.pilhas.items():
+                    frame = frames.get(thread)
+                    quadros = []
+                    while frame is not None:
+                        quadros.append(_quadro(frame))
+                        frame = frame.f_back
+                    if quadros:
+                        pilhas[";".join(reversed(quadros))] += 1
+
+    def gravar(self, nome: str, pilhas: Counter):
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        destino = self.diretorio / (re.sub(r"[^\w-]+", "_", nome) + ".folded")
+        with open(destino, "w", encoding="utf-8") as f:
+            for pilha, amostras in pilhas.most_common():
+                f.write(f"{pilha} {amostras}\n")
+
+
+def ativar_amostragem(diretorio: Path = None, intervalo: float = INTERVALO_AMOSTRAGEM) -> Path:
+    """Liga o perfil de chama das proximas etapas. Retorna o diretorio dos .folded."""
+    global _amostrador
+    if _amostrador is None:
+        diretorio = Path(diretorio or PERFIL_DIR / datetime.now().strftime("%Y%m%d_%H%M%S"))
+        _amostrador = _Amostrador(diretorio, intervalo)
+        _amostrador.start()
+    return _amostrador.diretorio
+
+
+# ----------------------------------------------------------------------
+# Historico e resumo
+# ----------------------------------------------------------------------
+def gravar_historico(medicoes, arquivo: Path = None):
+    """Acrescenta as medicoes ao historico (JSON Lines) para acompanhar regressoes."""
+    arquivo = Path(arquivo or PERFIL_DIR / "historico.jsonl")
+    arquivo.parent.mkdir(parents=True, exist_ok=True)
+    with open(arquivo, "a", encoding="utf-8") as f:
+        for medicao in medicoes:
+            f.write(json.dumps(medicao.como_dict(), ensure_ascii=False) + "\n")
+
+
+def encerrar() -> list:
+    """Imprime e grava no historico as medicoes concluidas; retorna as medicoes."""
+    medicoes = concluidas()
+    if medicoes:
+        print("\nPerfil das etapas:")
+        imprimir(medicoes)
+        gravar_historico(medicoes)
+    return medicoes
+
+
+def imprimir(medicoes):
+    """Tabela de tempo, parse/banco, vazao, memoria e bytes lidos por etapa."""
+    if not medicoes:
+        return
+    print(f"  {'Etapa':<28} {'total':>8} {'parse':>8} {'banco':>8} {'linhas/s':>10} {'RSS MB':>8} {'MB lidos':>9}")
+    for m in sorted(medicoes, key=lambda m: m.segundos, reverse=True):
+        rss = f"{m.rss_pico_mb:8.0f}" if m.rss_pico_mb is not None else "       -"
+        print(f"  {m.nome:<28} {m.segundos:7.2f}s {m.tempos['parse']:7.2f}s {m.tempos['banco']:7.2f}s "
+              f"{m.linhas_por_segundo:10.0f} {rss} {m.bytes_lidos / 1e6:9.1f}")
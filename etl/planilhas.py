@@ -0,0 +1,357 @@
+"""
+Leitura das planilhas Excel com cache
+Cada aba lida e guardada em Parquet em CACHE_PLANILHAS_DIR, com chave pelo hash
+do conteudo do arquivo; caminho, mtime e tamanho evitam recalcular o hash de
+arquivos que nao mudaram. Releituras na mesma execucao saem da memoria.
+
+As abas sao lidas em streaming (ler_em_lotes): openpyxl em modo somente
+leitura, ou python-calamine quando instalado, linha a linha e tipadas em lotes
+pelo mesmo parser do pd.read_excel, sem montar a planilha inteira como objetos
+Python. Os loaders pedem so as colunas que usam (colunas=): do cache em
+Parquet sao lidas so essas colunas, e na leitura do Excel as demais celulas
+sao descartadas linha a linha.
+
+pre_carregar() le em paralelo (pool de processos) todas as abas usadas pelo
+ETL que ainda nao estao no cache.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+import perfil
+from config import CACHE_PLANILHAS_DIR, EXCEL_FILES
+
+# Import opcional do pyarrow (sem ele o cache usa pickle)
+try:
+    import pyarrow.parquet as pq
+    PARQUET_DISPONIVEL = True
+except ImportError:
+    PARQUET_DISPONIVEL = False
+
+# Import opcional do python-calamine (leitor em Rust; sem ele usa openpyxl)
+try:
+    import python_calamine
+    CALAMINE_DISPONIVEL = True
+except ImportError:
+    CALAMINE_DISPONIVEL = False
+
+LINHAS_POR_LOTE = 20000   # linhas tipadas por vez no leitor em streaming
+VERSAO_CACHE = 2          # muda quando a leitura passa a gerar abas diferentes (invalida o cache)
+ERROS_EXCEL = {"#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A"}
+
+# Abas lidas pelos loaders de etl_dimensoes e etl_fatos: (chave de EXCEL_FILES, aba)
+PLANILHAS_ETL = [
+    ("carteira", 0),
+    ("ods", 0),
+    ("metaods", 0),
+    ("de_para", "DE-PARA"),
+    ("status_meta_2030", "Até 2030"),
+    ("status_meta_2030", "YoY"),
+    ("energia_consolidado", 0),
+    ("energia_renovavel", 0),
+    ("kpi_enel", 0),
+    ("kpi_edp", 0),
+    ("kpi_engie", 0),
+    ("kpi_isa", 0),
+    ("kpi_taesa", 0),
+    ("kpi_maz", 0),
+    ("kpi_eneva", 0),
+    ("indicadores_saneamento", 0),
+    ("indicadores_saneamento", "Carteira Saneamento"),
+    ("carteira_saneamento", "Empresas"),
+    ("empresa_saude", 0),
+    ("carteira_saude", 0),
+    ("kpi_alianca", 0),
+    ("kpi_onco", 0),
+    ("educacao", 0),
+    ("inclusao_digital", 0),
+]
+
+_INDICE = "indice.json"
+_memoria = {}
+
+
+def _caminho(arquivo) -> Path:
+    return EXCEL_FILES[arquivo] if arquivo in EXCEL_FILES else Path(arquivo)
+
+
+def _ler_indice() -> dict:
+    try:
+        with open(CACHE_PLANILHAS_DIR / _INDICE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _gravar_indice(indice: dict):
+    CACHE_PLANILHAS_DIR.mkdir(parents=True, exist_ok=True)
+    temporario = CACHE_PLANILHAS_DIR / f"{_INDICE}.{os.getpid()}.{threading.get_ident()}"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(indice, f, ensure_ascii=False, indent=1)
+    os.replace(temporario, CACHE_PLANILHAS_DIR / _INDICE)
+
+
+def hash_arquivo(caminho: Path, indice: dict = None) -> str:
+    """SHA-256 do arquivo, reaproveitado do indice se caminho, mtime e tamanho nao mudaram."""
+    info = caminho.stat()
+    chave = str(caminho.resolve())
+    anterior = (_ler_indice() if indice is None else indice).get(chave)
+    if anterior and anterior["mtime"] == info.st_mtime_ns and anterior["tamanho"] == info.st_size:
+        return anterior["sha256"]
+
+    perfil.contar(bytes_lidos=info.st_size)
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            sha.update(bloco)
+    if indice is not None:
+        indice[chave] = {"mtime": info.st_mtime_ns, "tamanho": info.st_size, "sha256": sha.hexdigest()}
+    return sha.hexdigest()
+
+
+def _arquivo_cache(sha256: str, sheet_name) -> Path:
+    aba = re.sub(r"[^\w-]+", "_", str(sheet_name))
+    return CACHE_PLANILHAS_DIR / f"v{VERSAO_CACHE}_{sha256[:24]}_{aba}"
+
+
+def _selecionar(nomes: list, colunas) -> list:
+    """
+    Nomes de colunas a manter. colunas: None (todas), lista de nomes (as ausentes
+    sao ignoradas) ou funcao que recebe os nomes do cabecalho e devolve os que ficam.
+    """
+    if colunas is None:
+        return list(nomes)
+    escolhidas = colunas(list(nomes)) if callable(colunas) else colunas
+    return [nome for nome in dict.fromkeys(escolhidas) if nome in nomes]
+
+
+def _nomes_parquet(caminho: Path) -> list:
+    """Colunas do DataFrame gravado no Parquet, pelo metadado do pandas (sem ler os dados)."""
+    metadado = pq.read_schema(caminho).pandas_metadata
+    indices = {c for c in metadado["index_columns"] if isinstance(c, str)}
+    return [c["name"] for c in metadado["columns"] if c["field_name"] not in indices]
+
+
+def _ler_cache(base: Path, colunas=None):
+    if base.with_suffix(".parquet").exists() and PARQUET_DISPONIVEL:
+        perfil.contar(bytes_lidos=base.with_suffix(".parquet").stat().st_size)
+        if colunas is None:
+            return pd.read_parquet(base.with_suffix(".parquet"))
+        selecionadas = _selecionar(_nomes_parquet(base.with_suffix(".parquet")), colunas)
+        return pd.read_parquet(base.with_suffix(".parquet"), columns=selecionadas)
+    if base.with_suffix(".pkl").exists():
+        perfil.contar(bytes_lidos=base.with_suffix(".pkl").stat().st_size)
+        df = pd.read_pickle(base.with_suffix(".pkl"))
+        return df if colunas is None else df[_selecionar(df.columns, colunas)]
+    return None
+
+
+def _gravar_cache(df: pd.DataFrame, base: Path):
+    """Parquet quando a aba volta identica (colunas com tipos mistos ficam em pickle)."""
+    CACHE_PLANILHAS_DIR.mkdir(parents=True, exist_ok=True)
+    if PARQUET_DISPONIVEL:
+        destino = base.with_suffix(".parquet")
+        try:
+            df.to_parquet(destino, index=True)
+            if pd.read_parquet(destino).equals(df):
+                return
+        except Exception:
+            pass
+        destino.unlink(missing_ok=True)
+    df.to_pickle(base.with_suffix(".pkl"))
+
+
+# ----------------------------------------------------------------------
+# Leitura em streaming
+# ----------------------------------------------------------------------
+def _linhas_calamine(caminho: Path, sheet_name):
+    livro = python_calamine.load_workbook(str(caminho))
+    aba = livro.get_sheet_by_index(sheet_name) if isinstance(sheet_name, int) else livro.get_sheet_by_name(sheet_name)
+    yield from aba.iter_rows()
+
+
+def _linhas_openpyxl(caminho: Path, sheet_name):
+    livro = openpyxl.load_workbook(caminho, read_only=True, data_only=True, keep_links=False)
+    try:
+        aba = livro.worksheets[sheet_name] if isinstance(sheet_name, int) else livro[sheet_name]
+        aba.reset_dimensions()
+        yield from aba.iter_rows(values_only=True)
+    finally:
+        livro.close()
+
+
+def _celula(valor):
+    """Valor da celula como o pd.read_excel entrega ao parser."""
+    if valor is None:
+        return ""
+    if isinstance(valor, float):
+        return int(valor) if valor.is_integer() else valor
+    if isinstance(valor, str):
+        return np.nan if valor in ERROS_EXCEL else valor
+    if type(valor) is date:
+        return datetime(valor.year, valor.month, valor.day)
+    return valor
+
+
+def _linhas(caminho: Path, sheet_name):
+    """
+    Linhas da aba sem as celulas vazias do fim. Linhas vazias antes da primeira
+    preenchida (tabela que nao comeca na linha 1) e no fim da aba sao descartadas.
+    """
+    vazias = 0
+    inicio = True
+    for linha in (_linhas_calamine if CALAMINE_DISPONIVEL else _linhas_openpyxl)(caminho, sheet_name):
+        valores = [_celula(v) for v in linha]
+        while valores and valores[-1] == "":
+            valores.pop()
+        if not valores:
+            vazias += 1
+            continue
+        if not inicio:
+            yield from [[]] * vazias
+        vazias, inicio = 0, False
+        yield valores
+
+
+def ler_em_lotes(arquivo, sheet_name=0, colunas=None, linhas_por_lote: int = LINHAS_POR_LOTE):
+    """
+    Le a aba em streaming e gera DataFrames de ate linhas_por_lote linhas, com
+    indice continuo. O cabecalho (primeira linha preenchida) e lido uma vez e da
+    os nomes como no pd.read_excel (repetidos viram "X.1", vazios "Unnamed: n");
+    celulas alem do cabecalho sao ignoradas. colunas: ver _selecionar.
+    """
+    linhas = _linhas(_caminho(arquivo), sheet_name)
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        return
+    nomes = list(TextParser([cabecalho], header=0).read().columns)
+    selecionadas = _selecionar(nomes, colunas)
+    posicoes = [nomes.index(nome) for nome in selecionadas]
+
+    inicio = 0
+    for lote in iter(lambda: list(islice(linhas, linhas_por_lote)), []):
+        indice = pd.RangeIndex(inicio, inicio + len(lote))
+        inicio += len(lote)
+        if not posicoes:
+            yield pd.DataFrame(index=indice)
+            continue
+        valores = [[linha[i] if i < len(linha) else "" for i in posicoes] for linha in lote]
+        df = TextParser(valores, header=None, names=selecionadas, skip_blank_lines=False).read()
+        df.index = indice
+        yield df
+    if inicio == 0:
+        yield pd.DataFrame(columns=selecionadas)
+
+
+def ler_excel(arquivo, sheet_name=0, colunas=None) -> pd.DataFrame:
+    """A aba inteira (ou so as colunas pedidas) a partir de ler_em_lotes."""
+    lotes = list(ler_em_lotes(arquivo, sheet_name, colunas))
+    if not lotes:
+        return pd.DataFrame()
+    if len(lotes) == 1:
+        return lotes[0]
+    # Um lote todo vazio numa coluna de texto/data deixa a concatenacao como object
+    return pd.concat(lotes).infer_objects()
+
+
+def _parsear(caminho: str, sheet_name, base: str) -> tuple:
+    """Worker: le a aba do Excel e grava no cache. Retorna (segundos, linhas)."""
+    inicio = time.perf_counter()
+    df = ler_excel(caminho, sheet_name=sheet_name)
+    _gravar_cache(df, Path(base))
+    return time.perf_counter() - inicio, len(df)
+
+
+def ler_planilha(arquivo, sheet_name=0, colunas=None) -> pd.DataFrame:
+    """
+    Equivalente ao pd.read_excel, com cache. arquivo: chave de EXCEL_FILES ou caminho.
+    colunas (ver _selecionar) limita a leitura as colunas usadas pelo loader; essas
+    leituras nao ficam em memoria e, sem cache em disco, saem do Excel em streaming
+    (o cache da aba inteira e gravado pelo pre_carregar).
+    Retorna uma copia (o loader pode alterar o DataFrame a vontade).
+    """
+    with perfil.trecho("parse"):
+        caminho = _caminho(arquivo)
+        indice = _ler_indice()
+        anterior = indice.get(str(caminho.resolve()))
+        sha256 = hash_arquivo(caminho, indice)
+        if indice.get(str(caminho.resolve())) is not anterior:
+            _gravar_indice(indice)
+        chave = (sha256, sheet_name)
+
+        if colunas is not None:
+            if chave in _memoria:
+                df = _memoria[chave]
+                return df[_selecionar(df.columns, colunas)].copy()
+            df = _ler_cache(_arquivo_cache(sha256, sheet_name), colunas)
+            if df is None:
+                perfil.contar(bytes_lidos=caminho.stat().st_size)
+                df = ler_excel(caminho, sheet_name=sheet_name, colunas=colunas)
+            return df
+
+        if chave not in _memoria:
+            base = _arquivo_cache(sha256, sheet_name)
+            df = _ler_cache(base)
+            if df is None:
+                perfil.contar(bytes_lidos=caminho.stat().st_size)
+                df = ler_excel(caminho, sheet_name=sheet_name)
+                _gravar_cache(df, base)
+            _memoria[chave] = df
+        return _memoria[chave].copy()
+
+
+def pre_carregar(planilhas=None, workers: int = None) -> int:
+    """
+    Le em paralelo as abas que ainda nao estao no cache (padrao: PLANILHAS_ETL).
+    Retorna quantas abas foram lidas do Excel.
+    """
+    indice = _ler_indice()
+    pendentes = []
+    for arquivo, sheet_name in planilhas or PLANILHAS_ETL:
+        caminho = _caminho(arquivo)
+        if not caminho.exists():
+            continue
+        base = _arquivo_cache(hash_arquivo(caminho, indice), sheet_name)
+        if not base.with_suffix(".parquet").exists() and not base.with_suffix(".pkl").exists():
+            pendentes.append((str(caminho), sheet_name, str(base)))
+    _gravar_indice(indice)
+    if not pendentes:
+        return 0
+
+    workers = min(workers or os.cpu_count() or 1, len(pendentes))
+    print(f"Lendo {len(pendentes)} aba(s) do Excel em {workers} processo(s)...")
+    lidas = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = {pool.submit(_parsear, *p): p for p in pendentes}
+        for futuro in as_completed(futuros):
+            caminho, sheet_name, _ = futuros[futuro]
+            try:
+                segundos, linhas = futuro.result()
+                lidas += 1
+            except Exception as e:
+                print(f"  Aviso: {Path(caminho).name} [{sheet_name}] - {e}")
+                continue
+            # Uma medicao por aba: mostra qual planilha domina a leitura
+            medicao = perfil.Medicao(f"Planilha {Path(caminho).stem} [{sheet_name}]", caminho)
+            medicao.segundos = medicao.tempos["parse"] = segundos
+            medicao.linhas = linhas
+            medicao.bytes_lidos = Path(caminho).stat().st_size
+            perfil.registrar(medicao)
+    return lidas
+
+
+def limpar_memoria():
+    """Descarta as abas guardadas em memoria (o cache em disco continua valido)."""
+    _memoria.clear()
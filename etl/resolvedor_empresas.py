@@ -0,0 +1,122 @@
+"""
+Resolucao de nomes de empresas para EmpresaID
+Indice montado uma vez por execucao a partir do lookup de DimEmpresa, com as
+mesmas regras da busca linear original de etl_fatos.get_empresa_id:
+
+1. busca exata (nome em minusculas, sem espacos nas pontas);
+2. busca parcial: o nome procurado contido no nome da empresa ou o nome da
+   empresa contido no nome procurado.
+
+A parte "empresa contida no nome" usa um automato Aho-Corasick com todos os
+nomes; a parte "nome contido na empresa" usa postings de trigramas. Quando
+mais de uma empresa casa, vence a de menor EmpresaID (a primeira carregada),
+independente da ordem em que o banco devolveu o lookup, e o caso entra no
+relatorio de ambiguidades.
+"""
+import pandas as pd
+
+from classificador import Automato
+
+TAMANHO_NGRAMA = 3
+
+
+def normalizar(nome) -> str:
+    return str(nome).strip().lower()
+
+
+def _ngramas(texto: str) -> set:
+    return {texto[i:i + TAMANHO_NGRAMA] for i in range(len(texto) - TAMANHO_NGRAMA + 1)}
+
+
+class ResolvedorEmpresas:
+    """Indice nome -> EmpresaID (exato, Aho-Corasick e trigramas)."""
+
+    def __init__(self, empresa_lookup: dict):
+        """empresa_lookup: {EmpresaNome: EmpresaID} (db.get_lookup de DimEmpresa)."""
+        entradas = sorted(empresa_lookup.items(), key=lambda item: (item[1], str(item[0])))
+        self.nomes = [nome for nome, _ in entradas]
+        self.ids = [id for _, id in entradas]
+        self.chaves = [str(nome).lower() for nome in self.nomes]
+
+        # Busca exata: chave -> posicoes (em ordem de EmpresaID)
+        self.exatos = {}
+        for pos, chave in enumerate(self.chaves):
+            self.exatos.setdefault(chave, []).append(pos)
+
+        # "nome procurado contido na empresa": trigrama -> posicoes
+        self.postings = {}
+        for pos, chave in enumerate(self.chaves):
+            for ngrama in _ngramas(chave):
+                self.postings.setdefault(ngrama, set()).add(pos)
+
+        # "empresa contida no nome procurado": Aho-Corasick com todos os nomes
+        self.automato = Automato(self.chaves)
+        self._cache = {}
+        self.ambiguos = {}
+
+    @classmethod
+    def do_banco(cls, db):
+        """Monta o indice a partir de esg.DimEmpresa."""
+        return cls(db.get_lookup("DimEmpresa", "EmpresaID", "EmpresaNome"))
+
+    def _contidas_no_nome(self, texto: str) -> set:
+        """Posicoes das empresas cujo nome aparece dentro do texto."""
+        return self.automato.encontrar(texto)
+
+    def _que_contem(self, texto: str) -> set:
+        """Posicoes das empresas cujo nome contem o texto."""
+        if len(texto) < TAMANHO_NGRAMA:
+            candidatas = range(len(self.chaves))
+        else:
+            listas = sorted((self.postings.get(g, set()) for g in _ngramas(texto)), key=len)
+            candidatas = set.intersection(*listas)
+        return {pos for pos in candidatas if texto in self.chaves[pos]}
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+    def resolver(self, empresa_nome) -> int:
+        """EmpresaID do nome (None se nao encontrado)."""
+        if not empresa_nome or pd.isna(empresa_nome):
+            return None
+
+        texto = normalizar(empresa_nome)
+        if texto not in self._cache:
+            self._cache[texto] = self._buscar(texto)
+        return self._cache[texto]
+
+    def _buscar(self, texto: str) -> int:
+        posicoes = self.exatos.get(texto)
+        if not posicoes:
+            posicoes = sorted(self._contidas_no_nome(texto) | self._que_contem(texto))
+        if not posicoes:
+            return None
+
+        escolhida = posicoes[0]
+        if len({self.ids[p] for p in posicoes}) > 1:
+            self.ambiguos[texto] = {
+                "nome": texto,
+                "escolhida": self.nomes[escolhida],
+                "empresa_id": self.ids[escolhida],
+                "candidatas": [self.nomes[p] for p in posicoes],
+            }
+        return self.ids[escolhida]
+
+    def resolver_coluna(self, nomes: pd.Series) -> pd.Series:
+        """resolver por coluna: cada nome distinto e resolvido uma unica vez."""
+        distintos = nomes.dropna().unique()
+        return nomes.map({nome: self.resolver(nome) for nome in distintos})
+
+    def relatorio_ambiguos(self) -> list:
+        """Nomes que casaram com mais de uma empresa, com a escolhida e as candidatas."""
+        return [self.ambiguos[texto] for texto in sorted(self.ambiguos)]
+
+    def imprimir_relatorio(self):
+        ambiguos = self.relatorio_ambiguos()
+        if not ambiguos:
+            return
+        print(f"\n  Aviso: {len(ambiguos)} nome(s) de empresa com mais de uma correspondencia:")
+        for item in ambiguos:
+            outras = [c for c in item["candidatas"] if c != item["escolhida"]]
+            print(f"    '{item['nome']}' -> {item['escolhida']} (ID {item['empresa_id']}); "
+                  f"tambem casa com: {', '.join(map(str, outras))}")
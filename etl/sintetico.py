@@ -0,0 +1,346 @@
+"""
+Planilhas sinteticas para benchmark do ETL
+Gera versoes ficticias de todos os arquivos de EXCEL_FILES com as mesmas abas
+e os mesmos cabecalhos lidos pelos loaders de etl_dimensoes e etl_fatos, e
+valores "sujos" como nas planilhas reais ("R$ 1.234,56", "9 novas instalacoes",
+CNPJ sem zeros a esquerda, Sim/NAO/ok, celulas vazias, espacos sobrando).
+
+O numero de linhas de cada planilha e a base (tamanho aproximado das reais)
+vezes o multiplicador (1x a 1000x). Os arquivos ficam na mesma estrutura de
+pastas de DATA_DIR; para rodar o ETL com eles use ETL_DATA_DIR=<destino>
+(ver benchmark.py).
+
+Uso:
+    python sintetico.py <destino> [--multiplicador 10] [--semente 42]
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import DATA_DIR, EXCEL_FILES
+
+MULTIPLICADOR_MAXIMO = 1000
+
+SETORES = ["Energia", "Saneamento", "Saude", "Educacao", "Inclusao Digital"]
+CATEGORIAS = ["Green", "Social", "Sustainable"]
+TEMAS = ["Meio Ambiente", "Social", "Governanca"]
+PRODUTOS = ["CCB", "Debenture", "CDCA", "Fianca", "Capital de Giro", "Leasing", "FINAME", "CPR"]
+SUBSETORES = {
+    "Energia": ["Energia Renovavel", "Eficiencia Energetica", "Transmissao de Energia", "Geracao Termica"],
+    "Saude": ["Hospitais", "Clinicas", "Laboratorios"],
+    "Educacao": ["Ensino Superior", "Educacao Basica", "Formacao Profissional"],
+    "Inclusao Digital": ["Telecomunicacoes", "Conectividade Rural"],
+}
+SUFIXOS = ["S.A.", "S/A", "LTDA", "S.A", "PARTICIPACOES S.A."]
+SANEAMENTO_ABREVIADO = ["CESAN", "COMPESA", "EMBASA", "IGUA RJ", "CASAN"]
+SANEAMENTO_COMPLETO = ["CATARINENSE DE AGUAS", "PERNAMBUCANA DE SANEAMENTO", "BAIANA DE AGUAS", "IGUA RIO",
+                       "CATARINENSE"]
+
+# Linhas por planilha no multiplicador 1 (ordem de grandeza das planilhas reais)
+LINHAS_BASE = {
+    "carteira": 60,
+    "ods": 25,
+    "metaods": 170,
+    "de_para": 400,
+    "tabela_social": 30,
+    "status_meta_2030": 6,
+    "energia_consolidado": 40,
+    "energia_renovavel": 80,
+    "kpi": 20,
+    "indicadores_saneamento": 25,
+    "carteira_saneamento": 30,
+    "empresa_saude": 20,
+    "carteira_saude": 40,
+    "educacao": 30,
+    "inclusao_digital": 30,
+}
+
+
+class Gerador:
+    """Valores sinteticos (deterministicos pela semente)."""
+
+    def __init__(self, multiplicador: int = 1, semente: int = 42):
+        if not 1 <= multiplicador <= MULTIPLICADOR_MAXIMO:
+            raise ValueError(f"multiplicador deve estar entre 1 e {MULTIPLICADOR_MAXIMO}")
+        self.multiplicador = multiplicador
+        self.rng = np.random.default_rng(semente)
+        self.empresas = {setor: self._nomes_empresas(setor, 12 * multiplicador) for setor in SETORES}
+
+    def linhas(self, chave: str) -> int:
+        return LINHAS_BASE[chave] * self.multiplicador
+
+    def escolher(self, valores, n: int) -> list:
+        return [valores[i] for i in self.rng.integers(0, len(valores), n)]
+
+    def vazios(self, valores: list, fracao: float = 0.05) -> list:
+        """Troca uma fracao dos valores por celulas vazias."""
+        return [None if v else valor for valor, v in zip(valores, self.rng.random(len(valores)) < fracao)]
+
+    def _nomes_empresas(self, setor: str, n: int) -> list:
+        sufixos = self.escolher(SUFIXOS, n)
+        return [f"{setor.upper()} SINTETICA {i + 1:05d} {sufixo}" for i, sufixo in enumerate(sufixos)]
+
+    def nomes(self, setor: str, n: int) -> list:
+        """Nomes da carteira do setor com as variacoes das planilhas (caixa e espacos)."""
+        nomes = self.escolher(self.empresas[setor], n)
+        sorteio = self.rng.random(n)
+        return [nome.title() if s < 0.1 else f" {nome}  " if s < 0.2 else nome for nome, s in zip(nomes, sorteio)]
+
+    def cnpjs(self, n: int) -> list:
+        """CNPJ formatado, so digitos ou numero (sem os zeros a esquerda)."""
+        digitos = [f"{d:014d}" for d in self.rng.integers(10 ** 11, 10 ** 14, n)]
+        formatos = self.rng.integers(0, 3, n)
+        return [f"{d[:2]}.{d[2:5]}.{d[5:8]}/{d[8:12]}-{d[12:]}" if f == 0 else d if f == 1 else int(d)
+                for d, f in zip(digitos, formatos)]
+
+    def monetarios(self, n: int, maximo: float = 5e8) -> list:
+        """Valores em reais como numero, "R$ 1.234,56" ou "1.234.567" (e alguns "-")."""
+        valores = self.rng.uniform(maximo / 1e4, maximo, n).round(2)
+        formatos = self.rng.random(n)
+        resultado = []
+        for valor, f in zip(valores, formatos):
+            brasileiro = f"{valor:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+            if f < 0.4:
+                resultado.append(float(valor))
+            elif f < 0.75:
+                resultado.append(f"R$ {brasileiro}")
+            elif f < 0.9:
+                resultado.append(f" {brasileiro.split(',')[0]} ")
+            elif f < 0.95:
+                resultado.append("-")
+            else:
+                resultado.append(None)
+        return resultado
+
+    def contagens(self, n: int, unidade: str, maximo: int = 50000) -> list:
+        """Quantidades como numero ou texto ("9 novas instalacoes")."""
+        valores = self.rng.integers(1, maximo, n)
+        formatos = self.rng.random(n)
+        return [int(v) if f < 0.5 else f"{v} {unidade}" if f < 0.8 else f"aprox. {v:,} {unidade}".replace(",", ".")
+                if f < 0.95 else None for v, f in zip(valores, formatos)]
+
+    def booleanos(self, n: int) -> list:
+        return self.escolher(["Sim", "SIM", "s", "ok", "Nao", "NÃO", "n", "", None], n)
+
+    def textos(self, prefixo: str, n: int) -> list:
+        return self.vazios([f"{prefixo} {i + 1}: verificado em relatorio anual" for i in range(n)], 0.2)
+
+
+# ----------------------------------------------------------------------
+# Abas de cada arquivo: {nome da aba: DataFrame}
+# ----------------------------------------------------------------------
+def _carteira_setor(g: Gerador, chave: str, setor: str, lido: bool = False) -> dict:
+    n = g.linhas(chave)
+    df = pd.DataFrame({
+        "Empresa": g.vazios(g.nomes(setor, n), 0.02),
+        "CNPJ": g.vazios(g.cnpjs(n), 0.05),
+        "Setor": setor,
+        "SubSetor": g.vazios(g.escolher(SUBSETORES.get(setor, [setor]), n), 0.1),
+        "Categoria": g.vazios(g.escolher(CATEGORIAS, n)),
+        "Tema": g.vazios(g.escolher(TEMAS, n)),
+        "Produto": g.vazios(g.escolher(PRODUTOS, n), 0.1),
+        "Total Carteira": g.monetarios(n),
+    })
+    if lido:
+        df["Lido"] = g.escolher(["Lido", "Nao Lido"], n)
+    return {"Planilha1": df}
+
+
+def _kpi(g: Gerador, chave: str) -> dict:
+    """Arquivos de KPI: cada empresa usa nomes de colunas diferentes."""
+    n = g.linhas("kpi")
+    nomes_kpi = ["Capacidade instalada (MW)", "Geração de energia renovável (MWh)", "Emissões de CO2 evitadas",
+                 "Redução no consumo", "Eficiência energética (%)", "Geração solar fotovoltaica",
+                 "Geração eólica", "Pacientes atendidos", "Leitos adicionados"]
+    variante = sorted(k for k in EXCEL_FILES if k.startswith("kpi_")).index(chave) % 3
+    coluna_kpi, coluna_valor, coluna_fonte = [
+        ("KPI", "Valor 2024", "Fonte"),
+        ("Indicador", "Total 2024", "Explicação"),
+        ("Metrica", "Quantidade", "Observações"),
+    ][variante]
+    valores = g.rng.uniform(0, 5000, n).round(1)
+    formatos = g.rng.random(n)
+    return {"KPIs": pd.DataFrame({
+        coluna_kpi: g.vazios(g.escolher(nomes_kpi, n), 0.05),
+        coluna_valor: [float(v) if f < 0.4 else f"{v:.1f}".replace(".", ",") if f < 0.7 else f"{v:.1f}%"
+                       if f < 0.85 else "não informado" for v, f in zip(valores, formatos)],
+        "Unidade": g.escolher(["MW", "MWh", "tCO2e", "%", "pacientes"], n),
+        coluna_fonte: g.textos("Relatorio de sustentabilidade, pagina", n),
+    })}
+
+
+def _abas(g: Gerador, chave: str) -> dict:
+    if chave in ("carteira_saude", "educacao", "inclusao_digital", "tabela_social", "energia_renovavel"):
+        setor = {"carteira_saude": "Saude", "energia_renovavel": "Energia", "inclusao_digital": "Inclusao Digital"}
+        return _carteira_setor(g, chave, setor.get(chave, "Educacao"), lido=chave == "energia_renovavel")
+
+    if chave.startswith("kpi_"):
+        return _kpi(g, chave)
+
+    if chave == "carteira":
+        n = g.linhas(chave)
+        setores = g.escolher(SETORES, n)
+        return {"Carteira": pd.DataFrame({
+            "Empresa": [g.nomes(setor, 1)[0] for setor in setores],
+            "Setor": g.vazios(setores, 0.05),
+        })}
+
+    if chave == "ods":
+        n = g.linhas(chave)
+        kpis = ["Capacidade Instalada", "Percentual de Energia", "Emissoes de CO2", "Volume de Agua Tratada",
+                "Volume de Esgoto", "Pacientes Atendidos", "Leitos Hospitalares", "Valor Total da Carteira"]
+        secundarias = [", ".join(str(o) for o in g.rng.choice(np.arange(1, 18), k, replace=False))
+                       for k in g.rng.integers(0, 4, n)]
+        return {"ODS": pd.DataFrame({
+            "KPI": g.escolher(kpis, n),
+            "ODS primária (nº)": g.vazios(list(g.rng.integers(1, 18, n)), 0.05),
+            "ODS secundárias (nº)": g.vazios(secundarias, 0.2),
+        })}
+
+    if chave == "metaods":
+        n = g.linhas(chave)
+        ods = g.rng.integers(1, 18, n)
+        return {"Metas": pd.DataFrame({
+            "ODS": g.vazios(list(ods), 0.02),
+            "Meta ODS primária (código)": [f"{o}.{i % 9 + 1}" for i, o in enumerate(ods)],
+            "Meta ODS primária (descrição resumida)": [f"Meta sintetica {i + 1} do ODS {o}" for i, o in enumerate(ods)],
+            "Indicador ONU sugerido": g.textos("Indicador", n),
+        })}
+
+    if chave == "de_para":
+        n = g.linhas(chave)
+        cnaes = g.rng.choice(9_000_000, n, replace=False) + 1_000_000
+        setores = g.escolher(SETORES, n)
+        return {"DE-PARA": pd.DataFrame({
+            "Cnae": g.vazios(list(cnaes), 0.01),
+            "ClasseBV": g.escolher(CATEGORIAS, n),
+            "SubSetorBV": [g.escolher(SUBSETORES.get(s, [s]), 1)[0] for s in setores],
+            "SetorBV": setores,
+            "ProjetoBV": g.textos("Projeto", n),
+            "CategoriaBV": g.escolher(CATEGORIAS, n),
+            "ProjetoIBGE": g.textos("Projeto IBGE", n),
+            "CategoriaIBGE": g.escolher(["A", "B", "C", "D"], n),
+            "MacroIBGE": g.escolher(["Industria", "Servicos", "Agropecuaria"], n),
+            "Divisao": [c // 100000 for c in cnaes],
+            "Grupo": [c // 10000 for c in cnaes],
+            "Classe": [c // 100 for c in cnaes],
+            "Subsetor": g.vazios(g.escolher(sum(SUBSETORES.values(), []), n), 0.1),
+            "Observacoes": g.textos("Obs", n),
+        })}
+
+    if chave == "status_meta_2030":
+        n = g.linhas(chave)
+        anos = list(range(2030 - n, 2030))
+        return {
+            "Até 2030": pd.DataFrame({
+                "Indicador": g.vazios([f"Meta ESG sintetica {i + 1}" for i in range(n)], 0.1),
+                "Valor": g.monetarios(n, 5e10),
+            }),
+            "YoY": pd.DataFrame({
+                "Ano": [str(a) if i % 2 else a for i, a in enumerate(anos)],
+                "Volume ESG Executado (R$)": g.monetarios(n, 5e10),
+                "Crescimento YoY": [f"{v:.1f}%".replace(".", ",") for v in g.rng.uniform(-10, 60, n)],
+            }),
+        }
+
+    if chave == "energia_consolidado":
+        n = g.linhas(chave)
+        return {"Consolidado": pd.DataFrame({
+            "Empresa": g.nomes("Energia", n),
+            "Capacidade Instalada (MW)": g.monetarios(n, 3000),
+            "Geração Renovável (MWh)": g.monetarios(n, 5e6),
+            "Emissões Evitadas GEE (tCO2e)": g.monetarios(n, 1e6),
+            "Total Carteira": g.monetarios(n),
+        })}
+
+    if chave == "indicadores_saneamento":
+        n = g.linhas(chave)
+        nomes = g.nomes("Saneamento", n)
+        for i in range(min(n, len(SANEAMENTO_ABREVIADO))):
+            nomes[i] = SANEAMENTO_ABREVIADO[i]
+        carteira = g.linhas("carteira_saneamento")
+        nomes_carteira = g.nomes("Saneamento", carteira)
+        for i in range(min(carteira, len(SANEAMENTO_COMPLETO))):
+            nomes_carteira[i] = SANEAMENTO_COMPLETO[i]
+        return {
+            "Indicadores": pd.DataFrame({
+                "Empresa": nomes,
+                "Volume de Água Tratada (m³)": g.monetarios(n, 1e8),
+                "Volume de Esgoto Tratado (m³)": g.monetarios(n, 1e8),
+                "População Atendida com Água": g.contagens(n, "habitantes", 5_000_000),
+                "População Atendida com Esgoto": g.contagens(n, "habitantes", 5_000_000),
+                "Instalações Adicionadas": g.contagens(n, "novas instalacoes", 40),
+                "Carteira BV (R$)": g.monetarios(n),
+            }),
+            "Carteira Saneamento": pd.DataFrame({
+                "Empresa": nomes_carteira,
+                "CNPJ": g.cnpjs(carteira),
+                "Categoria": g.escolher(CATEGORIAS, carteira),
+                "Tema": g.escolher(TEMAS, carteira),
+                "Carteira": g.monetarios(carteira),
+            }),
+        }
+
+    if chave == "carteira_saneamento":
+        n = g.linhas(chave)
+        return {"Empresas": pd.DataFrame({
+            "Empresa": g.nomes("Saneamento", n),
+            "Categoria_GSS": g.escolher(["Green", "Social", "Sustainability"], n),
+            "Taxonomia_FEBRABAN_OK": g.booleanos(n),
+            "CNAE_OK": g.booleanos(n),
+            "Exclusao": g.booleanos(n),
+            "Confome": g.booleanos(n),
+            "Evidencia_Categoria": g.textos("Evidencia categoria", n),
+            "Evidencia_Taxonomia": g.textos("Evidencia taxonomia", n),
+            "Evidencia_CNAE": g.textos("Evidencia CNAE", n),
+            "Evidencia_Exclusao": g.textos("Evidencia exclusao", n),
+        })}
+
+    if chave == "empresa_saude":
+        n = g.linhas(chave)
+        return {"Indicadores": pd.DataFrame({
+            "Empresa": g.nomes("Saude", n),
+            "Número de vagas em unidades de saúde ou pacientes atendidos": g.contagens(n, "pacientes"),
+            "Aumento da capacidade de leitos hospitalares e/ou diminuição da densidade": g.contagens(n, "leitos", 500),
+            "Redução de custos para tratamentos e medicamentos padrão": g.monetarios(n, 1e7),
+            "Número de leitos hospitalares adicionados": g.contagens(n, "leitos", 500),
+            "Número de pacientes beneficiados por cuidados de saúde ou tratamentos médicos": g.contagens(n, "pacientes"),
+        })}
+
+    raise KeyError(f"Sem esquema sintetico para '{chave}'")
+
+
+def gerar(destino, multiplicador: int = 1, semente: int = 42) -> dict:
+    """
+    Grava as planilhas sinteticas em destino (mesma estrutura de DATA_DIR).
+    Retorna {chave de EXCEL_FILES: caminho gerado}.
+    """
+    destino = Path(destino)
+    gerador = Gerador(multiplicador, semente)
+    gerados = {}
+    for chave, caminho in EXCEL_FILES.items():
+        abas = _abas(gerador, chave)
+        arquivo = destino / caminho.relative_to(DATA_DIR)
+        arquivo.parent.mkdir(parents=True, exist_ok=True)
+        with pd.ExcelWriter(arquivo) as writer:
+            for aba, df in abas.items():
+                df.to_excel(writer, sheet_name=aba, index=False)
+        gerados[chave] = arquivo
+    return gerados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera planilhas sinteticas no formato de EXCEL_FILES")
+    parser.add_argument("destino", help="Pasta de saida (use como ETL_DATA_DIR)")
+    parser.add_argument("--multiplicador", type=int, default=1, help=f"Linhas x N (1 a {MULTIPLICADOR_MAXIMO})")
+    parser.add_argument("--semente", type=int, default=42, help="Semente dos valores aleatorios")
+    args = parser.parse_args()
+
+    gerados = gerar(args.destino, args.multiplicador, args.semente)
+    print(f"{len(gerados)} planilhas geradas em {args.destino} (multiplicador {args.multiplicador}x)")
+
+
+if __name__ == "__main__":
+    main()
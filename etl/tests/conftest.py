@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Os modulos do ETL sao importados pelo nome (como em main.py)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,41 @@
+import openpyxl
+import pandas as pd
+
+import etl_fatos
+import planilhas
+
+
+class _Resolvedor:
+    def resolver(self, nome):
+        return 7
+
+
+def test_load_fato_kpi_le_a_planilha(tmp_path, monkeypatch):
+    livro = openpyxl.Workbook()
+    aba = livro.active
+    aba.append(["KPI", "Valor 2024", "Unidade", "Fonte"])
+    aba.append(["Capacidade instalada (MW)", "1.250,5", "MW", "Relatorio anual"])
+    aba.append(["Emissoes de CO2 evitadas", 300, "tCO2", None])
+    caminho = tmp_path / "kpi.xlsx"
+    livro.save(caminho)
+
+    carregados = []
+    monkeypatch.setattr(planilhas, "CACHE_PLANILHAS_DIR", tmp_path / "cache")
+    monkeypatch.setattr(planilhas, "EXCEL_FILES", {"kpi_enel": caminho})
+    monkeypatch.setattr(etl_fatos, "EXCEL_FILES", {"kpi_enel": caminho})
+    monkeypatch.setattr(etl_fatos, "sem_alteracoes", lambda *a: False)
+    monkeypatch.setattr(etl_fatos, "get_resolvedor", lambda: _Resolvedor())
+    monkeypatch.setattr(etl_fatos.db, "get_lookup", lambda *a: {"Energia": 1})
+    monkeypatch.setattr(etl_fatos.db, "log_import", lambda *a: None)
+    monkeypatch.setattr(etl_fatos, "carregar_fatias", lambda df, *a, **k: carregados.append(df))
+
+    etl_fatos.load_fato_kpi()
+
+    assert len(carregados) == 1
+    df = carregados[0]
+    assert df["EmpresaID"].tolist() == [7, 7]
+    assert df["TipoKPIID"].tolist() == [1, 3]
+    assert df["ValorTexto"].iloc[0] == "1.250,5"
+    assert df["ValorNumerico"].iloc[1] == 300
+    assert df["FonteDados"].iloc[0] == "Relatorio anual"
+    assert pd.isna(df["FonteDados"].iloc[1])
@@ -0,0 +1,47 @@
+import openpyxl
+import pandas as pd
+import pytest
+
+import planilhas
+
+
+def _planilha(tmp_path, celula: str):
+    """Tabela Empresa/Valor com o cabecalho na celula dada e uma linha vazia no meio."""
+    livro = openpyxl.Workbook()
+    aba = livro.active
+    coluna, linha = openpyxl.utils.cell.coordinate_from_string(celula)
+    coluna = openpyxl.utils.column_index_from_string(coluna)
+    aba.cell(linha, coluna, "Empresa")
+    aba.cell(linha, coluna + 1, "Valor")
+    aba.cell(linha + 1, coluna, "A")
+    aba.cell(linha + 1, coluna + 1, 1.5)
+    aba.cell(linha + 3, coluna, "B")
+    aba.cell(linha + 3, coluna + 1, 2)
+    caminho = tmp_path / f"{celula}.xlsx"
+    livro.save(caminho)
+    return caminho, linha
+
+
+@pytest.mark.parametrize("celula", ["A1", "A2", "B2", "C4"])
+def test_linhas_vazias_antes_do_cabecalho(tmp_path, celula):
+    caminho, linha = _planilha(tmp_path, celula)
+    esperado = pd.read_excel(caminho, header=linha - 1)
+
+    df = planilhas.ler_excel(caminho)
+
+    pd.testing.assert_frame_equal(df, esperado)
+    assert list(df.columns[-2:]) == ["Empresa", "Valor"]
+
+
+def test_colunas_selecionadas(tmp_path, monkeypatch):
+    monkeypatch.setattr(planilhas, "CACHE_PLANILHAS_DIR", tmp_path / "cache")
+    caminho, _ = _planilha(tmp_path, "B2")
+
+    assert list(planilhas.ler_excel(caminho, colunas=["Valor", "Ausente"]).columns) == ["Valor"]
+    assert list(planilhas.ler_planilha(caminho, colunas=lambda nomes: nomes[-1:]).columns) == ["Valor"]
+
+    planilhas.pre_carregar([(caminho, 0)], workers=1)
+    df = planilhas.ler_planilha(caminho, colunas=["Empresa"])
+    assert list(df.columns) == ["Empresa"]
+    assert df["Empresa"].tolist()[::2] == ["A", "B"]
+    assert len(planilhas.ler_planilha(caminho, colunas=[])) == 3
@@ -0,0 +1,104 @@
+"""
+Transformacoes vetorizadas usadas pelos loaders do ETL
+Versoes por coluna (pandas) de limpar_cnpj, limpar_valor_monetario e
+extrair_numero, com exatamente as mesmas regras das funcoes por valor.
+"""
+import numpy as np
+import pandas as pd
+
+VALORES_VERDADEIROS = ["sim", "s", "yes", "y", "1", "true", "ok"]
+
+
+def coluna(df: pd.DataFrame, nome: str, padrao=None) -> pd.Series:
+    """df[nome] ou uma serie constante com o padrao (equivale a row.get(nome, padrao))."""
+    if nome in df.columns:
+        return df[nome]
+    return pd.Series(padrao, index=df.index, dtype=object)
+
+
+def eh_numero(serie: pd.Series) -> pd.Series:
+    """Mascara de valores int/float do Python (mesmo teste de isinstance das funcoes por valor)."""
+    tipos = serie.map(type)
+    return tipos.map({t: issubclass(t, (int, float)) for t in tipos.unique()}).astype(bool)
+
+
+def texto(serie: pd.Series) -> pd.Series:
+    """str() de cada valor (NaN preservado)."""
+    return serie.astype(object).where(serie.isna(), serie.astype(object).astype(str))
+
+
+def normalizar_chave(valor) -> str:
+    """Chave de lookup normalizada: sem caixa e com os espacos colapsados."""
+    return " ".join(str(valor).split()).casefold()
+
+
+def normalizar_chave_coluna(serie: pd.Series) -> pd.Series:
+    """normalizar_chave por coluna (NaN preservado)."""
+    return texto(serie).str.split().str.join(" ").str.casefold()
+
+
+def mapear(serie: pd.Series, lookup: dict, padrao=None) -> pd.Series:
+    """
+    lookup.get(valor, padrao) por coluna. Com um database.Lookup, valores sem
+    correspondencia exata sao procurados pela chave normalizada.
+    """
+    resultado = serie.map(lookup)
+    normalizado = getattr(lookup, "normalizado", None)
+    if normalizado:
+        faltando = resultado.isna() & serie.notna()
+        if faltando.any():
+            resultado = resultado.astype(object)
+            resultado[faltando] = normalizar_chave_coluna(serie[faltando]).map(normalizado)
+    if padrao is not None:
+        resultado = resultado.fillna(padrao)
+    return resultado
+
+
+def limpar_cnpj_coluna(serie: pd.Series):
+    """
+    Versao por coluna de etl_dimensoes.limpar_cnpj.
+    Retorna (cnpj_formatado, cnpj_numerico); invalidos ficam nulos.
+    """
+    digitos = texto(serie).str.replace(r'\D', '', regex=True).str.zfill(14)
+    digitos = digitos.where(digitos.str.len() == 14)
+    formatado = (digitos.str[:2] + "." + digitos.str[2:5] + "." + digitos.str[5:8]
+                 + "/" + digitos.str[8:12] + "-" + digitos.str[12:14])
+    return formatado, pd.to_numeric(digitos)
+
+
+def limpar_valor_monetario_coluna(serie: pd.Series) -> pd.Series:
+    """Versao por coluna de etl_fatos.limpar_valor_monetario ("R$ 1.234,56" -> 1234.56)."""
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        return serie.astype(float)
+    serie = serie.astype(object)
+    numero = eh_numero(serie) & serie.notna()
+    limpo = (texto(serie.where(~numero)).str.replace(r'[R$\s.]', '', regex=True)
+             .str.replace(',', '.', regex=False))
+    convertido = pd.to_numeric(limpo, errors='coerce')
+    return convertido.where(~numero, pd.to_numeric(serie.where(numero)).astype(float))
+
+
+def extrair_numero_coluna(serie: pd.Series) -> pd.Series:
+    """Versao por coluna de etl_fatos.extrair_numero ('9 novas instalacoes' -> 9)."""
+    serie = serie.astype(object)
+    numero = eh_numero(serie) & serie.notna()
+    primeiro = pd.to_numeric(texto(serie.where(~numero)).str.extract(r'(\d+)', expand=False))
+    inteiros = np.trunc(pd.to_numeric(serie.where(numero)).astype(float))
+    return primeiro.where(~numero, inteiros).astype('Int64')
+
+
+def parse_bool_coluna(serie: pd.Series) -> pd.Series:
+    """Sim/Nao -> True/False (None para vazio)."""
+    verdadeiro = texto(serie).str.lower().str.strip().isin(VALORES_VERDADEIROS)
+    return verdadeiro.astype(object).where(serie.notna(), None)
+
+
+def preenchido(serie: pd.Series) -> pd.Series:
+    """Mascara de `valor and pd.notna(valor)`."""
+    return serie.notna() & serie.astype(object).where(serie.notna(), False).map(bool)
+
+
+def nome_preenchido(serie: pd.Series) -> pd.Series:
+    """Mascara de nomes validos: nao nulos, com valor verdadeiro e nao so espacos."""
+    so_espacos = texto(serie).str.strip().eq("")
+    return preenchido(serie) & ~so_espacos
@@ -282,18 +282,24 @@ CREATE TABLE fundos.FatoPatrimonioLiquido (
     ValorCota DECIMAL(18,8),
     CotistasTotal INT,
     CaptacaoLiquida DECIMAL(18,2),
+    CaptacaoBruta DECIMAL(18,2),
+    Resgates DECIMAL(18,2),
     RentabilidadeDia DECIMAL(10,6),
     RentabilidadeMes DECIMAL(10,6),
     RentabilidadeAno DECIMAL(10,6),
     Rentabilidade12M DECIMAL(10,6),
+    Rentabilidade24M DECIMAL(10,6),
     Volatilidade12M DECIMAL(10,6),
     SharpeRatio DECIMAL(10,6),
+    Drawdown DECIMAL(10,6),
+    DrawdownMaximo12M DECIMAL(10,6),
     DataCriacao DATETIME2 DEFAULT GETDATE(),
     CONSTRAINT FK_FatoPL_Fundo FOREIGN KEY (FundoID) REFERENCES fundos.FatoFundo(FundoID),
     CONSTRAINT FK_FatoPL_Tempo FOREIGN KEY (DataID) REFERENCES fundos.DimTempo(DataID)
 );
 CREATE INDEX IX_FatoPL_Fundo ON fundos.FatoPatrimonioLiquido(FundoID);
 CREATE INDEX IX_FatoPL_Data ON fundos.FatoPatrimonioLiquido(DataID);
+CREATE UNIQUE INDEX IX_FatoPL_FundoData ON fundos.FatoPatrimonioLiquido(FundoID, DataID);
 GO
 
 -- FatoResumoMensalESG
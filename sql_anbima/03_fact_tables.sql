@@ -84,6 +84,8 @@ CREATE TABLE fundos.FatoPatrimonioLiquido (
     Rentabilidade24M DECIMAL(10,6),
     Volatilidade12M DECIMAL(10,6),
     SharpeRatio DECIMAL(10,6),
+    Drawdown DECIMAL(10,6),             -- Queda da cota em relacao ao maior valor historico
+    DrawdownMaximo12M DECIMAL(10,6),    -- Pior drawdown dos ultimos 12M
     DataCriacao DATETIME2 DEFAULT GETDATE(),
     CONSTRAINT FK_FatoPL_Fundo FOREIGN KEY (FundoID) REFERENCES fundos.FatoFundo(FundoID),
     CONSTRAINT FK_FatoPL_Tempo FOREIGN KEY (DataID) REFERENCES fundos.DimTempo(DataID)
@@ -92,7 +94,7 @@ GO
 
 CREATE INDEX IX_FatoPL_Fundo ON fundos.FatoPatrimonioLiquido(FundoID);
 CREATE INDEX IX_FatoPL_Data ON fundos.FatoPatrimonioLiquido(DataID);
-CREATE INDEX IX_FatoPL_FundoData ON fundos.FatoPatrimonioLiquido(FundoID, DataID);
+CREATE UNIQUE INDEX IX_FatoPL_FundoData ON fundos.FatoPatrimonioLiquido(FundoID, DataID);
 GO
 
 -- ============================================================================
@@ -51,6 +51,9 @@ CREATE TABLE esg.dimsubsetor (
     CONSTRAINT fk_subsetor_setor FOREIGN KEY (setorid) REFERENCES esg.dimsetor(setorid)
 );
 
+-- Chave natural do upsert das dimensoes (etl/etl_dimensoes.py)
+CREATE UNIQUE INDEX ux_dimsubsetor_chave ON esg.dimsubsetor(setorid, subsetornome);
+
 -- ============================================================================
 -- DIMENSAO: CATEGORIA
 -- ============================================================================
@@ -104,6 +107,48 @@ CREATE TABLE esg.dimempresa (
 
 CREATE INDEX ix_dimempresa_cnpj ON esg.dimempresa(cnpjnumerico);
 CREATE INDEX ix_dimempresa_setor ON esg.dimempresa(setorid);
+CREATE UNIQUE INDEX ux_dimempresa_chave ON esg.dimempresa(empresanome);
+
+-- ============================================================================
+-- DIMENSAO: PRODUTO
+-- ============================================================================
+DROP TABLE IF EXISTS esg.dimproduto CASCADE;
+CREATE TABLE esg.dimproduto (
+    produtoid SERIAL PRIMARY KEY,
+    produtonome VARCHAR(200) NOT NULL,
+    produtodescricao VARCHAR(500),
+    tipoproduto VARCHAR(100),
+    ativo BOOLEAN DEFAULT true,
+    datacriacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    dataatualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE UNIQUE INDEX ux_dimproduto_chave ON esg.dimproduto(produtonome);
+
+-- ============================================================================
+-- DIMENSAO: CNAE
+-- ============================================================================
+DROP TABLE IF EXISTS esg.dimcnae CASCADE;
+CREATE TABLE esg.dimcnae (
+    cnaeid INT PRIMARY KEY,
+    cnaedescricao VARCHAR(500),
+    divisao VARCHAR(200),
+    grupo VARCHAR(200),
+    classe VARCHAR(200),
+    subclasse VARCHAR(200),
+    classebv VARCHAR(200),
+    subsetorbv VARCHAR(200),
+    setorbv VARCHAR(200),
+    projetobv VARCHAR(200),
+    categoriabv VARCHAR(200),
+    projetoibge VARCHAR(200),
+    categoriaibge VARCHAR(200),
+    macroibge VARCHAR(200),
+    observacoes VARCHAR(1000),
+    ativo BOOLEAN DEFAULT true,
+    datacriacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    dataatualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
 
 -- ============================================================================
 -- DIMENSAO: ODS
@@ -171,6 +216,91 @@ CREATE TABLE esg.logimportacao (
     datacriacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Telemetria de cada etapa do ETL (etl/perfil.py)
+DROP TABLE IF EXISTS esg.perfiletapa CASCADE;
+CREATE TABLE esg.perfiletapa (
+    perfilid SERIAL PRIMARY KEY,
+    etapa VARCHAR(200) NOT NULL,
+    arquivoorigem VARCHAR(500),
+    datainicio TIMESTAMP,
+    segundos NUMERIC(12,3),
+    segundosparse NUMERIC(12,3),
+    segundosbanco NUMERIC(12,3),
+    linhas INT,
+    linhasporsegundo NUMERIC(14,1),
+    byteslidos BIGINT,
+    rsspicomb NUMERIC(10,1),
+    datacriacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ============================================================================
+-- TABELAS: MANIFESTO DA CARGA INCREMENTAL (etl/incremental.py)
+-- Hash e linhas de cada entrada (arquivo/aba ou dimensao) por tabela carregada
+-- e hash de cada fatia (chave, ex: [EmpresaID, AnoReferencia]) das fatos
+-- ============================================================================
+DROP TABLE IF EXISTS esg.manifestoimportacao CASCADE;
+CREATE TABLE esg.manifestoimportacao (
+    tabeladestino VARCHAR(100) NOT NULL,
+    arquivo VARCHAR(500) NOT NULL,
+    aba VARCHAR(100) NOT NULL,
+    sha256 VARCHAR(64),
+    linhas INT,
+    dataimportacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (tabeladestino, arquivo, aba)
+);
+
+DROP TABLE IF EXISTS esg.manifestofatias CASCADE;
+CREATE TABLE esg.manifestofatias (
+    tabeladestino VARCHAR(100) NOT NULL,
+    chave VARCHAR(300) NOT NULL,
+    sha256 VARCHAR(64) NOT NULL,
+    linhas INT,
+    dataimportacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (tabeladestino, chave)
+);
+
+-- ============================================================================
+-- TABELAS: HISTORICO DE ALERTAS (EARLY WARNING)
+-- Materializadas apos cada carga por api/materializar_alertas.py
+-- ============================================================================
+DROP TABLE IF EXISTS esg.alertas CASCADE;
+CREATE TABLE esg.alertas (
+    alertaid SERIAL PRIMARY KEY,
+    regra VARCHAR(100) NOT NULL,
+    chave VARCHAR(300) NOT NULL DEFAULT '',
+    tipo VARCHAR(50),
+    severidade VARCHAR(20),
+    titulo VARCHAR(500),
+    descricao TEXT,
+    valor DECIMAL(20,4),
+    detalhes JSONB,
+    status VARCHAR(20) NOT NULL DEFAULT 'ativo',
+    primeiraocorrencia TIMESTAMP NOT NULL,
+    ultimaocorrencia TIMESTAMP NOT NULL,
+    resolvidoem TIMESTAMP,
+    execucoes INT DEFAULT 1,
+    datacriacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE UNIQUE INDEX ux_alertas_ativo ON esg.alertas(regra, chave) WHERE status = 'ativo';
+CREATE INDEX ix_alertas_status ON esg.alertas(status, severidade);
+CREATE INDEX ix_alertas_primeira ON esg.alertas(primeiraocorrencia);
+
+DROP TABLE IF EXISTS esg.alertasexecucao CASCADE;
+CREATE TABLE esg.alertasexecucao (
+    execucaoid SERIAL PRIMARY KEY,
+    dataexecucao TIMESTAMP NOT NULL,
+    novos INT,
+    persistentes INT,
+    resolvidos INT,
+    totalativos INT,
+    criticos INT,
+    medios INT,
+    baixos INT,
+    versaodados TEXT,
+    datacriacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- ============================================================================
 -- SCHEMA FUNDOS - Tabelas de Fundos de Investimento
 -- ============================================================================
@@ -307,6 +437,45 @@ CREATE TABLE emissores.demonstracoesfinanceiras (
     datacriacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Indicadores financeiros por (cnpj, ano), materializados na carga (api/materializar_indicadores.py)
+DROP TABLE IF EXISTS emissores.indicadores CASCADE;
+CREATE TABLE emissores.indicadores (
+    cnpj VARCHAR(18) NOT NULL,
+    ano INT NOT NULL,
+    receita DOUBLE PRECISION,
+    resultado_bruto DOUBLE PRECISION,
+    ebit DOUBLE PRECISION,
+    resultado_financeiro DOUBLE PRECISION,
+    lucro_antes_ir DOUBLE PRECISION,
+    lucro_operacoes_continuadas DOUBLE PRECISION,
+    lucro_liquido DOUBLE PRECISION,
+    ativo_total DOUBLE PRECISION,
+    ativo_circulante DOUBLE PRECISION,
+    caixa DOUBLE PRECISION,
+    aplicacoes_financeiras DOUBLE PRECISION,
+    passivo_circulante DOUBLE PRECISION,
+    emprestimos_cp DOUBLE PRECISION,
+    passivo_nao_circulante DOUBLE PRECISION,
+    emprestimos_lp DOUBLE PRECISION,
+    patrimonio_liquido DOUBLE PRECISION,
+    fco DOUBLE PRECISION,
+    margem_bruta DOUBLE PRECISION,
+    margem_ebit DOUBLE PRECISION,
+    margem_liquida DOUBLE PRECISION,
+    crescimento_receita DOUBLE PRECISION,
+    roe DOUBLE PRECISION,
+    divida_bruta DOUBLE PRECISION,
+    divida_liquida DOUBLE PRECISION,
+    divida_liquida_ebit DOUBLE PRECISION,
+    divida_pl DOUBLE PRECISION,
+    passivo_pl DOUBLE PRECISION,
+    liquidez_corrente DOUBLE PRECISION,
+    cobertura_juros DOUBLE PRECISION,
+    fco_divida DOUBLE PRECISION,
+    datacriacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (cnpj, ano)
+);
+
 DROP TABLE IF EXISTS emissores.governanca CASCADE;
 CREATE TABLE emissores.governanca (
     id SERIAL PRIMARY KEY,